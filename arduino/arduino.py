@@ -1,14 +1,64 @@
 import serial
+import threading
+import queue
 import time
 import random
 import logging
+from arduino.arduino_constants import ArduinoConstants
+from arduino.message_router import MessageRouter
+from arduino.command_future import CommandFuture
+from arduino.binary_frame import BinaryFrame
+from collections import deque
+import re
 
 class Arduino:
+    # unclaimed messages kept for get_message, oldest are dropped past this
+    MAX_INBOX_MESSAGES = 1000
+
+    # results for messages sent with send_message, kept for wait_for_result. nothing waits on most of them,
+    # so the oldest are dropped past this
+    MAX_QUEUED_RESULTS = 100
+
+    # how long a command waits for its Result: before it is given up on, so later replies still line up.
+    # this is longer than callers normally wait, since drive commands can take a while
+    COMMAND_TIMEOUT = 30.0
+
+    # a text line ends at a line break, or where a binary frame starts
+    LINE_END = re.compile(b'[\r\n\x02]')
+
     def __init__(self, usb_port = '/dev/ttyACM1', baud = 9600, timeout = 1):
         self.__serial = serial.Serial(port=usb_port, baudrate=baud, timeout=timeout)
 
         # device could be /dev/ttyUSB0 or /dev/ttyACM0
 
+        # every line from the vehicle is routed to subscribers by prefix. results are always
+        # queued, with the time they arrived, so one can't be missed between a send and the wait for it
+        self.__router = MessageRouter()
+        self.__results = queue.Queue(maxsize=Arduino.MAX_QUEUED_RESULTS)
+        self.__router.subscribe(ArduinoConstants.MESSAGE_PREFIX_RESULT, self.__handle_result)
+
+        # binary frames (see BinaryFrame) go to the handler for their frame type
+        self.__frame_handlers = {}
+
+        # commands waiting on a result, oldest first, and display commands held back until nothing is pending.
+        # the lock keeps the pending order the same as the order commands go out on the wire
+        self.__command_lock = threading.RLock()
+        self.__pending_commands = deque()
+        self.__held_displays = {} # command name -> (message, future)
+        self.__inbox = queue.Queue(maxsize=Arduino.MAX_INBOX_MESSAGES)
+        self.__last_sent = 0
+
+        self.__reading = True
+        self.__reader = threading.Thread(target=self.__read_messages, daemon=True, name=f"arduino_reader_{usb_port}")
+        self.__reader.start()
+
+    def get_router (self) -> MessageRouter:
+        return self.__router
+
+    # handler is called with the payload of each binary frame of the given type, on the reader thread
+    def subscribe_frames (self, frame_type : int, handler):
+        self.__frame_handlers[frame_type] = handler
+
     def handle_message(self, message):
         # subclass needs to do something here
         pass
@@ -27,50 +77,70 @@ class Arduino:
         return True
     
     def cleanup (self):
+        self.__reading = False
         self.__serial.close()
+        self.__reader.join(timeout=2.0)
 
     def refresh_connection (self):
         self.clear_input_buffer()
         self.__serial.close()
         self.__serial.open()
 
+    # drops anything not read yet. results still to come would be for commands sent before this,
+    # so pending commands are given up on as well
     def clear_input_buffer (self):
         self.__serial.reset_input_buffer()
+        self.__clear_queue(self.__inbox)
+        self.__clear_queue(self.__results)
+        self.__expire_all_commands()
 
     def has_message (self):
-        hasmsg = self.__serial.in_waiting > 0
-        return hasmsg
+        return not self.__inbox.empty()
     
+    # next message that no subscriber claimed. empty if nothing arrives within the timeout
     def get_message (self, timeout = 10.0):
-        # read bytes until we hit a carriage return or newline
-        complete_message = False
-        message_buffer = ""
-        start_time = time.time()
-        while complete_message == False and (time.time() - start_time <= timeout):
-            if self.__serial.in_waiting > 0:
-                next_byte = self.__serial.read()
-                try:
-                    next_str = next_byte.decode('utf-8')
-                    if next_str == '\n' or next_str == '\r':
-                        complete_message = True
-                    elif next_str == '\0' or next_str == '\x00':
-                        # ignore these characters, they may be c string terminators, but we dont care about those
-                        pass
-                    else:
-                        message_buffer += next_str
-                except Exception as e:
-                    print(f"Exception reading serial port: {e}")
-            else:
-                # wait for more bytes
-                time.sleep(0.05)
-
-        #logging.getLogger(__name__).info(f"Arduino: [{message_buffer}]")
-        return message_buffer.rstrip()
+        try:
+            return self.__inbox.get(timeout=timeout)
+        except queue.Empty:
+            return ""
     
     def send_message (self, message):
+        self.__last_sent = time.time()
         self.__serial.write(f"{message}\n".encode('UTF-8'))
         logging.getLogger(__name__).info(f"Sent: {message}")
 
+    # sends a command without waiting, and returns a future for its result.
+    # any number of commands can be in flight, the vehicle answers them in order, naming the command
+    def send_command (self, message) -> CommandFuture:
+        future = CommandFuture(message, Arduino.COMMAND_TIMEOUT)
+        with self.__command_lock:
+            self.__expire_commands()
+            self.__pending_commands.append(future)
+            self.send_message(message)
+        return future
+
+    # sends a display update. while other commands are pending, only the latest update of each
+    # kind (ShowPosition, ShowStatus, ...) is kept, and sent once nothing else is waiting.
+    # a replaced update's future finishes along with the one that replaced it
+    def send_display_command (self, message) -> CommandFuture:
+        command_name = message.split(':')[0]
+        with self.__command_lock:
+            self.__expire_commands()
+            if len(self.__pending_commands) == 0:
+                return self.send_command(message)
+
+            future = CommandFuture(message, Arduino.COMMAND_TIMEOUT)
+            if command_name in self.__held_displays:
+                replaced_message, replaced_future = self.__held_displays[command_name]
+                logging.getLogger(__name__).debug(f"Dropping display update {replaced_message}, replaced by {message}")
+                future.add_follower(replaced_future)
+            self.__held_displays[command_name] = (message, future)
+        return future
+
+    def get_pending_command_count (self):
+        with self.__command_lock:
+            return len(self.__pending_commands)
+
     def wait_for_ready (self, max_wait_secs = 10):
         # wait for ready
         logging.getLogger(__name__).debug("Waiting for arduino to become ready")
@@ -87,23 +157,141 @@ class Arduino:
 
         return ready
     
+    # waits for the result of the last message sent. results that arrived before it was sent are skipped
     def wait_for_result (self, max_wait_secs = 10):
         logging.getLogger(__name__).info("Waiting for arduino result")
         start = time.time()
-        received_result = False
-        result = False
-        while not received_result and time.time() - start < max_wait_secs:
-            # wait for hte response
-            while not self.has_message():
-                time.sleep(.1)
-                
-            a_msg = self.get_message()
-            if 'Result:' in a_msg:
+        while time.time() - start < max_wait_secs:
+            try:
+                received, a_msg = self.__results.get(timeout=max_wait_secs - (time.time() - start))
+            except queue.Empty:
+                break
+
+            if received >= self.__last_sent:
                 logging.getLogger(__name__).info(f"Received: {a_msg}")
-                received_result = True
-                result = a_msg.endswith(":0") # 0 is success
+                return a_msg.endswith(":0") # 0 is success
+            logging.getLogger(__name__).debug(f"Skipping earlier result: {a_msg}")
+
+        return False
+
+    # a result (Result:[command name]:[code]) belongs to the oldest pending command with the same name.
+    # pending commands ahead of that one never got their result, and are given up on. a result without
+    # a name goes to the oldest pending command. if no pending command matches, it was for
+    # something sent with send_message, and waits for wait_for_result
+    def __handle_result (self, message):
+        parts = message.split(':')
+        command_name = parts[1] if len(parts) > 2 else None
+        with self.__command_lock:
+            self.__expire_commands()
+            for i, future in enumerate(self.__pending_commands):
+                if command_name is None or future.get_command_name() == command_name:
+                    for lost in range(i):
+                        lost_future = self.__pending_commands.popleft()
+                        logging.getLogger(__name__).warning(f"Result for {lost_future.get_command()} was lost")
+                        lost_future.expire()
+                    self.__pending_commands.popleft().set_reply(message)
+                    self.__send_held_displays()
+                    return
+        if self.__results.full():
+            self.__clear_queue(self.__results, 1)
+        self.__results.put((time.time(), message))
+
+    # gives up on commands that never got a result
+    def __expire_commands (self):
+        now = time.time()
+        while len(self.__pending_commands) > 0 and self.__pending_commands[0].is_expired(now):
+            expired = self.__pending_commands.popleft()
+            logging.getLogger(__name__).warning(f"No result received for {expired.get_command()}")
+            expired.expire()
+        self.__send_held_displays()
+
+    # gives up on every pending and held command
+    def __expire_all_commands (self):
+        with self.__command_lock:
+            expired = list(self.__pending_commands) + [future for message, future in self.__held_displays.values()]
+            self.__pending_commands.clear()
+            self.__held_displays = {}
+        if len(expired) > 0:
+            logging.getLogger(__name__).warning(f"Giving up on {len(expired)} commands still waiting for a result")
+        for future in expired:
+            future.expire()
 
-        return result            
+    def __send_held_displays (self):
+        if len(self.__pending_commands) == 0 and len(self.__held_displays) > 0:
+            held = list(self.__held_displays.values())
+            self.__held_displays = {}
+            for message, future in held:
+                self.send_command(message).add_follower(future)
+
+    # runs on the reader thread. takes whatever bytes are waiting, splits them into lines and binary frames, and routes each one
+    def __read_messages (self):
+        pending = b''
+        while self.__reading:
+            try:
+                data = self.__serial.read(max(1, self.__serial.in_waiting))
+            except Exception as e:
+                # port is closed or being reopened
+                if self.__reading:
+                    logging.getLogger(__name__).debug(f"Exception reading serial port: {e}")
+                    time.sleep(0.1)
+                continue
+
+            if len(data) == 0:
+                continue
+
+            pending = self.__take_messages(pending + data)
+
+    # routes every complete line or frame at the start of data, returns whatever is left over
+    def __take_messages (self, data):
+        while len(data) > 0:
+            if data[0] == BinaryFrame.START:
+                frame_type, payload, used = BinaryFrame.take(data, self.__frame_handlers)
+                if used == 0:
+                    break
+                if frame_type is None:
+                    logging.getLogger(__name__).warning("Dropping corrupt binary frame")
+                else:
+                    self.__dispatch_frame(frame_type, payload)
+                data = data[used:]
+                continue
+
+            line_end = Arduino.LINE_END.search(data)
+            if line_end is None:
+                break
+            line = data[:line_end.start()]
+            # a frame start stays, to be read on the next pass
+            data = data[line_end.start() + (0 if line_end.group() == b'\x02' else 1):]
+
+            # ignore nulls, they may be c string terminators, but we dont care about those
+            message = line.replace(b'\0', b'').decode('utf-8', errors='ignore').rstrip()
+            if len(message) > 0:
+                self.__dispatch(message)
+        return data
+
+    def __dispatch_frame (self, frame_type, payload):
+        if frame_type in self.__frame_handlers:
+            try:
+                self.__frame_handlers[frame_type](payload)
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Handler for frame type {frame_type} failed: {e}")
+        else:
+            logging.getLogger(__name__).debug(f"No handler for binary frame type {frame_type}, dropping it")
+
+    def __dispatch (self, message):
+        #logging.getLogger(__name__).info(f"Arduino: [{message}]")
+        if not self.__router.route(message):
+            if self.__inbox.full():
+                self.__clear_queue(self.__inbox, 1)
+            self.__inbox.put(message)
+
+    def __clear_queue (self, q, max_items = None):
+        cleared = 0
+        while max_items is None or cleared < max_items:
+            try:
+                q.get_nowait()
+                cleared += 1
+            except queue.Empty:
+                break
 
 if __name__ == '__main__':
     logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
@@ -130,15 +318,7 @@ if __name__ == '__main__':
                     arduino.send_message('GO:0|2000')
                     moving = True
 
-            received_result = False
-            while not received_result:
-                # wait for hte response
-                while not arduino.has_message():
-                    time.sleep(.1)
-                    
-                a_msg = arduino.get_message()
-                if 'Result:' in a_msg:
-                    logging.getLogger(__name__).info(f"Received: {a_msg}")
-                    received_result = True
+            # wait for hte response
+            arduino.wait_for_result()
     else:
         logging.getLogger(__name__).error("Arduino not ready!")
@@ -0,0 +1,49 @@
+import struct
+import binascii
+
+# binary messages from the vehicle, sent between text lines where a line would start.
+# STX, frame type (1 byte), payload length (uint16), payload, then a CRC-16/CCITT-FALSE (uint16)
+# of everything from the frame type through the end of the payload. everything is little endian.
+# text lines never contain STX, so it marks where a frame begins
+class BinaryFrame:
+    START = 0x02
+    TYPE_LIDAR = ord('L')
+
+    # longer than this is treated as a corrupt length, rather than waited on
+    MAX_PAYLOAD_BYTES = 4096
+
+    HEADER = struct.Struct('<BBH')
+    CRC = struct.Struct('<H')
+
+    def encode (frame_type : int, payload : bytes):
+        header = BinaryFrame.HEADER.pack(BinaryFrame.START, frame_type, len(payload))
+        return header + payload + BinaryFrame.CRC.pack(BinaryFrame.get_crc(header[1:] + payload))
+
+    def get_crc (data : bytes):
+        return binascii.crc_hqx(data, 0xFFFF)
+
+    # reads a frame from the start of the given bytes, which must begin with START.
+    # returns (frame type, payload, bytes used). bytes used is 0 if the frame isn't all there yet.
+    # a frame that is corrupt, or not one of the given frame types, gives a frame type of None and uses
+    # just the start byte, so reading can pick up after it. checking the type early keeps a stray START
+    # (say, inside the payload of a frame that was cut off) from being waited on as a long frame
+    def take (data : bytes, frame_types = None):
+        if len(data) >= 2 and frame_types is not None and data[1] not in frame_types:
+            return None, None, 1
+        if len(data) < BinaryFrame.HEADER.size:
+            return None, None, 0
+
+        start, frame_type, payload_length = BinaryFrame.HEADER.unpack_from(data)
+        if payload_length > BinaryFrame.MAX_PAYLOAD_BYTES:
+            return None, None, 1
+
+        frame_length = BinaryFrame.HEADER.size + payload_length + BinaryFrame.CRC.size
+        if len(data) < frame_length:
+            return None, None, 0
+
+        payload = bytes(data[BinaryFrame.HEADER.size:BinaryFrame.HEADER.size + payload_length])
+        crc, = BinaryFrame.CRC.unpack_from(data, frame_length - BinaryFrame.CRC.size)
+        if crc != BinaryFrame.get_crc(bytes(data[1:BinaryFrame.HEADER.size]) + payload):
+            return None, None, 1
+
+        return frame_type, payload, frame_length
@@ -0,0 +1,63 @@
+import threading
+import time
+
+# the eventual result of a command sent to the vehicle. the vehicle answers every command
+# with a Result: line naming the command, in the order the commands were sent, which is how a reply finds its future.
+# a future that was replaced by a newer command (see Arduino.send_display_command) finishes with it
+class CommandFuture:
+    def __init__(self, command, timeout):
+        self.__command = command
+        self.__deadline = time.time() + timeout
+        self.__done = threading.Event()
+        self.__success = False
+        self.__reply = None
+        self.__followers = []
+        self.__lock = threading.Lock()
+
+    def get_command (self):
+        return self.__command
+
+    def get_command_name (self):
+        return self.__command.split(':')[0]
+
+    def get_reply (self):
+        return self.__reply
+
+    def is_done (self):
+        return self.__done.is_set()
+
+    def is_expired (self, now = None):
+        return (now if now is not None else time.time()) > self.__deadline
+
+    # waits for the result. True if the vehicle reported success, False if it failed or didn't answer in time
+    def result (self, timeout = 10.0):
+        self.__done.wait(timeout)
+        return self.__success
+
+    # the reply ends with :0 on success
+    def set_reply (self, reply):
+        self.__finish(reply.endswith(":0"), reply)
+
+    def expire (self):
+        self.__finish(False, None)
+
+    # the given future finishes whenever this one does
+    def add_follower (self, future):
+        with self.__lock:
+            if not self.__done.is_set():
+                self.__followers.append(future)
+                return
+        future.__finish(self.__success, self.__reply)
+
+    def __finish (self, success, reply):
+        with self.__lock:
+            if self.__done.is_set():
+                return
+            self.__success = success
+            self.__reply = reply
+            self.__done.set()
+            followers = self.__followers
+            self.__followers = []
+
+        for f in followers:
+            f.__finish(success, reply)
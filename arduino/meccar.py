@@ -1,19 +1,34 @@
 from arduino.arduino import Arduino
 from arduino.arduino_constants import ArduinoConstants
-from lidar.lidar_map import LidarMap
+from arduino.binary_frame import BinaryFrame
+from lidar.lidar_codec import LidarCodec
+from lidar.latest_scan import LatestScan, LidarScanParser
 import logging
 import time
 
 class MecCar(Arduino):
-    def __init__(self):
+    DEFAULT_PORTS = ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']
+
+    # how long to wait on the vehicle to say which lidar formats it can send. older firmware doesn't answer
+    LIDAR_FORMAT_TIMEOUT = 1.0
+
+    def __init__(self, streaming_lidar = False, preferred_lidar_format = LidarCodec.FORMAT_BINARY, ports = None):
         self.__lidar_offset = None
         self.__lidar_granularity = None
+
+        # scans come as text until the vehicle agrees to something else, see get_all_configurations
+        self.__preferred_lidar_format = preferred_lidar_format
+        self.__lidar_formats = None
+        self.__lidar_format = None
         self.__camera_configs = {}
-        self.__streaming_lidar = False # this was intended to make ps4 user not have to wait as long, but causes locks in some situations
+
+        # when streaming, scans the vehicle sends on its own are used as they come in, so lidar
+        # lookups that can live with the newest scan's age don't need a round trip
+        self.__streaming_lidar = streaming_lidar
         self.__streaming_camera_info = False
 
         connected = False
-        for trial_port in ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']:
+        for trial_port in (ports if ports is not None else MecCar.DEFAULT_PORTS):
             try:
                 logging.getLogger(__name__).info(f"Trying connection on {trial_port}")
                 Arduino.__init__(self, usb_port = trial_port, baud = 115200, timeout = 1)
@@ -27,6 +42,17 @@ class MecCar(Arduino):
             logging.getLogger(__name__).error("Failed to connect to vehicle!")
             raise Exception("Arduino connection error")
 
+        # keep vehicle state current as messages come in, whether or not anyone is waiting on them.
+        # lidar is parsed off the reader thread, and the newest scan is there for anyone to read without locking
+        self.__latest_lidar = LatestScan()
+        self.__lidar_parser = LidarScanParser(self.__latest_lidar)
+        router = self.get_router()
+        router.subscribe(ArduinoConstants.MESSAGE_PREFIX_CONFIG, self.__handle_config, claim = False)
+        router.subscribe(ArduinoConstants.MESSAGE_PREFIX_CAMERAS, self.__handle_cameras, claim = False)
+        router.subscribe(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP, self.__handle_lidar_map, claim = False)
+        router.subscribe(ArduinoConstants.MESSAGE_PREFIX_LOG, self.__handle_log, claim = False)
+        self.subscribe_frames(BinaryFrame.TYPE_LIDAR, self.__handle_lidar_frame)
+
     def is_streaming_lidar (self):
         return self.__streaming_lidar
     
@@ -34,140 +60,146 @@ class MecCar(Arduino):
         return self.__streaming_camera_info
 
     def get_all_configurations (self, timeout : float = 10.0):
-        if self.__lidar_offset is None or self.__lidar_granularity is None:
-            start_time = time.time()
-
-            while time.time() - start_time < timeout:
-                if self.has_message():
-                    msg = self.get_message()
-                    if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_CONFIG):
-                        logging.getLogger(__name__).info(f"Received config: {msg}")
-                        config_entry = msg.split(':')[1]
-                        config_key = config_entry.split('|')[0]
-                        config_val = config_entry.split('|')[1]
-                        if config_key == 'LidarHeading':
-                            self.__lidar_offset = int(config_val)
-                        elif config_key == 'LidarGranularity':
-                            self.__lidar_granularity = float(config_val)
-                    #else:
-                    #    logging.getLogger(__name__).info(f"Received unexpected message: {msg}")
-                else:
-                    time.sleep(0.25)
-
-                if self.__lidar_offset is None:
-                    self.get_config("LidarHeading")
-                elif self.__lidar_granularity is None:
-                    self.get_config("LidarGranularity")
-                else:
-                    break
+        start_time = time.time()
+        while (self.__lidar_offset is None or self.__lidar_granularity is None) and time.time() - start_time < timeout:
+            # the config message is handled as it arrives, this just waits for it to show up
+            config_waiter = self.get_router().expect(ArduinoConstants.MESSAGE_PREFIX_CONFIG)
+            if self.__lidar_offset is None:
+                self.get_config("LidarHeading")
+            else:
+                self.get_config("LidarGranularity")
+            # ask again if it doesn't
+            config_waiter.wait(min(1.0, timeout - (time.time() - start_time)))
+
+        if self.__lidar_format is None and self.__lidar_offset is not None and self.__lidar_granularity is not None:
+            self.__negotiate_lidar_format()
         
         return self.__lidar_offset is not None and self.__lidar_granularity is not None
 
+    def get_lidar_format (self):
+        return self.__lidar_format if self.__lidar_format is not None else LidarCodec.FORMAT_TEXT
+
+    # asks the vehicle which lidar formats it can send, and switches to the preferred one if it can.
+    # anything short of the vehicle agreeing leaves lidar as text
+    def __negotiate_lidar_format (self):
+        self.__lidar_format = LidarCodec.FORMAT_TEXT
+        if self.__preferred_lidar_format == LidarCodec.FORMAT_TEXT:
+            return
+
+        # only the formats reply counts, not some other config arriving late. older firmware
+        # doesn't know this setting and may not answer at all, so it isn't waited on for long
+        formats_waiter = self.get_router().expect(f"{ArduinoConstants.MESSAGE_PREFIX_CONFIG}LidarFormats|")
+        formats_result = self.send_command("GetConfig:LidarFormats")
+        if not formats_result.result(MecCar.LIDAR_FORMAT_TIMEOUT) or formats_waiter.wait(MecCar.LIDAR_FORMAT_TIMEOUT) is None or self.__lidar_formats is None:
+            formats_waiter.cancel()
+            logging.getLogger(__name__).info("Vehicle did not list its lidar formats, using text")
+            return
+
+        if self.__preferred_lidar_format in self.__lidar_formats:
+            if self.send_command(f"SetConfig:LidarFormat|{self.__preferred_lidar_format}").result(10):
+                self.__lidar_format = self.__preferred_lidar_format
+        logging.getLogger(__name__).info(f"Vehicle lidar formats: {self.__lidar_formats}, using {self.__lidar_format}")
+
     def get_config (self, config_key):
-        self.send_message(f"GetConfig:{config_key}")
-        return self.wait_for_result(10)
+        return self.send_command(f"GetConfig:{config_key}").result(10)
 
     def get_cameras (self, timeout : float = 10.0, force_refresh = False):
         if self.__streaming_camera_info:
             return self.__camera_configs
         else:
-            self.send_message(f"GetCameras:none")
-            start_time = time.time()
-            received_config = False
+            cameras_waiter = self.get_router().expect(ArduinoConstants.MESSAGE_PREFIX_CAMERAS)
+            self.send_command(f"GetCameras:none")
 
             if force_refresh or len(self.__camera_configs) == 0:
-                while time.time() - start_time < timeout and received_config == False:
-                    if self.has_message():
-                        msg = self.get_message()
-                        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_CAMERAS):
-                            logging.getLogger(__name__).info(f"Received cameras: {msg}")
-
-                            # Cameras:[rotation1]|[tilt1]|[minrotation1]|[maxrotation1]|[mintilt1]|[maxtilt1],[rotation2]|...
-                            full_cam_config = msg.split(':')[1]
-                            all_cams = full_cam_config.split(',')
-                            for cam_id, cam in enumerate(all_cams):
-                                this_cam = cam.split('|')
-                                self.__camera_configs[cam_id] = {
-                                    'rotation':int(this_cam[0]),
-                                    'tilt':int(this_cam[1]),
-                                    'min_rotation':int(this_cam[2]),
-                                    'max_rotation':int(this_cam[3]),
-                                    'min_tilt':int(this_cam[4]),
-                                    'max_tilt':int(this_cam[5]),
-                                }
-                            received_config = True
-                        #else:
-                        #    logging.getLogger(__name__).info(f"Received unexpected message: {msg}")
-                    else:
-                        time.sleep(0.25)
+                cameras_waiter.wait(timeout)
+            else:
+                # the reply still updates the cached cameras when it comes in
+                cameras_waiter.cancel()
 
             return self.__camera_configs
     
-    
+    def __handle_config (self, msg):
+        logging.getLogger(__name__).info(f"Received config: {msg}")
+        config_entry = msg.split(':')[1]
+        config_key = config_entry.split('|')[0]
+        config_val = config_entry.split('|')[1]
+        if config_key == 'LidarHeading':
+            self.__lidar_offset = int(config_val)
+        elif config_key == 'LidarGranularity':
+            self.__lidar_granularity = float(config_val)
+        elif config_key == 'LidarFormats':
+            self.__lidar_formats = config_val.split(',')
+
+    def __handle_cameras (self, msg):
+        logging.getLogger(__name__).info(f"Received cameras: {msg}")
+
+        # Cameras:[rotation1]|[tilt1]|[minrotation1]|[maxrotation1]|[mintilt1]|[maxtilt1],[rotation2]|...
+        full_cam_config = msg.split(':')[1]
+        all_cams = full_cam_config.split(',')
+        for cam_id, cam in enumerate(all_cams):
+            this_cam = cam.split('|')
+            self.__camera_configs[cam_id] = {
+                'rotation':int(this_cam[0]),
+                'tilt':int(this_cam[1]),
+                'min_rotation':int(this_cam[2]),
+                'max_rotation':int(this_cam[3]),
+                'min_tilt':int(this_cam[4]),
+                'max_tilt':int(this_cam[5]),
+            }
+
+    def __handle_lidar_map (self, msg):
+        #logging.getLogger(__name__).info(f"Received lidar: {msg}")
+        if self.__lidar_offset is None or self.__lidar_granularity is None:
+            logging.getLogger(__name__).info("Received lidar before lidar config, ignoring it")
+            return
+        self.__lidar_parser.submit(self.__lidar_offset, self.__lidar_granularity, msg.split(':')[1])
+
+    def __handle_lidar_frame (self, payload):
+        self.__lidar_parser.submit_binary(payload)
 
-    def handle_message(self, msg):
-        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP):
-            logging.getLogger(__name__).info(f"Received lidar: {msg}")
-            self.__last_lidar = LidarMap(offset = self.__lidar_offset, granularity = self.__lidar_granularity, lidar_data = msg.split(':')[1])
-            self.__last_lidar_time = time.time()
-        elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_CAMERAS):
-            logging.getLogger(__name__).info(f"Received cameras: {msg}")
-
-            # Cameras:[rotation1]|[tilt1]|[minrotation1]|[maxrotation1]|[mintilt1]|[maxtilt1],[rotation2]|...
-            full_cam_config = msg.split(':')[1]
-            all_cams = full_cam_config.split(',')
-            for cam_id, cam in enumerate(all_cams):
-                this_cam = cam.split('|')
-                self.__camera_configs[cam_id] = {
-                    'rotation':int(this_cam[0]),
-                    'tilt':int(this_cam[1]),
-                    'min_rotation':int(this_cam[2]),
-                    'max_rotation':int(this_cam[3]),
-                    'min_tilt':int(this_cam[4]),
-                    'max_tilt':int(this_cam[5]),
-                }
-        elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LOG):
-            logging.getLogger(__name__).info(f"Arduino:{msg}")
+    def __handle_log (self, msg):
+        logging.getLogger(__name__).info(f"Arduino:{msg}")
 
+    # the newest scan received and its age in seconds, without asking the vehicle for anything.
+    # (None, inf) if no scan has come in yet
+    def get_latest_lidar_map (self):
+        return self.__latest_lidar.get_with_age()
 
     def get_live_lidar_map (self, max_lidar_age_millis = 6000, timeout = 10):
         if self.__streaming_lidar:
-            return self.__last_lidar
-        else:
-            self.send_message(f"Map:{max_lidar_age_millis}")
-            start = time.time()
-            if self.wait_for_result(timeout):
-                while (time.time() - start <= timeout):
-                    if (self.has_message()):
-                        msg = self.get_message()
-                        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP):
-                            #logging.getLogger(__name__).info(f"Received lidar: {msg}")
-                            self.__last_lidar = LidarMap(offset = self.__lidar_offset, granularity = self.__lidar_granularity, lidar_data = msg.split(':')[1])
-                            self.__last_lidar_time = time.time()
-                            return self.__last_lidar
-            
-                    time.sleep(0.25)
-            return None
+            lidar_map = self.__latest_lidar.get_fresh(max_lidar_age_millis / 1000)
+            if lidar_map is not None:
+                return lidar_map
+
+        # ask for a scan, and wait for it to be parsed
+        requested = time.time()
+        future = self.send_command(f"Map:{max_lidar_age_millis}")
+        if future.result(timeout):
+            return self.__latest_lidar.wait_for_scan(newer_than = requested, timeout = max(0.0, timeout - (time.time() - requested)))
+        return None
+
+    def cleanup (self):
+        self.__lidar_parser.stop()
+        super().cleanup()
 
     def get_lidar_map (self, max_lidar_age_millis = 6000, wait_for_result = False):
-        self.send_message(f"Map:{max_lidar_age_millis}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Map:{max_lidar_age_millis}")
+        return wait_for_result == False or future.result(10)
 
     def rotate (self, degrees : float, wait_for_result = False):
-        self.send_message(f"Rotate:{degrees}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Rotate:{degrees}")
+        return wait_for_result == False or future.result(10)
     
     def stop (self):
-        self.send_message(f"Stop:0")
-        return self.wait_for_result(10)
+        return self.send_command(f"Stop:0").result(10)
 
     def look (self, rotation : int, tilt : int, wait_for_result = False):
-        self.send_message(f"Look:{int(rotation)}|{int(tilt)}")
+        future = self.send_command(f"Look:{int(rotation)}|{int(tilt)}")
 
         # force a refresh of camera configs
         self.__camera_configs = {}
 
-        return wait_for_result == False or self.wait_for_result(10)
+        return wait_for_result == False or future.result(10)
 
     def look_multi (self, angles, wait_for_result = False):
         msg = "Look:"
@@ -175,60 +207,67 @@ class MecCar(Arduino):
             if i > 0:
                 msg = msg + "|"
             msg = msg + f"{int(rotation)}|{int(tilt)}"
-        self.send_message(msg)
+        future = self.send_command(msg)
 
         # force a refresh of camera configs
         self.__camera_configs = {}
 
-        return wait_for_result == False or self.wait_for_result(10)
+        return wait_for_result == False or future.result(10)
 
     def go (self, speed = 1, duration_millis = 1000):
-        self.send_message(f"Go:{speed}|{duration_millis}")
-        return self.wait_for_result(10)
+        return self.send_command(f"Go:{speed}|{duration_millis}").result(10)
 
     def forward_distance (self, speed = 1, distance_units = 10, wait_for_result = False):
-        self.send_message(f"Forward:{distance_units}|{speed}|false")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Forward:{distance_units}|{speed}|false")
+        return wait_for_result == False or future.result(10)
 
     def reverse_distance (self, speed = 1, distance_units = 10, wait_for_result = False):
-        self.send_message(f"Reverse:{distance_units}|{speed}|false")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Reverse:{distance_units}|{speed}|false")
+        return wait_for_result == False or future.result(10)
 
     def strafe (self, strafe_direction, millis, wait_for_result = False):
-        self.send_message(f"Strafe:{strafe_direction}|{millis}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Strafe:{strafe_direction}|{millis}")
+        return wait_for_result == False or future.result(10)
 
     def strafe_left (self, wait_for_result = False, millis=2000):
-        self.send_message(f"Strafe:LL|{millis}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Strafe:LL|{millis}")
+        return wait_for_result == False or future.result(10)
 
     def strafe_right (self, wait_for_result = False, millis=2000):
-        self.send_message(f"Strafe:RR|{millis}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_command(f"Strafe:RR|{millis}")
+        return wait_for_result == False or future.result(10)
 
     def find_measurement (self, degrees: float, angle_tolerance: float, expected_distance : float, distance_tolerance : float, max_age : int, timeout = 10):
-        self.send_message(f"FindMeasurement:{degrees}|{angle_tolerance}|{expected_distance}|{distance_tolerance}|{max_age}")
-        return self.__wait_and_return_measurement(timeout)
+        if self.__streaming_lidar:
+            # a streamed scan that is recent enough has the same answer the vehicle would give
+            lidar_map = self.__latest_lidar.get_fresh(max_age / 1000)
+            if lidar_map is not None:
+                return lidar_map.find_measurement(degrees, angle_tolerance, expected_distance, distance_tolerance)
+
+        measurement_waiter = self.get_router().expect(ArduinoConstants.MESSAGE_PREFIX_MEASUREMENT)
+        self.send_command(f"FindMeasurement:{degrees}|{angle_tolerance}|{expected_distance}|{distance_tolerance}|{max_age}")
+        return self.__wait_and_return_measurement(measurement_waiter, timeout)
 
     def measure (self, degrees: float, tolerance: float, timeout = 10):
-        self.send_message(f"Measure:{degrees}|{tolerance}")
-        return self.__wait_and_return_measurement(timeout)
+        measurement_waiter = self.get_router().expect(ArduinoConstants.MESSAGE_PREFIX_MEASUREMENT)
+        self.send_command(f"Measure:{degrees}|{tolerance}")
+        return self.__wait_and_return_measurement(measurement_waiter, timeout)
 
     def display_mode (self, mode : str, wait_for_result = False):
-        self.send_message(f"ShowMode:{mode}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_display_command(f"ShowMode:{mode}")
+        return wait_for_result == False or future.result(10)
 
     def display_status (self, status : str, wait_for_result = False):
-        self.send_message(f"ShowStatus:{status}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_display_command(f"ShowStatus:{status}")
+        return wait_for_result == False or future.result(10)
 
     def display_command (self, command : str, wait_for_result = False):
-        self.send_message(f"ShowCommand:{command}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_display_command(f"ShowCommand:{command}")
+        return wait_for_result == False or future.result(10)
 
     def display_position (self, x: float, y:float, heading: float, wait_for_result = False):
-        self.send_message(f"ShowPosition:{round(x,1)}|{round(y,1)}|{round(heading,1)}")
-        return wait_for_result == False or self.wait_for_result(10)
+        future = self.send_display_command(f"ShowPosition:{round(x,1)}|{round(y,1)}|{round(heading,1)}")
+        return wait_for_result == False or future.result(10)
 
     def display_objects (self, obj_dist_map, wait_for_result = False):
         if len(obj_dist_map) > 0:
@@ -238,25 +277,19 @@ class MecCar(Arduino):
                 obj_display = f"{obj}*" if obj_dist_map[obj]['islidar'] == True else obj
                 obj_plus_dist.append(f"{obj_display}|{round(obj_dist_map[obj]['ground'],1)}")
             obj_string = "|".join(obj_plus_dist)
-            self.send_message(f"ShowObjects:{obj_string}")
-            return wait_for_result == False or self.wait_for_result(10)
+            future = self.send_display_command(f"ShowObjects:{obj_string}")
+            return wait_for_result == False or future.result(10)
         return False
 
-    def __wait_and_return_measurement (self, timeout):
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.has_message():
-                msg = self.get_message()
-                if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_MEASUREMENT):
-                    logging.getLogger(__name__).info(f"Received measurement: {msg}")
-
-                    # Measurement:[angle]|[distance]
-                    measurement_vals = msg.split(':')[1].split('|')
-                    return float(measurement_vals[0]), float(measurement_vals[1])
-            else:
-                time.sleep(0.25)
+    def __wait_and_return_measurement (self, measurement_waiter, timeout):
+        msg = measurement_waiter.wait(timeout)
+        if msg is not None:
+            logging.getLogger(__name__).info(f"Received measurement: {msg}")
+
+            # Measurement:[angle]|[distance]
+            measurement_vals = msg.split(':')[1].split('|')
+            return float(measurement_vals[0]), float(measurement_vals[1])
 
         logging.getLogger(__name__).info(f"No measurement received before timeout")
 
         return None,None
-
@@ -0,0 +1,88 @@
+import threading
+import queue
+import logging
+
+# waits for the next message with a given prefix. created through MessageRouter.expect,
+# before the command that triggers the message is sent, so the reply can't be missed
+class MessageWaiter:
+    def __init__(self, router, prefix):
+        self.__router = router
+        self.__prefix = prefix
+        self.__messages = queue.Queue()
+
+    def get_prefix (self):
+        return self.__prefix
+
+    def put (self, message):
+        self.__messages.put(message)
+
+    # returns the message, or None if nothing arrived in time. the waiter is done after this
+    def wait (self, timeout = 10.0):
+        try:
+            return self.__messages.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            logging.getLogger(__name__).info(f"No {self.__prefix} message received before timeout")
+            return None
+        finally:
+            self.cancel()
+
+    def cancel (self):
+        self.__router.remove_waiter(self)
+
+# hands each message from the vehicle to whoever subscribed to its prefix (Result:, Map:, Cameras:, ...).
+# subscribers either observe a message (for keeping state up to date) or claim it (like a queue of results).
+# on top of that, each message goes to the oldest waiter expecting its prefix, if there is one.
+# subscribers always see a message before a waiter does, so state is current by the time the waiter wakes up.
+# messages nobody claims are left for the caller, see route
+class MessageRouter:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__subscribers = [] # (prefix, handler, claims)
+        self.__waiters = []
+
+    # handler is called with each message starting with the prefix, on the thread doing the routing
+    def subscribe (self, prefix, handler, claim = True):
+        with self.__lock:
+            self.__subscribers.append((prefix, handler, claim))
+
+    def unsubscribe (self, prefix, handler):
+        with self.__lock:
+            self.__subscribers = [s for s in self.__subscribers if not (s[0] == prefix and s[1] == handler)]
+
+    # waiter for the next message with the given prefix
+    def expect (self, prefix) -> MessageWaiter:
+        waiter = MessageWaiter(self, prefix)
+        with self.__lock:
+            self.__waiters.append(waiter)
+        return waiter
+
+    def remove_waiter (self, waiter):
+        with self.__lock:
+            if waiter in self.__waiters:
+                self.__waiters.remove(waiter)
+
+    # sends the message to all matching subscribers, then the oldest matching waiter.
+    # returns True if a waiter took it or any subscriber claimed it
+    def route (self, message):
+        waiter = None
+        with self.__lock:
+            matching = [s for s in self.__subscribers if message.startswith(s[0])]
+            for w in self.__waiters:
+                if message.startswith(w.get_prefix()):
+                    waiter = w
+                    self.__waiters.remove(w)
+                    break
+
+        claimed = False
+        for prefix, handler, claims in matching:
+            try:
+                handler(message)
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Handler for {prefix} failed on [{message}]: {e}")
+            claimed = claimed or claims
+
+        if waiter is not None:
+            waiter.put(message)
+            claimed = True
+
+        return claimed
@@ -1,19 +1,23 @@
 from arduino.arduino import Arduino
 from arduino.arduino_constants import ArduinoConstants
-from lidar.lidar_map import LidarMap
+from lidar.latest_scan import LatestScan, LidarScanParser
 import logging
 import time
 
 class Observer(Arduino):
-    def __init__(self):
+    DEFAULT_PORTS = ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']
+
+    def __init__(self, streaming_lidar = False, ports = None):
         self.__lidar_offset = None
         self.__lidar_granularity = None
         self.__camera_configs = {}
-        self.__streaming_lidar = False # this was intended to make ps4 user not have to wait as long, but causes locks in some situations
+
+        # when streaming, scans the vehicle sends on its own are used as they come in
+        self.__streaming_lidar = streaming_lidar
         self.__streaming_camera_info = False
 
         connected = False
-        for trial_port in ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']:
+        for trial_port in (ports if ports is not None else Observer.DEFAULT_PORTS):
             try:
                 logging.getLogger(__name__).info(f"Trying connection on {trial_port}")
                 Arduino.__init__(self, usb_port = trial_port, baud = 115200, timeout = 1)
@@ -27,6 +31,11 @@ class Observer(Arduino):
             logging.getLogger(__name__).error("Failed to connect to vehicle!")
             raise Exception("Arduino connection error")
 
+        # lidar is parsed off the reader thread, and the newest scan is there for anyone to read without locking
+        self.__latest_lidar = LatestScan()
+        self.__lidar_parser = LidarScanParser(self.__latest_lidar)
+        self.get_router().subscribe(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP, self.__handle_lidar_map)
+
     def is_streaming_lidar (self):
         return self.__streaming_lidar
     
@@ -106,12 +115,14 @@ class Observer(Arduino):
     
     
 
+    def __handle_lidar_map (self, msg):
+        if self.__lidar_offset is None or self.__lidar_granularity is None:
+            logging.getLogger(__name__).info("Received lidar before lidar config, ignoring it")
+            return
+        self.__lidar_parser.submit(self.__lidar_offset, self.__lidar_granularity, msg.split(':')[1])
+
     def handle_message(self, msg):
-        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP):
-            logging.getLogger(__name__).info(f"Received lidar: {msg}")
-            self.__last_lidar = LidarMap(offset = self.__lidar_offset, granularity = self.__lidar_granularity, lidar_data = msg.split(':')[1])
-            self.__last_lidar_time = time.time()
-        elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_CAMERAS):
+        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_CAMERAS):
             logging.getLogger(__name__).info(f"Received cameras: {msg}")
 
             # Cameras:[rotation1]|[tilt1]|[minrotation1]|[maxrotation1]|[mintilt1]|[maxtilt1],[rotation2]|...
@@ -131,24 +142,25 @@ class Observer(Arduino):
             logging.getLogger(__name__).info(f"Arduino:{msg}")
 
 
+    # the newest scan received and its age in seconds, (None, inf) if no scan has come in yet
+    def get_latest_lidar_map (self):
+        return self.__latest_lidar.get_with_age()
+
     def get_live_lidar_map (self, max_lidar_age_millis = 6000, timeout = 10):
         if self.__streaming_lidar:
-            return self.__last_lidar
-        else:
-            self.send_message(f"Map:{max_lidar_age_millis}")
-            start = time.time()
-            if self.wait_for_result(timeout):
-                while (time.time() - start <= timeout):
-                    if (self.has_message()):
-                        msg = self.get_message()
-                        if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP):
-                            #logging.getLogger(__name__).info(f"Received lidar: {msg}")
-                            self.__last_lidar = LidarMap(offset = self.__lidar_offset, granularity = self.__lidar_granularity, lidar_data = msg.split(':')[1])
-                            self.__last_lidar_time = time.time()
-                            return self.__last_lidar
-            
-                    time.sleep(0.25)
-            return None
+            lidar_map = self.__latest_lidar.get_fresh(max_lidar_age_millis / 1000)
+            if lidar_map is not None:
+                return lidar_map
+
+        requested = time.time()
+        self.send_message(f"Map:{max_lidar_age_millis}")
+        if self.wait_for_result(timeout):
+            return self.__latest_lidar.wait_for_scan(newer_than = requested, timeout = max(0.0, timeout - (time.time() - requested)))
+        return None
+
+    def cleanup (self):
+        self.__lidar_parser.stop()
+        super().cleanup()
 
     def get_lidar_map (self, max_lidar_age_millis = 6000, wait_for_result = False):
         self.send_message(f"Map:{max_lidar_age_millis}")
@@ -5,12 +5,14 @@ import logging
 import time
 
 class Tank(Arduino):
-    def __init__(self):
+    DEFAULT_PORTS = ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']
+
+    def __init__(self, ports = None):
         self.__lidar_offset = None
         self.__lidar_granularity = None
 
         connected = False
-        for trial_port in ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']:
+        for trial_port in (ports if ports is not None else Tank.DEFAULT_PORTS):
             try:
                 logging.getLogger(__name__).info(f"Trying connection on {trial_port}")
                 Arduino.__init__(self, usb_port = trial_port, baud = 9600, timeout = 1)
@@ -24,6 +26,10 @@ class Tank(Arduino):
             logging.getLogger(__name__).error("Failed to connect to vehicle!")
             raise Exception("Arduino connection error")
 
+    # the tank firmware only sends lidar when asked
+    def is_streaming_lidar (self):
+        return False
+
     def get_all_configurations (self, timeout : float = 10.0):
         if self.__lidar_offset is None or self.__lidar_granularity is None:
             start_time = time.time()
@@ -0,0 +1,163 @@
+import unittest
+from arduino.arduino import Arduino
+from arduino.arduino_constants import ArduinoConstants
+from arduino.binary_frame import BinaryFrame
+import logging
+import time
+import os
+import tty
+import select
+
+class TestArduino(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+
+        # the test plays the vehicle on the other end of a pseudo terminal
+        self.__vehicle, port = os.openpty()
+        tty.setraw(port)
+        self.__arduino = Arduino(usb_port = os.ttyname(port), baud = 115200, timeout = 0.2)
+        os.close(port)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.__arduino.cleanup()
+        os.close(self.__vehicle)
+        return super().tearDown()
+
+    def test_framing (self):
+        # lines split across writes, mixed line endings and c string terminators
+        os.write(self.__vehicle, b'!READY!\r\nLog:hel')
+        time.sleep(0.1)
+        os.write(self.__vehicle, b'lo\x00\nMeasurement:90.0|12.5\n')
+
+        self.assertEqual('!READY!', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual('Log:hello', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual('Measurement:90.0|12.5', self.__arduino.get_message(timeout = 2.0))
+        self.assertFalse(self.__arduino.has_message())
+
+    def test_routing (self):
+        logs = []
+        self.__arduino.get_router().subscribe(ArduinoConstants.MESSAGE_PREFIX_LOG, logs.append, claim = False)
+        waiter = self.__arduino.get_router().expect(ArduinoConstants.MESSAGE_PREFIX_MEASUREMENT)
+
+        os.write(self.__vehicle, b'Log:one\nMeasurement:90.0|12.5\nMeasurement:45.0|10.0\n')
+        self.assertEqual('Measurement:90.0|12.5', waiter.wait(2.0))
+
+        # observed messages, and ones nobody waited on, are still there for get_message
+        self.assertEqual('Log:one', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual('Measurement:45.0|10.0', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual(['Log:one'], logs)
+
+    def test_wait_for_result (self):
+        # a result left over from before the last send doesn't count
+        os.write(self.__vehicle, b'Result:Rotate:1\n')
+        time.sleep(0.2)
+        self.__arduino.send_message('Go:1|1000')
+        self.assertEqual(b'Go:1|1000\n', self.__read_sent(1))
+        os.write(self.__vehicle, b'Log:moving\nResult:Go:0\n')
+        self.assertTrue(self.__arduino.wait_for_result(2))
+
+        # results don't show up as plain messages
+        self.assertEqual('Log:moving', self.__arduino.get_message(timeout = 2.0))
+        self.assertFalse(self.__arduino.has_message())
+
+        self.__arduino.send_message('Go:1|1000')
+        self.assertFalse(self.__arduino.wait_for_result(0.5))
+
+    def test_command_futures (self):
+        # several commands in flight, each result goes to the command it answers
+        rotate = self.__arduino.send_command('Rotate:90.0')
+        look = self.__arduino.send_command('Look:0|90')
+        self.assertEqual(2, self.__arduino.get_pending_command_count())
+        self.assertEqual(b'Rotate:90.0\nLook:0|90\n', self.__read_sent(2))
+
+        os.write(self.__vehicle, b'Result:1\n')
+        self.assertFalse(rotate.result(2.0))
+        self.assertFalse(look.is_done())
+        os.write(self.__vehicle, b'Result:0\n')
+        self.assertTrue(look.result(2.0))
+        self.assertEqual(0, self.__arduino.get_pending_command_count())
+
+    def test_lost_result (self):
+        # the result for the first rotate never arrives, the look result gives up on it
+        first_rotate = self.__arduino.send_command('Rotate:90.0')
+        look = self.__arduino.send_command('Look:0|90')
+        second_rotate = self.__arduino.send_command('Rotate:45.0')
+        self.assertEqual(3, len(self.__read_sent(3).split()))
+
+        os.write(self.__vehicle, b'Result:Look:0\n')
+        self.assertTrue(look.result(2.0))
+        self.assertTrue(first_rotate.is_done())
+        self.assertFalse(first_rotate.result(0))
+        self.assertFalse(second_rotate.is_done())
+        self.assertEqual(1, self.__arduino.get_pending_command_count())
+
+        # a result for something no longer pending is left for wait_for_result
+        self.__arduino.send_message('Go:1|1000')
+        os.write(self.__vehicle, b'Result:Go:0\n')
+        self.assertTrue(self.__arduino.wait_for_result(2))
+        self.assertFalse(second_rotate.is_done())
+
+        # clearing the input gives up on whatever is still pending
+        self.__arduino.clear_input_buffer()
+        self.assertFalse(second_rotate.result(0))
+        self.assertEqual(0, self.__arduino.get_pending_command_count())
+
+    def test_display_coalescing (self):
+        # nothing pending, so the display update goes right out
+        first = self.__arduino.send_display_command('ShowPosition:1|1|0')
+        self.assertEqual(b'ShowPosition:1|1|0\n', self.__read_sent(1))
+
+        # while that is pending, only the latest position is kept
+        second = self.__arduino.send_display_command('ShowPosition:2|2|0')
+        status = self.__arduino.send_display_command('ShowStatus:Busy')
+        third = self.__arduino.send_display_command('ShowPosition:3|3|0')
+
+        os.write(self.__vehicle, b'Result:0\n')
+        self.assertTrue(first.result(2.0))
+        self.assertEqual([b'ShowPosition:3|3|0', b'ShowStatus:Busy'], sorted(self.__read_sent(2).split()))
+
+        os.write(self.__vehicle, b'Result:0\nResult:0\n')
+        for f in [second, status, third]:
+            self.assertTrue(f.result(2.0))
+
+    def test_binary_frames (self):
+        frames = []
+        self.__arduino.subscribe_frames(BinaryFrame.TYPE_LIDAR, frames.append)
+
+        # a frame holding line breaks, split across writes, right after a line without its line break
+        payload = b'\x01\n\r\x00\x02' * 20
+        frame = BinaryFrame.encode(BinaryFrame.TYPE_LIDAR, payload)
+        os.write(self.__vehicle, b'Log:before' + frame[:7])
+        time.sleep(0.1)
+        os.write(self.__vehicle, frame[7:] + b'Log:after\n')
+
+        self.assertEqual('Log:before', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual('Log:after', self.__arduino.get_message(timeout = 2.0))
+        self.assertEqual([payload], frames)
+
+        # a corrupt frame is dropped, and reading picks up again after it
+        corrupt = bytearray(frame)
+        corrupt[10] ^= 0xFF
+        os.write(self.__vehicle, bytes(corrupt) + b'\nLog:recovered\n' + frame)
+        deadline = time.time() + 2.0
+        while len(frames) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([payload, payload], frames)
+        # what was left of the corrupt frame comes through as text
+        messages = []
+        while self.__arduino.has_message():
+            messages.append(self.__arduino.get_message(timeout = 0.5))
+        self.assertEqual('Log:recovered', messages[-1])
+
+    # reads the given number of lines sent to the vehicle
+    def __read_sent (self, lines):
+        sent = b''
+        deadline = time.time() + 2.0
+        while sent.count(b'\n') < lines and time.time() < deadline:
+            if len(select.select([self.__vehicle], [], [], 0.1)[0]) > 0:
+                sent += os.read(self.__vehicle, 1000)
+        return sent
+
+if __name__ == '__main__':
+    unittest.main()
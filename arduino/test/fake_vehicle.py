@@ -0,0 +1,158 @@
+from arduino.binary_frame import BinaryFrame
+from lidar.lidar_codec import LidarCodec
+import numpy as np
+import threading
+import select
+import logging
+import time
+import os
+import tty
+
+# plays the vehicle firmware on one end of a pseudo terminal, so the real serial classes can connect
+# to get_port() without hardware. it answers config and lidar requests, and sends scans as text or
+# binary, whichever was agreed on. anything it sends is held back as long as it would take at the given
+# baud rate (10 bits per byte), so timings are close to the real link.
+# commands it doesn't know get a failed result, subclasses add their own through handle_command
+class FakeVehicle:
+    def __init__(self, baud = 115200, lidar_offset = 0, lidar_granularity = 0.5, lidar_measurements = None, supports_binary_lidar = True, stream_interval = None):
+        self.__baud = baud
+        self.__lidar_offset = lidar_offset
+        self.__lidar_granularity = lidar_granularity
+        self.__lidar_measurements = lidar_measurements if lidar_measurements is not None else FakeVehicle.get_default_scan(lidar_granularity)
+        self.__supports_binary_lidar = supports_binary_lidar
+        self.__lidar_format = LidarCodec.FORMAT_TEXT
+        self.__stream_interval = stream_interval
+
+        self.__bytes_sent = 0
+        self.__commands = []
+        self.__write_lock = threading.Lock()
+
+        # the vehicle keeps the controlling end, the car opens the other one by name
+        self.__vehicle_fd, self.__port_fd = os.openpty()
+        tty.setraw(self.__port_fd)
+        self.__port = os.ttyname(self.__port_fd)
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True, name='fake_vehicle')
+        self.__thread.start()
+
+    # a scan with something every 4th bin, 1 to 3 meters away
+    def get_default_scan (granularity = 0.5):
+        bins = int(360 / granularity)
+        measurements = 2000.0 + 1000.0 * np.sin(np.radians(np.arange(bins) * granularity * 3))
+        measurements[np.arange(bins) % 4 != 0] = -1.0
+        return measurements
+
+    def get_port (self):
+        return self.__port
+
+    def get_lidar_format (self):
+        return self.__lidar_format
+
+    def get_bytes_sent (self):
+        return self.__bytes_sent
+
+    # every command received, in order
+    def get_commands (self):
+        return list(self.__commands)
+
+    def get_lidar_offset (self):
+        return self.__lidar_offset
+
+    def get_lidar_granularity (self):
+        return self.__lidar_granularity
+
+    def get_lidar_measurements (self):
+        return self.__lidar_measurements
+
+    def set_lidar_measurements (self, measurements):
+        self.__lidar_measurements = measurements
+
+    def stop (self):
+        self.__running = False
+        self.__thread.join(2.0)
+        os.close(self.__vehicle_fd)
+        os.close(self.__port_fd)
+
+    # sends a line of text, or a binary frame if given bytes
+    def send (self, message):
+        data = message if isinstance(message, bytes) else f"{message}\r\n".encode('UTF-8')
+        with self.__write_lock:
+            time.sleep(len(data) * 10 / self.__baud)
+            os.write(self.__vehicle_fd, data)
+            self.__bytes_sent += len(data)
+
+    def send_result (self, command_name, success = True):
+        self.send(f"Result:{command_name}:{0 if success else 1}")
+
+    def send_lidar_scan (self):
+        measurements = self.get_lidar_measurements()
+        if self.__lidar_format == LidarCodec.FORMAT_BINARY:
+            self.send(BinaryFrame.encode(BinaryFrame.TYPE_LIDAR, LidarCodec.encode_binary(self.__lidar_offset, self.__lidar_granularity, measurements)))
+        else:
+            self.send(f"Map:{LidarCodec.encode_text(measurements)}")
+
+    # handles a command and sends its result. returns False if the command isn't known
+    def handle_command (self, command_name, params):
+        if command_name == 'GetConfig':
+            return self.__get_config(params)
+        elif command_name == 'SetConfig':
+            return self.__set_config(params)
+        elif command_name == 'Map':
+            self.send_lidar_scan()
+            self.send_result(command_name)
+            return True
+        return False
+
+    def __get_config (self, config_key):
+        if config_key == 'LidarHeading':
+            self.send(f"Config:LidarHeading|{self.__lidar_offset}")
+        elif config_key == 'LidarGranularity':
+            self.send(f"Config:LidarGranularity|{self.__lidar_granularity}")
+        elif config_key == 'LidarFormats' and self.__supports_binary_lidar:
+            self.send(f"Config:LidarFormats|{LidarCodec.FORMAT_TEXT},{LidarCodec.FORMAT_BINARY}")
+        else:
+            self.send_result('GetConfig', False)
+            return True
+        self.send_result('GetConfig')
+        return True
+
+    def __set_config (self, params):
+        config_key, config_val = params.split('|')
+        if config_key == 'LidarFormat' and (config_val == LidarCodec.FORMAT_TEXT or (config_val == LidarCodec.FORMAT_BINARY and self.__supports_binary_lidar)):
+            self.__lidar_format = config_val
+            self.send_result('SetConfig')
+        else:
+            self.send_result('SetConfig', False)
+        return True
+
+    def __run (self):
+        pending = b''
+        last_scan = time.time()
+        while self.__running:
+            if self.__stream_interval is not None and time.time() - last_scan >= self.__stream_interval:
+                self.send_lidar_scan()
+                last_scan = time.time()
+
+            readable, _, _ = select.select([self.__vehicle_fd], [], [], 0.05)
+            if len(readable) == 0:
+                continue
+            try:
+                pending = pending + os.read(self.__vehicle_fd, 1024)
+            except OSError:
+                break
+
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                command = line.decode('utf-8', errors='ignore').strip()
+                if len(command) == 0:
+                    continue
+                self.__commands.append(command)
+                command_name, _, params = command.partition(':')
+                try:
+                    if not self.handle_command(command_name, params):
+                        self.send_result(command_name, False)
+                except Exception as e:
+                    logging.getLogger(__name__).warning(f"Fake vehicle failed on {command}: {e}")
+                    self.send_result(command_name, False)
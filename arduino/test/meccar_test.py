@@ -0,0 +1,88 @@
+import unittest
+from arduino.meccar import MecCar
+from arduino.test.fake_vehicle import FakeVehicle
+from lidar.lidar_codec import LidarCodec
+import logging
+import numpy as np
+import time
+
+# firmware from before lidar formats, it leaves GetConfig:LidarFormats unanswered.
+# a config reply shows up late, where the formats would be
+class SilentFormatsVehicle(FakeVehicle):
+    def handle_command (self, command_name, params):
+        if command_name == 'GetConfig' and params == 'LidarFormats':
+            self.send("Config:LidarGranularity|0.5")
+            return True
+        return FakeVehicle.handle_command(self, command_name, params)
+
+class TestMecCar(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_lidar_format_negotiation (self):
+        scans = {}
+        for supports_binary, preferred, expected in [
+            (True, LidarCodec.FORMAT_BINARY, LidarCodec.FORMAT_BINARY),
+            (False, LidarCodec.FORMAT_BINARY, LidarCodec.FORMAT_TEXT),
+            (True, LidarCodec.FORMAT_TEXT, LidarCodec.FORMAT_TEXT)]:
+
+            vehicle = FakeVehicle(lidar_offset = 90, supports_binary_lidar = supports_binary)
+            car = MecCar(preferred_lidar_format = preferred, ports = [vehicle.get_port()])
+            try:
+                self.assertTrue(car.get_all_configurations())
+                self.assertEqual(expected, car.get_lidar_format())
+                self.assertEqual(expected, vehicle.get_lidar_format())
+
+                lidar_map = car.get_live_lidar_map(timeout = 5)
+                self.assertIsNotNone(lidar_map)
+                scans[(supports_binary, preferred)] = lidar_map
+            finally:
+                car.cleanup()
+                vehicle.stop()
+
+        # the same scan, whichever way it came
+        text_angles, text_measurements = scans[(False, LidarCodec.FORMAT_BINARY)].get_scan()
+        for lidar_map in scans.values():
+            angles, measurements = lidar_map.get_scan()
+            self.assertTrue(np.array_equal(text_angles, angles))
+            self.assertTrue(np.allclose(text_measurements, measurements, atol = 0.5))
+
+    def test_lidar_formats_unanswered (self):
+        vehicle = SilentFormatsVehicle()
+        car = MecCar(preferred_lidar_format = LidarCodec.FORMAT_BINARY, ports = [vehicle.get_port()])
+        try:
+            start = time.time()
+            self.assertTrue(car.get_all_configurations())
+            self.assertLess(time.time() - start, 3 * MecCar.LIDAR_FORMAT_TIMEOUT)
+            self.assertEqual(LidarCodec.FORMAT_TEXT, car.get_lidar_format())
+
+            # the unanswered request doesn't take the next command's result
+            self.assertIsNotNone(car.get_live_lidar_map(timeout = 5))
+        finally:
+            car.cleanup()
+            vehicle.stop()
+
+    def test_streaming_lidar (self):
+        vehicle = FakeVehicle(stream_interval = 0.2)
+        car = MecCar(streaming_lidar = True, ports = [vehicle.get_port()])
+        try:
+            self.assertTrue(car.get_all_configurations())
+            lidar_map = car.get_live_lidar_map(max_lidar_age_millis = 1000, timeout = 5)
+            self.assertIsNotNone(lidar_map)
+
+            # streamed scans are used without asking for one
+            maps_requested = len([c for c in vehicle.get_commands() if c.startswith('Map:')])
+            for i in range(5):
+                self.assertIsNotNone(car.get_live_lidar_map(max_lidar_age_millis = 1000, timeout = 5))
+            self.assertEqual(maps_requested, len([c for c in vehicle.get_commands() if c.startswith('Map:')]))
+
+            latest, age = car.get_latest_lidar_map()
+            self.assertIsNotNone(latest)
+            self.assertLess(age, 1.0)
+        finally:
+            car.cleanup()
+            vehicle.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 # mock car to be used for unit test purposes
 class TestCar:
     def __init__(self, left_cam_starting_rotation = 0, right_cam_starting_rotation = 0):
+        self.__streaming_lidar = False
+        self.__streaming_camera_info = False
         self.__camera_configs = {
             '0': {
                 'rotation':left_cam_starting_rotation,
@@ -39,7 +41,10 @@ class TestCar:
     def handle_message(self, msg):
         pass
 
-    def get_live_lidar_map (self, timeout = 10):
+    def get_latest_lidar_map (self):
+        return None, float('inf')
+
+    def get_live_lidar_map (self, max_lidar_age_millis = 6000, timeout = 10):
         return None
 
     def get_lidar_map (self, wait_for_result = False):
@@ -0,0 +1,183 @@
+from arduino.test.fake_vehicle import FakeVehicle
+from arduino.arduino_constants import ArduinoConstants
+from field.field_map import FieldMap
+from lidar.lidar_map import LidarMap
+import numpy as np
+import logging
+import time
+
+# plays the MecCar firmware on a pseudo terminal, driving around a field map. it keeps the vehicle's
+# true position and heading, and answers movement, camera, measurement and lidar commands the way
+# the vehicle does: the result is sent once the move is done, taking as long as the move would.
+# lidar is traced from the current position against the map boundaries and obstacles.
+# map units are whatever the map uses (inches), lidar goes out in mm, like the real thing.
+# time_scale stretches or shrinks how long moves take, 0 makes them instant.
+# MecCar, Observer and Tank all connect to get_port() as they would to the vehicle
+class VehicleSimulator(FakeVehicle):
+    STRAFE_HEADINGS = {
+        ArduinoConstants.STRAFE_LEFT_FORWARD: -45.0,
+        ArduinoConstants.STRAFE_LEFT_LEFT: -90.0,
+        ArduinoConstants.STRAFE_LEFT_BACKWARD: -135.0,
+        ArduinoConstants.STRAFE_RIGHT_FORWARD: 45.0,
+        ArduinoConstants.STRAFE_RIGHT_RIGHT: 90.0,
+        ArduinoConstants.STRAFE_RIGHT_BACKWARD: 135.0
+    }
+
+    def __init__(self, field_map : FieldMap, x = 0.0, y = 0.0, heading = 0.0, baud = 115200, time_scale = 1.0,
+                 drive_speed = 12.0, strafe_speed = 6.0, rotation_speed = 90.0, vehicle_length = 22.0, units_to_mm = 25.4,
+                 max_lidar_range_mm = 12000.0, num_cameras = 2, **fake_vehicle_args):
+        # set before the fake vehicle starts, it may stream lidar right away
+        self.__field_map = field_map
+        self.__pose = (x, y, heading % 360.0)
+        self.__time_scale = time_scale
+        self.__drive_speed = drive_speed # map units a second, at speed 1
+        self.__strafe_speed = strafe_speed # map units a second
+        self.__rotation_speed = rotation_speed # degrees a second
+        self.__stop_distance = vehicle_length / 2
+        self.__units_to_mm = units_to_mm
+        self.__max_lidar_range_mm = max_lidar_range_mm
+        self.__cameras = [{'rotation':90, 'tilt':90, 'min_rotation':0, 'max_rotation':180, 'min_tilt':0, 'max_tilt':180} for i in range(num_cameras)]
+
+        # obstacle rectangles, rows are obstacles
+        obstacles = field_map.get_obstacles() if field_map.get_obstacles() is not None else {}
+        self.__obstacles = np.array([[o['xmin'], o['ymin'], o['xmax'], o['ymax']] for o in obstacles.values()], dtype=float).reshape(-1, 4)
+
+        FakeVehicle.__init__(self, baud = baud, **fake_vehicle_args)
+
+    # true position and heading, (x, y, heading)
+    def get_pose (self):
+        return self.__pose
+
+    def set_pose (self, x, y, heading):
+        self.__pose = (x, y, heading % 360.0)
+
+    def get_camera_rotations (self):
+        return [c['rotation'] for c in self.__cameras]
+
+    # traced from the current position, one measurement per bin, -1 where nothing is in range
+    def get_lidar_measurements (self):
+        x, y, heading = self.__pose
+        bins = int(round(360.0 / self.get_lidar_granularity()))
+        lidar_angles = np.arange(bins) * self.get_lidar_granularity() + self.get_lidar_offset()
+        distances = self.get_distances(x, y, heading + lidar_angles) * self.__units_to_mm
+        return np.where(distances <= self.__max_lidar_range_mm, distances, -1.0)
+
+    # map units from the point to the nearest wall or obstacle along each heading (0 is north, clockwise)
+    def get_distances (self, x, y, headings):
+        radians = np.radians(np.asarray(headings, dtype=float)).reshape(-1, 1)
+        dx = np.sin(radians)
+        dy = np.cos(radians)
+        dx = np.where(np.abs(dx) < 1e-12, 1e-12, dx)
+        dy = np.where(np.abs(dy) < 1e-12, 1e-12, dy)
+
+        # slab test against every box at once, rows are headings and columns are boxes.
+        # where a box is entered (near) and left (far), along the ray
+        xmin, ymin, xmax, ymax = self.__field_map.get_boundaries()
+        boxes = self.__obstacles
+        if xmin is not None:
+            boxes = np.vstack([boxes, [[xmin, ymin, xmax, ymax]]])
+        if len(boxes) == 0:
+            return np.full(len(radians), np.inf)
+
+        tx1 = (boxes[:, 0] - x) / dx
+        tx2 = (boxes[:, 2] - x) / dx
+        ty1 = (boxes[:, 1] - y) / dy
+        ty2 = (boxes[:, 3] - y) / dy
+        near = np.maximum(np.minimum(tx1, tx2), np.minimum(ty1, ty2))
+        far = np.minimum(np.maximum(tx1, tx2), np.maximum(ty1, ty2))
+
+        # obstacles are hit where they are entered. the boundary is the last box, and is hit where it is left
+        hits = np.where((near <= far) & (near > 0), near, np.inf)
+        if xmin is not None:
+            hits[:, -1] = np.where(far[:, -1] > 0, far[:, -1], np.inf)
+        return np.min(hits, axis=1)
+
+    def handle_command (self, command_name, params):
+        if command_name == 'Rotate':
+            return self.__rotate(float(params))
+        elif command_name == 'Forward':
+            distance, speed = params.split('|')[:2]
+            return self.__drive(0.0, float(distance), self.__drive_speed * float(speed), command_name)
+        elif command_name == 'Reverse':
+            distance, speed = params.split('|')[:2]
+            return self.__drive(180.0, float(distance), self.__drive_speed * float(speed), command_name)
+        elif command_name == 'Go':
+            speed, millis = params.split('|')
+            return self.__drive(0.0, self.__drive_speed * float(speed) * float(millis) / 1000, self.__drive_speed * float(speed), command_name)
+        elif command_name == 'Strafe':
+            direction, millis = params.split('|')
+            return self.__drive(VehicleSimulator.STRAFE_HEADINGS[direction], self.__strafe_speed * float(millis) / 1000, self.__strafe_speed, command_name)
+        elif command_name == 'Stop':
+            self.send_result(command_name)
+            return True
+        elif command_name == 'Look':
+            return self.__look([int(p) for p in params.split('|')])
+        elif command_name == 'GetCameras':
+            self.__send_cameras()
+            self.send_result(command_name)
+            return True
+        elif command_name == 'Measure':
+            degrees, tolerance = params.split('|')
+            angle, measurement = self.__get_lidar_map().find_measurement(float(degrees), float(tolerance), 0.0, float('inf'))
+            self.__send_measurement(angle, measurement)
+            self.send_result(command_name)
+            return True
+        elif command_name == 'FindMeasurement':
+            degrees, angle_tolerance, expected, distance_tolerance = [float(p) for p in params.split('|')[:4]]
+            angle, measurement = self.__get_lidar_map().find_measurement(degrees, angle_tolerance, expected, distance_tolerance)
+            self.__send_measurement(angle, measurement)
+            self.send_result(command_name)
+            return True
+        elif command_name.startswith('Show'):
+            self.send_result(command_name)
+            return True
+        return FakeVehicle.handle_command(self, command_name, params)
+
+    def __rotate (self, degrees):
+        self.__wait(abs(degrees) / self.__rotation_speed)
+        x, y, heading = self.__pose
+        self.__pose = (x, y, (heading + degrees) % 360.0)
+        self.send_result('Rotate')
+        return True
+
+    # moves along the vehicle relative heading, stopping short of anything in the way.
+    # the result is a failure if the vehicle had to stop early
+    def __drive (self, relative_heading, distance, speed, command_name):
+        x, y, heading = self.__pose
+        drive_heading = heading + relative_heading
+        clearance = max(0.0, self.get_distances(x, y, [drive_heading])[0] - self.__stop_distance)
+        travel = min(distance, clearance)
+
+        self.__wait(travel / speed if speed > 0 else 0.0)
+        self.__pose = (x + travel * np.sin(np.radians(drive_heading)), y + travel * np.cos(np.radians(drive_heading)), heading)
+        if travel < distance:
+            logging.getLogger(__name__).info(f"Simulated vehicle stopped after {round(travel, 1)} of {distance}, something is in the way")
+        self.send_result(command_name, travel >= distance)
+        return True
+
+    def __look (self, angles):
+        # rotation and tilt for each camera, in order
+        for cam_id in range(min(len(self.__cameras), len(angles) // 2)):
+            camera = self.__cameras[cam_id]
+            camera['rotation'] = min(camera['max_rotation'], max(camera['min_rotation'], angles[cam_id * 2]))
+            camera['tilt'] = min(camera['max_tilt'], max(camera['min_tilt'], angles[cam_id * 2 + 1]))
+        self.send_result('Look')
+        return True
+
+    def __send_cameras (self):
+        # Cameras:[rotation1]|[tilt1]|[minrotation1]|[maxrotation1]|[mintilt1]|[maxtilt1],[rotation2]|...
+        cameras = ','.join(f"{c['rotation']}|{c['tilt']}|{c['min_rotation']}|{c['max_rotation']}|{c['min_tilt']}|{c['max_tilt']}" for c in self.__cameras)
+        self.send(f"Cameras:{cameras}")
+
+    def __send_measurement (self, angle, measurement):
+        if angle is None:
+            self.send("Measurement:-1.0|-1.0")
+        else:
+            self.send(f"Measurement:{round(angle, 2)}|{round(measurement, 1)}")
+
+    def __get_lidar_map (self):
+        return LidarMap(offset = self.get_lidar_offset(), granularity = self.get_lidar_granularity(), measurements = self.get_lidar_measurements())
+
+    def __wait (self, seconds):
+        if self.__time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.__time_scale)
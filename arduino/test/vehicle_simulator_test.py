@@ -0,0 +1,86 @@
+import unittest
+from arduino.test.vehicle_simulator import VehicleSimulator
+from arduino.meccar import MecCar
+from arduino.observer import Observer
+from arduino.tank import Tank
+from field.field_map import FieldMap
+import logging
+import numpy as np
+
+class TestVehicleSimulator(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+
+        # a 200 x 200 room, with a box north east of center
+        self.__field_map = FieldMap({}, boundaries={'xmin':-100, 'ymin':-100, 'xmax':100, 'ymax':100}, obstacles={
+            'box': {'xmin':40, 'ymin':40, 'xmax':60, 'ymax':60}
+        })
+        return super().setUp()
+
+    def test_lidar_tracing (self):
+        simulator = VehicleSimulator(self.__field_map, x = 0, y = 0, heading = 0, time_scale = 0)
+        try:
+            # walls straight ahead, right, behind, left, and the box corner on the diagonal
+            distances = simulator.get_distances(0, 0, [0, 90, 180, 270, 45])
+            self.assertTrue(np.allclose([100, 100, 100, 100, np.hypot(40, 40)], distances))
+
+            # lidar is vehicle relative, so turning the vehicle turns the scan
+            simulator.set_pose(0, 50, 90)
+            measurements = simulator.get_lidar_measurements()
+            self.assertAlmostEqual(40 * 25.4, measurements[0]) # box, ahead
+            self.assertAlmostEqual(50 * 25.4, measurements[540]) # north wall, to the left (270)
+        finally:
+            simulator.stop()
+
+    def test_meccar_driving (self):
+        simulator = VehicleSimulator(self.__field_map, x = 0, y = 0, heading = 0, time_scale = 0)
+        car = MecCar(ports = [simulator.get_port()])
+        try:
+            self.assertTrue(car.get_all_configurations())
+            lidar_map = car.get_live_lidar_map(timeout = 5)
+            self.assertAlmostEqual(100 * 25.4, lidar_map.get_measurement(0.0, 0.1), places = 0)
+
+            self.assertTrue(car.rotate(90, wait_for_result = True))
+            self.assertTrue(car.forward_distance(distance_units = 20, wait_for_result = True))
+            x, y, heading = simulator.get_pose()
+            self.assertAlmostEqual(20, x)
+            self.assertAlmostEqual(0, y)
+            self.assertAlmostEqual(90, heading)
+
+            # the east wall is 80 away, the vehicle stops half a length short of it
+            self.assertFalse(car.forward_distance(distance_units = 100, wait_for_result = True))
+            self.assertAlmostEqual(89, simulator.get_pose()[0])
+
+            self.assertTrue(car.look_multi([(45, 80), (135, 90)], wait_for_result = True))
+            self.assertEqual([45, 135], simulator.get_camera_rotations())
+            self.assertEqual(45, car.get_cameras(force_refresh = True)[0]['rotation'])
+
+            angle, measurement = car.measure(0.0, 1.0)
+            self.assertAlmostEqual(11 * 25.4, measurement, places = 0)
+        finally:
+            car.cleanup()
+            simulator.stop()
+
+    def test_observer_and_tank (self):
+        simulator = VehicleSimulator(self.__field_map, time_scale = 0)
+        observer = Observer(ports = [simulator.get_port()])
+        try:
+            self.assertTrue(observer.get_all_configurations())
+            self.assertIsNotNone(observer.get_live_lidar_map(timeout = 5))
+        finally:
+            observer.cleanup()
+            simulator.stop()
+
+        simulator = VehicleSimulator(self.__field_map, time_scale = 0)
+        tank = Tank(ports = [simulator.get_port()])
+        try:
+            self.assertTrue(tank.get_all_configurations())
+            self.assertIsNotNone(tank.get_live_lidar_map(timeout = 5))
+            self.assertTrue(tank.rotate(-90))
+            self.assertAlmostEqual(270, simulator.get_pose()[2])
+        finally:
+            tank.cleanup()
+            simulator.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+from arduino.meccar import MecCar
+from arduino.test.vehicle_simulator import VehicleSimulator
+from field.field_map import FieldMap
+from lidar.lidar_codec import LidarCodec
+from pilot.path_finder import PathFinder
+from timing.stage_timer import StageTimer
+import logging
+import json
+import sys
+
+# drives a MecCar across a simulated room, leg by leg the way GoToPositionAction does
+# (lidar, find a path, face the first leg, drive it), and reports where the time went as json.
+# there are no cameras, so the simulator's true position stands in for visual positioning.
+# usage: python benchmark_drive.py [lidar format] [time scale] [baud]
+
+MAX_LEGS = 10
+MAX_DIST_PER_LEG = 60.0
+CLOSE_ENOUGH = 6.0
+
+def drive (car : MecCar, simulator : VehicleSimulator, path_finder : PathFinder, target_x, target_y, stage_timer : StageTimer):
+    for leg in range(MAX_LEGS):
+        x, y, heading = simulator.get_pose()
+        if path_finder.is_close_enough(x, y, target_x, target_y, CLOSE_ENOUGH):
+            return True, leg
+
+        with stage_timer.stage('lidar'):
+            lidar_map = car.get_live_lidar_map(10.0)
+        with stage_timer.stage('plan'):
+            # paths are planned with north as 0, heading as -180 to 180
+            current_heading = heading if heading <= 180 else heading - 360
+            paths = path_finder.find_potential_paths(x, y, target_x, target_y, lidar_map = lidar_map, current_heading = current_heading)
+        if len(paths) == 0:
+            logging.getLogger(__name__).warning(f"No path from {x},{y} to {target_x},{target_y}")
+            return False, leg
+
+        leg_heading, leg_dist, leg_x, leg_y = paths[0][0]
+        with stage_timer.stage('rotate'):
+            car.rotate(path_finder.find_rotation(current_heading = current_heading, target_heading = leg_heading), wait_for_result = True)
+        with stage_timer.stage('forward'):
+            car.forward_distance(distance_units = min(leg_dist, MAX_DIST_PER_LEG), wait_for_result = True)
+
+    x, y, heading = simulator.get_pose()
+    return path_finder.is_close_enough(x, y, target_x, target_y, CLOSE_ENOUGH), MAX_LEGS
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] %(module)s:%(message)s', level=logging.WARNING)
+
+    lidar_format = sys.argv[1] if len(sys.argv) > 1 else LidarCodec.FORMAT_BINARY
+    time_scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    baud = int(sys.argv[3]) if len(sys.argv) > 3 else 115200
+
+    # a room with a wall partway across the middle, the way through is on the east side
+    field_map = FieldMap({}, boundaries={'xmin':0, 'ymin':0, 'xmax':240, 'ymax':240}, obstacles={
+        'wall': {'xmin':0, 'ymin':110, 'xmax':150, 'ymax':130}
+    })
+    simulator = VehicleSimulator(field_map, x = 40, y = 40, heading = 0, baud = baud, time_scale = time_scale)
+    car = MecCar(preferred_lidar_format = lidar_format, ports = [simulator.get_port()])
+    stage_timer = StageTimer(enabled = True)
+    try:
+        if not car.get_all_configurations():
+            raise Exception("Simulated vehicle did not send its lidar config")
+
+        stage_timer.start_cycle()
+        arrived, legs = drive(car, simulator, PathFinder(field_map = field_map), 60, 200, stage_timer)
+        x, y, heading = simulator.get_pose()
+        print(json.dumps({
+            'lidar_format': car.get_lidar_format(),
+            'baud': baud,
+            'time_scale': time_scale,
+            'arrived': arrived,
+            'legs': legs,
+            'final_position': [round(x, 1), round(y, 1), round(heading, 1)],
+            'timing': stage_timer.get_breakdown()
+        }, indent=2))
+    finally:
+        car.cleanup()
+        simulator.stop()
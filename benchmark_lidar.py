@@ -0,0 +1,62 @@
+from arduino.meccar import MecCar
+from arduino.test.fake_vehicle import FakeVehicle
+from lidar.lidar_codec import LidarCodec
+import logging
+import json
+import time
+import sys
+import numpy as np
+
+# requests lidar scans from a fake vehicle on a pseudo terminal, once with text scans and once with binary,
+# and reports scan size and request latency as json. the fake vehicle holds its writes back to the given baud rate.
+# usage: python benchmark_lidar.py [repetitions] [baud]
+
+def benchmark_format (lidar_format, repetitions, baud):
+    vehicle = FakeVehicle(baud = baud)
+    car = MecCar(preferred_lidar_format = lidar_format, ports = [vehicle.get_port()])
+    try:
+        if not car.get_all_configurations():
+            raise Exception("Fake vehicle did not send its lidar config")
+
+        latencies = []
+        bytes_per_scan = []
+        for i in range(repetitions):
+            sent = vehicle.get_bytes_sent()
+            start = time.time()
+            if car.get_live_lidar_map(max_lidar_age_millis = 0, timeout = 10) is None:
+                raise Exception(f"No {lidar_format} scan received")
+            latencies.append(time.time() - start)
+            bytes_per_scan.append(vehicle.get_bytes_sent() - sent)
+
+        decode_start = time.time()
+        measurements = vehicle.get_lidar_measurements()
+        for i in range(repetitions):
+            if lidar_format == LidarCodec.FORMAT_BINARY:
+                LidarCodec.decode_binary(LidarCodec.encode_binary(0, 0.5, measurements))
+            else:
+                LidarCodec.decode_text(0, 0.5, LidarCodec.encode_text(measurements))
+        encode_decode_millis = (time.time() - decode_start) * 1000 / repetitions
+
+        return {
+            'format': car.get_lidar_format(),
+            'bytes_per_scan': int(np.median(bytes_per_scan)),
+            'median_millis': round(float(np.median(latencies)) * 1000, 2),
+            'max_millis': round(float(np.max(latencies)) * 1000, 2),
+            'encode_decode_millis': round(encode_decode_millis, 3)
+        }
+    finally:
+        car.cleanup()
+        vehicle.stop()
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] %(module)s:%(message)s', level=logging.WARNING)
+
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baud = int(sys.argv[2]) if len(sys.argv) > 2 else 115200
+
+    report = {
+        'baud': baud,
+        'repetitions': repetitions,
+        'formats': [benchmark_format(f, repetitions, baud) for f in [LidarCodec.FORMAT_TEXT, LidarCodec.FORMAT_BINARY]]
+    }
+    print(json.dumps(report, indent=2))
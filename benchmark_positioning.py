@@ -0,0 +1,22 @@
+from position.position_benchmark import PositionBenchmark
+import logging
+import json
+import sys
+
+# replays the recorded positioning fixtures through every estimator and mode,
+# and reports latency and accuracy as json.
+# usage: python benchmark_positioning.py [output_file] [repetitions]
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] %(module)s:%(message)s', level=logging.WARNING)
+
+    output_file = sys.argv[1] if len(sys.argv) > 1 else None
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    benchmark = PositionBenchmark(fixture_dir = 'position/test/resources/benchmark', repetitions = repetitions)
+    report = benchmark.run()
+
+    if output_file is not None:
+        benchmark.write_report(report, output_file)
+    else:
+        print(json.dumps(report, indent=2))
@@ -23,6 +23,14 @@ class Camera:
     def capture_image (self):
         pass
 
+    # captures an image into the next slot of the given FrameRingBuffer, and returns that slot.
+    # None if no image could be captured
+    def capture_image_to_buffer (self, frame_buffer, preprocess = False):
+        image = self.capture_image(preprocess = preprocess)
+        if image is None:
+            return None
+        return frame_buffer.write(image)
+
     # stops the camera
     def stop_camera (self):
         pass
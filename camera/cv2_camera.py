@@ -29,7 +29,7 @@ class CV2Camera (Camera):
         self.start_camera()
 
     # no additional processing necessary
-    def preprocess_image (self, image):
+    def preprocess_image (self, image, dst = None):
         
         # crop 100px off each side
         #y = 0
@@ -44,7 +44,7 @@ class CV2Camera (Camera):
         kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
         
         # Apply the filter matrix to the image
-        sharpened = cv2.filter2D(image, -1, kernel)        
+        sharpened = cv2.filter2D(image, -1, kernel, dst = dst)        
         
         return sharpened
 
@@ -73,6 +73,20 @@ class CV2Camera (Camera):
 
         return frame
 
+    # the latest frame goes straight from the capture thread into shared memory,
+    # sharpened on the way if preprocessing, instead of being copied out first
+    def capture_image_to_buffer (self, frame_buffer, preprocess = False):
+        with CV2Camera.__read_lock:
+            if self.frame is None or not self.grabbed:
+                return None
+            frame_slot, slot_frame = frame_buffer.reserve(self.frame.shape, self.frame.dtype)
+            if preprocess:
+                self.preprocess_image(self.frame, dst = slot_frame)
+            else:
+                np.copyto(slot_frame, self.frame)
+
+        return frame_slot
+
     def __open(self, gstreamer_pipeline_string):
         try:
             self.video_capture = cv2.VideoCapture(
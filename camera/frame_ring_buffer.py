@@ -0,0 +1,139 @@
+from multiprocessing import shared_memory
+import numpy as np
+import logging
+
+# identifies one frame written to a FrameRingBuffer. this is what gets handed to
+# other processes instead of the frame itself, so it has to stay small and picklable
+class FrameSlot:
+    def __init__(self, buffer_name, slot, sequence, shape, dtype):
+        self.buffer_name = buffer_name
+        self.slot = slot
+        self.sequence = sequence
+        self.shape = tuple(shape)
+        self.dtype = str(dtype)
+
+    def __repr__(self):
+        return f"FrameSlot({self.buffer_name}, slot={self.slot}, seq={self.sequence}, shape={self.shape}, dtype={self.dtype})"
+
+# fixed number of frame slots in a single block of shared memory. cameras capture straight
+# into the next slot and inference workers map the same memory, so a frame is never
+# written to disk or pickled on its way to another process.
+# slots are reused in order, so there should be at least as many slots as frames
+# that are in flight at once (cameras * smoothing cycles).
+# only the process that created the buffer writes to it or frees it.
+class FrameRingBuffer:
+    # the buffer starts with the slot count and slot size, so readers only need the name
+    BUFFER_HEADER_BYTES = 64
+
+    # each slot is preceded by its sequence number, so a reader can tell if the slot was reused
+    HEADER_BYTES = 64
+
+    # shared memory opened by this process, by name. views handed out keep pointing into these
+    __attached = {}
+
+    def __init__(self, num_slots = 8, slot_bytes = 0):
+        if num_slots < 1:
+            raise Exception("Frame ring buffer needs at least one slot")
+        self.__num_slots = num_slots
+        self.__slot_bytes = 0
+        self.__shm = None
+        # blocks replaced when the slots grew. slots already handed out may still be read from them, so they are freed with the buffer
+        self.__retired = []
+        self.__next_slot = 0
+        self.__sequence = 0
+
+        if slot_bytes > 0:
+            self.__allocate(slot_bytes)
+
+    def get_num_slots (self):
+        return self.__num_slots
+
+    def get_slot_bytes (self):
+        return self.__slot_bytes
+
+    def get_name (self):
+        return self.__shm.name if self.__shm is not None else None
+
+    # reserves the next slot for a frame of the given shape / type.
+    # returns the slot, and a writable array over it that the frame should be written into.
+    # the buffer grows into a new block if the frame doesn't fit. earlier slots stay readable from the old one
+    def reserve (self, shape, dtype):
+        dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(shape)) * dtype.itemsize
+        if frame_bytes > self.__slot_bytes:
+            # slots stay aligned to the header size
+            self.__allocate(-(-frame_bytes // FrameRingBuffer.HEADER_BYTES) * FrameRingBuffer.HEADER_BYTES)
+
+        slot = self.__next_slot
+        self.__next_slot = (self.__next_slot + 1) % self.__num_slots
+        self.__sequence += 1
+
+        offset = FrameRingBuffer.__get_slot_offset(slot, self.__slot_bytes)
+        np.ndarray((1,), dtype=np.int64, buffer=self.__shm.buf, offset=offset)[0] = self.__sequence
+        frame = np.ndarray(shape, dtype=dtype, buffer=self.__shm.buf, offset=offset + FrameRingBuffer.HEADER_BYTES)
+
+        return FrameSlot(self.__shm.name, slot, self.__sequence, shape, dtype), frame
+
+    # copies the given frame into the next slot
+    def write (self, frame):
+        frame_slot, slot_frame = self.reserve(frame.shape, frame.dtype)
+        np.copyto(slot_frame, frame)
+        return frame_slot
+
+    # frees the shared memory. slots already handed out can no longer be read
+    def close (self):
+        for shm in self.__retired:
+            FrameRingBuffer.__free(shm)
+        self.__retired = []
+
+        if self.__shm is not None:
+            FrameRingBuffer.__free(self.__shm)
+            self.__shm = None
+            self.__slot_bytes = 0
+
+    # array over the frame in the given slot, usable from any process.
+    # the array points into shared memory, so it is only good until the slot is reused
+    @staticmethod
+    def read (frame_slot : FrameSlot):
+        if frame_slot.buffer_name not in FrameRingBuffer.__attached:
+            FrameRingBuffer.__attached[frame_slot.buffer_name] = shared_memory.SharedMemory(name=frame_slot.buffer_name)
+        shm = FrameRingBuffer.__attached[frame_slot.buffer_name]
+
+        dtype = np.dtype(frame_slot.dtype)
+        frame_bytes = int(np.prod(frame_slot.shape)) * dtype.itemsize
+        num_slots, slot_bytes = np.ndarray((2,), dtype=np.int64, buffer=shm.buf)
+        if frame_slot.slot >= num_slots or frame_bytes > slot_bytes:
+            raise Exception(f"{frame_slot} does not fit in {num_slots} buffer slots of {slot_bytes} bytes")
+
+        offset = FrameRingBuffer.__get_slot_offset(frame_slot.slot, int(slot_bytes))
+        sequence = np.ndarray((1,), dtype=np.int64, buffer=shm.buf, offset=offset)[0]
+        if sequence != frame_slot.sequence:
+            raise Exception(f"{frame_slot} was overwritten by frame {sequence}, the ring buffer needs more slots")
+
+        return np.ndarray(frame_slot.shape, dtype=dtype, buffer=shm.buf, offset=offset + FrameRingBuffer.HEADER_BYTES)
+
+    @staticmethod
+    def __get_slot_offset (slot, slot_bytes):
+        return FrameRingBuffer.BUFFER_HEADER_BYTES + slot * (FrameRingBuffer.HEADER_BYTES + slot_bytes)
+
+    def __allocate (self, slot_bytes):
+        if self.__shm is not None:
+            logging.getLogger(__name__).info(f"Growing frame buffer slots from {self.__slot_bytes} to {slot_bytes} bytes")
+            self.__retired.append(self.__shm)
+
+        # shared memory names are limited in length on some platforms, so keep it short
+        name = f"pilot_frames_{np.random.randint(0, 1 << 30):x}"
+        self.__shm = shared_memory.SharedMemory(name=name, create=True, size=FrameRingBuffer.__get_slot_offset(self.__num_slots, slot_bytes))
+        self.__slot_bytes = slot_bytes
+        np.ndarray((2,), dtype=np.int64, buffer=self.__shm.buf)[:] = [self.__num_slots, slot_bytes]
+        self.__next_slot = 0
+
+    @staticmethod
+    def __free (shm):
+        FrameRingBuffer.__attached.pop(shm.name, None)
+        try:
+            shm.close()
+        except BufferError:
+            # a frame view is still around, the mapping goes away with it
+            pass
+        shm.unlink()
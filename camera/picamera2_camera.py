@@ -131,6 +131,17 @@ class Picamera2Camera (Camera):
 
         return grey
 
+    # the lores plane is copied out of the capture buffer straight into shared memory
+    def capture_image_to_buffer (self, frame_buffer, preprocess = False):
+        buffer = self.__picam2.capture_buffer("lores")
+        frame_slot, grey = frame_buffer.reserve((self.__lowres_size[1], self.__stride), buffer.dtype)
+        np.copyto(grey, buffer[:self.__stride * self.__lowres_size[1]].reshape((self.__lowres_size[1], self.__stride)))
+
+        if preprocess:
+            grey[:] = self.preprocess_image(grey)
+
+        return frame_slot
+
     def preprocess_image (self, image):
         return image
     
@@ -0,0 +1,62 @@
+import unittest
+from camera.frame_ring_buffer import FrameRingBuffer
+from multiprocessing import Pool
+import numpy as np
+import logging
+
+def external_frame_sum (frame_slot):
+    return int(np.sum(FrameRingBuffer.read(frame_slot), dtype=np.int64))
+
+class TestFrameRingBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_write_read (self):
+        frame_buffer = FrameRingBuffer(num_slots = 3)
+        try:
+            frames = [np.random.randint(0, 255, (48, 64), dtype=np.uint8) for i in range(3)]
+            slots = [frame_buffer.write(f) for f in frames]
+            for f, s in zip(frames, slots):
+                self.assertTrue(np.array_equal(f, FrameRingBuffer.read(s)))
+
+            # the oldest slot gets reused, and can't be read as the old frame anymore
+            newest = frame_buffer.write(frames[0])
+            self.assertEqual(slots[0].slot, newest.slot)
+            with self.assertRaises(Exception):
+                FrameRingBuffer.read(slots[0])
+            self.assertTrue(np.array_equal(frames[1], FrameRingBuffer.read(slots[1])))
+        finally:
+            frame_buffer.close()
+
+    def test_reserve_grows (self):
+        frame_buffer = FrameRingBuffer(num_slots = 2, slot_bytes = 64)
+        try:
+            small = frame_buffer.write(np.ones((4, 4), dtype=np.uint8))
+            frame_slot, frame = frame_buffer.reserve((20, 30, 3), np.uint8)
+            frame[:] = 7
+            self.assertGreaterEqual(frame_buffer.get_slot_bytes(), 20 * 30 * 3)
+            self.assertEqual((20, 30, 3), FrameRingBuffer.read(frame_slot).shape)
+            self.assertTrue(np.all(FrameRingBuffer.read(frame_slot) == 7))
+            self.assertNotEqual(small.buffer_name, frame_slot.buffer_name)
+
+            # the frame written before the buffer grew is still there, for this process and others
+            self.assertEqual(16, external_frame_sum(small))
+            with Pool(1) as pool:
+                self.assertEqual([16, 20 * 30 * 3 * 7], pool.map(external_frame_sum, [small, frame_slot]))
+        finally:
+            frame_buffer.close()
+
+    def test_other_process (self):
+        frame_buffer = FrameRingBuffer(num_slots = 4)
+        try:
+            frames = [np.full((120, 160), i, dtype=np.uint8) for i in range(4)]
+            slots = [frame_buffer.write(f) for f in frames]
+            with Pool(2) as pool:
+                sums = pool.map(external_frame_sum, slots)
+            self.assertEqual([int(np.sum(f, dtype=np.int64)) for f in frames], sums)
+        finally:
+            frame_buffer.close()
+
+if __name__ == '__main__':
+    unittest.main()
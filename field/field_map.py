@@ -1,6 +1,9 @@
-from field.field_point import Point
+from field.obstacle_index import ObstacleIndex
+import numpy as np
 import math
 import logging
+import hashlib
+import json
 
 class FieldMap:
     def __init__(self, landmarks, shape='rectangle', boundaries = None, obstacles = None, search = None, near_boundaries = None, name = None, dead_spots = None):
@@ -9,12 +12,17 @@ class FieldMap:
         
         self.__landmarks = landmarks
         self.__relative_distances = self.__calculate_relative_distances()
+        self.__pair_geometry = None
+        self.__quadrants = None
         self.__boundaries = boundaries
         self.__obstacles = obstacles
         self.__search = search
         self.__near_boundaries = near_boundaries
         self.__name = name
         self.__dead_spots = dead_spots if dead_spots is not None else {}
+
+        # obstacles don't change once the map is loaded, so they are indexed up front
+        self.__obstacle_index = ObstacleIndex(self.__obstacles) if self.__obstacles is not None else None
         
         if self.__boundaries is None:
             logging.getLogger(__name__).warning("No boundaries given on map, all points will be considered in bounds")
@@ -34,6 +42,11 @@ class FieldMap:
     def get_name (self):
         return self.__name
 
+    # identifies the map by its contents, so the same map loaded twice gives the same fingerprint
+    def get_fingerprint (self):
+        contents = [self.__name, self.__landmarks, self.__boundaries, self.__obstacles, self.__search, self.__near_boundaries, self.__dead_spots]
+        return hashlib.sha1(json.dumps(contents, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def get_searchable_objects (self):
         return self.__search if self.__search is not None else []
 
@@ -43,6 +56,20 @@ class FieldMap:
         
         return self.__boundaries['xmin'], self.__boundaries['ymin'], self.__boundaries['xmax'], self.__boundaries['ymax']
 
+    # near boundaries always include the boundaries, so this gives the outer extent either way
+    def get_near_boundaries(self):
+        if self.__near_boundaries is None:
+            return self.get_boundaries()
+        if self.__boundaries is None:
+            return self.__near_boundaries['xmin'], self.__near_boundaries['ymin'], self.__near_boundaries['xmax'], self.__near_boundaries['ymax']
+
+        return (
+            min(self.__boundaries['xmin'], self.__near_boundaries['xmin']),
+            min(self.__boundaries['ymin'], self.__near_boundaries['ymin']),
+            max(self.__boundaries['xmax'], self.__near_boundaries['xmax']),
+            max(self.__boundaries['ymax'], self.__near_boundaries['ymax'])
+        )
+
     def get_width (self):
         if self.__boundaries is None:
             return -1
@@ -79,6 +106,9 @@ class FieldMap:
     def get_obstacles (self):
         return self.__obstacles
 
+    def get_dead_spots (self):
+        return self.__dead_spots
+
     # tells whether a given point is in bounds or close to it
     def is_near_bounds (self, x, y):
         if self.is_in_bounds(x, y):
@@ -122,85 +152,87 @@ class FieldMap:
         if self.__obstacles is None:
             return False, None
 
-        for o in self.__obstacles:
-            o_bounds = self.__obstacles[o]
-            if x >= o_bounds['xmin'] and x <= o_bounds['xmax'] and y >= o_bounds['ymin'] and y <= o_bounds['ymax']:
-                return True, o
-            
-            if path_width > 0:
-                # need to check all 4 corners of the vehicle
-                for corner_x, corner_y in self.__get_corners(x,y, path_width):
-                    if corner_x >= o_bounds['xmin'] and corner_x <= o_bounds['xmax'] and corner_y >= o_bounds['ymin'] and corner_y <= o_bounds['ymax']:
-                        return True, o
-        
-        return False, None
+        # with a path width, any of the 4 corners of the vehicle counts
+        found = self.__obstacle_index.find_point(x, y, size=path_width)
+        return found >= 0, self.__obstacle_index.get_obstacle_id(found)
+
+    # same as is_blocked for many points at once. returns an array of blocked flags and a list of obstacle ids
+    def are_blocked (self, xs, ys):
+        if self.__obstacles is None:
+            return np.zeros(len(xs), dtype=bool), [None] * len(xs)
+
+        found = self.__obstacle_index.find_points(xs, ys)
+        return found >= 0, [self.__obstacle_index.get_obstacle_id(f) for f in found]
 
     # tells whether direct path between two points is blocked by a mapped obstacle
     def is_path_blocked (self, x1, y1, x2, y2, path_width = 0):
         if self.__obstacles is None:
             return False, None
-        
+
         # if we are already sitting within the footprint of an obstacle, first move away from the obstacle before doing this calculation
-        on_obstacle, obstacle_id = self.is_blocked(x1, y1)
-        if on_obstacle:
-            #logging.getLogger(__name__).warning(f"On or against {obstacle_id}, getting away!")
-
-            # whichever point of the obstacle is closest to the center of the map, pretend we are just away from it
-            ox_min, oy_min, ox_max, oy_max = self.get_obstacle_bounds(obstacle_id=obstacle_id)
-            bx_min, by_min, bx_max, by_max = self.get_boundaries()
-            x_center = bx_min + ((bx_max - bx_min) / 2)
-            y_center = by_min + ((by_max - by_min) / 2)
-
-            new_x = x1
-            new_y = y1
-            still_stuck = True
-            move_size = 1
-            while (still_stuck):
-                still_stuck, obstacle_id = self.is_blocked(new_x, new_y)
-                new_x = ox_min - move_size if (abs(x_center - ox_min) < abs(x_center - ox_max)) else ox_max + move_size
-                new_y = oy_min - move_size if (abs(y_center - oy_min) < abs(y_center - oy_max)) else oy_max + move_size
-                move_size += 1 # next move will be bigger
-
-            #logging.getLogger(__name__).info(f"Replacing actual coords with off-obstacle: {new_x},{new_y}")
-            x1 = new_x
-            y1 = new_y
-
-
-        # if width is to be taken into account, we need to do this check 4 times with a different path segment
-        path_segments = [
-            (Point(x1, y1),Point(x2, y2)),
-        ]
+        if self.__obstacle_index.find_point(x1, y1) >= 0:
+            x1, y1 = self.__get_off_obstacle(x1, y1)
+
+        # if width is to be taken into account, we need to do this check 4 more times with a different path segment.
+        # the first segment hit decides
+        offset_x, offset_y = self.__get_path_offsets(path_width)
+        found = self.__obstacle_index.find_segments(x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y)
+        hit = found[found >= 0]
+        return len(hit) > 0, self.__obstacle_index.get_obstacle_id(hit[0] if len(hit) > 0 else -1)
+
+    # same as is_path_blocked for many paths at once. returns an array of blocked flags and a list of obstacle ids
+    def are_paths_blocked (self, x1s, y1s, x2s, y2s, path_width = 0):
+        x1s = np.array(x1s, dtype=float).ravel()
+        y1s = np.array(y1s, dtype=float).ravel()
+        x2s = np.array(x2s, dtype=float).ravel()
+        y2s = np.array(y2s, dtype=float).ravel()
+        if self.__obstacles is None:
+            return np.zeros(len(x1s), dtype=bool), [None] * len(x1s)
 
+        # if we are already sitting within the footprint of an obstacle, first move away from the obstacle before doing this calculation
+        for i in np.nonzero(self.__obstacle_index.find_points(x1s, y1s) >= 0)[0]:
+            x1s[i], y1s[i] = self.__get_off_obstacle(x1s[i], y1s[i])
+
+        # rows are paths, columns are the segments of that path. the first segment hit decides
+        offset_x, offset_y = self.__get_path_offsets(path_width)
+        found = self.__obstacle_index.find_segments(
+            x1s[:, np.newaxis] + offset_x, y1s[:, np.newaxis] + offset_y,
+            x2s[:, np.newaxis] + offset_x, y2s[:, np.newaxis] + offset_y).reshape(len(x1s), len(offset_x))
+        hit = found >= 0
+        found = np.where(np.any(hit, axis=1), found[np.arange(len(x1s)), np.argmax(hit, axis=1)], -1)
+
+        return found >= 0, [self.__obstacle_index.get_obstacle_id(f) for f in found]
+
+    # x and y shifts of the segments that make up a path of the given width.
+    # this isn't perfect, and assumes the object (width) is square and moving in a fixed orientation
+    def __get_path_offsets (self, path_width):
         if path_width > 0:
-            # add additional segments to account for width of the path
-            # this isn't perfect, and assumes the object (width) is square and moving in a fixed orientation
-            path_segments = [
-                (Point(x1, y1),Point(x2, y2)),
-                (Point(x1+(path_width/2), y1),Point(x2+(path_width/2), y2)),
-                (Point(x1-(path_width/2), y1),Point(x2-(path_width/2), y2)),
-                (Point(x1, y1+(path_width/2)),Point(x2, y2+(path_width/2))),
-                (Point(x1, y1-(path_width/2)),Point(x2, y2-(path_width/2))),
-            ]
-
-        for path_segment_p, path_segment_q in path_segments:
-            for o in self.__obstacles:
-                segments = [
-                    (Point(self.__obstacles[o]['xmin'],self.__obstacles[o]['ymin']),Point(self.__obstacles[o]['xmax'],self.__obstacles[o]['ymin'])),
-                    (Point(self.__obstacles[o]['xmin'],self.__obstacles[o]['ymin']),Point(self.__obstacles[o]['xmin'],self.__obstacles[o]['ymax'])),
-                    (Point(self.__obstacles[o]['xmin'],self.__obstacles[o]['ymax']),Point(self.__obstacles[o]['xmax'],self.__obstacles[o]['ymax'])),
-                    (Point(self.__obstacles[o]['xmax'],self.__obstacles[o]['ymin']),Point(self.__obstacles[o]['xmax'],self.__obstacles[o]['ymax'])),
-                ]
-                for obst_seg_p, obst_seg_q in segments:
-                    if self.__do_intersect(path_segment_p, path_segment_q, obst_seg_p, obst_seg_q):
-                        #logging.getLogger(__name__).info("".join([
-                        #    "The following segments intersect: ",
-                        #    f"({obst_seg_p.x},{obst_seg_p.y}) ... ",
-                        #    f"({obst_seg_q.x},{obst_seg_q.y}) ... ",
-                        #]))
-                        return True, o
+            return np.array([0, path_width/2, -path_width/2, 0, 0], dtype=float), np.array([0, 0, 0, path_width/2, -path_width/2], dtype=float)
+        return np.zeros(1), np.zeros(1)
+
+    # whichever point of the obstacle is closest to the center of the map, pretend we are just away from it
+    def __get_off_obstacle (self, x1, y1):
+        on_obstacle, obstacle_id = self.is_blocked(x1, y1)
+        #logging.getLogger(__name__).warning(f"On or against {obstacle_id}, getting away!")
+
+        ox_min, oy_min, ox_max, oy_max = self.get_obstacle_bounds(obstacle_id=obstacle_id)
+        bx_min, by_min, bx_max, by_max = self.get_boundaries()
+        x_center = bx_min + ((bx_max - bx_min) / 2)
+        y_center = by_min + ((by_max - by_min) / 2)
+
+        new_x = x1
+        new_y = y1
+        still_stuck = True
+        move_size = 1
+        while (still_stuck):
+            still_stuck, obstacle_id = self.is_blocked(new_x, new_y)
+            new_x = ox_min - move_size if (abs(x_center - ox_min) < abs(x_center - ox_max)) else ox_max + move_size
+            new_y = oy_min - move_size if (abs(y_center - oy_min) < abs(y_center - oy_max)) else oy_max + move_size
+            move_size += 1 # next move will be bigger
+
+        #logging.getLogger(__name__).info(f"Replacing actual coords with off-obstacle: {new_x},{new_y}")
+        return new_x, new_y
 
-        return False, None
-    
     # returns xmin, ymin, xmax, ymax for given obstacle
     def get_obstacle_bounds (self, obstacle_id):
         if self.__obstacles is not None and obstacle_id in self.__obstacles:
@@ -304,6 +336,10 @@ class FieldMap:
         
     def get_slope (self, landmark_id, landmark_id_2):
         slope = None
+        pair = self.get_pair_geometry(landmark_id, landmark_id_2)
+        if pair is not None and pair['slope'] is not None:
+            return pair['slope']
+
         if self.is_landmark_known(landmark_id=landmark_id) and self.is_landmark_known(landmark_id=landmark_id_2):
             landmark_x, landmark_y = self.get_landmark_position(landmark_id=landmark_id)
             landmark2_x, landmark2_y = self.get_landmark_position(landmark_id=landmark_id_2)
@@ -315,6 +351,11 @@ class FieldMap:
         #                  -------
         #                 III | IV
         quadrant = None
+        if self.__quadrants is None:
+            self.build_pair_geometry()
+        if landmark_id in self.__quadrants:
+            return self.__quadrants[landmark_id]
+
         if self.is_landmark_known(landmark_id=landmark_id):
             x,y = self.get_landmark_position(landmark_id=landmark_id)
             if x >= 0 and y >= 0:
@@ -329,6 +370,53 @@ class FieldMap:
         return quadrant
 
 
+    # precomputes everything about each ordered pair of landmarks that positioning needs.
+    # this only depends on the map, so it is done once, when the map is loaded
+    def build_pair_geometry (self):
+        pair_geometry = {}
+        quadrants = {}
+        for landmark_id in self.__landmarks:
+            x1, y1 = self.get_landmark_position(landmark_id)
+            quadrants[landmark_id] = 1 if x1 >= 0 and y1 >= 0 else 2 if x1 < 0 and y1 >= 0 else 4 if x1 >= 0 and y1 < 0 else 3
+
+            for landmark_2_id in self.__landmarks:
+                if landmark_2_id == landmark_id:
+                    continue
+
+                x2, y2 = self.get_landmark_position(landmark_2_id)
+                dist = self.__relative_distances[landmark_id][landmark_2_id]
+                xdist = abs(x2 - x1)
+                ydist = abs(y2 - y1)
+
+                # the line between the two is the hypotenuse of a right triangle, rotated from the y axis.
+                # the rotation is 90 minus the angle opposite the x side
+                rotation = None
+                if ydist != 0:
+                    cos_far = (dist ** 2 + ydist ** 2 - xdist ** 2) / (2 * dist * ydist)
+                    rotation = 180 - math.degrees(math.acos(max(-1.0, min(1.0, cos_far)))) - 90
+
+                min_preferred = [p for p in [self.get_landmark_min_angle_preference(landmark_id), self.get_landmark_min_angle_preference(landmark_2_id)] if p is not None]
+                max_preferred = [p for p in [self.get_landmark_max_angle_preference(landmark_id), self.get_landmark_max_angle_preference(landmark_2_id)] if p is not None]
+
+                pair_geometry[(landmark_id, landmark_2_id)] = {
+                    'distance':dist,
+                    'bearing':math.degrees(math.atan2(x2 - x1, y2 - y1)), # 0 is north, positive is to the right
+                    'slope':(y2 - y1) / (x2 - x1) if x2 != x1 else None,
+                    'rotation':rotation,
+                    'min_angle_preference':max(min_preferred) if len(min_preferred) > 0 else None,
+                    'max_angle_preference':min(max_preferred) if len(max_preferred) > 0 else None
+                }
+
+        self.__pair_geometry = pair_geometry
+        self.__quadrants = quadrants
+
+    # returns the precomputed geometry between two landmarks, or None if either is unknown
+    def get_pair_geometry (self, landmark_id_1, landmark_id_2):
+        if self.__pair_geometry is None:
+            self.build_pair_geometry()
+
+        return self.__pair_geometry[(landmark_id_1, landmark_id_2)] if (landmark_id_1, landmark_id_2) in self.__pair_geometry else None
+
     def get_distance (self, landmark_id_1, landmark_id_2):
         if landmark_id_1 != landmark_id_2 and self.is_landmark_known(landmark_id_1) and self.is_landmark_known(landmark_id_2):
             return self.__relative_distances[landmark_id_1][landmark_id_2]
@@ -360,72 +448,3 @@ class FieldMap:
     
     def __dist(self, p1, p2):
         return math.sqrt( ((p1[0]-p2[0])**2)+((p1[1]-p2[1])**2) )
-
-    # The following code is adapted from https://www.geeksforgeeks.org/check-if-two-given-line-segments-intersect/#
-    # Given three collinear points p, q, r, the function checks if  
-    # point q lies on line segment 'pr'  
-    def __on_segment(self, p, q, r): 
-        if ( (q.x <= max(p.x, r.x)) and (q.x >= min(p.x, r.x)) and 
-            (q.y <= max(p.y, r.y)) and (q.y >= min(p.y, r.y))): 
-            return True
-        return False
-    
-    def __orientation(self, p, q, r): 
-        # to find the orientation of an ordered triplet (p,q,r) 
-        # function returns the following values: 
-        # 0 : Collinear points 
-        # 1 : Clockwise points 
-        # 2 : Counterclockwise 
-        
-        # See https://www.geeksforgeeks.org/orientation-3-ordered-points/amp/  
-        # for details of below formula.  
-        
-        val = (float(q.y - p.y) * (r.x - q.x)) - (float(q.x - p.x) * (r.y - q.y)) 
-        if (val > 0): 
-            
-            # Clockwise orientation 
-            return 1
-        elif (val < 0): 
-            
-            # Counterclockwise orientation 
-            return 2
-        else: 
-            
-            # Collinear orientation 
-            return 0
-    
-    # The main function that returns true if  
-    # the line segment 'p1q1' and 'p2q2' intersect. 
-    def __do_intersect(self, p1,q1,p2,q2): 
-        
-        # Find the 4 orientations required for  
-        # the general and special cases 
-        o1 = self.__orientation(p1, q1, p2) 
-        o2 = self.__orientation(p1, q1, q2) 
-        o3 = self.__orientation(p2, q2, p1) 
-        o4 = self.__orientation(p2, q2, q1) 
-    
-        # General case 
-        if ((o1 != o2) and (o3 != o4)): 
-            return True
-    
-        # Special Cases 
-    
-        # p1 , q1 and p2 are collinear and p2 lies on segment p1q1 
-        if ((o1 == 0) and self.__on_segment(p1, p2, q1)): 
-            return True
-    
-        # p1 , q1 and q2 are collinear and q2 lies on segment p1q1 
-        if ((o2 == 0) and self.__on_segment(p1, q2, q1)): 
-            return True
-    
-        # p2 , q2 and p1 are collinear and p1 lies on segment p2q2 
-        if ((o3 == 0) and self.__on_segment(p2, p1, q2)): 
-            return True
-    
-        # p2 , q2 and q1 are collinear and q1 lies on segment p2q2 
-        if ((o4 == 0) and self.__on_segment(p2, q1, q2)): 
-            return True
-    
-        # If none of the cases 
-        return False
\ No newline at end of file
@@ -16,7 +16,7 @@ class FieldMapPersistence:
         return saved_map
     
     def load_map_from_dict (self, json_map : dict) -> FieldMap:
-        return FieldMap(
+        field_map = FieldMap(
                 boundaries=json_map['boundaries'] if 'boundaries' in json_map else None,
                 shape=json_map['shape'] if 'shape' in json_map else None,
                 landmarks=json_map['landmarks'] if 'landmarks' in json_map else None,
@@ -25,4 +25,9 @@ class FieldMapPersistence:
                 near_boundaries=json_map['near_boundaries'] if 'near_boundaries' in json_map else None,
                 name='dynamic'
         )
+
+        # landmark pair geometry only depends on the map, so get it out of the way now
+        field_map.build_pair_geometry()
+
+        return field_map
             
\ No newline at end of file
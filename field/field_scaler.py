@@ -2,6 +2,7 @@ import logging
 import random
 import math
 import statistics
+import numpy as np
 from trig.trig import BasicTrigCalc
 
 # translates between an LVPS field and a scaled field
@@ -40,6 +41,15 @@ class FieldScaler:
 
         self.__trig_calc = BasicTrigCalc()
 
+        # rasterized bounds and obstacles, one cell per whole scaled coordinate. built the first time they are needed
+        self.__in_bounds_mask = None
+        self.__obstacle_mask = None
+        self.__in_bounds_grid = None
+        self.__obstacle_grid = None
+        self.__free_cells = None
+        self.__mask_rows = 0
+        self.__mask_cols = 0
+
     def get_scaled_height (self):
         return self.__scaled_height
     
@@ -155,6 +165,8 @@ class FieldScaler:
         # convert the slope to degrees
         cartesian_degrees = math.degrees(math.atan(slope))
         
+        # every step along the way that is within range
+        candidates = []
         while (traveled < max_dist and full_dist > self.__get_distance(starting_x, starting_y, curr_x, curr_y)):
             traveled += dist_increment
             curr_x, curr_y = self.__trig_calc.get_coords_for_angle_and_distance (
@@ -167,15 +179,24 @@ class FieldScaler:
             traveled = self.__get_distance(starting_x, starting_y, curr_x, curr_y)
 
             if self.__get_distance(starting_x, starting_y, curr_x, curr_y) <= max_dist:
-                if block_check_method(starting_x, starting_y, curr_x, curr_y) == False:
-                    last_ok_x = curr_x
-                    last_ok_y = curr_y
+                candidates.append((curr_x, curr_y))
+
+        # the furthest step that isn't blocked wins, so check from the far end back
+        for curr_x, curr_y in reversed(candidates):
+            if block_check_method(starting_x, starting_y, curr_x, curr_y) == False:
+                last_ok_x = curr_x
+                last_ok_y = curr_y
+                break
 
         #logging.getLogger(__name__).info(f"Position {starting_x},{starting_y} wants to go up to {max_dist} toward {target_x},{target_y} returning nearest coords: {last_ok_x},{last_ok_y}")
 
         return last_ok_x, last_ok_y
 
     def is_in_bounds (self, sim_x, sim_y):
+        cell = self.__get_mask_cell(sim_x, sim_y)
+        if cell is not None:
+            return self.__in_bounds_grid[cell[0]][cell[1]]
+
         lvps_x,lvps_y = self.get_lvps_coords(sim_x, sim_y)
         bound_x_min, bound_y_min, bound_x_max, bound_y_max = self.__field_map.get_boundaries()
         if lvps_x <= bound_x_min or lvps_x >= bound_x_max or lvps_y <= bound_y_min or lvps_y >= bound_y_max:
@@ -183,28 +204,75 @@ class FieldScaler:
         return True
 
     def is_obstacle (self, sim_x, sim_y):
+        cell = self.__get_mask_cell(sim_x, sim_y)
+        if cell is not None:
+            return self.__obstacle_grid[cell[0]][cell[1]]
+
         lvps_x,lvps_y = self.get_lvps_coords(sim_x, sim_y)
         is_blocked, obstacle_id = self.__field_map.is_blocked(lvps_x, lvps_y)
         return is_blocked
 
-    def get_random_traversable_coords (self):
-        max_attempts = 1000
-        curr_attempt = 0
+    # boolean grids indexed [sim_y, sim_x], covering every whole scaled coordinate from 0 to the scaled width/height
+    def get_in_bounds_mask (self):
+        self.__build_masks()
+        return self.__in_bounds_mask
 
-        min_x, min_y, max_x, max_y = self.get_map().get_boundaries()
+    def get_obstacle_mask (self):
+        self.__build_masks()
+        return self.__obstacle_mask
 
-        while curr_attempt < max_attempts:
-            curr_attempt += 1
-            lvps_x = random.randrange(int(min_x*10),int(max_x)*10)/10
-            lvps_y = random.randrange(int(min_y*10),int(max_y)*10)/10
+    def get_traversable_mask (self):
+        return self.get_in_bounds_mask() & ~self.get_obstacle_mask()
 
-            if self.__field_map.is_in_bounds(lvps_x, lvps_y):
-                blocked, obstacle_id = self.__field_map.is_blocked(lvps_x, lvps_y)
-                if not blocked:
-                    return lvps_x,lvps_y
+    # lvps coords of a random scaled cell that is in bounds and not blocked
+    def get_random_traversable_coords (self):
+        self.__build_masks()
+        if len(self.__free_cells) == 0:
+            logging.getLogger(__name__).error("Unable to find traversable coords!")
+            return None,None
+
+        sim_y, sim_x = divmod(self.__free_cells[random.randrange(len(self.__free_cells))], self.__mask_cols)
+        lvps_x, lvps_y = self.get_lvps_coords(sim_x, sim_y)
+        return round(lvps_x, 1), round(lvps_y, 1)
+
+    # the mask cell for a whole scaled coordinate, None if the coordinate isn't on the grid
+    def __get_mask_cell (self, sim_x, sim_y):
+        if self.__in_bounds_mask is None:
+            self.__build_masks()
+
+        cell_x = int(sim_x)
+        cell_y = int(sim_y)
+        if cell_x != sim_x or cell_y != sim_y or cell_x < 0 or cell_y < 0 or cell_y >= self.__mask_rows or cell_x >= self.__mask_cols:
+            return None
+        return cell_y, cell_x
+
+    # same checks as the point by point methods, for every scaled coordinate at once
+    def __build_masks (self):
+        if self.__in_bounds_mask is not None:
+            return
+
+        sim_x, sim_y = np.meshgrid(np.arange(int(self.__scaled_width) + 1, dtype=float), np.arange(int(self.__scaled_height) + 1, dtype=float))
+        if self.__invert_x_axis:
+            sim_x = self.__scaled_width - sim_x
+        if self.__invert_y_axis:
+            sim_y = self.__scaled_height - sim_y
+        lvps_x = ((sim_x - self.__shift_x) / self.__x_scaler) + ((1 / self.__x_scaler) / 2)
+        lvps_y = ((sim_y - self.__shift_y) / self.__y_scaler) + ((1 / self.__y_scaler) / 2)
 
-        logging.getLogger(__name__).error("Unable to find traversable coords!")
-        return None,None
+        bound_x_min, bound_y_min, bound_x_max, bound_y_max = self.__field_map.get_boundaries()
+        in_bounds = (lvps_x > bound_x_min) & (lvps_x < bound_x_max) & (lvps_y > bound_y_min) & (lvps_y < bound_y_max)
+        blocked, _ = self.__field_map.are_blocked(lvps_x.ravel(), lvps_y.ravel())
+        blocked = blocked.reshape(lvps_x.shape)
+
+        # single lookups are answered from plain lists, they are quicker to index than arrays
+        self.__in_bounds_grid = in_bounds.tolist()
+        self.__obstacle_grid = blocked.tolist()
+        self.__in_bounds_mask = in_bounds
+        self.__obstacle_mask = blocked
+
+        self.__mask_rows, self.__mask_cols = lvps_x.shape
+        self.__free_cells = np.flatnonzero(self.__in_bounds_mask & ~self.__obstacle_mask).tolist()
+        logging.getLogger(__name__).debug(f"Rasterized field to {lvps_x.shape[1]} x {lvps_x.shape[0]}, {len(self.__free_cells)} cells traversable")
 
     def __get_shifted_coords (self, x, y):
         return (x + self.__shift_x, y + self.__shift_y)
@@ -0,0 +1,168 @@
+import math
+import numpy as np
+
+# Uniform grid over the obstacle rectangles of a map, built once when the map is loaded.
+# Each grid cell lists the obstacles that overlap it, so point and segment queries only
+# look at obstacles nearby. Obstacles are numbered in map order, and every query
+# reports the first obstacle (in that order) that is hit, same as scanning the map.
+class ObstacleIndex:
+    # above this many cells, a query just takes every obstacle as a candidate
+    MAX_QUERY_CELLS = 256
+
+    def __init__(self, obstacles, cell_size = None):
+        self.__ids = list(obstacles.keys())
+        bounds = np.array([[obstacles[o]['xmin'], obstacles[o]['ymin'], obstacles[o]['xmax'], obstacles[o]['ymax']] for o in self.__ids], dtype=float).reshape(-1, 4)
+        self.__xmin = bounds[:, 0]
+        self.__ymin = bounds[:, 1]
+        self.__xmax = bounds[:, 2]
+        self.__ymax = bounds[:, 3]
+
+        # single point checks are faster on plain floats
+        self.__bounds = [tuple(b) for b in bounds.tolist()]
+
+        # about one obstacle per cell, so most obstacles land in a handful of cells
+        if cell_size is None:
+            spans = np.maximum(self.__xmax - self.__xmin, self.__ymax - self.__ymin)
+            cell_size = max(1.0, float(np.mean(spans))) if len(spans) > 0 else 1.0
+        self.__cell_size = cell_size
+
+        self.__cells = {}
+        for i in range(len(self.__ids)):
+            for cell_x in range(self.__get_cell(self.__xmin[i]), self.__get_cell(self.__xmax[i]) + 1):
+                for cell_y in range(self.__get_cell(self.__ymin[i]), self.__get_cell(self.__ymax[i]) + 1):
+                    if (cell_x, cell_y) not in self.__cells:
+                        self.__cells[(cell_x, cell_y)] = []
+                    self.__cells[(cell_x, cell_y)].append(i)
+
+        # each obstacle as its four edges, rows are obstacles
+        self.__edges = np.stack([
+            np.column_stack([self.__xmin, self.__ymin, self.__xmax, self.__ymin]),
+            np.column_stack([self.__xmin, self.__ymin, self.__xmin, self.__ymax]),
+            np.column_stack([self.__xmin, self.__ymax, self.__xmax, self.__ymax]),
+            np.column_stack([self.__xmax, self.__ymin, self.__xmax, self.__ymax])
+        ], axis=1)
+
+    def get_obstacle_id (self, obstacle_index):
+        return self.__ids[obstacle_index] if obstacle_index >= 0 else None
+
+    # first obstacle containing the point, or any corner of a square of the given size centered on it. -1 if none
+    def find_point (self, x, y, size = 0):
+        half = size * .5
+        if size > 0:
+            candidates = self.__get_candidates(x - half, y - half, x + half, y + half)
+        else:
+            candidates = self.__cells.get((self.__get_cell(x), self.__get_cell(y)), [])
+
+        for i in candidates:
+            if self.__contains(i, x, y):
+                return i
+            if size > 0:
+                for corner_x, corner_y in [(x - half, y - half), (x - half, y + half), (x + half, y - half), (x + half, y + half)]:
+                    if self.__contains(i, corner_x, corner_y):
+                        return i
+        return -1
+
+    # first obstacle containing each point, -1 where there is none
+    def find_points (self, xs, ys):
+        xs = np.asarray(xs, dtype=float).ravel()
+        ys = np.asarray(ys, dtype=float).ravel()
+        found = np.full(len(xs), -1)
+        if len(self.__ids) == 0 or len(xs) == 0:
+            return found
+
+        # one pass per obstacle keeps memory to the number of points. last to first, so the first on the map wins
+        for i in range(len(self.__ids) - 1, -1, -1):
+            found[(xs >= self.__xmin[i]) & (xs <= self.__xmax[i]) & (ys >= self.__ymin[i]) & (ys <= self.__ymax[i])] = i
+        return found
+
+    # first obstacle whose edges each segment crosses or touches, -1 where there is none.
+    # only obstacles overlapping a segment's bounding box get the full intersection test
+    def find_segments (self, x1s, y1s, x2s, y2s):
+        x1s = np.asarray(x1s, dtype=float).ravel()
+        y1s = np.asarray(y1s, dtype=float).ravel()
+        x2s = np.asarray(x2s, dtype=float).ravel()
+        y2s = np.asarray(y2s, dtype=float).ravel()
+        found = np.full(len(x1s), -1)
+        if len(self.__ids) == 0 or len(x1s) == 0:
+            return found
+
+        seg_xmin = np.minimum(x1s, x2s)
+        seg_ymin = np.minimum(y1s, y2s)
+        seg_xmax = np.maximum(x1s, x2s)
+        seg_ymax = np.maximum(y1s, y2s)
+        candidates = self.__get_candidates(np.min(seg_xmin), np.min(seg_ymin), np.max(seg_xmax), np.max(seg_ymax))
+        if len(candidates) == 0:
+            return found
+        candidates = np.array(candidates, dtype=int)
+
+        overlapping = (
+            (seg_xmin[:, np.newaxis] <= self.__xmax[candidates]) & (seg_xmax[:, np.newaxis] >= self.__xmin[candidates]) &
+            (seg_ymin[:, np.newaxis] <= self.__ymax[candidates]) & (seg_ymax[:, np.newaxis] >= self.__ymin[candidates]))
+        segment_indexes, candidate_indexes = np.nonzero(overlapping)
+        if len(segment_indexes) == 0:
+            return found
+
+        # every pair against all four edges at once, rows are pairs
+        obstacle_indexes = candidates[candidate_indexes]
+        edges = self.__edges[obstacle_indexes]
+        hit = np.any(self.__do_intersect(
+            x1s[segment_indexes, np.newaxis], y1s[segment_indexes, np.newaxis], x2s[segment_indexes, np.newaxis], y2s[segment_indexes, np.newaxis],
+            edges[:, :, 0], edges[:, :, 1], edges[:, :, 2], edges[:, :, 3]), axis=1)
+
+        # lowest obstacle number hit by each segment
+        first = np.full(len(x1s), len(self.__ids))
+        np.minimum.at(first, segment_indexes[hit], obstacle_indexes[hit])
+        return np.where(first < len(self.__ids), first, -1)
+
+    def __contains (self, i, x, y):
+        xmin, ymin, xmax, ymax = self.__bounds[i]
+        return x >= xmin and x <= xmax and y >= ymin and y <= ymax
+
+    def __get_cell (self, coord):
+        return int(math.floor(coord / self.__cell_size))
+
+    # obstacles in any cell the rectangle touches, in map order
+    def __get_candidates (self, xmin, ymin, xmax, ymax):
+        cell_xmin = self.__get_cell(xmin)
+        cell_xmax = self.__get_cell(xmax)
+        cell_ymin = self.__get_cell(ymin)
+        cell_ymax = self.__get_cell(ymax)
+        if (cell_xmax - cell_xmin + 1) * (cell_ymax - cell_ymin + 1) > ObstacleIndex.MAX_QUERY_CELLS:
+            return range(len(self.__ids))
+
+        candidates = set()
+        for cell_x in range(cell_xmin, cell_xmax + 1):
+            for cell_y in range(cell_ymin, cell_ymax + 1):
+                if (cell_x, cell_y) in self.__cells:
+                    candidates.update(self.__cells[(cell_x, cell_y)])
+        return sorted(candidates)
+
+    # The following is adapted from https://www.geeksforgeeks.org/check-if-two-given-line-segments-intersect/#
+    # to work on arrays of segment pairs at once.
+    # orientation of each ordered triplet (p,q,r): 0 collinear, 1 clockwise, -1 counterclockwise
+    def __orientation (self, px, py, qx, qy, rx, ry):
+        return np.sign(((qy - py) * (rx - qx)) - ((qx - px) * (ry - qy)))
+
+    # given collinear p, q, r, whether q lies on segment pr
+    def __on_segment (self, px, py, qx, qy, rx, ry):
+        return (qx <= np.maximum(px, rx)) & (qx >= np.minimum(px, rx)) & (qy <= np.maximum(py, ry)) & (qy >= np.minimum(py, ry))
+
+    # whether segments p1q1 and p2q2 intersect
+    def __do_intersect (self, p1x, p1y, q1x, q1y, p2x, p2y, q2x, q2y):
+        o1 = self.__orientation(p1x, p1y, q1x, q1y, p2x, p2y)
+        o2 = self.__orientation(p1x, p1y, q1x, q1y, q2x, q2y)
+        o3 = self.__orientation(p2x, p2y, q2x, q2y, p1x, p1y)
+        o4 = self.__orientation(p2x, p2y, q2x, q2y, q1x, q1y)
+
+        # general case
+        intersect = (o1 != o2) & (o3 != o4)
+
+        # collinear special cases, these are rare so only checked if there are any
+        if np.any((o1 == 0) | (o2 == 0) | (o3 == 0) | (o4 == 0)):
+            intersect = intersect | (
+                ((o1 == 0) & self.__on_segment(p1x, p1y, p2x, p2y, q1x, q1y)) |
+                ((o2 == 0) & self.__on_segment(p1x, p1y, q2x, q2y, q1x, q1y)) |
+                ((o3 == 0) & self.__on_segment(p2x, p2y, p1x, p1y, q2x, q2y)) |
+                ((o4 == 0) & self.__on_segment(p2x, p2y, q1x, q1y, q2x, q2y)))
+
+        return intersect
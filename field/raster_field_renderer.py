@@ -0,0 +1,338 @@
+import logging
+import math
+import cv2
+import numpy as np
+from field.field_map import FieldMap
+from field.field_scaler import FieldScaler
+
+# renders the same image of the map as FieldRenderer, drawn straight into a numpy array instead of
+# through matplotlib. the layout matches what matplotlib gives FieldRenderer (default subplot margins,
+# both axes running from the scaled size down to 1), so the two can be swapped for each other.
+# the map itself (boundaries and obstacles) is only drawn once per image size.
+# there is no global lock, so any number of renderers can run at once
+class RasterFieldRenderer:
+    # where matplotlib puts the axes in the figure, as fractions of the figure: left, bottom, width, height
+    AXES_BOUNDS = (0.125, 0.11, 0.775, 0.77)
+
+    COLORS = {
+        'white':(255, 255, 255),
+        'gray':(128, 128, 128),
+        'green':(0, 128, 0),
+        'yellow':(255, 255, 0),
+        'blue':(0, 0, 255),
+        'lightblue':(173, 216, 230),
+        'red':(255, 0, 0),
+        'purple':(128, 0, 128),
+        'black':(0, 0, 0)
+    }
+
+    def __init__(self, field_map : FieldMap, map_scaler : FieldScaler, grayscale = False):
+        self.__field_map = field_map
+        self.__map_scaler = map_scaler
+        self.__agent_state = {}
+        self.__search_state = {}
+        self.__grayscale = grayscale
+
+        # static layers, keyed by image size in pixels
+        self.__static_layers = {}
+
+    def get_map_scaler (self):
+        return self.__map_scaler
+
+    def update_agent_state (self, agent_id, position_history, look_history):
+        self.__agent_state[agent_id] = {
+            'position':position_history,
+            'look':look_history
+        }
+
+    def update_search_state (self, agent_id, target_type, estimated_x, estimated_y):
+        if target_type not in self.__search_state:
+            self.__search_state[target_type] = []
+        self.__search_state[target_type].append((estimated_x, estimated_y, agent_id))
+
+    # same arguments and output as FieldRenderer: rgb uint8 (height, width, 3), or (height, width, 1) if grayscale
+    def render_field_image_to_array (self, add_game_state = False, agent_id = None, other_agents_visible = False, width_inches=4, height_inches=4, dpi=100):
+        np_rendered = None
+        try:
+            np_rendered = self.__render_field_image(
+                add_game_state=add_game_state,
+                agent_id=agent_id,
+                other_agents_visible=other_agents_visible,
+                width_inches=width_inches,
+                height_inches=height_inches,
+                dpi=dpi)
+
+            if self.__grayscale:
+                np_rendered = self.__rgb2gray(np_rendered)
+                new_shape_w, new_shape_h = np_rendered.shape
+
+                # add single channel for holding the grayscale value, as that's what stable baselines 3 likes
+                np_rendered = np_rendered.reshape(new_shape_w, new_shape_h, 1)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error rendering field to array: {e}")
+
+        return np_rendered
+
+    def save_field_image (self, image_file, add_game_state = False, agent_id = None, other_agents_visible = False, width_inches=4, height_inches=4, dpi=100):
+        try:
+            img_rgb = self.__render_field_image(
+                add_game_state=add_game_state,
+                agent_id=agent_id,
+                other_agents_visible=other_agents_visible,
+                width_inches=width_inches,
+                height_inches=height_inches,
+                dpi=dpi)
+
+            cv2.imwrite(image_file, cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error rendering field to file: {e}")
+
+    def __rgb2gray(self, rgb):
+        return np.round(np.dot(rgb[...,:3], [0.2989, 0.5870, 0.1140])).astype(np.uint8)
+
+    def __render_field_image (self, add_game_state = False, agent_id = None, other_agents_visible = False, width_inches=4, height_inches=4, dpi=100):
+        static = self.__get_static_layer(int(round(width_inches * dpi)), int(round(height_inches * dpi)))
+        img = static['base'].copy()
+
+        if add_game_state:
+            self.__draw_game_state(static, img, agent_id, True)
+            if other_agents_visible:
+                for p in self.__agent_state:
+                    if p != agent_id:
+                        self.__draw_game_state(static, img, p, False)
+
+        # obstacles need to cover all past state data
+        img[static['obstacles']] = RasterFieldRenderer.COLORS['gray']
+
+        # current agent's position is visible over everything
+        if add_game_state:
+            self.__draw_found_targets(static, img)
+            self.__draw_current_position(static, img, agent_id)
+
+        return np.asarray(np.clip(img, 0, 255), dtype=np.uint8)
+
+    def __get_static_layer (self, width_px, height_px):
+        if (width_px, height_px) not in self.__static_layers:
+            scaled_width = self.__map_scaler.get_scaled_width()
+            scaled_height = self.__map_scaler.get_scaled_height()
+            axes_left, axes_bottom, axes_width, axes_height = RasterFieldRenderer.AXES_BOUNDS
+
+            # data coords at the center of every pixel column and row. the axes run from the scaled size down to 1
+            display_x = np.arange(width_px) + 0.5
+            display_y = height_px - (np.arange(height_px) + 0.5)
+            pixel_x = scaled_width + ((display_x - width_px * axes_left) / (width_px * axes_width)) * (1 - scaled_width)
+            pixel_y = scaled_height + ((display_y - height_px * axes_bottom) / (height_px * axes_height)) * (1 - scaled_height)
+
+            # nothing is drawn outside the axes
+            in_axes_x = (display_x >= width_px * axes_left) & (display_x <= width_px * (axes_left + axes_width))
+            in_axes_y = (display_y >= height_px * axes_bottom) & (display_y <= height_px * (axes_bottom + axes_height))
+
+            static = {
+                'x':pixel_x,
+                'y':pixel_y,
+                'in_axes_x':in_axes_x,
+                'in_axes_y':in_axes_y,
+                'base':np.full((height_px, width_px, 3), 255.0, dtype=np.float32),
+                'obstacles':np.zeros((height_px, width_px), dtype=bool)
+            }
+
+            bx_min, by_min, bx_max, by_max = self.__field_map.get_boundaries()
+            self.__fill_rect(static, static['base'], bx_min, by_min, bx_max, by_max, RasterFieldRenderer.COLORS['white'])
+
+            obstacles = self.__field_map.get_obstacles()
+            for o in obstacles if obstacles is not None else {}:
+                ox_min, oy_min, ox_max, oy_max = self.__field_map.get_obstacle_bounds(o)
+                rows, cols, mask = self.__get_rect_mask(static, ox_min, oy_min, ox_max, oy_max)
+                if mask is not None:
+                    static['obstacles'][rows, cols] |= mask
+
+            self.__static_layers[(width_px, height_px)] = static
+
+        return self.__static_layers[(width_px, height_px)]
+
+    def __get_alpha_based_on_age(self, age, age_max, alpha_min = 0.2, alpha_max = 0.7):
+        capped_age = min(age, age_max)
+        age_in_pct = capped_age / age_max
+        alpha_range = alpha_max - alpha_min
+
+        alpha_offset = (1 - age_in_pct) * alpha_range
+        return alpha_min + alpha_offset
+
+    # draws the game state. bool indicates if it's to be shown from this agent's perspective
+    def __draw_game_state (self, static, img, agent_id, is_current_agent = True):
+        # current position is the newest entry in travel history
+        stale_history = 10 # how many moves back are considered 'stale'
+
+        alpha_multiplier = 1
+        fill = True
+        colors = {
+            'position':'green',
+            'look':'yellow',
+            'breadcrumb':'black'
+        }
+        if is_current_agent == False:
+            alpha_multiplier = 0.5
+            fill = False
+            colors = {
+                'position':'blue',
+                'look':'lightblue',
+                'breadcrumb':'black'
+            }
+
+        if agent_id not in self.__agent_state:
+            return
+
+        if 'look' in self.__agent_state[agent_id]:
+            l_history_len = len(self.__agent_state[agent_id]['look'])
+            for l_num, (x,y,heading,min_angle,max_angle,dist) in enumerate(self.__agent_state[agent_id]['look']):
+                # a cone indicating the direction of the look, angles are the same as the matplotlib wedge
+                look_age = l_history_len - l_num
+                scaled_x, scaled_y = self.__map_scaler.get_scaled_coords(x,y)
+                scaled_dist = self.__map_scaler.scale_lvps_distance_to_sim(dist)
+
+                mp_heading = 90 - heading
+                if mp_heading > 180:
+                    mp_heading -= 180
+                else:
+                    mp_heading += 180
+
+                self.__fill_wedge(static, img, scaled_x, scaled_y, scaled_dist, min_angle + mp_heading, max_angle + mp_heading,
+                    RasterFieldRenderer.COLORS[colors['look']],
+                    self.__get_alpha_based_on_age(look_age, stale_history, alpha_min=0.0, alpha_max=0.4)*alpha_multiplier)
+
+        if 'position' in self.__agent_state[agent_id]:
+            p_history_len = len(self.__agent_state[agent_id]['position'])
+            last_scaled_x = None
+            last_scaled_y = None
+            for p_num, (x,y,heading,conf) in enumerate(self.__agent_state[agent_id]['position']):
+                # a dot on the position, with alpha indicating how old it is.
+                # other agents are drawn unfilled with no line width, so nothing shows, same as matplotlib
+                position_age = p_history_len - p_num
+                scaled_x, scaled_y = self.__map_scaler.get_scaled_coords(x,y)
+                if fill:
+                    self.__fill_circle(static, img, scaled_x, scaled_y, 3.0,
+                        RasterFieldRenderer.COLORS[colors['position']],
+                        self.__get_alpha_based_on_age(position_age, stale_history, alpha_min=0, alpha_max=1.0)*alpha_multiplier)
+
+                if last_scaled_x is not None:
+                    self.__draw_dotted_line(static, img, last_scaled_x, last_scaled_y, scaled_x, scaled_y,
+                        RasterFieldRenderer.COLORS[colors['breadcrumb']],
+                        self.__get_alpha_based_on_age(position_age, stale_history, alpha_min=0, alpha_max=0.5)*alpha_multiplier)
+
+                last_scaled_x = scaled_x
+                last_scaled_y = scaled_y
+
+    def __draw_current_position (self, static, img, agent_id):
+        if agent_id in self.__agent_state and 'position' in self.__agent_state[agent_id]:
+            if len(self.__agent_state[agent_id]['position']) > 0:
+                x,y,heading,confidence = self.__agent_state[agent_id]['position'][-1]
+                scaled_x, scaled_y = self.__map_scaler.get_scaled_coords(x,y)
+                self.__fill_circle(static, img, scaled_x, scaled_y, 2.0, RasterFieldRenderer.COLORS['red'], 1.0)
+
+    # targets that have been found, as small squares turned 45 degrees about their corner
+    def __draw_found_targets (self, static, img):
+        target_size = 0.01
+
+        target_width = self.__map_scaler.get_scaled_width() * target_size
+        target_height = self.__map_scaler.get_scaled_height() * target_size
+        cos_a = math.cos(math.radians(45.0))
+        sin_a = math.sin(math.radians(45.0))
+
+        for target_type in self.__search_state:
+            for (estimated_x, estimated_y, agent_id) in self.__search_state[target_type]:
+                scaled_x, scaled_y = self.__map_scaler.get_scaled_coords(estimated_x, estimated_y)
+                corner_x = scaled_x - target_width
+                corner_y = scaled_y - target_height
+                reach = target_width + target_height
+                rows, cols, dx, dy = self.__get_region(static, corner_x - reach, corner_y - reach, corner_x + reach, corner_y + reach)
+                if dx is None:
+                    continue
+
+                # back into the rectangle's own frame
+                u = dx * cos_a + dy * sin_a
+                v = -dx * sin_a + dy * cos_a
+                mask = (u >= 0) & (u <= target_width) & (v >= 0) & (v <= target_height)
+                if not np.any(mask):
+                    # smaller than a pixel, color the pixel it lands on
+                    center_x = ((target_width * cos_a) - (target_height * sin_a)) / 2
+                    center_y = ((target_width * sin_a) + (target_height * cos_a)) / 2
+                    distances = np.hypot(dx - center_x, dy - center_y)
+                    mask = distances == distances.min()
+                self.__blend(img, rows, cols, mask, RasterFieldRenderer.COLORS['purple'], 1.0)
+
+    # rows and columns of the image covering the given data rectangle (inside the axes),
+    # along with each pixel's data coords relative to (origin_x, origin_y). None if nothing is visible
+    def __get_region (self, static, x_min, y_min, x_max, y_max, origin_x = None, origin_y = None):
+        x_lo, x_hi = min(x_min, x_max), max(x_min, x_max)
+        y_lo, y_hi = min(y_min, y_max), max(y_min, y_max)
+        cols = np.nonzero((static['x'] >= x_lo) & (static['x'] <= x_hi) & static['in_axes_x'])[0]
+        rows = np.nonzero((static['y'] >= y_lo) & (static['y'] <= y_hi) & static['in_axes_y'])[0]
+        if len(cols) == 0 or len(rows) == 0:
+            return None, None, None, None
+
+        rows = slice(rows[0], rows[-1] + 1)
+        cols = slice(cols[0], cols[-1] + 1)
+        origin_x = x_min if origin_x is None else origin_x
+        origin_y = y_min if origin_y is None else origin_y
+        dx = static['x'][cols][np.newaxis, :] - origin_x
+        dy = static['y'][rows][:, np.newaxis] - origin_y
+        return rows, cols, dx, dy
+
+    def __get_rect_mask (self, static, x_min, y_min, x_max, y_max):
+        scaled_min_x, scaled_min_y = self.__map_scaler.get_scaled_coords(lvps_x=x_min, lvps_y=y_min)
+        scaled_max_x, scaled_max_y = self.__map_scaler.get_scaled_coords(lvps_x=x_max, lvps_y=y_max)
+        rows, cols, dx, dy = self.__get_region(static, scaled_min_x, scaled_min_y, scaled_max_x, scaled_max_y)
+        if dx is None:
+            return None, None, None
+        return rows, cols, np.ones((dy.shape[0], dx.shape[1]), dtype=bool)
+
+    def __fill_rect (self, static, img, x_min, y_min, x_max, y_max, color):
+        rows, cols, mask = self.__get_rect_mask(static, x_min, y_min, x_max, y_max)
+        if mask is not None:
+            self.__blend(img, rows, cols, mask, color, 1.0)
+
+    def __fill_circle (self, static, img, center_x, center_y, radius, color, alpha):
+        rows, cols, dx, dy = self.__get_region(static, center_x - radius, center_y - radius, center_x + radius, center_y + radius, center_x, center_y)
+        if dx is not None:
+            self.__blend(img, rows, cols, (dx ** 2) + (dy ** 2) <= radius ** 2, color, alpha)
+
+    # counterclockwise from theta1 to theta2, in degrees of the data space, same as a matplotlib wedge
+    def __fill_wedge (self, static, img, center_x, center_y, radius, theta1, theta2, color, alpha):
+        rows, cols, dx, dy = self.__get_region(static, center_x - radius, center_y - radius, center_x + radius, center_y + radius, center_x, center_y)
+        if dx is None:
+            return
+
+        sweep = (theta2 - theta1) % 360.0
+        if sweep == 0 and theta2 != theta1:
+            sweep = 360.0
+        angles = (np.degrees(np.arctan2(dy, dx)) - theta1) % 360.0
+        self.__blend(img, rows, cols, ((dx ** 2) + (dy ** 2) <= radius ** 2) & (angles <= sweep), color, alpha)
+
+    # a dotted line, two pixels on, two off
+    def __draw_dotted_line (self, static, img, x1, y1, x2, y2, color, alpha):
+        col1, row1 = self.__get_pixel(static, x1, y1)
+        col2, row2 = self.__get_pixel(static, x2, y2)
+        steps = int(max(abs(col2 - col1), abs(row2 - row1))) + 1
+        on = (np.arange(steps) % 4) < 2
+        cols = np.rint(np.linspace(col1, col2, steps)).astype(int)[on]
+        rows = np.rint(np.linspace(row1, row2, steps)).astype(int)[on]
+
+        visible = (cols >= 0) & (cols < img.shape[1]) & (rows >= 0) & (rows < img.shape[0])
+        cols = cols[visible]
+        rows = rows[visible]
+        visible = static['in_axes_x'][cols] & static['in_axes_y'][rows]
+        cols = cols[visible]
+        rows = rows[visible]
+        img[rows, cols] = img[rows, cols] * (1 - alpha) + np.array(color, dtype=np.float32) * alpha
+
+    # fractional pixel column and row for data coords
+    def __get_pixel (self, static, x, y):
+        width_px = len(static['x'])
+        height_px = len(static['y'])
+        col = ((x - static['x'][0]) / (static['x'][-1] - static['x'][0])) * (width_px - 1) if width_px > 1 else 0
+        row = ((y - static['y'][0]) / (static['y'][-1] - static['y'][0])) * (height_px - 1) if height_px > 1 else 0
+        return col, row
+
+    def __blend (self, img, rows, cols, mask, color, alpha):
+        region = img[rows, cols]
+        region[mask] = region[mask] * (1 - alpha) + np.array(color, dtype=np.float32) * alpha
@@ -1,6 +1,7 @@
 import unittest
 from field.field_map import FieldMap
 import logging
+import math
 
 class TestFieldMap(unittest.TestCase):
     def setUp(self) -> None:
@@ -106,7 +107,46 @@ class TestFieldMap(unittest.TestCase):
         self.assertTrue(is_blocked)
         self.assertEqual('post', obstacle_id)
 
+    def test_overlapping_obstacles (self):
+        # when a path or point hits more than one obstacle, the first one on the map is reported
+        curr_map = FieldMap({}, boundaries={'xmin':-100, 'ymin':-100, 'xmax':100, 'ymax':100}, obstacles={
+            'wall':{'xmin':-50, 'ymin':40, 'xmax':50, 'ymax':45},
+            'table':{'xmin':-5, 'ymin':-5, 'xmax':5, 'ymax':5},
+            'chair':{'xmin':0, 'ymin':0, 'xmax':8, 'ymax':8}
+        })
 
+        self.assertEqual((True, 'table'), curr_map.is_blocked(3, 3))
+        self.assertEqual((True, 'chair'), curr_map.is_blocked(7, 7))
+        self.assertEqual((True, 'table'), curr_map.is_blocked(7, 7, path_width=6))
+
+        # the wall is crossed, but it's first on the map
+        self.assertEqual((True, 'wall'), curr_map.is_path_blocked(-20, -20, 20, 60))
+        self.assertEqual((True, 'chair'), curr_map.is_path_blocked(20, 7, 6, 7))
+
+        # the straight line passes the chair, its width doesn't
+        self.assertEqual((False, None), curr_map.is_path_blocked(20, 11, -20, 11))
+        self.assertEqual((True, 'table'), curr_map.is_path_blocked(20, 11, -20, 11, path_width=14))
+
+    def test_batched_queries (self):
+        curr_map = self.get_basic_map()
+
+        xs = [0, 4, 5, 6, -20]
+        ys = [0, 4, -21, -21.5, 0]
+        blocked, obstacle_ids = curr_map.are_blocked(xs, ys)
+        for i in range(len(xs)):
+            self.assertEqual(curr_map.is_blocked(xs[i], ys[i]), (blocked[i], obstacle_ids[i]))
+
+        paths = [(100, 100, -100, -100), (100, 10, -100, 10), (100, 3, -100, 3), (0, 0, 30, 0), (6, -30, 6, -10), (3, 3, 9, 9)]
+        for path_width in [0, 10.0]:
+            blocked, obstacle_ids = curr_map.are_paths_blocked([p[0] for p in paths], [p[1] for p in paths], [p[2] for p in paths], [p[3] for p in paths], path_width=path_width)
+            for i, (x1, y1, x2, y2) in enumerate(paths):
+                self.assertEqual(curr_map.is_path_blocked(x1, y1, x2, y2, path_width=path_width), (blocked[i], obstacle_ids[i]))
+
+        # no obstacles on the map
+        open_map = FieldMap({}, boundaries={'xmin':-10, 'ymin':-10, 'xmax':10, 'ymax':10})
+        blocked, obstacle_ids = open_map.are_paths_blocked([0], [0], [5], [5])
+        self.assertFalse(blocked[0])
+        self.assertIsNone(obstacle_ids[0])
 
     def test_quadrants (self):
         curr_map = self.get_basic_map()
@@ -123,4 +163,20 @@ class TestFieldMap(unittest.TestCase):
         curr_map = self.get_basic_map()
         self.assertEquals(134.3, round(curr_map.get_distance('n1', 'n2'),1))
         self.assertEquals(134.3, round(curr_map.get_distance('n2', 'n1'),1))
-        self.assertEquals(294.0, round(curr_map.get_distance('n2', 'e1'),1))
\ No newline at end of file
+        self.assertEquals(294.0, round(curr_map.get_distance('n2', 'e1'),1))
+
+    def test_pair_geometry(self):
+        curr_map = self.get_basic_map()
+        pair = curr_map.get_pair_geometry('n1', 'n2')
+        self.assertEqual(round(curr_map.get_distance('n1', 'n2'),3), round(pair['distance'],3))
+        self.assertEqual(round((-79.0 - 38.0) / (-106.0 + 40.0),3), round(pair['slope'],3))
+
+        # n2 is down and to the left of n1
+        self.assertLess(pair['bearing'], -90)
+        self.assertGreater(pair['bearing'], -180)
+        self.assertAlmostEqual(pair['bearing'] + 180, curr_map.get_pair_geometry('n2', 'n1')['bearing'], places=6)
+
+        # rotation of the right triangle between the two
+        self.assertAlmostEqual(math.degrees(math.atan2(117.0, 66.0)), pair['rotation'], places=6)
+        self.assertIsNone(pair['min_angle_preference'])
+        self.assertIsNone(curr_map.get_pair_geometry('n1', 'unknown'))
@@ -94,6 +94,34 @@ class TestFieldScaler(unittest.TestCase):
         self.assertGreater(round(clear_x,1), round(target_x,1))
         self.assertGreater(round(clear_y,1), round(target_y,1))
 
+    def test_traversable_mask (self):
+        scaler = FieldScaler(self.get_basic_map(), 100, 100, 1)
+        mask = scaler.get_traversable_mask()
+        self.assertEqual((101, 101), mask.shape)
+
+        # whole coordinates come from the mask, anything else is worked out, and they should agree
+        post_x, post_y = scaler.get_scaled_coords(lvps_x=0, lvps_y=0)
+        self.assertTrue(scaler.is_obstacle(post_x, post_y))
+        self.assertTrue(scaler.is_in_bounds(post_x, post_y))
+        self.assertFalse(mask[int(post_y), int(post_x)])
+        self.assertTrue(scaler.is_obstacle(post_x + 0.001, post_y))
+
+        self.assertFalse(scaler.is_in_bounds(-5, 50))
+        self.assertTrue(scaler.is_in_bounds(50, 50))
+        self.assertTrue(mask[50, 50])
+        self.assertTrue(scaler.is_in_bounds(50.5, 50.5))
+
+    def test_random_traversable_coords (self):
+        field_map = self.get_basic_map()
+        scaler = FieldScaler(field_map, 100, 100, 1)
+        for i in range(100):
+            x, y = scaler.get_random_traversable_coords()
+            self.assertTrue(field_map.is_in_bounds(x, y))
+            self.assertFalse(field_map.is_blocked(x, y)[0])
+
+        # nothing open
+        blocked_map = FieldMap({}, boundaries={'xmin':0, 'ymin':0, 'xmax':10, 'ymax':10}, obstacles={'all':{'xmin':-1, 'ymin':-1, 'xmax':11, 'ymax':11}})
+        self.assertEqual((None, None), FieldScaler(blocked_map, 20, 20, 1).get_random_traversable_coords())
 
     def get_basic_map (self):
         return FieldMap( {
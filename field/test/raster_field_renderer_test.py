@@ -0,0 +1,59 @@
+import unittest
+from field.field_map import FieldMap
+from field.field_scaler import FieldScaler
+from field.raster_field_renderer import RasterFieldRenderer
+from position.confidence import Confidence
+import numpy as np
+import logging
+
+class TestRasterFieldRenderer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_shape (self):
+        field_map = self.get_basic_map()
+        scaler = FieldScaler(field_map, 128, 128, 0.9, invert_x_axis=True, invert_y_axis=True)
+
+        rendered = RasterFieldRenderer(field_map, scaler).render_field_image_to_array(width_inches=1.28, height_inches=1.28, dpi=100)
+        self.assertEqual((128, 128, 3), rendered.shape)
+        self.assertEqual(np.uint8, rendered.dtype)
+
+        rendered = RasterFieldRenderer(field_map, scaler, grayscale=True).render_field_image_to_array(width_inches=4, height_inches=3, dpi=50)
+        self.assertEqual((150, 200, 1), rendered.shape)
+        self.assertEqual(np.uint8, rendered.dtype)
+
+    def test_game_state (self):
+        field_map = self.get_basic_map()
+        scaler = FieldScaler(field_map, 128, 128, 0.9, invert_x_axis=True, invert_y_axis=True)
+        renderer = RasterFieldRenderer(field_map, scaler)
+
+        empty = renderer.render_field_image_to_array(add_game_state=True, agent_id='A', width_inches=1.28, height_inches=1.28, dpi=100)
+
+        # only the obstacles show on an empty map
+        gray = np.all(empty == [128, 128, 128], axis=2)
+        self.assertGreater(np.count_nonzero(gray), 0)
+        self.assertTrue(np.all(np.all(empty == [255, 255, 255], axis=2) | gray))
+
+        renderer.update_agent_state('A', [(-50.0, 100.0, -44.0, Confidence.CONFIDENCE_HIGH), (50.0, 50.0, 90.0, Confidence.CONFIDENCE_HIGH)], [(50.0, 50.0, 90.0, -30.0, 30.0, 60.0)])
+        renderer.update_search_state('A', 'cone', 20.0, 120.0)
+        rendered = renderer.render_field_image_to_array(add_game_state=True, agent_id='A', width_inches=1.28, height_inches=1.28, dpi=100)
+
+        # current position on top of everything
+        self.assertGreater(np.count_nonzero(np.all(rendered == [255, 0, 0], axis=2)), 0)
+        self.assertGreater(np.count_nonzero(np.all(rendered == [128, 0, 128], axis=2)), 0)
+
+        # the map layer is reused, the game state doesn't stick to it
+        self.assertTrue(np.array_equal(empty, renderer.render_field_image_to_array(add_game_state=False, width_inches=1.28, height_inches=1.28, dpi=100)))
+
+    def get_basic_map (self):
+        return FieldMap({},
+            boundaries={'xmin':-100, 'ymin':-50, 'xmax':150, 'ymax':200},
+            obstacles={
+                'table':{'xmin':0, 'ymin':0, 'xmax':30, 'ymax':10},
+                'couch':{'xmin':100, 'ymin':150, 'xmax':120, 'ymax':190}
+            }
+        )
+
+if __name__ == '__main__':
+    unittest.main()
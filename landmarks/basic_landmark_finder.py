@@ -1,13 +1,14 @@
 from camera.image_resolution import ImageResolution
 from field.field_map import FieldMap
 from landmarks.landmark_finder import LandmarkFinder
+from timing.stage_timer import StageTimer
 import logging
 import statistics
 import time
 
 class BasicLandmarkFinder (LandmarkFinder) :
-    def __init__ (self, camera_config, field_map : FieldMap, model_name : str, default_object_id_filter : list = None):
-        LandmarkFinder.__init__(self, camera_config=camera_config, field_map=field_map, default_object_id_filter=default_object_id_filter)
+    def __init__ (self, camera_config, field_map : FieldMap, model_name : str, default_object_id_filter : list = None, stage_timer : StageTimer = None):
+        LandmarkFinder.__init__(self, camera_config=camera_config, field_map=field_map, default_object_id_filter=default_object_id_filter, stage_timer=stage_timer)
         self.__model_name = model_name
         self.__default_confidence_threshold = 0.25
 
@@ -3,14 +3,15 @@ from field.field_map import FieldMap
 from landmarks.emitter_group import EmitterGroup, EmitterGroupPattern
 from landmarks.emitter_viewed_location import EmitterViewedLocation
 from landmarks.landmark_finder import LandmarkFinder
+from timing.stage_timer import StageTimer
 import logging
 import statistics
 import time
 import math
 
 class EmitterLandmarkFinder (LandmarkFinder) :
-    def __init__ (self, camera_config, field_map : FieldMap):
-        LandmarkFinder.__init__(self, camera_config=camera_config, field_map=field_map)
+    def __init__ (self, camera_config, field_map : FieldMap, stage_timer : StageTimer = None):
+        LandmarkFinder.__init__(self, camera_config=camera_config, field_map=field_map, stage_timer=stage_timer)
         self.__emitter_model = 'lights'
         self.__landmark_type = 'light'
         self.__default_confidence_threshold = 0.25
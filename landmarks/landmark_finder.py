@@ -1,11 +1,12 @@
 from camera.image_resolution import ImageResolution
 from field.field_map import FieldMap
+from timing.stage_timer import StageTimer
 import statistics
 import time
 import logging
 
 class LandmarkFinder:
-    def __init__ (self, camera_config, field_map : FieldMap, apply_smoothing = True, default_object_id_filter = ['light']):
+    def __init__ (self, camera_config, field_map : FieldMap, apply_smoothing = True, default_object_id_filter = ['light'], stage_timer : StageTimer = None):
         self.__camera_config = camera_config
         self.__field_map = field_map
         self.__image_resolution = camera_config['IMAGE_RESOLUTION']
@@ -16,26 +17,29 @@ class LandmarkFinder:
         self.__max_sighting_age = 10.0 # 10 seconds
         self.__default_object_id_filter = default_object_id_filter
         self.__barrel_distortion_at_edge = camera_config['BARREL_DISTORTION_AT_EDGE']
+        self.__stage_timer = stage_timer if stage_timer is not None else StageTimer()
 
 
     def get_camera_config (self):
         return self.__camera_config
 
     def locate_landmarks (self, object_locations, id_filter = None, confidence_threshold = None):
-        raw_locations = self.extract_landmarks_from_locations (
-            object_locations,
-            id_filter = id_filter if id_filter is not None else self.__default_object_id_filter, 
-            confidence_threshold = confidence_threshold)
+        with self.__stage_timer.stage('landmark_extraction'):
+            raw_locations = self.extract_landmarks_from_locations (
+                object_locations,
+                id_filter = id_filter if id_filter is not None else self.__default_object_id_filter, 
+                confidence_threshold = confidence_threshold)
 
         if self.__apply_smoothing:
-            self.__cache_landmarks(raw_sightings=raw_locations)
-
-            # get a smoothed version utilizing the latest, plus what we have in the cache
-            smoothed = self.get_smoothed_landmarks(
-                all_landmarks=self.__get_raw_looking_landmarks_from_cache(),
-                max_ticks_to_use=3,
-                allowed_dev=1.7,
-                min_sample_size=3)
+            with self.__stage_timer.stage('smoothing'):
+                self.__cache_landmarks(raw_sightings=raw_locations)
+
+                # get a smoothed version utilizing the latest, plus what we have in the cache
+                smoothed = self.get_smoothed_landmarks(
+                    all_landmarks=self.__get_raw_looking_landmarks_from_cache(),
+                    max_ticks_to_use=3,
+                    allowed_dev=1.7,
+                    min_sample_size=3)
             if len(smoothed) > 0:
                 return smoothed
 
@@ -0,0 +1,94 @@
+import threading
+import time
+import logging
+from collections import deque
+from lidar.lidar_map import LidarMap
+from lidar.lidar_codec import LidarCodec
+
+# the newest lidar scan from the vehicle, and when it was received.
+# a scan is never changed once published (a LidarMap only fills in its own lookup caches, which
+# come out the same whichever thread builds them), and publishing swaps in a new (scan, time) pair
+# with a single assignment. so readers never need a lock, they just take whatever pair is current
+class LatestScan:
+    def __init__(self):
+        self.__latest = (None, 0.0)
+        self.__published = threading.Condition()
+
+    def publish (self, lidar_map : LidarMap, scan_time = None):
+        self.__latest = (lidar_map, scan_time if scan_time is not None else time.time())
+
+        # only callers waiting on a new scan take this lock
+        with self.__published:
+            self.__published.notify_all()
+
+    # the newest scan and the time it was received. (None, 0.0) if nothing has been published
+    def get (self):
+        return self.__latest
+
+    # the newest scan and its age in seconds. (None, inf) if nothing has been published
+    def get_with_age (self):
+        lidar_map, scan_time = self.__latest
+        if lidar_map is None:
+            return None, float('inf')
+        return lidar_map, max(0.0, time.time() - scan_time)
+
+    # the newest scan, if it is no older than max_age seconds
+    def get_fresh (self, max_age : float):
+        lidar_map, age = self.get_with_age()
+        return lidar_map if age <= max_age else None
+
+    # waits for a scan received after the given time. returns None if none shows up in time
+    def wait_for_scan (self, newer_than : float, timeout : float):
+        deadline = time.time() + timeout
+        with self.__published:
+            while True:
+                lidar_map, scan_time = self.__latest
+                if lidar_map is not None and scan_time > newer_than:
+                    return lidar_map
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.__published.wait(remaining)
+
+# turns raw scans (text Map: data or binary payloads) into LidarMaps on its own thread, so the serial reader never waits on parsing.
+# only the newest unparsed scan is kept, if scans come in faster than they are parsed the older ones are skipped
+class LidarScanParser:
+    def __init__(self, latest_scan : LatestScan, name = 'lidar_scan_parser'):
+        self.__latest_scan = latest_scan
+        self.__pending = deque(maxlen=1) # (decoder, decoder args, received time)
+        self.__has_pending = threading.Event()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__parse_scans, daemon=True, name=name)
+        self.__thread.start()
+
+    def submit (self, offset : int, granularity : float, lidar_data : str, received_time = None):
+        self.__pending.append((LidarCodec.decode_text, (offset, granularity, lidar_data), received_time if received_time is not None else time.time()))
+        self.__has_pending.set()
+
+    # binary scans carry their own offset and granularity
+    def submit_binary (self, payload : bytes, received_time = None):
+        self.__pending.append((LidarCodec.decode_binary, (payload,), received_time if received_time is not None else time.time()))
+        self.__has_pending.set()
+
+    def stop (self, timeout = 2.0):
+        self.__running = False
+        self.__has_pending.set()
+        self.__thread.join(timeout)
+
+    def __parse_scans (self):
+        while True:
+            self.__has_pending.wait()
+            self.__has_pending.clear()
+            if not self.__running:
+                break
+
+            # anything submitted after this sets the event again, so it is picked up on the next pass
+            while len(self.__pending) > 0:
+                try:
+                    decoder, decoder_args, received_time = self.__pending.popleft()
+                except IndexError:
+                    break
+                try:
+                    self.__latest_scan.publish(decoder(*decoder_args), received_time)
+                except Exception as e:
+                    logging.getLogger(__name__).warning(f"Dropping lidar scan that could not be read: {e}")
@@ -0,0 +1,40 @@
+import struct
+import numpy as np
+from lidar.lidar_map import LidarMap
+
+# the two ways a scan can come from the vehicle.
+# text is the original Map: line, one measurement (mm) per bin, pipe delimited, with offset and granularity
+# coming from the vehicle config. binary is the payload of a BinaryFrame: a header with a format version,
+# the offset (degrees) and granularity (hundredths of a degree), then one uint16 per bin, in mm, 0 for no hit.
+# a binary scan is a third of the size of the text one or less, and decodes without any parsing
+class LidarCodec:
+    FORMAT_TEXT = 'text'
+    FORMAT_BINARY = 'binary'
+
+    BINARY_VERSION = 1
+    BINARY_HEADER = struct.Struct('<BxhH')
+
+    # measurements are clipped to what fits in a uint16
+    MAX_BINARY_MM = 65535
+
+    def encode_text (measurements):
+        return '|'.join(f"{m:.1f}" for m in measurements)
+
+    def decode_text (offset : int, granularity : float, lidar_data : str):
+        return LidarMap(offset = offset, granularity = granularity, lidar_data = lidar_data)
+
+    def encode_binary (offset : int, granularity : float, measurements):
+        measurements = np.clip(np.rint(np.asarray(measurements, dtype=float)), 0, LidarCodec.MAX_BINARY_MM)
+        header = LidarCodec.BINARY_HEADER.pack(LidarCodec.BINARY_VERSION, int(offset), int(round(granularity * 100)))
+        return header + measurements.astype('<u2').tobytes()
+
+    def decode_binary (payload : bytes):
+        if len(payload) < LidarCodec.BINARY_HEADER.size or (len(payload) - LidarCodec.BINARY_HEADER.size) % 2 != 0:
+            raise Exception(f"Binary lidar scan has a bad length: {len(payload)}")
+
+        version, offset, granularity = LidarCodec.BINARY_HEADER.unpack_from(payload)
+        if version != LidarCodec.BINARY_VERSION:
+            raise Exception(f"Binary lidar scan version {version} is not supported")
+
+        measurements = np.frombuffer(payload, dtype='<u2', offset=LidarCodec.BINARY_HEADER.size)
+        return LidarMap(offset = offset, granularity = granularity / 100, measurements = measurements)
@@ -1,95 +1,143 @@
 import logging
-import math
-import json
+import bisect
+import numpy as np
+
+# A single lidar scan. The vehicle sends one measurement (mm) per bin, pipe delimited,
+# bin i is at angle (i * granularity) + offset, where 0 is the front of the vehicle and 270 is left.
+# Bins without a hit (measurement <= 0) are not available.
+# Scans that are already decoded (see LidarCodec) are given as an array of measurements instead of lidar_data.
 class LidarMap:
-    def __init__(self, offset : int, granularity : float, lidar_data : str):
-        lidar_raw = lidar_data.split('|')
-        self.__measurement_map = {}
-        for i,measurement in enumerate(lidar_raw):
-            measurement = float(measurement)
-            if measurement > 0.0:
-                adjustedAngle = (i * granularity) + offset
-                if adjustedAngle > 360.0:
-                    adjustedAngle -= 360.0
-
-                self.__measurement_map[adjustedAngle] = measurement
-        
-        self.__available_angles = sorted(self.__measurement_map.keys())
+    # lidar measures in mm, field maps are in inches
+    MM_PER_MAP_UNIT = 25.4
+
+    def __init__(self, offset : int, granularity : float, lidar_data : str = None, measurements = None):
+        if measurements is None:
+            measurements = np.fromstring(lidar_data, dtype=float, sep='|')
+            if len(measurements) != lidar_data.count('|') + 1:
+                raise Exception(f"Lidar data could not be read, expected {lidar_data.count('|') + 1} measurements, got {len(measurements)}")
+        measurements = np.asarray(measurements, dtype=float)
+
+        angles = (np.arange(len(measurements)) * granularity) + offset
+        angles = np.where(angles > 360.0, angles - 360.0, angles)
+        hits = measurements > 0.0
+        self.__hit_angles = angles[hits]
+        self.__hit_measurements = measurements[hits]
+
+        # sorted by angle. if two bins land on the same angle, the later bin wins
+        self.__angles, last_bins = np.unique(self.__hit_angles[::-1], return_index=True)
+        self.__measurements = self.__hit_measurements[::-1][last_bins]
+        self.__available_angles = self.__angles.tolist()
+        self.__available_measurements = self.__measurements.tolist()
+
+        # the scan repeated a turn before and after, so nearest lookups across 0/360 are a plain search
+        self.__wrapped_angles = None
+        self.__wrapped_measurements = None
+        self.__wrapped_angle_array = None
+        self.__wrapped_measurement_array = None
+
+        self.__measurement_map = None
         #logging.getLogger(__name__).info(f"Available angles: {self.__available_angles}")
 
     def get_available_angles (self):
         return self.__available_angles
 
     def get_lidar_data (self):
+        # only built if someone asks, lookups use the arrays
+        if self.__measurement_map is None:
+            self.__measurement_map = dict(zip(self.__hit_angles.tolist(), self.__hit_measurements.tolist()))
         return self.__measurement_map
 
+    # every available angle and its measurement, sorted by angle
+    def get_scan (self):
+        return self.__angles, self.__measurements
+
     def get_measurement (self, vehicle_relative_angle : float, max_allowed_drift : float):
         #logging.getLogger(__name__).info(f"Pulling Lidar for angle {vehicle_relative_angle}")
-        # find the closest available
-        closest_available = self.get_closest_available_angle(vehicle_relative_angle)
-
-        logging.getLogger(__name__).info(f"Closest available to {vehicle_relative_angle} is {closest_available}")
-
-        # if it's close enough 0 or 360, also check the opposite
-        if vehicle_relative_angle - max_allowed_drift < 0:
-            alternative = self.get_closest_available_angle(360.0)
-            if abs(alternative - 360.0 - vehicle_relative_angle) < abs(closest_available - vehicle_relative_angle):
-                closest_available = alternative
-        elif vehicle_relative_angle + max_allowed_drift > 360.0:
-            alternative = self.get_closest_available_angle(0.0)
-            if abs((360.0 + alternative) - vehicle_relative_angle) < abs(closest_available - vehicle_relative_angle):
-                closest_available = alternative
-
-        if abs(vehicle_relative_angle - closest_available) <= max_allowed_drift:
-            if closest_available in self.__measurement_map:
-                return self.__measurement_map[closest_available]
-            else:
-                logging.getLogger(__name__).error(f"Lidar measurement was found at {closest_available} but is now gone!")
+        if len(self.__available_angles) == 0:
+            return -1.0
+
+        # the closest available, either way around
+        wrapped_angles, wrapped_measurements = self.__get_wrapped_scan()
+        desired_angle = vehicle_relative_angle % 360.0
+        i = bisect.bisect_left(wrapped_angles, desired_angle)
+        if wrapped_angles[i] - desired_angle >= desired_angle - wrapped_angles[i - 1]:
+            i -= 1
+
+        logging.getLogger(__name__).debug(f"Closest available to {vehicle_relative_angle} is {wrapped_angles[i] % 360.0}")
+
+        if abs(wrapped_angles[i] - desired_angle) <= max_allowed_drift:
+            return wrapped_measurements[i]
         return -1.0
 
+    # same as get_measurement, for many angles at once. returns an array, -1.0 wherever nothing is close enough
+    def get_measurements (self, vehicle_relative_angles, max_allowed_drift : float):
+        desired_angles = np.asarray(vehicle_relative_angles, dtype=float) % 360.0
+        if len(self.__available_angles) == 0:
+            return np.full(desired_angles.shape, -1.0)
+
+        self.__get_wrapped_scan()
+        wrapped_angles = self.__wrapped_angle_array
+        above = np.searchsorted(wrapped_angles, desired_angles, side='left')
+        below = above - 1
+        closest = np.where(wrapped_angles[above] - desired_angles >= desired_angles - wrapped_angles[below], below, above)
+
+        return np.where(np.abs(wrapped_angles[closest] - desired_angles) <= max_allowed_drift, self.__wrapped_measurement_array[closest], -1.0)
+
+    # available angles and measurements from start_angle clockwise to end_angle, inclusive.
+    # if start_angle is past end_angle, the sector crosses the front of the vehicle (0/360)
+    def get_sector (self, start_angle : float, end_angle : float):
+        start_angle = start_angle % 360.0 if start_angle != 360.0 else 360.0
+        end_angle = end_angle % 360.0 if end_angle != 360.0 else 360.0
+        first = np.searchsorted(self.__angles, start_angle, side='left')
+        last = np.searchsorted(self.__angles, end_angle, side='right')
+        if start_angle <= end_angle:
+            return self.__angles[first:last], self.__measurements[first:last]
+        return np.concatenate([self.__angles[first:], self.__angles[:last]]), np.concatenate([self.__measurements[first:], self.__measurements[:last]])
+
+    # closest hit within the sector, as (angle, measurement). (None, -1.0) if there are no hits in the sector
+    def get_min_distance_in_sector (self, start_angle : float, end_angle : float):
+        angles, measurements = self.get_sector(start_angle, end_angle)
+        if len(measurements) == 0:
+            return None, -1.0
+        closest = np.argmin(measurements)
+        return float(angles[closest]), float(measurements[closest])
+
+    # same idea as the vehicle's FindMeasurement: of the hits within angle_tolerance of the angle whose
+    # measurement is within distance_tolerance of the expected distance, the one closest to the angle.
+    # returns (angle, measurement), or (None, None) if nothing matches
+    def find_measurement (self, vehicle_relative_angle : float, angle_tolerance : float, expected_distance : float, distance_tolerance : float):
+        angles, measurements = self.get_sector(vehicle_relative_angle - angle_tolerance, vehicle_relative_angle + angle_tolerance)
+        matches = np.abs(measurements - expected_distance) <= distance_tolerance
+        if not np.any(matches):
+            return None, None
+
+        angles = angles[matches]
+        drift = np.abs(angles - (vehicle_relative_angle % 360.0))
+        closest = np.argmin(np.minimum(drift, 360.0 - drift))
+        return float(angles[closest]), float(measurements[matches][closest])
+
+    # closest available angle, without wrapping around. anything before the first
+    # or after the last available angle gets that angle
     def get_closest_available_angle (self, desired_angle: float):
-        # if there's a direct hit, return that
-        if desired_angle in self.__available_angles:
-            return self.__available_angles[self.__available_angles.index(desired_angle)]
-
-        lowest = min(self.__available_angles)
-        highest = max(self.__available_angles)
-
-        if desired_angle < lowest:
-            return lowest
-        elif desired_angle > highest:
-            return highest
-
-        # do a binary search to find nearest
-        sub_center = math.floor(len(self.__available_angles) / 2)
-        sub_length = len(self.__available_angles)
-        closest_so_far = self.__available_angles[sub_center]
-        sub_offset = 0
-        while sub_center > 0 and sub_center < (sub_center + sub_length):
-            if round(desired_angle,2) == round(self.__available_angles[sub_center],2):
-                return round(desired_angle,2)
-            elif abs(desired_angle - self.__available_angles[sub_center]) < abs(desired_angle - closest_so_far):
-                closest_so_far = self.__available_angles[sub_center]
-            
-            if sub_length == 1:
-                if abs(self.__available_angles[sub_center] - desired_angle) < abs(closest_so_far - desired_angle):
-                    return self.__available_angles[sub_center]
-                return closest_so_far
-            elif desired_angle > self.__available_angles[sub_center]:
-                sub_offset = sub_center
-                sub_length /= 2
-                sub_length = round(sub_length)
-                sub_center += math.floor(sub_length / 2)
-            elif desired_angle < self.__available_angles[sub_center]:
-                sub_offset = sub_center
-                sub_length /= 2
-                sub_length = round(sub_length)
-                sub_center -= math.floor(sub_length / 2)
-        
-        if abs(self.__available_angles[0] - desired_angle) < abs(closest_so_far - desired_angle):
+        if len(self.__available_angles) == 0:
+            return None
+
+        i = bisect.bisect_left(self.__available_angles, desired_angle)
+        if i == 0:
             return self.__available_angles[0]
-        elif abs(self.__available_angles[len(self.__available_angles)-1] - desired_angle) < abs(closest_so_far - desired_angle):
-            return self.__available_angles[len(self.__available_angles)-1]
+        elif i == len(self.__available_angles):
+            return self.__available_angles[-1]
+        elif self.__available_angles[i] == desired_angle:
+            return self.__available_angles[i]
 
+        below = self.__available_angles[i - 1]
+        above = self.__available_angles[i]
+        return above if above - desired_angle < desired_angle - below else below
 
-        return closest_so_far
+    def __get_wrapped_scan (self):
+        if self.__wrapped_angles is None:
+            self.__wrapped_angles = [a - 360.0 for a in self.__available_angles] + self.__available_angles + [a + 360.0 for a in self.__available_angles]
+            self.__wrapped_measurements = self.__available_measurements * 3
+            self.__wrapped_angle_array = np.array(self.__wrapped_angles)
+            self.__wrapped_measurement_array = np.array(self.__wrapped_measurements)
+        return self.__wrapped_angles, self.__wrapped_measurements
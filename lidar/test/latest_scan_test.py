@@ -0,0 +1,68 @@
+import unittest
+from lidar.latest_scan import LatestScan, LidarScanParser
+import logging
+import threading
+import time
+
+class TestLatestScan(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_publish_and_age (self):
+        latest = LatestScan()
+        self.assertEqual(latest.get_with_age(), (None, float('inf')))
+        self.assertIsNone(latest.get_fresh(10.0))
+
+        parser = LidarScanParser(latest)
+        try:
+            parser.submit(0, 1.0, "10|-1|30", received_time = time.time() - 5.0)
+            lidar_map = latest.wait_for_scan(newer_than = 0, timeout = 2.0)
+            self.assertIsNotNone(lidar_map)
+            self.assertEqual(lidar_map.get_available_angles(), [0.0, 2.0])
+
+            # too old for a 1 second limit, fine for 10
+            self.assertIsNone(latest.get_fresh(1.0))
+            self.assertIs(latest.get_fresh(10.0), lidar_map)
+            self.assertGreaterEqual(latest.get_with_age()[1], 5.0)
+
+            # a scan that can't be read is dropped, the last good one stays
+            parser.submit(0, 1.0, "10|abc|30")
+            self.assertIsNone(latest.wait_for_scan(newer_than = time.time() - 1.0, timeout = 0.5))
+            self.assertIs(latest.get()[0], lidar_map)
+        finally:
+            parser.stop()
+
+    def test_wait_for_newer_scan (self):
+        latest = LatestScan()
+        parser = LidarScanParser(latest)
+        try:
+            requested = time.time()
+            threading.Timer(0.2, parser.submit, args=(0, 1.0, "5|6|7")).start()
+            lidar_map = latest.wait_for_scan(newer_than = requested, timeout = 5.0)
+            self.assertIsNotNone(lidar_map)
+            self.assertEqual(len(lidar_map.get_available_angles()), 3)
+
+            # readers always see a complete scan while new ones are published
+            seen = []
+            reading = True
+            def read_scans ():
+                while reading:
+                    scan, scan_time = latest.get()
+                    seen.append(len(scan.get_available_angles()))
+
+            reader = threading.Thread(target=read_scans)
+            reader.start()
+            for i in range(50):
+                parser.submit(0, 1.0, "|".join(['10'] * (i + 1)))
+            time.sleep(0.2)
+            reading = False
+            reader.join()
+
+            self.assertTrue(all(1 <= s <= 50 for s in seen if s != 3))
+            self.assertEqual(len(latest.get()[0].get_available_angles()), 50)
+        finally:
+            parser.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from lidar.lidar_codec import LidarCodec
+import logging
+import numpy as np
+
+class TestLidarCodec(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_binary_matches_text (self):
+        measurements = np.full(720, -1.0)
+        measurements[::3] = np.arange(240) * 10.0 + 150.0
+        measurements[5] = 70000.0 # past what a uint16 holds
+
+        text_map = LidarCodec.decode_text(90, 0.5, LidarCodec.encode_text(measurements))
+        payload = LidarCodec.encode_binary(90, 0.5, measurements)
+        binary_map = LidarCodec.decode_binary(payload)
+
+        # a header plus two bytes a bin, against several bytes a bin for text
+        self.assertEqual(LidarCodec.BINARY_HEADER.size + 720 * 2, len(payload))
+        self.assertLess(len(payload) * 2, len(LidarCodec.encode_text(measurements)))
+
+        self.assertEqual(text_map.get_available_angles(), binary_map.get_available_angles())
+        text_angles, text_measurements = text_map.get_scan()
+        binary_angles, binary_measurements = binary_map.get_scan()
+        clipped = text_measurements != 70000.0
+        self.assertTrue(np.array_equal(text_measurements[clipped], binary_measurements[clipped]))
+        self.assertEqual(65535.0, binary_map.get_measurement(92.5, 0.1))
+
+    def test_bad_payloads (self):
+        payload = LidarCodec.encode_binary(0, 1.0, [100.0, 200.0])
+        self.assertEqual([0.0, 1.0], LidarCodec.decode_binary(payload).get_available_angles())
+
+        with self.assertRaises(Exception):
+            LidarCodec.decode_binary(payload[:-1])
+        with self.assertRaises(Exception):
+            LidarCodec.decode_binary(bytes([LidarCodec.BINARY_VERSION + 1]) + payload[1:])
+
+if __name__ == '__main__':
+    unittest.main()
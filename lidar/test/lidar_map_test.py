@@ -54,6 +54,57 @@ class TestPathFinder(unittest.TestCase):
 
 
 
+    def test_measurement_wraps_around (self):
+        blocked_angles = [0.5, 100.0, 359.5]
+        lidar = self.__get_lidar_map_with_paths_blocked(blocked_angles, [10.0, 20.0, 30.0])
+
+        # just either side of the front of the vehicle
+        self.assertEqual(lidar.get_measurement(0.1, 0.5), 10.0)
+        self.assertEqual(lidar.get_measurement(359.9, 0.5), 30.0)
+        self.assertEqual(lidar.get_measurement(-0.3, 0.5), 30.0)
+        self.assertEqual(lidar.get_measurement(180.0, 0.5), -1.0)
+
+    def test_get_measurements (self):
+        blocked_angles = [0.0, 10.5, 11.0, 11.5, 12.5, 100.0, 200.0, 250.0, 250.5, 359.5 ]
+        lidar = self.__get_lidar_map_with_paths_blocked(blocked_angles, [a + 1.0 for a in blocked_angles])
+
+        angles = np.arange(-5.0, 365.0, 0.1)
+        measurements = lidar.get_measurements(angles, 0.5)
+        for a, m in zip(angles, measurements):
+            self.assertEqual(m, lidar.get_measurement(a, 0.5))
+
+    def test_sectors (self):
+        blocked_angles = [0.0, 10.5, 11.0, 100.0, 350.0, 359.5]
+        lidar = self.__get_lidar_map_with_paths_blocked(blocked_angles, [50.0, 40.0, 30.0, 5.0, 20.0, 60.0])
+
+        angles, measurements = lidar.get_sector(10.0, 100.0)
+        self.assertEqual(list(angles), [10.5, 11.0, 100.0])
+        self.assertEqual(list(measurements), [40.0, 30.0, 5.0])
+
+        # across the front of the vehicle
+        angles, measurements = lidar.get_sector(345.0, 15.0)
+        self.assertEqual(list(angles), [350.0, 359.5, 0.0, 10.5, 11.0])
+        self.assertEqual(lidar.get_min_distance_in_sector(345.0, 15.0), (350.0, 20.0))
+
+        # nothing there
+        self.assertEqual(lidar.get_min_distance_in_sector(200.0, 300.0), (None, -1.0))
+
+    def test_find_measurement (self):
+        blocked_angles = [0.0, 10.5, 11.0, 100.0, 350.0, 359.5]
+        lidar = self.__get_lidar_map_with_paths_blocked(blocked_angles, [50.0, 40.0, 30.0, 5.0, 20.0, 60.0])
+
+        # closest angle wins when both are within the expected distance
+        self.assertEqual(lidar.find_measurement(10.8, 1.0, 35.0, 10.0), (11.0, 30.0))
+
+        # only hits near the expected distance count
+        self.assertEqual(lidar.find_measurement(10.8, 1.0, 40.0, 2.0), (10.5, 40.0))
+
+        # across the front of the vehicle
+        self.assertEqual(lidar.find_measurement(-0.2, 1.0, 60.0, 5.0), (359.5, 60.0))
+
+        # nothing close enough
+        self.assertEqual(lidar.find_measurement(100.0, 1.0, 50.0, 5.0), (None, None))
+
     def __get_lidar_map_with_paths_blocked (self, headings : list, distances : list):
         s_map = ''
         for degree in np.arange(0.0,360.1,0.5):
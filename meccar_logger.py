@@ -18,6 +18,9 @@ if __name__ == '__main__':
     lidar_offset = None
     lidar_granularity = None
 
+    # results are claimed for wait_for_result and the command futures, and never reach get_message, so they are printed as they arrive
+    tank.get_router().subscribe(ArduinoConstants.MESSAGE_PREFIX_RESULT, lambda msg: print(f"Result: {msg.split(':')[1]}"), claim = False)
+
     if tank.wait_for_ready():
         print(f"Connected.")
 
@@ -36,8 +39,6 @@ if __name__ == '__main__':
                 msg = tank.get_message()
                 if msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LOG):
                     print(f"Log: {msg.split(':')[1]}")
-                elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_RESULT):
-                    print(f"Result: {msg.split(':')[1]}")
                 elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_MEASUREMENT):
                     print(f"Measurement: {msg.split(':')[1]}")
                 elif msg.startswith(ArduinoConstants.MESSAGE_PREFIX_LIDAR_MAP):
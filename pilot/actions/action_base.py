@@ -75,6 +75,12 @@ class ActionBase:
     
     # triggers pilot to find current position, physically adjusting the vehicle as needed (if configured)
     def find_new_position (self):
+        # if the pose is being tracked closely enough, a full positioning cycle can be skipped
+        if self.get_pilot_nav().is_tracking_enabled():
+            tracked_x, _, _, _ = self.get_pilot_nav().get_tracked_coords_and_heading()
+            if tracked_x is not None:
+                return True
+
         found_position = False
         adjustments = 0
         while not found_position and adjustments <= self.__max_positioning_adjustments:
@@ -22,6 +22,8 @@ class AdjustRandomlyAction(ActionBase):
         # attempt to execute both moves on the car. If it fails, it's not a big deal
         logging.getLogger(__name__).info(f"Adjusting by strafing {strafe_dir} for {strafe_millis} millis and rotating {rotate_deg}")
         try:
+            # strafing isn't tracked, so the next position has to come from a full fix
+            self.get_pilot_nav().lose_tracking()
             self.get_vehicle().strafe (strafe_direction = strafe_dir, millis = strafe_millis, wait_for_result = True)
 
             self.get_vehicle().rotate(degrees = rotate_deg, wait_for_result = True)
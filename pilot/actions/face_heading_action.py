@@ -42,6 +42,7 @@ class FaceHeadingAction(ActionBase):
                 else:
                     logging.getLogger(__name__).info(f"Rotation of {target_rotation} is required.")
                     if self.get_vehicle().rotate(target_rotation, wait_for_result=True):
+                        self.get_pilot_nav().predict_rotation(target_rotation)
                         # if not rechecking, assume we've arrived
                         if not recheck:
                             arrived = True
@@ -51,6 +52,7 @@ class FaceHeadingAction(ActionBase):
                             rotation_attempts += 1
                     else:
                         logging.getLogger(__name__).error("rotation failed, getting updated heading")
+                        self.get_pilot_nav().lose_tracking()
                         rotation_attempts += 1
                 
         self.get_pilot_nav().invalidate_position()
@@ -30,7 +30,7 @@ class GoToPositionAction(ActionBase):
 
     # this method arrives at the desired position by...
     # 1) See if we've arrived. if so, we're done
-    # 2) Find an open path (max 2 legs) to the given destination
+    # 2) Find an open path to the given destination (direct, two legs, or planned on the map grid)
     # 3) Face the end of the first leg, from step 1. If it fails, go back to step 1
     # 4) Drive toward the destination from step 1, up to max distance defined in settings
     # 5) Go back to step 1
@@ -83,11 +83,13 @@ class GoToPositionAction(ActionBase):
                                 # we should now be facing the correct heading. Ok to go forward
                                 if self.get_vehicle().forward_distance(speed=self.__driving_speed, distance_units = safe_dist, wait_for_result=True):
                                     logging.getLogger(__name__).info("Vehicle completed leg")
+                                    self.get_pilot_nav().predict_forward(safe_dist)
                                     leg_complete = True
                                 else:
                                     # rotation was successful, but the drive was not. maybe hit an obstacle or something
                                     # need to recalculate path
                                     logging.getLogger(__name__).info("Vehicle attempted drive, but leg did not complete")
+                                    self.get_pilot_nav().lose_tracking()
                                     leg_attempts = self.__max_leg_attempts
                             else:
                                 # recompute path from whereever we're facing now
@@ -3,6 +3,7 @@ from pilot.pilot_logger import PilotLogger
 from camera.camera_info import CameraInfo
 from pilot.actions.action_base import ActionBase
 from trig.trig import BasicTrigCalc
+from lidar.lidar_map import LidarMap
 import logging
 import time
 import math
@@ -108,10 +109,10 @@ class SearchAction(ActionBase):
         return False
 
     def __in_to_mm (self, measurement):
-        return measurement * 25.4
+        return measurement * LidarMap.MM_PER_MAP_UNIT
     
     def __mm_to_in (self, measurement):
-        return measurement / 25.4
+        return measurement / LidarMap.MM_PER_MAP_UNIT
 
     def __get_vehicle_relative_heading (self, cam_oriented_heading):
         new_heading = cam_oriented_heading - 90
@@ -0,0 +1,92 @@
+from multiprocessing import Process, Queue
+import queue
+import logging
+
+# a long-lived process dedicated to one camera. it is given a resident object once, at startup
+# (for navigation, a copy of the navigator with its finders and object locator), so anything
+# expensive that object loads, like detection models, stays loaded between requests.
+# requests are a module-level function and its arguments, the function is called with the
+# resident object first. results go back on a queue shared by all workers, tagged with the
+# round they belong to and the camera id
+class CameraWorker:
+    def __init__(self, camera_id, resident, results : Queue, on_start = None):
+        self.__camera_id = camera_id
+        self.__requests = Queue()
+        self.__results = results
+        self.__process = Process(target=run_camera_worker, args=(camera_id, self.__requests, results), daemon=True, name=f"camera_worker_{camera_id}")
+        self.__process.start()
+
+        # sent through the queue rather than as process args so it is always pickled, never forked
+        self.__requests.put((resident, on_start))
+
+    def get_camera_id (self):
+        return self.__camera_id
+
+    def is_alive (self):
+        return self.__process.is_alive()
+
+    def submit (self, round_id, func, args):
+        self.__requests.put((round_id, func, args))
+
+    def stop (self, timeout = 2.0):
+        if self.__process.is_alive():
+            self.__requests.put(None)
+            self.__process.join(timeout)
+            if self.__process.is_alive():
+                self.__process.terminate()
+                self.__process.join(timeout)
+        self.__requests.close()
+
+def run_camera_worker (camera_id, requests, results):
+    resident, on_start = requests.get()
+    if on_start is not None:
+        try:
+            on_start(resident)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Camera {camera_id} worker failed to start cleanly: {e}")
+
+    while True:
+        try:
+            request = requests.get()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+
+        round_id, func, args = request
+        result = {}
+        try:
+            result = func(resident, *args)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Camera {camera_id} worker request failed: {e}")
+        results.put((round_id, camera_id, result))
+
+# waits for a result from each of the given workers for the given round, in the order they come in.
+# results from older rounds (left over from a timeout) are dropped. workers that die, or don't
+# answer within the timeout, are left out
+def collect_camera_results (results : Queue, round_id, workers : dict, timeout):
+    collected = {}
+    waited = 0.0
+    poll_seconds = 0.5
+    while len(collected) < len(workers):
+        try:
+            result_round, camera_id, result = results.get(timeout=poll_seconds)
+            if result_round == round_id:
+                collected[camera_id] = result
+            continue
+        except queue.Empty:
+            waited += poll_seconds
+
+        missing = [c for c in workers if c not in collected]
+        if waited >= timeout:
+            logging.getLogger(__name__).info(f"Timed out waiting on cameras {missing}, their results will not be included")
+            break
+        dead = [c for c in missing if not workers[c].is_alive()]
+        if len(dead) > 0:
+            logging.getLogger(__name__).warning(f"Camera workers {dead} died, their results will not be included")
+            if len(dead) == len(missing):
+                break
+            for c in dead:
+                collected[c] = None
+
+    return {c:collected[c] for c in collected if collected[c] is not None}
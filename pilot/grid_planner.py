@@ -0,0 +1,284 @@
+import logging
+import heapq
+import math
+from lidar.lidar_map import LidarMap
+from field.field_map import FieldMap
+import numpy as np
+import weakref
+
+# Plans multi-leg paths over an occupancy grid of the field map. Boundaries and obstacles are
+# inflated by the vehicle footprint, so the planner only has to treat the vehicle as a point.
+# Dead spots are passable, but cost more to drive through since positioning does not work there.
+# Lidar hits are stamped onto a separate layer, on top of the static map layer. Each search only uses the scan it is given.
+class GridPlanner:
+    # static layers are built once per map and planner configuration, then shared by every planner.
+    # they are held only as long as the map is, so a map that is replaced doesn't stay in memory
+    __static_layers = weakref.WeakKeyDictionary()
+
+    def __init__ (self, field_map : FieldMap, lidar_scale : float, vehicle_width = 13.0, vehicle_length = 22.0, cell_size = 2.0, max_lidar_range = None, dead_spot_cost = 4.0, escape_cost = 10.0):
+        self.__field_map = field_map
+        self.__cell_size = cell_size
+
+        # same footprint the map checks use for paths
+        self.__inflation = max(vehicle_width, vehicle_length) / 2
+
+        self.__lidar_scale = lidar_scale # lidar units per map unit, see LidarMap.MM_PER_MAP_UNIT
+        self.__max_lidar_range = max_lidar_range # map units, hits further away are ignored
+        self.__dead_spot_cost = dead_spot_cost # cost multiplier for cells in a dead spot
+        self.__escape_cost = escape_cost # cost multiplier for cells too close to something, when starting or ending in one
+
+        self.__static = self.__get_static_layer()
+
+        # lidar hits, and the same inflated by the vehicle footprint
+        self.__lidar_hits = None
+        self.__lidar_blocked = None
+        if self.__static is not None:
+            self.clear_lidar()
+
+    def is_available (self):
+        return self.__static is not None
+
+    def clear_lidar (self):
+        self.__lidar_hits = np.zeros(self.__static['hard'].shape, dtype=bool)
+        self.__lidar_blocked = np.zeros(self.__static['hard'].shape, dtype=bool)
+
+    # true if the vehicle can't be at the given point, based on the map and any lidar added so far
+    def is_blocked (self, x, y):
+        row, col = self.__get_cell(x, y)
+        if row is None:
+            return True
+        return bool(self.__static['blocked'][row, col] or self.__lidar_blocked[row, col])
+
+    # adds every hit of the scan to the lidar layer. x, y, heading is where the vehicle was when the scan was taken.
+    # only cells that were not already hit are stamped, so repeated scans of the same surroundings are cheap
+    def add_lidar (self, lidar_map : LidarMap, x : float, y : float, heading : float):
+        angles, measurements = lidar_map.get_scan()
+        distances = measurements / self.__lidar_scale
+        if self.__max_lidar_range is not None:
+            angles = angles[distances <= self.__max_lidar_range]
+            distances = distances[distances <= self.__max_lidar_range]
+
+        # lidar angles are clockwise from the front of the vehicle, headings are clockwise from north
+        bearings = np.radians(heading + angles)
+        rows, cols = self.__get_cells(x + distances * np.sin(bearings), y + distances * np.cos(bearings))
+
+        in_grid = (rows >= 0) & (rows < self.__lidar_hits.shape[0]) & (cols >= 0) & (cols < self.__lidar_hits.shape[1])
+        rows = rows[in_grid]
+        cols = cols[in_grid]
+        new_hits = ~self.__lidar_hits[rows, cols]
+        rows = rows[new_hits]
+        cols = cols[new_hits]
+        if len(rows) == 0:
+            return 0
+
+        self.__lidar_hits[rows, cols] = True
+        kernel_rows, kernel_cols = self.__get_kernel()
+        stamp_rows = (rows[:, np.newaxis] + kernel_rows[np.newaxis, :]).ravel()
+        stamp_cols = (cols[:, np.newaxis] + kernel_cols[np.newaxis, :]).ravel()
+        in_grid = (stamp_rows >= 0) & (stamp_rows < self.__lidar_hits.shape[0]) & (stamp_cols >= 0) & (stamp_cols < self.__lidar_hits.shape[1])
+        self.__lidar_blocked[stamp_rows[in_grid], stamp_cols[in_grid]] = True
+
+        logging.getLogger(__name__).debug(f"Added {len(rows)} new lidar hits to the grid")
+        return len(rows)
+
+    # returns a list of legs [(heading, dist, x, y), ...] from start to end, same as the paths PathFinder gives.
+    # empty if there is no way there. lidar from earlier searches is dropped, hits from an old position
+    # may be something that has moved, or be off by however far the position was off
+    def find_path (self, start_x : float, start_y : float, end_x : float, end_y : float, lidar_map : LidarMap = None, current_heading : float = None):
+        if self.__static is None:
+            return []
+
+        self.clear_lidar()
+        if lidar_map is not None and current_heading is not None:
+            self.add_lidar(lidar_map, start_x, start_y, current_heading)
+
+        start = self.__get_cell(start_x, start_y)
+        end = self.__get_cell(end_x, end_y)
+        if start[0] is None or end[0] is None:
+            logging.getLogger(__name__).info("Start or end is outside the planning grid")
+            return []
+
+        hard = self.__static['hard'] | self.__lidar_hits
+        if hard[end]:
+            logging.getLogger(__name__).info(f"({end_x}, {end_y}) is blocked")
+            return []
+
+        blocked, cost = self.__get_search_grid(hard, start, end)
+        cells = self.__search(blocked, cost, start, end)
+        if cells is None:
+            logging.getLogger(__name__).info(f"No path on the grid from ({start_x}, {start_y}) to ({end_x}, {end_y})")
+            return []
+
+        waypoints = self.__simplify(cells, blocked, cost)
+        points = [(start_x, start_y)] + [self.__get_point(row, col) for row, col in waypoints[1:-1]] + [(end_x, end_y)]
+
+        legs = []
+        for (from_x, from_y), (to_x, to_y) in zip(points[:-1], points[1:]):
+            legs.append((math.degrees(math.atan2(to_x - from_x, to_y - from_y)), math.dist((from_x, from_y), (to_x, to_y)), to_x, to_y))
+
+        logging.getLogger(__name__).info(f"Grid path from ({start_x}, {start_y}) to ({end_x}, {end_y}) has {len(legs)} legs")
+        return legs
+
+    # blocked cells and per cell cost for one search. the start and end may be too close to something
+    # for the vehicle to fit, so the inflated cells right around them can still be used, at a cost
+    def __get_search_grid (self, hard, start, end):
+        blocked = self.__static['blocked'] | self.__lidar_blocked
+        cost = self.__static['cost'].copy()
+
+        escape_cells = int(math.ceil(self.__inflation / self.__cell_size)) + 1
+        rows, cols = np.indices(blocked.shape)
+        escape = np.zeros(blocked.shape, dtype=bool)
+        for row, col in [start, end]:
+            escape = escape | (np.hypot(rows - row, cols - col) <= escape_cells)
+        escape = escape & blocked & ~hard
+
+        cost[escape] = cost[escape] * self.__escape_cost
+        blocked = blocked & ~escape
+        return blocked, cost
+
+    # 8 connected A*, moving into a cell costs the distance times that cell's cost
+    def __search (self, blocked, cost, start, end):
+        rows, cols = blocked.shape
+        start_index = start[0] * cols + start[1]
+        end_index = end[0] * cols + end[1]
+        blocked = blocked.ravel()
+        cost = cost.ravel()
+        moves = [(-1, -1, math.sqrt(2)), (-1, 0, 1.0), (-1, 1, math.sqrt(2)), (0, -1, 1.0), (0, 1, 1.0), (1, -1, math.sqrt(2)), (1, 0, 1.0), (1, 1, math.sqrt(2))]
+
+        best = {start_index : 0.0}
+        came_from = {start_index : None}
+        closed = set()
+        open_cells = [(self.__get_heuristic(start, end), start_index)]
+        while len(open_cells) > 0:
+            _, index = heapq.heappop(open_cells)
+            if index == end_index:
+                path = []
+                while index is not None:
+                    path.append((index // cols, index % cols))
+                    index = came_from[index]
+                return path[::-1]
+
+            if index in closed:
+                continue
+            closed.add(index)
+
+            row = index // cols
+            col = index % cols
+            for row_move, col_move, move_dist in moves:
+                next_row = row + row_move
+                next_col = col + col_move
+                if next_row < 0 or next_row >= rows or next_col < 0 or next_col >= cols:
+                    continue
+                next_index = next_row * cols + next_col
+                if blocked[next_index] or next_index in closed:
+                    continue
+
+                # dont cut the corner of a blocked cell
+                if row_move != 0 and col_move != 0 and (blocked[row * cols + next_col] or blocked[next_row * cols + col]):
+                    continue
+
+                next_cost = best[index] + move_dist * cost[next_index]
+                if next_index not in best or next_cost < best[next_index]:
+                    best[next_index] = next_cost
+                    came_from[next_index] = index
+                    heapq.heappush(open_cells, (next_cost + self.__get_heuristic((next_row, next_col), end), next_index))
+
+        return None
+
+    # octile distance, never more than the real cost since every cell costs at least 1
+    def __get_heuristic (self, cell, end):
+        row_diff = abs(cell[0] - end[0])
+        col_diff = abs(cell[1] - end[1])
+        return max(row_diff, col_diff) + (math.sqrt(2) - 1) * min(row_diff, col_diff)
+
+    # drops every cell that can be skipped with a straight line, so only the turns are left
+    def __simplify (self, cells, blocked, cost):
+        waypoints = [cells[0]]
+        anchor = 0
+        while anchor < len(cells) - 1:
+            next_anchor = anchor + 1
+            for i in range(len(cells) - 1, anchor + 1, -1):
+                if self.__is_line_clear(cells[anchor], cells[i], blocked, cost):
+                    next_anchor = i
+                    break
+            waypoints.append(cells[next_anchor])
+            anchor = next_anchor
+
+        return waypoints
+
+    # clear if the line doesn't cross anything blocked, or anything more expensive than either end
+    def __is_line_clear (self, from_cell, to_cell, blocked, cost):
+        steps = int(math.ceil(max(abs(to_cell[0] - from_cell[0]), abs(to_cell[1] - from_cell[1])) * 2)) + 1
+        rows = np.rint(np.linspace(from_cell[0], to_cell[0], steps)).astype(int)
+        cols = np.rint(np.linspace(from_cell[1], to_cell[1], steps)).astype(int)
+        return not np.any(blocked[rows, cols]) and not np.any(cost[rows, cols] > max(cost[from_cell], cost[to_cell]))
+
+    # footprint of the vehicle, as cell offsets
+    def __get_kernel (self):
+        radius = int(math.ceil(self.__inflation / self.__cell_size))
+        kernel_rows, kernel_cols = np.indices((radius * 2 + 1, radius * 2 + 1)) - radius
+        in_footprint = np.hypot(kernel_rows, kernel_cols) * self.__cell_size <= self.__inflation
+        return kernel_rows[in_footprint], kernel_cols[in_footprint]
+
+    def __get_cells (self, xs, ys):
+        cols = np.rint((np.asarray(xs, dtype=float) - self.__static['xmin']) / self.__cell_size).astype(int)
+        rows = np.rint((np.asarray(ys, dtype=float) - self.__static['ymin']) / self.__cell_size).astype(int)
+        return rows, cols
+
+    def __get_cell (self, x, y):
+        rows, cols = self.__get_cells([x], [y])
+        row = int(rows[0])
+        col = int(cols[0])
+        if row < 0 or row >= self.__static['hard'].shape[0] or col < 0 or col >= self.__static['hard'].shape[1]:
+            return None, None
+        return row, col
+
+    def __get_point (self, row, col):
+        return self.__static['xmin'] + col * self.__cell_size, self.__static['ymin'] + row * self.__cell_size
+
+    def __get_static_layer (self):
+        map_layers = GridPlanner.__static_layers.setdefault(self.__field_map, {})
+        key = (self.__cell_size, self.__inflation, self.__dead_spot_cost)
+        if key not in map_layers:
+            map_layers[key] = self.__build_static_layer()
+        return map_layers[key]
+
+    # rows are y, columns are x. cell centers run from the min boundary, one cell size apart
+    def __build_static_layer (self):
+        xmin, ymin, xmax, ymax = self.__field_map.get_boundaries()
+        if xmin is None:
+            logging.getLogger(__name__).warning("Grid planning requires map boundaries")
+            return None
+
+        xs = xmin + np.arange(int(math.floor((xmax - xmin) / self.__cell_size)) + 1) * self.__cell_size
+        ys = ymin + np.arange(int(math.floor((ymax - ymin) / self.__cell_size)) + 1) * self.__cell_size
+        grid_x, grid_y = np.meshgrid(xs, ys)
+
+        # too close to a wall for the vehicle to fit
+        hard = np.zeros(grid_x.shape, dtype=bool)
+        blocked = (grid_x - xmin < self.__inflation) | (xmax - grid_x < self.__inflation) | (grid_y - ymin < self.__inflation) | (ymax - grid_y < self.__inflation)
+
+        obstacles = self.__field_map.get_obstacles()
+        for o in obstacles if obstacles is not None else {}:
+            o_bounds = obstacles[o]
+            hard = hard | ((grid_x >= o_bounds['xmin']) & (grid_x <= o_bounds['xmax']) & (grid_y >= o_bounds['ymin']) & (grid_y <= o_bounds['ymax']))
+            blocked = blocked | (
+                (grid_x >= o_bounds['xmin'] - self.__inflation) & (grid_x <= o_bounds['xmax'] + self.__inflation) &
+                (grid_y >= o_bounds['ymin'] - self.__inflation) & (grid_y <= o_bounds['ymax'] + self.__inflation))
+
+        # the planner doesn't know which way the vehicle will be facing, so dead spots cost extra regardless of heading
+        cost = np.ones(grid_x.shape, dtype=float)
+        dead_spots = self.__field_map.get_dead_spots()
+        for d in dead_spots if dead_spots is not None else {}:
+            d_bounds = dead_spots[d]
+            in_spot = (grid_x >= d_bounds['xmin']) & (grid_x <= d_bounds['xmax']) & (grid_y >= d_bounds['ymin']) & (grid_y <= d_bounds['ymax'])
+            cost[in_spot] = self.__dead_spot_cost
+
+        logging.getLogger(__name__).info(f"Grid planner built a {grid_x.shape[1]} x {grid_x.shape[0]} grid, {np.count_nonzero(blocked | hard)} cells blocked")
+        return {
+            'xmin' : xmin,
+            'ymin' : ymin,
+            'hard' : hard,
+            'blocked' : blocked | hard,
+            'cost' : cost
+        }
@@ -1,5 +1,7 @@
 from multiprocessing import Pool as ThreadPool
+from multiprocessing import Queue
 from multiprocessing.context import TimeoutError
+from pilot.camera_worker import CameraWorker, collect_camera_results
 import atexit
 import logging
 
@@ -8,6 +10,12 @@ import logging
 class NavigationThreadManager:
     __thread_pool = None
 
+    # long-lived workers, one per camera, keyed by owner then camera id.
+    # all of them answer on the same results queue
+    __camera_workers = {}
+    __camera_results = None
+    __camera_round = 0
+
     def get_thread_pool ():
         # this should match the number of cameras, since pilot-related multi-threading
         # is mainly to allow concurrent processing involving the cameras
@@ -24,4 +32,48 @@ class NavigationThreadManager:
             logging.getLogger(__name__).warning("Cleaning up pilot thread pool")
             NavigationThreadManager.__thread_pool.close()
             NavigationThreadManager.__thread_pool.terminate()
-            NavigationThreadManager.__thread_pool = None
\ No newline at end of file
+            NavigationThreadManager.__thread_pool = None
+
+        for owner_key in list(NavigationThreadManager.__camera_workers.keys()):
+            NavigationThreadManager.stop_camera_workers(owner_key)
+
+    # returns the workers for the given cameras, starting any that aren't running.
+    # the resident object is handed to each worker only when it starts, and on_start (if given) is called with it there
+    def get_camera_workers (owner_key, resident, camera_ids, on_start = None):
+        if NavigationThreadManager.__camera_results is None:
+            if NavigationThreadManager.__thread_pool is None:
+                atexit.register(NavigationThreadManager.cleanup)
+            NavigationThreadManager.__camera_results = Queue()
+
+        if owner_key not in NavigationThreadManager.__camera_workers:
+            NavigationThreadManager.__camera_workers[owner_key] = {}
+        workers = NavigationThreadManager.__camera_workers[owner_key]
+
+        for c in camera_ids:
+            if c in workers and not workers[c].is_alive():
+                logging.getLogger(__name__).warning(f"Camera {c} worker is no longer running, restarting")
+                workers[c].stop()
+                del workers[c]
+            if c not in workers:
+                logging.getLogger(__name__).info(f"Starting camera {c} worker")
+                workers[c] = CameraWorker(camera_id=c, resident=resident, results=NavigationThreadManager.__camera_results, on_start=on_start)
+
+        return {c:workers[c] for c in camera_ids}
+
+    # sends each camera worker its request, and waits for the results. requests are keyed by camera id,
+    # each one a module-level function and its args. returns the results keyed by camera id
+    def run_on_camera_workers (owner_key, resident, requests, on_start = None, timeout = 30.0):
+        workers = NavigationThreadManager.get_camera_workers(owner_key, resident, list(requests.keys()), on_start)
+        NavigationThreadManager.__camera_round += 1
+        for c in requests:
+            func, args = requests[c]
+            workers[c].submit(NavigationThreadManager.__camera_round, func, args)
+
+        return collect_camera_results(NavigationThreadManager.__camera_results, NavigationThreadManager.__camera_round, workers, timeout)
+
+    def stop_camera_workers (owner_key):
+        if owner_key in NavigationThreadManager.__camera_workers:
+            logging.getLogger(__name__).warning("Stopping camera workers")
+            for c in NavigationThreadManager.__camera_workers[owner_key]:
+                NavigationThreadManager.__camera_workers[owner_key][c].stop()
+            del NavigationThreadManager.__camera_workers[owner_key]
@@ -2,15 +2,20 @@ import logging
 import math
 from lidar.lidar_map import LidarMap
 from field.field_map import FieldMap
+from pilot.grid_planner import GridPlanner
 import numpy as np
 
 class PathFinder:
-    def __init__(self, field_map: FieldMap = None, vehicle_width = 13.0, vehicle_length = 22.0, vehicle_height = 16.0):
+    def __init__(self, field_map: FieldMap = None, vehicle_width = 13.0, vehicle_length = 22.0, vehicle_height = 16.0, lidar_scale = LidarMap.MM_PER_MAP_UNIT):
         self.__field_map = field_map
+        self.__lidar_scale = lidar_scale # lidar units per map unit
         self.__vehicle_width = vehicle_width
         self.__vehicle_height = vehicle_height
         self.__vehicle_length = vehicle_length
 
+        # only built if the angle sweep can't find a way
+        self.__grid_planner = None
+
     def is_close_enough (self, start_x, start_y, end_x, end_y, max_distance):
         return self.__get_distance(start_x, start_y, end_x, end_y) <= max_distance
     
@@ -32,8 +37,8 @@ class PathFinder:
         return option1 if abs(option1) < abs(option2) else option2
             
 
-    # this method currently only allows a max of two legs of a trip, meaning it will only make a single turn 
-    # to go around a pre-identified obstacle
+    # this method first looks for a direct path, or two legs with a single turn to go around an obstacle.
+    # if neither works, the grid planner is used, which can give any number of legs
     def find_potential_paths (self, start_x : float, start_y : float, end_x : float, end_y : float, lidar_map : LidarMap, current_heading : float):
         # finds a couple of ways to get to the given location
         direct_heading, direct_dist = self.find_direct_path (start_x=start_x, start_y=start_y, end_x=end_x, end_y=end_y)
@@ -60,48 +65,49 @@ class PathFinder:
         paths = [] # array of arrays of tuples [ [(heading,dist),(leg2_heading, leg2_dist),...],[...] ]
         distances = [] # distance of each path, so the can be sorted
 
-        for first_leg_fraction in np.arange(first_leg_starting_fraction, min_first_leg_fraction - 0.01, -1*first_leg_adjust_increment):
-            for heading_adjust_amount in np.arange(0.5, max_adjust + 0.1, angle_increment):
-                # check the positive and negative path around
-                potential_left_heading = self.__rescale_heading(direct_heading - heading_adjust_amount)
-                potential_right_heading = self.__rescale_heading(direct_heading + heading_adjust_amount)
-
-                for potential_heading in [potential_left_heading, potential_right_heading]:
-                    
-                    # heading 0 == north. heading -90 = west, 90 = east
-
-                    # what would the x,y point be if we went the first leg distance in the potential heading direction
-                    trial_dist = direct_dist * first_leg_fraction
-
-                    # convert to an x,y coordinate
-                    first_leg_x, first_leg_y = self.find_point(start_x=start_x, start_y=start_y, degrees=potential_heading, distance=trial_dist)
-
-                    # if not in bounds, ignore it
-                    if self.__field_map is None or self.__field_map.is_in_bounds(first_leg_x, first_leg_y):
-                        # if map indicates it's blocked, ignore it
-                        if self.__is_path_map_plausible (start_x = start_x, start_y = start_y, end_x = first_leg_x, end_y = first_leg_y):
-                            # if the map indicates or that there's no clear path from there to the end goal                            
-                            if self.__is_path_map_plausible (start_x = first_leg_x, start_y = first_leg_y, end_x = end_x, end_y = end_y):
-                                # see if the lidar shows blocked
-                                if lidar_map is None or self.is_path_clear_including_vehicle_width (
-                                    desired_heading = potential_heading,
-                                    distance = trial_dist, 
-                                    lidar_map = lidar_map,
-                                    current_heading = current_heading):
-
-                                    last_leg_heading, last_leg_dist = self.find_direct_path(first_leg_x, first_leg_y, end_x, end_y)
-                                    paths.append([
-                                        (potential_heading, trial_dist, first_leg_x, first_leg_y),(last_leg_heading, last_leg_dist, end_x, end_y)
-                                    ])
-                                    distances.append(trial_dist + last_leg_dist)
-
-                                    if len(paths) >= desired_paths:
-                                        break
-
-                if len(paths) >= desired_paths:
-                    break
-            if len(paths) >= desired_paths:
-                break
+        # every first leg is tried at once. rows are first leg fractions, columns are headings,
+        # each heading adjustment to the left, then the same to the right
+        first_leg_fractions = np.arange(first_leg_starting_fraction, min_first_leg_fraction - 0.01, -1*first_leg_adjust_increment)
+        heading_adjust_amounts = np.arange(0.5, max_adjust + 0.1, angle_increment)
+        potential_headings = self.__rescale_headings(np.column_stack([direct_heading - heading_adjust_amounts, direct_heading + heading_adjust_amounts]).ravel())
+        trial_dists = direct_dist * first_leg_fractions
+
+        # heading 0 == north. heading -90 = west, 90 = east
+        potential_radians = np.radians(potential_headings)
+        first_leg_xs = start_x + trial_dists[:, np.newaxis] * np.sin(potential_radians)[np.newaxis, :]
+        first_leg_ys = start_y + trial_dists[:, np.newaxis] * np.cos(potential_radians)[np.newaxis, :]
+
+        # if not in bounds, ignore it
+        possible = np.ones(first_leg_xs.shape, dtype=bool)
+        if self.__field_map is not None:
+            xmin, ymin, xmax, ymax = self.__field_map.get_boundaries()
+            if xmin is not None:
+                possible = (first_leg_xs >= xmin) & (first_leg_xs <= xmax) & (first_leg_ys >= ymin) & (first_leg_ys <= ymax)
+
+        # see if the lidar shows blocked
+        if lidar_map is not None:
+            clearances = self.get_clearances(self.__get_lidar_headings(potential_headings, current_heading), lidar_map)
+            possible = possible & (clearances[np.newaxis, :] > trial_dists[:, np.newaxis])
+
+        # the map checks are slower, so they are only done for what's left, in order, until there are enough paths
+        for fraction_index, heading_index in np.argwhere(possible):
+            potential_heading = float(potential_headings[heading_index])
+            trial_dist = float(trial_dists[fraction_index])
+            first_leg_x, first_leg_y = self.find_point(start_x=start_x, start_y=start_y, degrees=potential_heading, distance=trial_dist)
+
+            if self.__field_map is None or self.__field_map.is_in_bounds(first_leg_x, first_leg_y):
+                # if map indicates it's blocked, ignore it
+                if self.__is_path_map_plausible (start_x = start_x, start_y = start_y, end_x = first_leg_x, end_y = first_leg_y):
+                    # if the map indicates or that there's no clear path from there to the end goal
+                    if self.__is_path_map_plausible (start_x = first_leg_x, start_y = first_leg_y, end_x = end_x, end_y = end_y):
+                        last_leg_heading, last_leg_dist = self.find_direct_path(first_leg_x, first_leg_y, end_x, end_y)
+                        paths.append([
+                            (potential_heading, trial_dist, first_leg_x, first_leg_y),(last_leg_heading, last_leg_dist, end_x, end_y)
+                        ])
+                        distances.append(trial_dist + last_leg_dist)
+
+                        if len(paths) >= desired_paths:
+                            break
         
         # sort by distance
         sorted_paths = []
@@ -121,9 +127,25 @@ class PathFinder:
             else:
                 sorted_paths.append(paths[i])
                 sorted_distances.append(dist)
-        
+
+        if len(sorted_paths) == 0:
+            grid_planner = self.get_grid_planner()
+            if grid_planner is not None:
+                logging.getLogger(__name__).info("no one or two leg path found, trying the grid planner")
+                grid_path = grid_planner.find_path(start_x, start_y, end_x, end_y, lidar_map=lidar_map, current_heading=current_heading)
+                if len(grid_path) > 0:
+                    sorted_paths.append(grid_path)
+
         return sorted_paths
 
+    # the planner is kept so its grid is only built once. each search only avoids what the lidar given to it shows
+    def get_grid_planner (self):
+        if self.__grid_planner is None and self.__field_map is not None:
+            grid_planner = GridPlanner(field_map=self.__field_map, lidar_scale=self.__lidar_scale, vehicle_width=self.__vehicle_width, vehicle_length=self.__vehicle_length)
+            if grid_planner.is_available():
+                self.__grid_planner = grid_planner
+        return self.__grid_planner
+
     # returns true if the given leg is shown to be plausible (unblocked) by the map
     # this does not actually look at lidar for live obstructions. it is just based on map
     # if map is unavailable, all paths are considered plausible
@@ -170,23 +192,34 @@ class PathFinder:
 
 
     def is_path_clear_including_vehicle_width (self, desired_heading : float, distance: float, lidar_map : LidarMap, current_heading : float):
-        # right triangle, where direct_dist is the 90 degree back, 1/2 vehicle width is the 90 deg bottom
-        # find the bottom angle
-        hypotenuse = math.hypot((self.__vehicle_width/2), distance)
-        side_angle = math.degrees(math.asin((self.__vehicle_width/2)/hypotenuse))
-
         # desired heading is relative to north, need to get vehicle-relative, which is what the lidar is
-        desired_relative_heading = self.find_rotation (current_heading, desired_heading)
-
-        # check whether the given angle is open according to lidar
-        left_heading = self.__rescale_heading(desired_relative_heading - side_angle)
-        right_heading = self.__rescale_heading(desired_relative_heading + side_angle)
-
-        return  self.is_path_clear(left_heading, distance=distance, lidar_map=lidar_map) and \
-            self.is_path_clear(desired_relative_heading, distance=distance, lidar_map=lidar_map) and \
-            self.is_path_clear(right_heading, distance=distance, lidar_map=lidar_map)
-
-
+        lidar_heading = self.__get_lidar_headings(np.array([desired_heading]), current_heading)
+        return bool(self.get_clearances(lidar_heading, lidar_map)[0] > distance)
+
+    # how far the vehicle could drive along each of the given lidar headings (0 is front, 270 is left)
+    # before something in the scan is within half the vehicle width of its path. inf if nothing is in the way.
+    # the scan is converted to map units first, so clearances are in map units too
+    def get_clearances (self, lidar_headings, lidar_map : LidarMap):
+        lidar_headings = np.asarray(lidar_headings, dtype=float)
+        scan_angles, scan_measurements = lidar_map.get_scan()
+        if len(scan_angles) == 0:
+            return np.full(lidar_headings.shape, np.inf)
+        scan_measurements = scan_measurements / self.__lidar_scale
+
+        # every hit, relative to every heading. rows are headings
+        offsets = np.radians(scan_angles[np.newaxis, :] - lidar_headings.reshape(-1, 1))
+        ahead = scan_measurements[np.newaxis, :] * np.cos(offsets)
+        beside = np.abs(scan_measurements[np.newaxis, :] * np.sin(offsets))
+        in_path = (ahead > 0) & (beside <= self.__vehicle_width / 2)
+
+        return np.min(np.where(in_path, ahead, np.inf), axis=1).reshape(lidar_headings.shape)
+
+    # headings relative to north, as lidar headings for a vehicle facing current_heading
+    def __get_lidar_headings (self, headings, current_heading):
+        return (np.asarray(headings, dtype=float) - current_heading) % 360.0
+
+    def __rescale_headings (self, headings):
+        return np.where(headings > 180, headings - 360, np.where(headings < -180, headings + 360, headings))
 
     # if the heading has moved outside of range, it adjusts
     def __rescale_heading (self, heading):
@@ -206,7 +239,7 @@ class PathFinder:
 
         lidar_dist = lidar_map.get_measurement (converted_heading, 0.5) # allowed drift should be calculated somehow, not hardcoded
 
-        return lidar_dist <= 0 or lidar_dist > distance
+        return lidar_dist <= 0 or lidar_dist / self.__lidar_scale > distance
 
 
     # returns a heading and distance for a straight line
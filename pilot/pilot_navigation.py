@@ -4,6 +4,7 @@ from landmarks.object_search_finder import ObjectSearchFinder
 from position.position_estimator_with_clustering import PositionEstimatorWithClustering
 from position.confidence import Confidence
 from position.estimator_mode import EstimatorMode
+from position.pose_tracker import PoseTracker
 from landmarks.landmark_labeler import LandmarkLabeler
 from landmarks.object_search_labeler import ObjectSearchLabeler
 import time
@@ -11,12 +12,14 @@ import logging
 import statistics
 from camera.camera_info import CameraInfo
 from camera.camera_manager import CameraManager
+from camera.frame_ring_buffer import FrameRingBuffer
 from recognition.tflite_object_locator import TFLiteObjectLocator
 from field.field_map import FieldMap
 from navsvc.nav_service import NavService
 from pilot.pilot_resources import PilotResources
 from pilot.pilot_logger import PilotLogger
 from pilot.navigation_thread_manager import NavigationThreadManager
+from timing.stage_timer import StageTimer
 import json
 import copy
 import os
@@ -38,9 +41,18 @@ class PilotNavigation:
         self.__smoothing_cycles_per_image = self.__config['Landmarks']['Detection']['SmoothingCyclesPerImage']
         self.__lidar_map = None
         self.__lidar_time = 0
+        self.__lidar_invalidated_time = 0
         self.__lidar_max_age = self.__config['Lidar']['MaxAge'] # max seconds old lidar data can be. As long as the vehicle doesn't move the lidar should be good indefinitely, as long as objects don't move around it
 
-        self.__locator = TFLiteObjectLocator(model_configs = pilot_resources.get_model_configs())
+        # per-stage timing of each positioning cycle, attached to the basis that gets logged
+        self.__stage_timer = StageTimer(enabled = self.__config['Positioning']['StageTiming'] if 'StageTiming' in self.__config['Positioning'] else False)
+        self.__last_timing = None
+
+        self.__locator = TFLiteObjectLocator(
+            model_configs = pilot_resources.get_model_configs(),
+            stage_timer = self.__stage_timer,
+            batch_inference = self.__config['Landmarks']['Detection']['BatchInference'] if 'BatchInference' in self.__config['Landmarks']['Detection'] else False,
+            debug_image_dir = self.__config['Landmarks']['Detection']['DebugImageDir'] if 'DebugImageDir' in self.__config['Landmarks']['Detection'] else None)
         self.__estimator_mode = PilotNavigation.__get_estimator_mode(self.__config['Positioning']['EstimatorMode'])
 
         self.__delay_between_location_attempts = self.__config['Positioning']['PositionRetryDelaySeconds'] # how long to wait between location attemps
@@ -72,6 +84,21 @@ class PilotNavigation:
         self.__last_heading = None
         self.__last_confidence = None
         self.__last_coord_time = None
+
+        # between full fixes, the pose can be tracked from the moves the vehicle was told to make
+        self.__tracking_enabled = self.__config['Positioning']['TrackingEnabled'] if 'TrackingEnabled' in self.__config['Positioning'] else False
+        self.__tracking_max_position_uncertainty = self.__config['Positioning']['TrackingMaxPositionUncertainty'] if 'TrackingMaxPositionUncertainty' in self.__config['Positioning'] else 6.0
+        self.__tracking_max_heading_uncertainty = self.__config['Positioning']['TrackingMaxHeadingUncertainty'] if 'TrackingMaxHeadingUncertainty' in self.__config['Positioning'] else 8.0
+        self.__tracker = PoseTracker()
+        # track updates look through one camera at a time, taking turns
+        self.__next_tracking_camera = 0
+
+        # a recent position is given to the estimator as a starting point, as long as the vehicle hasn't driven since.
+        # off unless configured, since only moves reported through predict_forward / lose_tracking count as driving,
+        # and anything else moving the vehicle (like controlled drive) would leave a stale prior
+        self.__warm_start = self.__config['Positioning']['WarmStart'] if 'WarmStart' in self.__config['Positioning'] else False
+        self.__warm_start_max_age = self.__config['Positioning']['WarmStartMaxAge'] if 'WarmStartMaxAge' in self.__config['Positioning'] else 30.0
+        self.__moved_since_fix = True
         
         self.__alt_camera_positions = {}
         self.__default_camera_positions = []
@@ -87,6 +114,13 @@ class PilotNavigation:
                     for pos in self.__config['Cameras'][c]['AlternateHeadings']:
                         self.__alt_camera_positions[c].append(pos - 90)
 
+        # frames for multithreaded detection are handed to the workers through shared memory.
+        # enough slots for every camera's smoothing cycles, twice over, so a slot is never reused while being read
+        self.__frame_buffer = None
+        self.__worker_key = f"{map_id}_{id(self)}"
+        if self.__multithreaded_positioning or self.__multithreaded_search:
+            self.__frame_buffer = FrameRingBuffer(num_slots = max(1, 2 * self.__smoothing_cycles_per_image * len(self.__enabled_cameras)))
+
         self.__finders = {} # for navigation only
         self.__obj_search_finders = {} # for search
         for c in self.__enabled_cameras:
@@ -98,14 +132,16 @@ class PilotNavigation:
                 if model_configs[m]['LandmarkType'] == 'emitter':
                     self.__finders[c].append(EmitterLandmarkFinder(
                         camera_config=CameraInfo.CameraConfig[self.__enabled_cameras[c]],
-                        field_map=field_map
+                        field_map=field_map,
+                        stage_timer = self.__stage_timer
                     ))
 
                 elif model_configs[m]['LandmarkType'] == 'basic':
                     self.__finders[c].append(BasicLandmarkFinder(
                         camera_config=CameraInfo.CameraConfig[self.__enabled_cameras[c]],
                         field_map=field_map,
-                        model_name = m
+                        model_name = m,
+                        stage_timer = self.__stage_timer
                     ))
                     self.__obj_search_finders[c].append(ObjectSearchFinder(
                         camera_config=CameraInfo.CameraConfig[self.__enabled_cameras[c]],
@@ -126,14 +162,21 @@ class PilotNavigation:
                 estimator_mode = PilotNavigation.__get_estimator_mode(self.__estimator_mode),
                 max_lidar_drift_deg = self.__config['Lidar']['MaxDriftDegrees'],
                 max_lidar_visual_variance_pct = self.__config['Lidar']['MaxVisualDistVariancePct'],
-                adjust_for_altitude=self.__config['Positioning']['AdjustForAltitude']
+                adjust_for_altitude=self.__config['Positioning']['AdjustForAltitude'],
+                stage_timer = self.__stage_timer
             )        
 
     def __get_estimator_mode (estimator_mode_str):
-        if estimator_mode_str.lower() == "fast":
+        # accepts either the config value (very_precise) or an EstimatorMode value (Very Precise)
+        mode_str = estimator_mode_str.lower().replace(' ', '_')
+        if mode_str == "fast":
             return EstimatorMode.FAST
-        elif estimator_mode_str.lower() == "very_precise":
+        elif mode_str == "very_precise":
             return EstimatorMode.VERY_PRECISE
+        elif mode_str == "closed_form":
+            return EstimatorMode.CLOSED_FORM
+        elif mode_str == "grid":
+            return EstimatorMode.GRID
         else:
             return EstimatorMode.PRECISE
         
@@ -215,22 +258,42 @@ class PilotNavigation:
     def get_altitude (self):
         return self.__curr_altitude
     
-    def __prepare_for_multiprocessing (self):
-        # dump any potentially troubling items from the object graph so this object can be pickled
-        self.__locator.unload_models()
+    # runs once in each camera worker, so the models are ready before the first frame arrives
+    def load_detection_models (self):
+        self.__locator.load_models()
+
+    # workers hold a copy of this navigator from when they started. anything that
+    # changes between requests is sent along with the frames and applied here
+    def update_camera_state (self, camera_id, camera_heading, altitude):
+        self.__camera_headings[camera_id] = camera_heading
+        self.__curr_altitude = altitude
+
+    # sends each camera's frames to its worker, and waits for the results
+    def __run_on_camera_workers (self, requests):
+        return NavigationThreadManager.run_on_camera_workers(
+            owner_key = self.__worker_key,
+            resident = self,
+            requests = requests,
+            on_start = external_load_detection_models)
 
     # this locates landmarks on a single camera in a threadsafe way, so multiple
     # cameras can be 'queried' simultaneously
-    def locate_landmarks_on_camera (self, camera_id, latest_image_files = None):
+    def locate_landmarks_on_camera (self, camera_id, latest_frames = None):
         located_landmarks = {}
         try:
             # go through location cycle multiple times so smoothing can work
             c_located_objects = None
+
+            # frames that were already captured are detected all at once, the finders still see them one cycle at a time
+            frame_objects = None
+            if latest_frames is not None:
+                frame_objects = self.__locator.find_objects_in_frame_slots(frame_slots = latest_frames, min_confidence = self.__min_object_confidence)
+
             for locate_cycle in range(self.__smoothing_cycles_per_image):
-                if latest_image_files is None:
+                if latest_frames is None:
                     c_located_objects = self.__locator.find_objects_on_camera(camera=self.__get_camera(camera_id), min_confidence = self.__min_object_confidence)
                 else:
-                    c_located_objects = self.__locator.find_objects_in_image_file(image_file = latest_image_files[locate_cycle], min_confidence = self.__min_object_confidence)
+                    c_located_objects = frame_objects[locate_cycle]
                 logging.getLogger(__name__).debug(f"Camera {camera_id} found {len(c_located_objects)} objects: {c_located_objects}")
                 located_landmarks[camera_id] = {}
                 for f in self.__finders[camera_id]:
@@ -265,25 +328,22 @@ class PilotNavigation:
         
         return located_landmarks
 
-    def locate_landmarks (self):
+    # all enabled cameras, unless given which ones to look through
+    def locate_landmarks (self, camera_ids = None):
         consolidated_landmarks = {} # keyed by camera id
-        camera_searches = [] # for multithreading
-        for c in self.__enabled_cameras:
+        camera_searches = {} # for multithreading, keyed by camera id
+        for c in (camera_ids if camera_ids is not None else self.__enabled_cameras):
             # Get each camera search going in separate threads
             if self.__multithreaded_positioning:
                 # capture as many images as necessary for smoothing
                 images = []
-                for i in range(self.__smoothing_cycles_per_image):
-                    file_name = f'/tmp/{c}_processing_{i}.npy'
-                    img = self.__get_camera(c).capture_image (preprocess = True, file_name = file_name)
-                    if img is not None:
-                        images.append(file_name)
+                with self.__stage_timer.stage('capture'):
+                    for i in range(self.__smoothing_cycles_per_image):
+                        frame_slot = self.__get_camera(c).capture_image_to_buffer (self.__frame_buffer, preprocess = True)
+                        if frame_slot is not None:
+                            images.append(frame_slot)
                 if len(images) >= self.__smoothing_cycles_per_image:
-                    camera_searches.append((
-                        self,
-                        c,
-                        images
-                    ))
+                    camera_searches[c] = (external_locate_landmarks, (c, images, self.__camera_headings[c], self.get_altitude()))
             else:
                 camera_results = self.locate_landmarks_on_camera(c)
                 if c in camera_results:
@@ -292,31 +352,31 @@ class PilotNavigation:
         # consolidate results into a dictionary keyed by camera id
         # if multithreading, we need to wait for results to come in
         if self.__multithreaded_positioning:
-            self.__prepare_for_multiprocessing()
-            pool = NavigationThreadManager.get_thread_pool()
-            async_results = pool.starmap_async(external_locate_landmarks, camera_searches)
-            try:
-                for thread_result in async_results.get():
-                    for cid in thread_result:
-                        consolidated_landmarks[cid] = thread_result[cid]
-            except TimeoutError as te:
-                # is the thread pool corrupt in this case? Does it have a zombie
-                logging.getLogger(__name__).info("Timed out, some or all camera results may not be included")
+            # inference and landmark extraction happen in the workers, so only the wait can be timed here
+            with self.__stage_timer.stage('workers'):
+                worker_results = self.__run_on_camera_workers(camera_searches)
+                for c in worker_results:
+                    for cid in worker_results[c]:
+                        consolidated_landmarks[cid] = worker_results[c][cid]
 
         return consolidated_landmarks
 
-    def locate_objects_on_camera (self, objects, camera_id, latest_image_files = None):
+    def locate_objects_on_camera (self, objects, camera_id, latest_frames = None):
         combined_located_objects = {}
 
         all_objects = {}
 
         try:
+            frame_objects = None
+            if latest_frames is not None:
+                frame_objects = self.__locator.find_objects_in_frame_slots(frame_slots = latest_frames, min_confidence = self.__min_object_confidence)
+
             for locate_cycle in range(self.__smoothing_cycles_per_image):
                 c_located_objects = None
-                if latest_image_files is None:
+                if latest_frames is None:
                     c_located_objects = self.__locator.find_objects_on_camera(camera=self.__get_camera(camera_id), min_confidence = self.__min_object_confidence)
                 else:
-                    c_located_objects = self.__locator.find_objects_in_image_file(image_file = latest_image_files[locate_cycle], min_confidence = self.__min_object_confidence)
+                    c_located_objects = frame_objects[locate_cycle]
 
                 #logging.getLogger(__name__).info(f"Camera {camera_id} found {len(c_located_objects)} objects: {c_located_objects}")
                 combined_located_objects[camera_id] = {}
@@ -358,24 +418,18 @@ class PilotNavigation:
     def locate_objects (self, objects):
         all_objects = {}
 
-        camera_searches = [] # for multithreading
+        camera_searches = {} # for multithreading, keyed by camera id
         for c in self.__enabled_cameras:
             # Get each camera search going in separate threads
             if self.__multithreaded_search:
                 # capture as many images as necessary for smoothing
                 images = []
                 for i in range(self.__smoothing_cycles_per_image):
-                    file_name = f'/tmp/{c}_processing_{i}.npy'
-                    img = self.__get_camera(c).capture_image (preprocess = True, file_name = file_name)
-                    if img is not None:
-                        images.append(file_name)
+                    frame_slot = self.__get_camera(c).capture_image_to_buffer (self.__frame_buffer, preprocess = True)
+                    if frame_slot is not None:
+                        images.append(frame_slot)
                 if len(images) >= self.__smoothing_cycles_per_image:
-                    camera_searches.append((
-                        self,
-                        objects,
-                        images,
-                        c
-                    ))
+                    camera_searches[c] = (external_locate_objects, (objects, images, c, self.__camera_headings[c], self.get_altitude()))
             else:
                 camera_results = self.locate_objects_on_camera(objects, c)
                 if c in camera_results:
@@ -385,16 +439,10 @@ class PilotNavigation:
         # consolidate results into a dictionary keyed by camera id
         # if multithreading, we need to wait for results to come in
         if self.__multithreaded_search:
-            self.__prepare_for_multiprocessing()
-            pool = NavigationThreadManager.get_thread_pool()
-            async_results = pool.starmap_async(external_locate_objects, camera_searches)
-            try:
-                for thread_result in async_results.get():
-                    for cid in thread_result:
-                        all_objects[cid] = thread_result[cid]
-            except TimeoutError as te:
-                # is the thread pool corrupt in this case? Does it have a zombie
-                logging.getLogger(__name__).info("Timed out, some or all camera results may not be included in objectg search")
+            worker_results = self.__run_on_camera_workers(camera_searches)
+            for c in worker_results:
+                for cid in worker_results[c]:
+                    all_objects[cid] = worker_results[c][cid]
 
         return all_objects
 
@@ -418,10 +466,20 @@ class PilotNavigation:
     
     def invalidate_position (self):
         self.__lidar_map = None
+        self.__lidar_invalidated_time = time.time()
 
     def __get_lidar_map (self):
+        if self.__lidar_enabled_positioning and self.__vehicle.is_streaming_lidar():
+            # the newest streamed scan is free to use, as long as it was taken since the vehicle last moved
+            lidar_map, age = self.__vehicle.get_latest_lidar_map()
+            scan_time = time.time() - age
+            if lidar_map is not None and age <= self.__lidar_max_age and scan_time > self.__lidar_invalidated_time:
+                self.__lidar_map = lidar_map
+                self.__lidar_time = scan_time
+
         if self.__lidar_enabled_positioning and (self.__lidar_map is None or time.time() - self.__lidar_time > self.__lidar_max_age):
-            self.__lidar_map = self.__vehicle.get_live_lidar_map(timeout=15.0)
+            with self.__stage_timer.stage('lidar'):
+                self.__lidar_map = self.__vehicle.get_live_lidar_map(timeout=15.0)
             self.__lidar_time = time.time()
         return self.__lidar_map
 
@@ -429,9 +487,12 @@ class PilotNavigation:
         if preferred_confidence is None:
             preferred_confidence = self.__preferred_position_confidence
 
+        self.__stage_timer.start_cycle()
+
         if cam_start_default_position:
             # ensure cameras are at correct heading
-            self.reposition_cameras()
+            with self.__stage_timer.stage('camera_positioning'):
+                self.reposition_cameras()
 
         num_repositions_allowed = self.__get_num_alt_camera_headings() if allow_camera_reposition else 0
         attempts = 0
@@ -441,6 +502,7 @@ class PilotNavigation:
         heading = None
         confidence = Confidence.CONFIDENCE_LOW
         basis = None
+        prior = self.__get_position_prior()
         
         # keep looping until we get coordinates with target confidence or we hit max number of retries (in which case, we go with minimum confidence)
         while confidence < preferred_confidence and attempts < self.__max_position_attempts:
@@ -456,7 +518,8 @@ class PilotNavigation:
             landmark_requirements_met = False # do we have a good enough set of sightings to position
 
             while confidence < preferred_confidence and num_repositions_used <= num_repositions_allowed and landmark_preferences_met == False:
-                landmarks = self.locate_landmarks()
+                with self.__stage_timer.stage('locate_landmarks'):
+                    landmarks = self.locate_landmarks()
                 
                 for c in landmarks:
                     camera_heading = self.get_camera_heading(c)
@@ -486,16 +549,19 @@ class PilotNavigation:
                     num_repositions_used += 1
                 elif landmark_requirements_met:
                     logging.getLogger(__name__).info(f"Combined Landmarks: {combined_landmarks}")
-                    x, y, heading, confidence, basis = self.get_coords_and_heading_for_landmarks (combined_landmarks=combined_landmarks, allow_lidar = True)
+                    with self.__stage_timer.stage('estimate'):
+                        x, y, heading, confidence, basis = self.get_coords_and_heading_for_landmarks (combined_landmarks=combined_landmarks, allow_lidar = True, prior = prior)
                     if x is None and len(combined_landmarks) > self.__config['Landmarks']['Minimum']:
                         # One of the landmarks may be bad. Try trimming the lowest hanging one
                         logging.getLogger(__name__).info(f"Positioning failed, looks like possibly an invalid landmark value. Trimming the lowest one and trying again.")
-                        x, y, heading, confidence, basis = self.get_coords_and_heading_for_landmarks (combined_landmarks=combined_landmarks, allow_lidar = True, max_landmarks=self.__max_positioning_landmarks - 1)
+                        with self.__stage_timer.stage('estimate'):
+                            x, y, heading, confidence, basis = self.get_coords_and_heading_for_landmarks (combined_landmarks=combined_landmarks, allow_lidar = True, max_landmarks=self.__max_positioning_landmarks - 1, prior = prior)
 
                     logging.getLogger(__name__).info(f"=== Coords: ({x} , {y})  Heading: {heading}, Confidence: {confidence} ===")
                     if x is not None and y is not None and heading is not None and confidence is not None and confidence >= self.__min_position_confidence:
                         # display on vehicle, if configured
-                        self.__vehicle.display_position(x=x, y=y, heading=heading, wait_for_result = True) # if we dont wait for result, the repositino can fail
+                        # results are matched to their own commands, so the reposition doesn't need to wait on the display
+                        self.__vehicle.display_position(x=x, y=y, heading=heading)
                     elif num_repositions_used < num_repositions_allowed:
                         self.reposition_cameras(num_repositions_used)
                         num_repositions_used += 1
@@ -512,27 +578,36 @@ class PilotNavigation:
             if num_repositions_used > 0:
                 self.reposition_cameras()
         
+        # the breakdown sent with the basis covers everything up to logging it
+        if basis is not None and self.__stage_timer.is_enabled():
+            basis['timing'] = self.__stage_timer.get_breakdown()
+
         if confidence >= self.__min_position_confidence:
             if self.__pilot_logger is not None and x is not None and y is not None and heading is not None:
-                if self.__save_images:
-                    views = []
-                    for c in self.__newest_images:
-                        image_location = self.__newest_images[c]
-                        views.append({
-                            'image_file':image_location,
-                            'image_format':'png',
-                            'camera_id':c.split('_')[0],
-                            'camera_heading':c.split('_')[1]
-                        })
-                    self.__pilot_logger.log_coordinates_and_images(map_id = self.__map_id, x = x, y = y, heading = heading, images=views, basis=basis)
-                else:
-                    self.__pilot_logger.log_coordinates(map_id = self.__map_id, x = x, y = y, heading = heading, basis=basis)
+                with self.__stage_timer.stage('logging'):
+                    if self.__save_images:
+                        views = []
+                        for c in self.__newest_images:
+                            image_location = self.__newest_images[c]
+                            views.append({
+                                'image_file':image_location,
+                                'image_format':'png',
+                                'camera_id':c.split('_')[0],
+                                'camera_heading':c.split('_')[1]
+                            })
+                        self.__pilot_logger.log_coordinates_and_images(map_id = self.__map_id, x = x, y = y, heading = heading, images=views, basis=basis)
+                    else:
+                        self.__pilot_logger.log_coordinates(map_id = self.__map_id, x = x, y = y, heading = heading, basis=basis)
             
             self.__last_x = x
             self.__last_y = y
             self.__last_heading = heading
             self.__last_confidence = confidence
             self.__last_coord_time = time.time()
+            self.__moved_since_fix = False
+
+            if self.__tracking_enabled and x is not None and y is not None and heading is not None:
+                self.__tracker.correct_with_fix(x=x, y=y, heading=heading, confidence=confidence, timestamp=self.__last_coord_time)
 
             # clear image buffer
             self.__newest_images = {}
@@ -541,17 +616,30 @@ class PilotNavigation:
             if x is not None and y is not None and heading is not None:
                 self.__vehicle.display_position(x=x, y=y, heading=heading)
 
+            self.__finish_timing_cycle()
             return x,y,heading,confidence
 
         # clear image buffer
         self.__newest_images = {}
 
         # log this failure, if configured
-        self.__pilot_logger.log_position_failure(map_id=self.__map_id, basis=basis)
+        with self.__stage_timer.stage('logging'):
+            self.__pilot_logger.log_position_failure(map_id=self.__map_id, basis=basis)
 
         # positioning failed
+        self.__finish_timing_cycle()
         return None,None,None,None
 
+    # keeps the full breakdown of the cycle that just ended, including logging
+    def __finish_timing_cycle (self):
+        if self.__stage_timer.is_enabled():
+            self.__last_timing = self.__stage_timer.get_breakdown()
+            self.__stage_timer.log_breakdown()
+
+    # per-stage timing of the last positioning cycle, None if stage timing is off
+    def get_last_timing (self):
+        return self.__last_timing
+
     def __are_landmark_requirements_met (self, tiered_landmarks, unique_landmarks):
         if len(unique_landmarks) < self.__config['Landmarks']['Minimum']:
             return False
@@ -628,7 +716,7 @@ class PilotNavigation:
         return top_landmarks
 
 
-    def get_coords_and_heading_for_landmarks (self, combined_landmarks, allow_lidar = True, lidar_map = None, max_landmarks = None):
+    def get_coords_and_heading_for_landmarks (self, combined_landmarks, allow_lidar = True, lidar_map = None, max_landmarks = None, prior = None):
         landmarks_to_keep = max_landmarks if max_landmarks is not None else self.__max_positioning_landmarks
         if allow_lidar and lidar_map is None:
             lidar_map = self.__get_lidar_map()
@@ -643,17 +731,141 @@ class PilotNavigation:
         x, y, heading, confidence, basis = self.__position_est[[*self.__position_est.keys()][0]].get_coords_and_heading(
             located_objects=filtered_landmarks,
             view_altitude=self.get_altitude(), # on the tank, on the floor
-            lidar_map=lidar_map
+            lidar_map=lidar_map,
+            prior=prior
         )
         return x, y, heading, confidence, basis
+
+    # the last position, if it's recent and still valid, for the estimator to start from
+    def __get_position_prior (self):
+        if not self.__warm_start:
+            return None
+
+        # a tracked position is kept current through moves, and knows how far off it could be
+        if self.__tracking_enabled and self.__tracker.is_initialized():
+            x, y, heading = self.__tracker.get_pose()
+            return {
+                'x':x,
+                'y':y,
+                'heading':heading,
+                'age':time.time() - self.__tracker.get_last_update(),
+                'radius':max(3 * self.__tracker.get_position_uncertainty(), PositionEstimatorWithClustering.PRIOR_BASE_RADIUS)
+            }
+
+        if self.__moved_since_fix or self.__last_x is None or self.__last_coord_time is None:
+            return None
+
+        age = time.time() - self.__last_coord_time
+        if age > self.__warm_start_max_age:
+            return None
+
+        return {
+            'x':self.__last_x,
+            'y':self.__last_y,
+            'heading':self.__last_heading,
+            'age':age
+        }
     
     def get_last_coords_and_heading (self):
         return self.__last_x, self.__last_y, self.__last_heading, self.__last_confidence, self.__last_coord_time
-        
+
+    def is_tracking_enabled (self):
+        return self.__tracking_enabled
+
+    # the vehicle was told to rotate by the given degrees, and reported success
+    def predict_rotation (self, degrees):
+        self.invalidate_position()
+        if self.__tracking_enabled and self.__tracker.is_initialized():
+            self.__tracker.predict_rotation(degrees)
+            self.__update_last_from_tracker()
+
+    # the vehicle was told to drive forward the given distance, and reported success
+    def predict_forward (self, distance):
+        self.invalidate_position()
+        self.__moved_since_fix = True
+        if self.__tracking_enabled and self.__tracker.is_initialized():
+            self.__tracker.predict_forward(distance)
+            self.__update_last_from_tracker()
+
+    # the vehicle moved in a way that can't be predicted, the next position needs a full fix
+    def lose_tracking (self):
+        self.invalidate_position()
+        self.__moved_since_fix = True
+        self.__tracker.reset()
+
+    # returns the tracked position, without a full positioning cycle, if the track is good enough.
+    # if not, landmarks in view of the cameras where they currently point are used to correct the track.
+    # if it's still not good enough, nothing is returned and a full fix is needed
+    def get_tracked_coords_and_heading (self):
+        if not self.__tracking_enabled or not self.__tracker.is_initialized():
+            return None,None,None,None
+
+        if not self.__is_track_confident():
+            self.update_tracked_position()
+
+        if self.__is_track_confident():
+            x, y, heading = self.__tracker.get_pose()
+            logging.getLogger(__name__).info(f"=== Tracked Coords: ({x} , {y})  Heading: {heading}, Uncertainty: {self.__tracker.get_position_uncertainty()} / {self.__tracker.get_heading_uncertainty()} ===")
+            self.__update_last_from_tracker()
+            self.__vehicle.display_position(x=x, y=y, heading=heading)
+            return x, y, heading, self.__tracker.get_confidence()
+
+        logging.getLogger(__name__).info(f"Tracked position too uncertain ({self.__tracker.get_position_uncertainty()} / {self.__tracker.get_heading_uncertainty()}), full fix required")
+        return None,None,None,None
+
+    # corrects the track with whatever landmarks are in view, one at a time, rather than triangulating.
+    # only one camera is used, so this costs a fraction of a positioning cycle, which still follows if it isn't enough.
+    # returns the number of landmarks used
+    def update_tracked_position (self):
+        if not self.__tracker.is_initialized() or len(self.__enabled_cameras) == 0:
+            return 0
+
+        camera_ids = list(self.__enabled_cameras)
+        camera_id = camera_ids[self.__next_tracking_camera % len(camera_ids)]
+        self.__next_tracking_camera = (self.__next_tracking_camera + 1) % len(camera_ids)
+
+        num_used = 0
+        with self.__stage_timer.stage('locate_landmarks'):
+            landmarks = self.locate_landmarks(camera_ids = [camera_id])
+        lidar_map = self.__get_lidar_map()
+        for c in landmarks:
+            estimator = self.__position_est[c]
+            angles = estimator.extract_object_view_angles(
+                located_objects = self.__format_landmarks_for_position (located_objects = landmarks[c], camera_heading = self.__camera_headings[c]),
+                add_relative_angles = False)
+            distances = estimator.extract_distances (view_angles=angles, view_altitude=self.get_altitude(), lidar_map=lidar_map)
+            for lid in distances:
+                selected_angle = max(angles[lid], key=lambda x:x['confidence'])
+                landmark_x, landmark_y = self.__field_map.get_landmark_position(lid)
+
+                # for the cameras, 90 is the front of the vehicle
+                relative_bearing = selected_angle['image_heading'] + selected_angle['image_rel_deg'] - 90
+                self.__tracker.correct_with_bearing(landmark_x=landmark_x, landmark_y=landmark_y, relative_bearing=relative_bearing)
+                self.__tracker.correct_with_range(landmark_x=landmark_x, landmark_y=landmark_y, distance=distances[lid]['ground'], is_lidar=distances[lid]['islidar'])
+                num_used += 1
+
+        logging.getLogger(__name__).info(f"Track updated with {num_used} landmarks")
+        return num_used
+
+    def __is_track_confident (self):
+        return self.__tracker.is_confident(
+            max_position_uncertainty=self.__tracking_max_position_uncertainty,
+            max_heading_uncertainty=self.__tracking_max_heading_uncertainty)
+
+    def __update_last_from_tracker (self):
+        self.__last_x, self.__last_y, self.__last_heading = self.__tracker.get_pose()
+        self.__last_confidence = self.__tracker.get_confidence()
+        self.__last_coord_time = time.time()
+
 
     def cleanup (self):
         logging.getLogger(__name__).debug("Cleaning up resources")
         self.__camera_manager.cleanup_cameras()
+        NavigationThreadManager.stop_camera_workers(self.__worker_key)
+        if self.__frame_buffer is not None:
+            self.__frame_buffer.close()
+        for c in self.__position_est:
+            self.__position_est[c].cleanup()
 
     def __format_landmarks_for_position (self, located_objects, camera_heading):
         as_list = []
@@ -673,12 +885,21 @@ class PilotNavigation:
         del state["_PilotNavigation__camera_manager"]
         del state["_PilotNavigation__resources"]
         del state["_PilotNavigation__newest_images"]
+        # workers read frames by slot, they don't need the buffer itself
+        del state["_PilotNavigation__frame_buffer"]
+        # the vehicle owns the serial link and its reader thread, detection never touches it
+        state["_PilotNavigation__vehicle"] = None
         return state
     
-def external_locate_landmarks (pilot_nav_inst, camera_id, image_files):
-    return pilot_nav_inst.locate_landmarks_on_camera(camera_id, image_files)
+def external_load_detection_models (pilot_nav_inst):
+    pilot_nav_inst.load_detection_models()
+
+def external_locate_landmarks (pilot_nav_inst, camera_id, frames, camera_heading, altitude):
+    pilot_nav_inst.update_camera_state(camera_id, camera_heading, altitude)
+    return pilot_nav_inst.locate_landmarks_on_camera(camera_id, frames)
 
-def external_locate_objects (pilot_nav_inst, objects, images, camera_id):
+def external_locate_objects (pilot_nav_inst, objects, images, camera_id, camera_heading, altitude):
+    pilot_nav_inst.update_camera_state(camera_id, camera_heading, altitude)
     return pilot_nav_inst.locate_objects_on_camera(objects, camera_id, images)
 
 if __name__ == "__main__":
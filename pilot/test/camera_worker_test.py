@@ -0,0 +1,67 @@
+import unittest
+from pilot.navigation_thread_manager import NavigationThreadManager
+import logging
+import os
+
+# stands in for the navigator, counts how often its 'models' get loaded
+class ResidentCounter:
+    def __init__(self):
+        self.loads = 0
+        self.requests = 0
+
+def external_load (resident):
+    resident.loads += 1
+
+def external_count (resident, value):
+    resident.requests += 1
+    return {'loads':resident.loads, 'requests':resident.requests, 'value':value, 'pid':os.getpid()}
+
+def external_fail (resident, value):
+    raise Exception("detection failed")
+
+def external_exit (resident, value):
+    os._exit(1)
+
+class TestCameraWorker(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        NavigationThreadManager.stop_camera_workers('test')
+        return super().tearDown()
+
+    def test_workers_persist (self):
+        resident = ResidentCounter()
+        first = NavigationThreadManager.run_on_camera_workers('test', resident, {'Left':(external_count, (1,)), 'Right':(external_count, (2,))}, on_start=external_load)
+        second = NavigationThreadManager.run_on_camera_workers('test', resident, {'Left':(external_count, (3,)), 'Right':(external_count, (4,))}, on_start=external_load)
+
+        self.assertEqual(3, second['Left']['value'])
+        self.assertEqual(4, second['Right']['value'])
+        for c in ['Left', 'Right']:
+            # same process, models loaded once, and the worker's copy kept its state
+            self.assertEqual(first[c]['pid'], second[c]['pid'])
+            self.assertEqual(1, second[c]['loads'])
+            self.assertEqual(2, second[c]['requests'])
+        self.assertNotEqual(second['Left']['pid'], second['Right']['pid'])
+        self.assertNotEqual(os.getpid(), second['Left']['pid'])
+
+        # the local copy is untouched
+        self.assertEqual(0, resident.loads)
+
+    def test_failures (self):
+        resident = ResidentCounter()
+
+        # a failed request gives an empty result, the worker keeps going
+        results = NavigationThreadManager.run_on_camera_workers('test', resident, {'Left':(external_fail, (1,)), 'Right':(external_count, (2,))})
+        self.assertEqual({}, results['Left'])
+        self.assertEqual(2, results['Right']['value'])
+
+        # a worker that dies is left out, and restarted next time
+        results = NavigationThreadManager.run_on_camera_workers('test', resident, {'Left':(external_exit, (1,)), 'Right':(external_count, (2,))}, timeout=5.0)
+        self.assertEqual(['Right'], list(results.keys()))
+        results = NavigationThreadManager.run_on_camera_workers('test', resident, {'Left':(external_count, (3,))})
+        self.assertEqual(1, results['Left']['requests'])
+
+if __name__ == '__main__':
+    unittest.main()
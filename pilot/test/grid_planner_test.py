@@ -0,0 +1,142 @@
+import unittest
+from pilot.grid_planner import GridPlanner
+from pilot.path_finder import PathFinder
+from lidar.lidar_map import LidarMap
+from field.field_map import FieldMap
+import logging
+import numpy as np
+import weakref
+import gc
+
+class TestGridPlanner(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_inflated_map (self):
+        planner = GridPlanner(field_map=self.__get_field_map_with_wall(), lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0)
+        self.assertTrue(planner.is_available())
+
+        # within half the vehicle length of the wall or the boundary
+        self.assertTrue(planner.is_blocked(40.0, 85.0))
+        self.assertTrue(planner.is_blocked(40.0, 95.0))
+        self.assertTrue(planner.is_blocked(195.0, 40.0))
+        self.assertFalse(planner.is_blocked(40.0, 40.0))
+        self.assertFalse(planner.is_blocked(185.0, 95.0))
+
+    def test_path_around_wall (self):
+        field_map = self.__get_field_map_with_wall()
+        path_finder = PathFinder(field_map=field_map, vehicle_width=10.0, vehicle_length=20.0)
+
+        # the only way through is the gap at the far east end of the wall, too far for two legs
+        paths = path_finder.find_potential_paths(start_x=40.0, start_y=40.0, end_x=40.0, end_y=160.0, lidar_map=None, current_heading=0.0)
+        logging.getLogger(__name__).info(f"Paths: {paths}")
+
+        self.assertEqual(1, len(paths))
+        self.assertGreater(len(paths[0]), 2)
+        self.__assert_path_clear(field_map, 40.0, 40.0, 40.0, 160.0, paths[0])
+
+    def test_path_around_lidar (self):
+        field_map = self.__get_field_map_with_wall()
+        planner = GridPlanner(field_map=field_map, lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0)
+
+        # facing east, something 30 ahead, 40 wide
+        lidar = self.__get_lidar_map_with_wall(30.0, 20.0)
+        legs = planner.find_path(start_x=40.0, start_y=40.0, end_x=120.0, end_y=40.0, lidar_map=lidar, current_heading=90.0)
+        logging.getLogger(__name__).info(f"Legs: {legs}")
+
+        self.assertGreater(len(legs), 1)
+        self.__assert_path_clear(field_map, 40.0, 40.0, 120.0, 40.0, legs)
+        self.assertTrue(planner.is_blocked(70.0, 40.0))
+        for heading, dist, x, y in legs:
+            self.assertFalse(planner.is_blocked(x, y))
+
+        # same scan again, nothing new to add
+        self.assertEqual(0, planner.add_lidar(lidar, 40.0, 40.0, 90.0))
+
+        # lidar isn't part of the shared map layer
+        self.assertFalse(GridPlanner(field_map=field_map, lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0).is_blocked(70.0, 40.0))
+        planner.clear_lidar()
+        self.assertFalse(planner.is_blocked(70.0, 40.0))
+
+        # each search only uses the scan it is given
+        planner.find_path(start_x=40.0, start_y=40.0, end_x=120.0, end_y=40.0, lidar_map=lidar, current_heading=90.0)
+        self.assertTrue(planner.is_blocked(70.0, 40.0))
+        self.assertEqual(1, len(planner.find_path(start_x=40.0, start_y=40.0, end_x=120.0, end_y=40.0)))
+        self.assertFalse(planner.is_blocked(70.0, 40.0))
+
+    def test_path_finder_lidar_scale (self):
+        # the path finder's planner takes the scan in mm, so the wall lands 30 ahead, not 30 * 25.4
+        path_finder = PathFinder(field_map=self.__get_field_map_with_wall(), vehicle_width=10.0, vehicle_length=20.0)
+        planner = path_finder.get_grid_planner()
+        planner.find_path(start_x=40.0, start_y=40.0, end_x=120.0, end_y=40.0, lidar_map=self.__get_lidar_map_with_wall(30.0, 20.0), current_heading=90.0)
+        self.assertTrue(planner.is_blocked(70.0, 40.0))
+        self.assertFalse(planner.is_blocked(40.0, 40.0))
+
+    def test_static_layer_released (self):
+        field_map = self.__get_field_map_with_wall()
+        map_ref = weakref.ref(field_map)
+        planner = GridPlanner(field_map=field_map, lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0)
+        self.assertTrue(planner.is_blocked(40.0, 85.0))
+
+        # the shared layer doesn't keep the map alive once its planners are gone
+        del planner, field_map
+        gc.collect()
+        self.assertIsNone(map_ref())
+
+    def test_no_path (self):
+        # wall all the way across
+        field_map = FieldMap({}, boundaries={'xmin':0, 'ymin':0, 'xmax':200, 'ymax':200}, obstacles={'wall':{'xmin':0, 'ymin':90, 'xmax':200, 'ymax':100}})
+        planner = GridPlanner(field_map=field_map, lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0)
+        self.assertEqual([], planner.find_path(start_x=40.0, start_y=40.0, end_x=40.0, end_y=160.0))
+
+        # ending on an obstacle
+        self.assertEqual([], planner.find_path(start_x=40.0, start_y=40.0, end_x=40.0, end_y=95.0))
+
+    def test_start_near_obstacle (self):
+        field_map = self.__get_field_map_with_wall()
+        planner = GridPlanner(field_map=field_map, lidar_scale=LidarMap.MM_PER_MAP_UNIT, vehicle_width=10.0, vehicle_length=20.0)
+
+        # too close to the wall for the vehicle to fit, but it has to be able to get away
+        self.assertTrue(planner.is_blocked(40.0, 84.0))
+        legs = planner.find_path(start_x=40.0, start_y=84.0, end_x=40.0, end_y=40.0)
+        self.assertGreater(len(legs), 0)
+        self.assertAlmostEqual(legs[-1][2], 40.0)
+        self.assertAlmostEqual(legs[-1][3], 40.0)
+
+    def __assert_path_clear (self, field_map, start_x, start_y, end_x, end_y, legs):
+        x, y = start_x, start_y
+        for heading, dist, leg_x, leg_y in legs:
+            self.assertAlmostEqual(leg_x, x + dist * np.sin(np.radians(heading)), 3)
+            self.assertAlmostEqual(leg_y, y + dist * np.cos(np.radians(heading)), 3)
+            self.assertTrue(field_map.is_in_bounds(leg_x, leg_y))
+            self.assertFalse(field_map.is_path_blocked(x, y, leg_x, leg_y)[0])
+            x, y = leg_x, leg_y
+
+        self.assertAlmostEqual(x, end_x)
+        self.assertAlmostEqual(y, end_y)
+
+    # a wall across the middle of the map, with a gap at the east end
+    def __get_field_map_with_wall (self):
+        return FieldMap({},
+            boundaries={'xmin':0, 'ymin':0, 'xmax':200, 'ymax':200},
+            obstacles={
+                'wall':{'xmin':0, 'ymin':90, 'xmax':170, 'ymax':100}
+            }
+        )
+
+    # returns a lidar map with hits along a straight wall the given distance ahead, out to the given half width.
+    # distances are in map units, the measurements are in mm like the vehicle sends them
+    def __get_lidar_map_with_wall (self, distance, half_width):
+        s_map = []
+        for degree in np.arange(0.0, 360.1, 0.5):
+            beside = distance * np.tan(np.radians(degree))
+            if (degree < 90.0 or degree > 270.0) and abs(beside) <= half_width:
+                s_map.append(f"{distance * LidarMap.MM_PER_MAP_UNIT / np.cos(np.radians(degree))}")
+            else:
+                s_map.append("-1.0")
+
+        return LidarMap(0, 0.5, '|'.join(s_map))
+
+if __name__ == '__main__':
+    unittest.main()
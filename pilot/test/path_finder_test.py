@@ -154,6 +154,52 @@ class TestPathFinder(unittest.TestCase):
         self.assertEqual(2, len(paths[0]))
         self.assertEqual(2, len(paths[1]))
 
+    def test_clearances (self):
+        # a single post 40 ahead, the scan has it at 1016 mm
+        lidar = self.__get_lidar_map_with_paths_blocked([0.0], [40.0])
+        self.assertAlmostEqual(40.0 * LidarMap.MM_PER_MAP_UNIT, lidar.get_measurement(0.0, 0.1))
+        path_finder = PathFinder(vehicle_width=10.0)
+
+        clearances = path_finder.get_clearances(np.array([0.0, 5.0, 10.0, 90.0, 355.0, 180.0]), lidar)
+        self.assertAlmostEqual(clearances[0], 40.0)
+
+        # 5 degrees off, the post is 3.5 to the side, still within half the vehicle width
+        self.assertAlmostEqual(clearances[1], 40.0 * np.cos(np.radians(5.0)))
+        self.assertAlmostEqual(clearances[4], clearances[1])
+
+        # 10 degrees off, it's 6.9 to the side, so the vehicle clears it
+        self.assertEqual(clearances[2], np.inf)
+        self.assertEqual(clearances[3], np.inf)
+
+        # behind the vehicle doesnt count
+        self.assertEqual(clearances[5], np.inf)
+
+        self.assertFalse(path_finder.is_path_clear_including_vehicle_width(desired_heading=90.0, distance=50.0, lidar_map=lidar, current_heading=90.0))
+        self.assertTrue(path_finder.is_path_clear_including_vehicle_width(desired_heading=90.0, distance=30.0, lidar_map=lidar, current_heading=90.0))
+        self.assertTrue(path_finder.is_path_clear_including_vehicle_width(desired_heading=80.0, distance=50.0, lidar_map=lidar, current_heading=90.0))
+
+    # detours around an obstacle seen by lidar should not clip it
+    def test_find_paths_clear_of_lidar_block (self):
+        blocked_angles = [360.0-45.0, 360.0-45.5,360.0-44.5]
+        blocked_distances = [20.0,20.0,20.0]
+        lidar = self.__get_lidar_map_with_paths_blocked(blocked_angles, blocked_distances)
+
+        path_finder = PathFinder(vehicle_width=13.0)
+        paths = path_finder.find_potential_paths(
+            start_x=0, start_y=0,
+            end_x=50.0, end_y=50.0,
+            lidar_map=lidar,
+            current_heading=90.0
+        )
+
+        self.assertEqual(2, len(paths))
+        for path in paths:
+            heading, dist, x, y = path[0]
+            self.assertTrue(path_finder.is_path_clear_including_vehicle_width(desired_heading=heading, distance=dist, lidar_map=lidar, current_heading=90.0))
+
+            # the block is at 45 degrees, 20 out. the first leg has to pass it by more than half the vehicle width
+            self.assertGreater(abs(20.0 * np.sin(np.radians(heading - 45.0))), 6.5)
+
     # find potential paths with field map boundaries and obstacles taken into account
     def test_find_paths_map_obstacles(self):
         # wants to go 0,0 - 50,50, so put a block near 25,25 and see how it goes around
@@ -184,7 +230,8 @@ class TestPathFinder(unittest.TestCase):
 
     # find potential paths with boundaries taken into account
 
-    # returns a lidar map that is wide open except for the given blockages, which must be in .5 increments
+    # returns a lidar map that is wide open except for the given blockages, which must be in .5 increments.
+    # distances are in map units, the measurements are in mm like the vehicle sends them
     def __get_lidar_map_with_paths_blocked (self, headings : list, distances : list):
         s_map = ''
         for degree in np.arange(0.0,360.1,0.5):
@@ -192,7 +239,7 @@ class TestPathFinder(unittest.TestCase):
                 s_map = s_map + '|'
             
             if degree in headings:
-                s_map = s_map + f"{distances[headings.index(degree)]}"
+                s_map = s_map + f"{distances[headings.index(degree)] * LidarMap.MM_PER_MAP_UNIT}"
                 logging.getLogger(__name__).info(f"Adding block of {distances[headings.index(degree)]} @ {degree} deg")
             else:
                 s_map = s_map + "-1.0"
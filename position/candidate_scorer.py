@@ -0,0 +1,135 @@
+from field.field_map import FieldMap
+from visual.visual_degrees import VisualDegreesCalculator
+import numpy as np
+import logging
+
+# Scores many candidate coordinates at once against the same view angles.
+# This is the array version of PositionEstimator.is_possible / get_possible_headings,
+# candidates are given as an (N,2) array of x,y
+class CandidateScorer:
+    def __init__(self, field_map : FieldMap, visual_degrees_calc : VisualDegreesCalculator, view_width, base_front = 90.0):
+        self.__field_map = field_map
+        self.__visual_degrees_calc = visual_degrees_calc
+        self.__view_width = view_width
+        self.__base_front = base_front
+
+    # builds the per-landmark and per-pair arrays needed for scoring. these depend only on the view angles,
+    # so the same table can be reused for every candidate of a fix
+    def build_view_table (self, view_angles):
+        # only landmarks on the map can be scored
+        landmark_ids = [l for l in view_angles if self.__field_map.is_landmark_known(l)]
+        landmark_positions = []
+        landmark_rel_facing = []
+        for landmark_id in landmark_ids:
+            selected_angle = max(view_angles[landmark_id], key=lambda x:x['confidence'])
+            landmark_positions.append(self.__field_map.get_landmark_position(landmark_id))
+
+            # how many degrees, relative to vehicle facing, the landmark was seen
+            img_pixels_off_center = selected_angle['center_x'] - (self.__view_width / 2.0)
+            image_relative_deg = self.__visual_degrees_calc.caclulate_horizontal_visual_degrees_given_width_pixels(img_pixels_off_center)
+            landmark_rel_facing.append(selected_angle['image_heading'] - self.__base_front + image_relative_deg)
+
+        # each unordered pair once, seen from whichever landmark came first
+        pair_base = []
+        pair_point = []
+        pair_visible = []
+        processed_pairs = []
+        for base_index, base_landmark_id in enumerate(landmark_ids):
+            base_landmark = max(view_angles[base_landmark_id], key=lambda x:x['confidence'])
+            for landmark_id in view_angles[base_landmark_id][0]['relative_deg']:
+                if landmark_id in landmark_ids and f"{base_landmark_id}|{landmark_id}" not in processed_pairs:
+                    processed_pairs.append(f"{base_landmark_id}|{landmark_id}")
+                    processed_pairs.append(f"{landmark_id}|{base_landmark_id}")
+                    pair_base.append(base_index)
+                    pair_point.append(landmark_ids.index(landmark_id))
+                    pair_visible.append(base_landmark['relative_deg'][landmark_id])
+
+        landmark_positions = np.array(landmark_positions, dtype=float).reshape(-1, 2)
+        pair_base = np.array(pair_base, dtype=int)
+        pair_point = np.array(pair_point, dtype=int)
+
+        return {
+            'landmark_ids':landmark_ids,
+            'landmark_positions':landmark_positions,
+            'landmark_rel_facing':np.array(landmark_rel_facing, dtype=float),
+            'pair_base':pair_base,
+            'pair_point':pair_point,
+            'pair_far_side':np.hypot(
+                landmark_positions[pair_base, 0] - landmark_positions[pair_point, 0],
+                landmark_positions[pair_base, 1] - landmark_positions[pair_point, 1]),
+            'pair_visible':np.abs(np.array(pair_visible, dtype=float))
+        }
+
+    # returns an (N, num landmarks) array of the heading implied by each landmark, for each candidate
+    def get_possible_headings (self, candidates, view_table):
+        candidates = np.asarray(candidates, dtype=float).reshape(-1, 2)
+        pos_x = candidates[:, 0:1]
+        pos_y = candidates[:, 1:2]
+        landmark_x = view_table['landmark_positions'][:, 0][np.newaxis, :]
+        landmark_y = view_table['landmark_positions'][:, 1][np.newaxis, :]
+        visual_angle = view_table['landmark_rel_facing'][np.newaxis, :]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # relative north, same as VisualDegreesCalculator.calculate_relative_north
+            angled_side = np.hypot(pos_x - landmark_x, pos_y - landmark_y)
+            vertical_side = np.abs(pos_y - landmark_y)
+            north_deg_diff = np.degrees(np.arcsin(vertical_side / angled_side))
+
+        relative_north = np.where(pos_y > landmark_y, north_deg_diff + 90, np.where(pos_y < landmark_y, 90 - north_deg_diff, 0.0))
+        relative_north = np.where((pos_y != landmark_y) & (pos_x < landmark_x), -1 * relative_north, relative_north)
+
+        # rotate the long way around north if the short way overshoots
+        swapped = relative_north + visual_angle > 180
+        swapped_north = 360 - np.abs(relative_north)
+        swapped_north = np.where(relative_north > 0, -1 * swapped_north, swapped_north)
+        visible_heading = visual_angle + np.where(swapped, swapped_north, relative_north)
+
+        # the sign is decided from the shortest relative north, as in PositionEstimator.__is_heading_negative
+        landmark_on_left = (pos_x > landmark_x) & (
+            ((visual_angle > 0) & (relative_north + visual_angle < 180)) |
+            ((visual_angle < 0) & (np.abs(visual_angle) < relative_north)))
+        landmark_on_right = (pos_x < landmark_x) & (
+            ((visual_angle > 0) & (visual_angle > np.abs(relative_north))) |
+            ((visual_angle < 0) & (visual_angle + relative_north < -180)))
+
+        return np.where(landmark_on_left | landmark_on_right, -1 * np.abs(visible_heading), np.abs(visible_heading))
+
+    # returns the angle variance and heading spread for every candidate.
+    # candidates that lead to an impossible triangle get an infinite angle variance
+    def score_candidates (self, candidates, view_angles = None, view_table = None):
+        if view_table is None:
+            view_table = self.build_view_table(view_angles)
+        candidates = np.asarray(candidates, dtype=float).reshape(-1, 2)
+
+        pair_base = view_table['pair_base']
+        pair_point = view_table['pair_point']
+        positions = view_table['landmark_positions']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # expected far angle between each pair, from each candidate
+            base_side = np.hypot(candidates[:, 0:1] - positions[pair_base, 0][np.newaxis, :], candidates[:, 1:2] - positions[pair_base, 1][np.newaxis, :])
+            top_side = np.hypot(candidates[:, 0:1] - positions[pair_point, 0][np.newaxis, :], candidates[:, 1:2] - positions[pair_point, 1][np.newaxis, :])
+            far_side = view_table['pair_far_side'][np.newaxis, :]
+            expected_angle = np.abs(np.degrees(np.arccos((top_side ** 2 + base_side ** 2 - far_side ** 2) / (2 * top_side * base_side))))
+
+            total_degrees = np.sum(expected_angle, axis=1)
+            degrees_diff = np.sum(np.abs(expected_angle - view_table['pair_visible'][np.newaxis, :]), axis=1)
+            angle_variance = degrees_diff / total_degrees
+
+        invalid = np.any(np.isnan(expected_angle), axis=1) | ~(total_degrees > 0)
+        angle_variance = np.where(invalid, np.inf, angle_variance)
+
+        heading_spread = np.zeros(len(candidates))
+        if len(view_table['landmark_ids']) > 1:
+            headings = self.get_possible_headings(candidates, view_table)
+            heading_spread = np.max(np.abs(headings - np.mean(headings, axis=1, keepdims=True)), axis=1) / 360.0
+
+        return angle_variance, heading_spread
+
+    # boolean mask of the candidates that pass the same checks as PositionEstimator.is_possible.
+    # give the view table if there is one, it is only built from the view angles if not
+    def get_possible_mask (self, candidates, view_angles = None, allowed_variance = 0.2, allowed_heading_variance = 0.3, view_table = None):
+        angle_variance, heading_spread = self.score_candidates(candidates, view_angles=view_angles, view_table=view_table)
+        possible = (angle_variance <= allowed_variance) & (heading_spread <= allowed_heading_variance)
+        logging.getLogger(__name__).debug(f"{np.count_nonzero(possible)} of {len(possible)} candidates are possible")
+        return possible
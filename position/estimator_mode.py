@@ -1,4 +1,6 @@
 class EstimatorMode:
     FAST = 'Fast'
     PRECISE = 'Precise'
-    VERY_PRECISE = 'Very Precise'
\ No newline at end of file
+    VERY_PRECISE = 'Very Precise'
+    CLOSED_FORM = 'Closed Form'
+    GRID = 'Grid'
\ No newline at end of file
@@ -0,0 +1,100 @@
+from field.field_map import FieldMap
+from position.candidate_scorer import CandidateScorer
+import numpy as np
+import logging
+
+# Finds possible coordinates by scoring a grid of field positions against every observed landmark at once,
+# rather than triangulating pairs of landmarks. A coarse grid covering the map is scored first,
+# then a finer grid around the best coarse cells.
+class GridLocalizer:
+    def __init__(self, field_map : FieldMap, candidate_scorer : CandidateScorer, coarse_step = 6.0, fine_step = 1.0, refine_cells = 5, max_coordinates = 10, distance_weight = 0.5, heading_weight = 4.0):
+        self.__field_map = field_map
+        self.__candidate_scorer = candidate_scorer
+        self.__coarse_step = coarse_step
+        self.__fine_step = fine_step
+        self.__refine_cells = refine_cells
+        self.__max_coordinates = max_coordinates
+        self.__distance_weight = distance_weight
+        self.__heading_weight = heading_weight
+
+        # built the first time it is needed, then reused for every fix
+        self.__coarse_grid = None
+
+    def __get_open_positions (self, positions):
+        # same filtering the pairwise search uses, near bounds and not inside an obstacle
+        if len(positions) == 0:
+            return positions
+        blocked, _ = self.__field_map.are_blocked(positions[:, 0], positions[:, 1])
+        keep = np.array([self.__field_map.is_near_bounds(x, y) for x, y in positions], dtype=bool) & ~blocked
+        return positions[keep]
+
+    def __get_coarse_grid (self):
+        if self.__coarse_grid is None:
+            xmin, ymin, xmax, ymax = self.__field_map.get_near_boundaries()
+            if xmin is None:
+                logging.getLogger(__name__).warning("Grid localization requires map boundaries")
+                self.__coarse_grid = np.zeros((0, 2))
+            else:
+                grid_x, grid_y = np.meshgrid(np.arange(xmin, xmax + self.__coarse_step, self.__coarse_step), np.arange(ymin, ymax + self.__coarse_step, self.__coarse_step))
+                self.__coarse_grid = self.__get_open_positions(np.column_stack([grid_x.ravel(), grid_y.ravel()]))
+                logging.getLogger(__name__).info(f"Grid localization will search {len(self.__coarse_grid)} coarse positions")
+
+        return self.__coarse_grid
+
+    # combined residual for every candidate. lower is better
+    def __score (self, candidates, view_table, distances):
+        angle_variance, heading_spread = self.__candidate_scorer.score_candidates(candidates, view_table=view_table)
+
+        # relative distance residual, lidar measurements count twice as much as visual estimates
+        distance_residual = np.zeros(len(candidates))
+        measured = [l for l in distances if self.__field_map.is_landmark_known(l)]
+        if len(measured) > 0:
+            positions = np.array([self.__field_map.get_landmark_position(l) for l in measured], dtype=float)
+            observed = np.array([distances[l]['ground'] for l in measured], dtype=float)
+            weights = np.array([2.0 if distances[l]['islidar'] else 1.0 for l in measured])
+            expected = np.hypot(candidates[:, 0:1] - positions[:, 0][np.newaxis, :], candidates[:, 1:2] - positions[:, 1][np.newaxis, :])
+            distance_residual = np.sum(weights * np.abs(expected - observed) / observed, axis=1) / np.sum(weights)
+
+        cost = angle_variance + (self.__distance_weight * distance_residual) + (self.__heading_weight * heading_spread)
+        return np.where(np.isnan(cost), np.inf, cost), angle_variance, heading_spread
+
+    # near, if given, is (x, y, radius). only that part of the grid is searched, unless nothing there is possible
+    def find_possible_coordinates (self, view_angles, distances, allowed_variance = 0.3, allowed_heading_variance = 0.1, near = None):
+        coarse = self.__get_coarse_grid()
+        view_table = self.__candidate_scorer.build_view_table(view_angles)
+        if len(coarse) == 0 or len(view_table['pair_base']) == 0:
+            return []
+
+        if near is not None:
+            near_x, near_y, near_radius = near
+            near_coarse = coarse[np.hypot(coarse[:, 0] - near_x, coarse[:, 1] - near_y) <= near_radius]
+            if len(near_coarse) > 0:
+                found = self.__find_in_grid(near_coarse, view_table, distances, allowed_variance, allowed_heading_variance)
+                if len(found) > 0:
+                    return found
+            logging.getLogger(__name__).info(f"No coordinates found near ({near_x}, {near_y}), searching the whole grid")
+
+        return self.__find_in_grid(coarse, view_table, distances, allowed_variance, allowed_heading_variance)
+
+    def __find_in_grid (self, coarse, view_table, distances, allowed_variance, allowed_heading_variance):
+        coarse_cost, _, _ = self.__score(coarse, view_table, distances)
+        best_cells = np.argsort(coarse_cost)[0:self.__refine_cells]
+        best_cells = coarse[best_cells[np.isfinite(coarse_cost[best_cells])]]
+        if len(best_cells) == 0:
+            return []
+
+        # fine grid around each of the best coarse cells
+        offsets = np.arange(-self.__coarse_step, self.__coarse_step + self.__fine_step, self.__fine_step)
+        offset_x, offset_y = np.meshgrid(offsets, offsets)
+        offsets = np.column_stack([offset_x.ravel(), offset_y.ravel()])
+        fine = np.unique(np.round((best_cells[:, np.newaxis, :] + offsets[np.newaxis, :, :]).reshape(-1, 2), 3), axis=0)
+        fine = self.__get_open_positions(fine)
+        if len(fine) == 0:
+            return []
+
+        fine_cost, angle_variance, heading_spread = self.__score(fine, view_table, distances)
+        ranked = np.argsort(fine_cost)[0:self.__max_coordinates]
+
+        # only report positions that would also pass the pairwise filter
+        possible = (angle_variance[ranked] <= allowed_variance) & (heading_spread[ranked] <= allowed_heading_variance)
+        return [(float(x), float(y)) for x, y in fine[ranked][possible]]
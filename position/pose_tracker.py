@@ -0,0 +1,168 @@
+import numpy as np
+import math
+import logging
+
+# Tracks the vehicle pose between full position fixes, using an extended kalman filter.
+# The state is x, y, heading (degrees, 0 is north, positive is clockwise, same as the path finder).
+# Commanded rotations and forward drives move the prediction and grow its uncertainty,
+# single landmark bearings, ranges (lidar or visual), and full fixes pull it back in.
+class PoseTracker:
+    def __init__(self, rotation_noise_pct = 0.1, rotation_noise_deg = 1.0, distance_noise_pct = 0.1, heading_drift_per_unit = 0.05, bearing_std_deg = 2.0, lidar_range_std = 1.5, visual_range_std_pct = 0.15, max_fix_distance = 11.3):
+        self.__rotation_noise_pct = rotation_noise_pct # how far off a commanded rotation can be, as pct of the rotation
+        self.__rotation_noise_deg = rotation_noise_deg # fixed error added to every rotation
+        self.__distance_noise_pct = distance_noise_pct # how far off a commanded drive can be, as pct of the distance
+        self.__heading_drift_per_unit = heading_drift_per_unit # degrees the heading can wander per unit driven
+        self.__bearing_std = bearing_std_deg
+        self.__lidar_range_std = lidar_range_std
+        self.__visual_range_std_pct = visual_range_std_pct
+
+        # squared mahalanobis distance past which a full fix replaces the track instead of being blended in.
+        # 11.3 is the 99% cutoff for 3 degrees of freedom
+        self.__max_fix_distance = max_fix_distance
+
+        self.__state = None
+        self.__covariance = None
+        self.__confidence = None
+        self.__last_update = None
+
+    def is_initialized (self):
+        return self.__state is not None
+
+    # forgets the current pose, the next full fix will start tracking again
+    def reset (self):
+        self.__state = None
+        self.__covariance = None
+        self.__confidence = None
+        self.__last_update = None
+
+    def get_pose (self):
+        if self.__state is None:
+            return None, None, None
+        return float(self.__state[0]), float(self.__state[1]), float(self.__state[2])
+
+    # confidence of the full fix the track is based on
+    def get_confidence (self):
+        return self.__confidence
+
+    def get_last_update (self):
+        return self.__last_update
+
+    # one standard deviation, in map units, along the worst direction
+    def get_position_uncertainty (self):
+        if self.__covariance is None:
+            return None
+        return float(math.sqrt(max(np.linalg.eigvalsh(self.__covariance[0:2,0:2]))))
+
+    # one standard deviation, in degrees
+    def get_heading_uncertainty (self):
+        if self.__covariance is None:
+            return None
+        return float(math.sqrt(self.__covariance[2,2]))
+
+    def is_confident (self, max_position_uncertainty, max_heading_uncertainty):
+        if self.__state is None:
+            return False
+        return self.get_position_uncertainty() <= max_position_uncertainty and self.get_heading_uncertainty() <= max_heading_uncertainty
+
+    # a full fix from the position estimator. the less confident the fix, the less it moves the track
+    def correct_with_fix (self, x, y, heading, confidence, timestamp):
+        position_std, heading_std = self.__get_fix_std(confidence)
+        measurement_noise = np.diag([position_std ** 2, position_std ** 2, heading_std ** 2])
+
+        innovation = None
+        if self.__state is not None:
+            innovation = np.array([x, y, heading], dtype=float) - self.__state
+            innovation[2] = self.__rescale_heading(innovation[2])
+            fix_distance = innovation @ np.linalg.inv(self.__covariance + measurement_noise) @ innovation
+            if fix_distance > self.__max_fix_distance:
+                # the fix disagrees with where we think we are, more than either could be off. trust the fix
+                logging.getLogger(__name__).info(f"Fix ({x}, {y}, {heading}) is too far from track {self.get_pose()}, restarting track")
+                innovation = None
+
+        if innovation is None:
+            self.__state = np.array([x, y, self.__rescale_heading(heading)], dtype=float)
+            self.__covariance = measurement_noise
+        else:
+            self.__update(innovation, np.identity(3), measurement_noise)
+
+        self.__confidence = confidence
+        self.__last_update = timestamp
+        logging.getLogger(__name__).debug(f"Track corrected with fix ({x}, {y}, {heading}), now {self.get_pose()} +/- {self.get_position_uncertainty()}")
+
+    # rotation in degrees, positive is clockwise
+    def predict_rotation (self, degrees):
+        if self.__state is None:
+            return
+        self.__state[2] = self.__rescale_heading(self.__state[2] + degrees)
+        self.__covariance[2,2] += (abs(degrees) * self.__rotation_noise_pct + self.__rotation_noise_deg) ** 2
+
+    # drive straight ahead along the current heading
+    def predict_forward (self, distance):
+        if self.__state is None:
+            return
+        heading_rad = math.radians(self.__state[2])
+        self.__state[0] += distance * math.sin(heading_rad)
+        self.__state[1] += distance * math.cos(heading_rad)
+
+        # heading error turns into sideways error the further we go
+        jacobian = np.identity(3)
+        jacobian[0,2] = distance * math.cos(heading_rad) * math.pi / 180.0
+        jacobian[1,2] = -1 * distance * math.sin(heading_rad) * math.pi / 180.0
+
+        # the distance error is along the direction of travel
+        along = np.array([math.sin(heading_rad), math.cos(heading_rad)])
+        process_noise = np.zeros((3,3))
+        process_noise[0:2,0:2] = np.outer(along, along) * (abs(distance) * self.__distance_noise_pct) ** 2
+        process_noise[2,2] = (abs(distance) * self.__heading_drift_per_unit) ** 2
+
+        self.__covariance = jacobian @ self.__covariance @ jacobian.T + process_noise
+
+    # a landmark seen at the given vehicle-relative bearing (degrees, 0 is straight ahead, positive is right)
+    def correct_with_bearing (self, landmark_x, landmark_y, relative_bearing, bearing_std = None):
+        if self.__state is None:
+            return
+        bearing_std = bearing_std if bearing_std is not None else self.__bearing_std
+        x_diff = landmark_x - self.__state[0]
+        y_diff = landmark_y - self.__state[1]
+        dist_sq = x_diff ** 2 + y_diff ** 2
+        if dist_sq == 0:
+            return
+
+        expected = math.degrees(math.atan2(x_diff, y_diff)) - self.__state[2]
+        innovation = np.array([self.__rescale_heading(relative_bearing - expected)])
+        observation = np.array([[
+            -1 * y_diff / dist_sq * 180.0 / math.pi,
+            x_diff / dist_sq * 180.0 / math.pi,
+            -1.0]])
+        self.__update(innovation, observation, np.array([[bearing_std ** 2]]))
+
+    # a measured ground distance to a landmark
+    def correct_with_range (self, landmark_x, landmark_y, distance, is_lidar = False):
+        if self.__state is None:
+            return
+        range_std = self.__lidar_range_std if is_lidar else max(distance * self.__visual_range_std_pct, self.__lidar_range_std)
+        x_diff = landmark_x - self.__state[0]
+        y_diff = landmark_y - self.__state[1]
+        expected = math.sqrt(x_diff ** 2 + y_diff ** 2)
+        if expected == 0:
+            return
+
+        innovation = np.array([distance - expected])
+        observation = np.array([[-1 * x_diff / expected, -1 * y_diff / expected, 0.0]])
+        self.__update(innovation, observation, np.array([[range_std ** 2]]))
+
+    def __update (self, innovation, observation, measurement_noise):
+        innovation_cov = observation @ self.__covariance @ observation.T + measurement_noise
+        gain = self.__covariance @ observation.T @ np.linalg.inv(innovation_cov)
+        self.__state = self.__state + gain @ innovation
+        self.__state[2] = self.__rescale_heading(self.__state[2])
+        self.__covariance = (np.identity(3) - gain @ observation) @ self.__covariance
+
+    # standard deviations assumed for a fix with the given confidence
+    def __get_fix_std (self, confidence):
+        confidence = confidence if confidence is not None else 0.5
+        return (1 - confidence) * 20 + 1, (1 - confidence) * 30 + 1
+
+    def __rescale_heading (self, heading):
+        heading = ((heading + 180.0) % 360.0) - 180.0
+        return 180.0 if heading == -180.0 else heading
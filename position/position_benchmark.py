@@ -0,0 +1,181 @@
+from field.field_map_persistence import FieldMapPersistence
+from lidar.lidar_map import LidarMap
+from position.position_estimator import PositionEstimator
+from position.position_estimator_with_clustering import PositionEstimatorWithClustering
+from position.position_thread_manager import PositionThreadManager
+from position.estimator_mode import EstimatorMode
+import numpy as np
+import platform
+import random
+import time
+import math
+import json
+import os
+import logging
+
+# Replays recorded observations (located objects, optional lidar, and the map they were taken on)
+# through the position estimators, so changes to the positioning math can be compared run to run.
+# Each fixture is a json file with the ground truth position the observations were taken from.
+class PositionBenchmark:
+    ALL_ESTIMATORS = {
+        'PositionEstimator' : PositionEstimator,
+        'PositionEstimatorWithClustering' : PositionEstimatorWithClustering
+    }
+    ALL_MODES = [EstimatorMode.FAST, EstimatorMode.PRECISE, EstimatorMode.VERY_PRECISE, EstimatorMode.CLOSED_FORM, EstimatorMode.GRID]
+
+    def __init__(self, fixture_dir = 'position/test/resources/benchmark', estimators = None, modes = None, multithreading = (False, True), repetitions = 3, warmup = 1, seed = 42):
+        self.__fixture_dir = fixture_dir
+        self.__estimators = estimators if estimators is not None else list(PositionBenchmark.ALL_ESTIMATORS.keys())
+        self.__modes = modes if modes is not None else PositionBenchmark.ALL_MODES
+        self.__multithreading = multithreading
+        self.__repetitions = repetitions
+        self.__warmup = warmup
+        self.__seed = seed
+        self.__fixtures = None
+
+    def get_fixtures (self):
+        if self.__fixtures is None:
+            self.__fixtures = []
+            for f in sorted(os.listdir(self.__fixture_dir)):
+                if f.endswith('.json'):
+                    with open(os.path.join(self.__fixture_dir, f), 'r') as fixture_file:
+                        self.__fixtures.append(json.loads(fixture_file.read()))
+            logging.getLogger(__name__).info(f"Loaded {len(self.__fixtures)} benchmark fixtures from {self.__fixture_dir}")
+
+        return self.__fixtures
+
+    # lidar is recorded as vehicle relative angle => mm, same as LidarMap.get_lidar_data
+    def __build_lidar_map (self, measurements):
+        if measurements is None:
+            return None
+        measurement_map = {float(angle):mm for angle, mm in measurements.items()}
+        lidar_data = []
+        for deg in np.arange(0, 360.25, .25):
+            if deg in measurement_map:
+                lidar_data.append(f"{measurement_map[deg]}")
+            else:
+                lidar_data.append(f"{-1.0}")
+        return LidarMap(0, 0.25, '|'.join(lidar_data))
+
+    def __build_estimator (self, estimator_name, fixture, field_map, estimator_mode, use_multithreading):
+        return PositionBenchmark.ALL_ESTIMATORS[estimator_name](
+            field_map,
+            horizontal_fov = fixture['camera']['horizontal_fov'],
+            vertical_fov = fixture['camera']['vertical_fov'],
+            view_width = fixture['camera']['view_width'],
+            view_height = fixture['camera']['view_height'],
+            use_multithreading = use_multithreading,
+            estimator_mode = estimator_mode,
+            adjust_for_altitude = fixture['adjust_for_altitude'] if 'adjust_for_altitude' in fixture else True)
+
+    def __get_heading_error (self, heading, expected_heading):
+        diff = ((heading - expected_heading + 180.0) % 360.0) - 180.0
+        return abs(diff)
+
+    def __summarize (self, values):
+        if len(values) == 0:
+            return None
+        values = np.array(values, dtype=float)
+        return {
+            'mean' : round(float(np.mean(values)), 4),
+            'p50' : round(float(np.percentile(values, 50)), 4),
+            'p90' : round(float(np.percentile(values, 90)), 4),
+            'p99' : round(float(np.percentile(values, 99)), 4),
+            'max' : round(float(np.max(values)), 4)
+        }
+
+    # runs every fixture through one estimator configuration
+    def run_configuration (self, estimator_name, estimator_mode, use_multithreading):
+        latencies = []
+        position_errors = []
+        heading_errors = []
+        failures = 0
+        per_fixture = {}
+
+        for fixture in self.get_fixtures():
+            field_map = FieldMapPersistence().load_map_from_dict(fixture['map'])
+            lidar_map = self.__build_lidar_map(fixture['lidar'] if 'lidar' in fixture else None)
+            estimator = self.__build_estimator(estimator_name, fixture, field_map, estimator_mode, use_multithreading)
+            expected = fixture['expected']
+
+            # same random sequence for every configuration, so the genetic modes are comparable.
+            # worker processes keep their own generators, so multithreaded runs are only repeatable per pool
+            np.random.seed(self.__seed)
+            random.seed(self.__seed)
+
+            fixture_latencies = []
+            fixture_position_errors = []
+            fixture_heading_errors = []
+            fixture_failures = 0
+            for i in range(self.__warmup + self.__repetitions):
+                start = time.perf_counter()
+                x, y, heading, confidence, basis = estimator.get_coords_and_heading(
+                    located_objects = fixture['located_objects'],
+                    view_altitude = fixture['view_altitude'],
+                    lidar_map = lidar_map)
+                elapsed = time.perf_counter() - start
+
+                # warmup runs build pools and caches, they are not counted
+                if i < self.__warmup:
+                    continue
+
+                fixture_latencies.append(elapsed)
+                if x is None or y is None or heading is None:
+                    fixture_failures += 1
+                else:
+                    fixture_position_errors.append(math.dist((x, y), (expected['x'], expected['y'])))
+                    fixture_heading_errors.append(self.__get_heading_error(heading, expected['heading']))
+
+            per_fixture[fixture['name']] = {
+                'latency' : self.__summarize(fixture_latencies),
+                'failures' : fixture_failures,
+                'position_error' : self.__summarize(fixture_position_errors),
+                'heading_error' : self.__summarize(fixture_heading_errors)
+            }
+            latencies += fixture_latencies
+            position_errors += fixture_position_errors
+            heading_errors += fixture_heading_errors
+            failures += fixture_failures
+
+            # each map gets its own worker pool, dont let them pile up
+            if use_multithreading:
+                PositionThreadManager.cleanup()
+
+        total_time = sum(latencies)
+        return {
+            'estimator' : estimator_name,
+            'mode' : estimator_mode,
+            'multithreading' : use_multithreading,
+            'runs' : len(latencies),
+            'failures' : failures,
+            'fixes_per_sec' : round((len(latencies) - failures) / total_time, 4) if total_time > 0 else None,
+            'latency' : self.__summarize(latencies),
+            'position_error' : self.__summarize(position_errors),
+            'heading_error' : self.__summarize(heading_errors),
+            'fixtures' : per_fixture
+        }
+
+    def run (self):
+        results = []
+        for estimator_name in self.__estimators:
+            for estimator_mode in self.__modes:
+                for use_multithreading in self.__multithreading:
+                    logging.getLogger(__name__).info(f"Benchmarking {estimator_name}, mode: {estimator_mode}, multithreading: {use_multithreading}")
+                    results.append(self.run_configuration(estimator_name, estimator_mode, use_multithreading))
+
+        return {
+            'timestamp' : time.time(),
+            'platform' : platform.platform(),
+            'processor' : platform.processor(),
+            'cpu_count' : os.cpu_count(),
+            'python' : platform.python_version(),
+            'fixtures' : [f['name'] for f in self.get_fixtures()],
+            'repetitions' : self.__repetitions,
+            'warmup' : self.__warmup,
+            'seed' : self.__seed,
+            'results' : results
+        }
+
+    def write_report (self, report, output_file):
+        with open(output_file, 'w') as f:
+            f.write(json.dumps(report, indent=2))
@@ -1,17 +1,26 @@
 from field.field_map import FieldMap
+from lidar.lidar_map import LidarMap
 from visual.visual_distance import VisualDistanceCalculator
 from visual.visual_degrees import VisualDegreesCalculator
 from trig.trig import BasicTrigCalc
 from trig.genetic_length_finder import BaseTopLengthFinder
+from trig.closed_form_length_finder import ClosedFormLengthFinder
 from position.position_thread_manager import PositionThreadManager
+from position.candidate_scorer import CandidateScorer
+from position.grid_localizer import GridLocalizer
 from position.confidence import Confidence
 from position.estimator_mode import EstimatorMode
+from timing.stage_timer import StageTimer
+import numpy as np
 import math
 import statistics
 import logging
 
 class PositionEstimator:
-    def __init__(self, field_map : FieldMap, horizontal_fov, vertical_fov, view_width, view_height, base_front=90.0, use_multithreading=True, estimator_mode = EstimatorMode.VERY_PRECISE, max_lidar_drift_deg = 1.5, max_lidar_visual_variance_pct = 0.33, adjust_for_altitude = True):
+    # when given a prior position, candidates must be within at least this radius of it
+    PRIOR_BASE_RADIUS = 18.0
+
+    def __init__(self, field_map : FieldMap, horizontal_fov, vertical_fov, view_width, view_height, base_front=90.0, use_multithreading=True, estimator_mode = EstimatorMode.VERY_PRECISE, max_lidar_drift_deg = 1.5, max_lidar_visual_variance_pct = 0.33, adjust_for_altitude = True, stage_timer : StageTimer = None):
         self.__field_map = field_map
         self.__visual_dist_calc = VisualDistanceCalculator(horizontal_fov = horizontal_fov, vertical_fov = vertical_fov, view_width=view_width, view_height=view_height)
         self.__visual_degrees_calc = VisualDegreesCalculator(horizontal_fov = horizontal_fov, vertical_fov = vertical_fov, view_width=view_width, view_height=view_height)
@@ -25,9 +34,46 @@ class PositionEstimator:
         self.__max_lidar_drift = max_lidar_drift_deg
         self.__max_lidar_visual_variance = max_lidar_visual_variance_pct
         self.__adjust_for_altitude = adjust_for_altitude
+        self.__stage_timer = stage_timer if stage_timer is not None else StageTimer()
+        self.__candidate_scorer = CandidateScorer(field_map = field_map, visual_degrees_calc = self.__visual_degrees_calc, view_width = view_width, base_front = base_front)
+        self.__grid_localizer = GridLocalizer(field_map = field_map, candidate_scorer = self.__candidate_scorer) if estimator_mode == EstimatorMode.GRID else None
+
+        # when given a prior position, candidates must be within this radius of it.
+        # the radius grows with the age of the prior, since the vehicle may have moved
+        self.__prior_base_radius = PositionEstimator.PRIOR_BASE_RADIUS
+        self.__prior_radius_growth = 3.0 # per second
+        self.__prior_max_radius = 72.0
+
+        # worker processes build their own estimator from this, once, when the pool starts
+        self.__worker_config = {
+            'field_map':field_map,
+            'horizontal_fov':horizontal_fov,
+            'vertical_fov':vertical_fov,
+            'view_width':view_width,
+            'view_height':view_height,
+            'base_front':base_front,
+            'use_multithreading':False,
+            'estimator_mode':estimator_mode,
+            'max_lidar_drift_deg':max_lidar_drift_deg,
+            'max_lidar_visual_variance_pct':max_lidar_visual_variance_pct,
+            'adjust_for_altitude':adjust_for_altitude
+        }
+        # the map is keyed by its contents, so estimators built from the same map, even loaded separately, share a pool
+        self.__worker_key = f"{field_map.get_fingerprint()}|{horizontal_fov}|{vertical_fov}|{view_width}|{view_height}|{base_front}|{estimator_mode}|{max_lidar_drift_deg}|{max_lidar_visual_variance_pct}|{adjust_for_altitude}"
+
+        self.__holds_pool = False
 
         self.__log_configuration()
 
+    def get_stage_timer (self):
+        return self.__stage_timer
+
+    # lets go of the worker pool, it is freed once no estimator is using it
+    def cleanup (self):
+        if self.__holds_pool:
+            PositionThreadManager.release_estimator_pool(self.__worker_key)
+            self.__holds_pool = False
+
     def __log_configuration (self):
         logging.getLogger(__name__).info(f"== Position Estimator configuration ==")
         printable_settings = {
@@ -135,7 +181,7 @@ class PositionEstimator:
         return new_heading
 
     def __mm_to_in (self, measurement):
-        return measurement / 25.4
+        return measurement / LidarMap.MM_PER_MAP_UNIT
 
 
     def extract_distances (self, view_angles, view_altitude, filter_unmapped_objects = True, lidar_map = None):
@@ -215,7 +261,7 @@ class PositionEstimator:
         if self.__estimator_mode == EstimatorMode.FAST:
             target_accuracy = 0.01
             allowed_time = 0.2
-        elif self.__estimator_mode == EstimatorMode.VERY_PRECISE:
+        elif self.__estimator_mode in [EstimatorMode.VERY_PRECISE, EstimatorMode.CLOSED_FORM]:
             target_accuracy = 0.001
             allowed_time = 0.7
         
@@ -226,14 +272,51 @@ class PositionEstimator:
 
         if self.__estimator_mode == EstimatorMode.FAST:
             target_solutions = 10
-        elif self.__estimator_mode == EstimatorMode.VERY_PRECISE:
+        elif self.__estimator_mode in [EstimatorMode.VERY_PRECISE, EstimatorMode.CLOSED_FORM]:
             target_solutions = 20
         
         return target_solutions
 
+    # closed form mode solves the triangle directly, all other modes use the genetic search
+    def __get_length_finder (self, far_angle, far_side, est_top, est_base, base_confidence, top_confidence, seeds = None):
+        if self.__estimator_mode == EstimatorMode.CLOSED_FORM:
+            return ClosedFormLengthFinder(
+                far_angle=far_angle,
+                far_side=far_side,
+                est_top=est_top,
+                est_base=est_base,
+                base_confidence=base_confidence,
+                top_confidence=top_confidence,
+                seeds=seeds
+            )
 
-    def __get_possible_coordinates (self, viz_angle, landmark_id, other_landmark_id, distances, view_angles):
-        actual_field_dist = self.__field_map.get_distance(landmark_id_1=landmark_id,landmark_id_2=other_landmark_id)
+        return BaseTopLengthFinder(
+            far_angle=far_angle,
+            far_side=far_side,
+            est_top=est_top,
+            est_base=est_base,
+            base_confidence=base_confidence,
+            top_confidence=top_confidence,
+            seeds=seeds
+        )
+
+    # how far from the prior position a candidate may be. the prior can set its own radius if it knows better
+    def get_prior_radius (self, prior):
+        if 'radius' in prior and prior['radius'] is not None:
+            return prior['radius']
+        age = prior['age'] if 'age' in prior and prior['age'] is not None else 0
+        return min(self.__prior_base_radius + (self.__prior_radius_growth * age), self.__prior_max_radius)
+
+
+    def __get_possible_coordinates (self, viz_angle, landmark_id, other_landmark_id, distances, view_angles, prior = None):
+        # everything about the pair that only depends on the map comes from the map's precomputed table
+        pair_geometry = self.__field_map.get_pair_geometry(landmark_id, other_landmark_id)
+        if pair_geometry is None:
+            # one of the landmarks isn't on the map, so there's nothing to triangulate from
+            logging.getLogger(__name__).debug(f"No map geometry between {landmark_id} and {other_landmark_id}, skipping the pair")
+            return []
+        actual_field_dist = pair_geometry['distance']
+        landmark_x,landmark_y = self.__field_map.get_landmark_position(landmark_id)
         possible = []
 
         # imagine a line betwee the two landmarks. we have to
@@ -300,13 +383,21 @@ class PositionEstimator:
                     top_confidence += 0.025
 
 
-            length_finder = BaseTopLengthFinder(
+            # if we have a good idea where we are, the sides that position implies are a good place to start
+            seeds = None
+            if prior is not None:
+                base_x, base_y = self.__field_map.get_landmark_position(base_landmark_id)
+                top_x, top_y = self.__field_map.get_landmark_position(top_landmark_id)
+                seeds = [(self.get_distance(prior['x'], prior['y'], base_x, base_y), self.get_distance(prior['x'], prior['y'], top_x, top_y))]
+
+            length_finder = self.__get_length_finder(
                 far_angle=abs(viz_angle),
                 far_side=actual_field_dist, 
                 est_top=top_side,
                 est_base=base_side,
                 base_confidence=base_confidence,
-                top_confidence=top_confidence
+                top_confidence=top_confidence,
+                seeds=seeds
             )
 
             target_accuracy, allowed_time = self.__get_target_accuracy_and_time()
@@ -327,22 +418,13 @@ class PositionEstimator:
                 #logging.getLogger(__name__).info(f"{landmark_id}/{other_landmark_id} For calculation - Top Angle: {top_angle}, Base Angle: {base_angle}, Viz Angle: {abs(viz_angle)}")
 
                 # now get this landmark's slope, relative to a line that goes from this landmark to the y axis
-                # to do so, make a right triangle between the 2 landmarks, to get the landmark's far angle
-                landmark_x,landmark_y = self.__field_map.get_landmark_position(landmark_id)
-                other_landmark_x, other_landmark_y = self.__field_map.get_landmark_position(other_landmark_id)
-                landmarks_xdist = abs(other_landmark_x - landmark_x)
-                landmarks_ydist = abs(other_landmark_y - landmark_y)
-                # for this right triangle, base angle is the 90, base side is the right side of the landmark, 
-                # far side is the side opposite the landmark, top side is the side ot hte left of hte landmark
-                # what I WANT is the far angle
+                # to do so, make a right triangle between the 2 landmarks, to get the landmark's far angle.
+                # the map has already calculated how much that right triangle is rotated (none if the landmarks are level)
                 landmark_to_me_slope_deg = 0
-                if landmarks_ydist != 0:
-                    #logging.getLogger(__name__).info(f"field dist: {actual_field_dist}, top_side: {landmarks_ydist}, far_side: {landmarks_xdist}")
-                    landmark_far_angle = self.calc_far_angle(far_side=landmarks_xdist, base_side=actual_field_dist, top_side=landmarks_ydist)
-
+                if pair_geometry['rotation'] is not None:
                     # the top_angle we have so far is just part of it, since the right triangle is rotated,
                     # we have to adjust the top_angle by  however much the right triangle is rotated
-                    slope_adjust_for_right_triangle_rotation = 180 - landmark_far_angle - 90
+                    slope_adjust_for_right_triangle_rotation = pair_geometry['rotation']
 
                     #logging.getLogger(__name__).info(f"{landmark_id} - landmark far angle: {landmark_far_angle}, slope adjust deg: {slope_adjust_for_right_triangle_rotation}, top angle: {top_angle}")
 
@@ -614,7 +696,7 @@ class PositionEstimator:
         allowed_heading_variance = 0.03
         if self.__estimator_mode == EstimatorMode.PRECISE:
             allowed_heading_variance = 0.03
-        if self.__estimator_mode == EstimatorMode.VERY_PRECISE:
+        if self.__estimator_mode in [EstimatorMode.VERY_PRECISE, EstimatorMode.CLOSED_FORM]:
             allowed_heading_variance = 0.025
         return allowed_heading_variance
 
@@ -623,11 +705,14 @@ class PositionEstimator:
     # heading of 0 means vehicle is pointed north on the axis.
     # + heading means it's pointed to the right of north
     # - heading means it's pointed to the left of north
-    def get_coords_and_heading (self, located_objects, view_altitude, lidar_map = None):
-        angles = self.extract_object_view_angles(located_objects=located_objects)
+    # prior, if given, is a recent position: {'x', 'y', 'heading', 'age'}, with age in seconds, and optionally a search 'radius'
+    def get_coords_and_heading (self, located_objects, view_altitude, lidar_map = None, prior = None):
+        with self.__stage_timer.stage('view_angles'):
+            angles = self.extract_object_view_angles(located_objects=located_objects)
         #logging.getLogger(__name__).info(f"Estimated Angles: {angles}")
 
-        distances =self.extract_distances(view_angles=angles, view_altitude=view_altitude, lidar_map = lidar_map)
+        with self.__stage_timer.stage('distances'):
+            distances =self.extract_distances(view_angles=angles, view_altitude=view_altitude, lidar_map = lidar_map)
         #logging.getLogger(__name__).info(f"Estimated distances: {distances}")
 
 
@@ -635,11 +720,13 @@ class PositionEstimator:
         coords = []
         if len(located_objects) > 1:
             conf = Confidence.CONFIDENCE_LOW
-            coords = self.find_possible_coordinates(
-                view_angles=angles, 
-                distances=distances, 
-                allowed_variance=0.3, # we want to be able to adjust the estimated distances quite a bit. this isnt for accuracy
-                allowed_heading_variance = self.get_allowed_heading_variance())
+            with self.__stage_timer.stage('coordinates'):
+                coords = self.find_possible_coordinates(
+                    view_angles=angles, 
+                    distances=distances, 
+                    allowed_variance=0.3, # we want to be able to adjust the estimated distances quite a bit. this isnt for accuracy
+                    allowed_heading_variance = self.get_allowed_heading_variance(),
+                    prior=prior)
 
         # if we got some back, get the heading and return the centroid
         heading = None
@@ -658,7 +745,8 @@ class PositionEstimator:
             y = [p[1] for p in coords]
             centroid_x, centroid_y = (sum(x) / len(coords), sum(y) / len(coords))
 
-            heading = self.get_heading(centroid_x, centroid_y, angles)
+            with self.__stage_timer.stage('heading'):
+                heading = self.get_heading(centroid_x, centroid_y, angles)
 
         basis = {
             'angles':angles,
@@ -668,7 +756,8 @@ class PositionEstimator:
 
         return centroid_x, centroid_y, heading, conf, basis
     
-    def get_possible_coords_isolated (self, landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles = True):
+    # view_table is CandidateScorer.build_view_table for these view angles. it is the same for every pair, so it should be built once per fix
+    def get_possible_coords_isolated (self, landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles = True, prior = None, view_table = None):
         # this is the angle of the other landmark id relative to this one.
         # positive means th OTHER is to the right. negative means OTHEr is to the left
         selected_this_angle = max(view_angles[landmark_id], key=lambda x:x['confidence'])
@@ -676,41 +765,57 @@ class PositionEstimator:
         filtered_coords = []
 
         viz_angle = selected_this_angle['relative_deg'][other_landmark_id]
-        lm_min_preferred = self.__max_or_none(self.__field_map.get_landmark_min_angle_preference(landmark_id), self.__field_map.get_landmark_min_angle_preference(other_landmark_id))
-        lm_max_preferred = self.__min_or_none(self.__field_map.get_landmark_max_angle_preference(landmark_id), self.__field_map.get_landmark_max_angle_preference(other_landmark_id))
+        pair_geometry = self.__field_map.get_pair_geometry(landmark_id, other_landmark_id)
+        if pair_geometry is None:
+            logging.getLogger(__name__).debug(f"No map geometry between {landmark_id} and {other_landmark_id}, skipping the pair")
+            return filtered_coords
+        lm_min_preferred = pair_geometry['min_angle_preference']
+        lm_max_preferred = pair_geometry['max_angle_preference']
 
         if ((lm_max_preferred is None or abs(viz_angle) <= lm_max_preferred) and (lm_min_preferred is None or abs(viz_angle) >= lm_min_preferred)) or enforce_landmark_preferred_angles == False:
             if (lm_min_preferred is not None and abs(viz_angle) < lm_min_preferred) or (lm_max_preferred is not None and abs(viz_angle) > lm_max_preferred):
                 logging.getLogger(__name__).info(f"Visual angle of {round(viz_angle,2)} between {landmark_id} and {other_landmark_id} is outside preferred, but using it anyway")
 
-            curr_possibilities = self.__get_possible_coordinates(
-                viz_angle=viz_angle, 
-                landmark_id=landmark_id, 
-                other_landmark_id=other_landmark_id, 
-                distances=distances,
-                view_angles=view_angles)
-
-            in_bounds_coords = []
-            if filter_out_of_bounds:
-                near_bounds_coords = []
-                # filter any that are out of bounds. Allow near_bounds to be used, as the robot could wander a little out
-                for poss_x, poss_y in curr_possibilities:
-                    if self.__field_map.is_near_bounds(x=poss_x, y=poss_y):
-                        near_bounds_coords.append((poss_x, poss_y))
-
-                # filter any that are within an obstacle
-                for poss_x, poss_y in near_bounds_coords:
-                    blocked, osbtacle_id = self.__field_map.is_blocked(poss_x, poss_y)
-                    if not blocked:
-                        in_bounds_coords.append((poss_x, poss_y))
+            with self.__stage_timer.stage('length_finding'):
+                curr_possibilities = self.__get_possible_coordinates(
+                    viz_angle=viz_angle, 
+                    landmark_id=landmark_id, 
+                    other_landmark_id=other_landmark_id, 
+                    distances=distances,
+                    view_angles=view_angles,
+                    prior=prior)
+
+            with self.__stage_timer.stage('candidate_filtering'):
+                # only keep what's close enough to where we were
+                if prior is not None:
+                    prior_radius = self.get_prior_radius(prior)
+                    curr_possibilities = [(poss_x, poss_y) for poss_x, poss_y in curr_possibilities if self.get_distance(poss_x, poss_y, prior['x'], prior['y']) <= prior_radius]
+
+                in_bounds_coords = []
+                if filter_out_of_bounds:
+                    near_bounds_coords = []
+                    # filter any that are out of bounds. Allow near_bounds to be used, as the robot could wander a little out
+                    for poss_x, poss_y in curr_possibilities:
+                        if self.__field_map.is_near_bounds(x=poss_x, y=poss_y):
+                            near_bounds_coords.append((poss_x, poss_y))
+
+                    # filter any that are within an obstacle
+                    if len(near_bounds_coords) > 0:
+                        blocked, obstacle_ids = self.__field_map.are_blocked([x for x, y in near_bounds_coords], [y for x, y in near_bounds_coords])
+                        in_bounds_coords = [c for c, b in zip(near_bounds_coords, blocked) if not b]
 
-            else:
-                in_bounds_coords = curr_possibilities
-
-            # filter any impossible coordinates
-            for poss_x, poss_y in in_bounds_coords:
-                if self.is_possible(poss_x, poss_y, view_angles=view_angles, allowed_variance=allowed_variance, allowed_heading_variance=allowed_heading_variance):
-                    filtered_coords.append((poss_x, poss_y))
+                else:
+                    in_bounds_coords = curr_possibilities
+
+                # filter any impossible coordinates, all candidates are scored together
+                if len(in_bounds_coords) > 0:
+                    possible = self.__candidate_scorer.get_possible_mask(
+                        np.array(in_bounds_coords), 
+                        view_angles=view_angles, 
+                        allowed_variance=allowed_variance, 
+                        allowed_heading_variance=allowed_heading_variance,
+                        view_table=view_table)
+                    filtered_coords = [c for c, p in zip(in_bounds_coords, possible) if p]
 
             #logging.getLogger(__name__).info(f"Before allowed filter: {len(in_bounds_coords)}, after allowed filter: {len(filtered_coords)}")
 
@@ -720,13 +825,41 @@ class PositionEstimator:
         return filtered_coords
 
 
-    def find_possible_coordinates (self, view_angles, distances, filter_out_of_bounds = True, allowed_variance = 0.3, allowed_heading_variance = 0.1, enforce_landmark_preferred_angles = True):
+    def find_possible_coordinates (self, view_angles, distances, filter_out_of_bounds = True, allowed_variance = 0.3, allowed_heading_variance = 0.1, enforce_landmark_preferred_angles = True, prior = None):
+        # grid mode uses all landmarks together instead of pairs. the grid is always within the near bounds
+        if self.__estimator_mode == EstimatorMode.GRID:
+            if len(distances) > 1:
+                with self.__stage_timer.stage('grid_search'):
+                    return self.__grid_localizer.find_possible_coordinates(
+                        view_angles=view_angles, 
+                        distances=distances, 
+                        allowed_variance=allowed_variance, 
+                        allowed_heading_variance=allowed_heading_variance,
+                        near=None if prior is None else (prior['x'], prior['y'], self.get_prior_radius(prior)))
+            return []
+
+        # what scoring needs from the view angles is the same for every pair, so it is built once
+        view_table = self.__candidate_scorer.build_view_table(view_angles)
+        final_possible_coords = self.__find_possible_coordinates_for_pairs(view_angles, distances, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles, prior, view_table)
+
+        # the prior may be wrong (vehicle was moved, or the last fix was bad). if nothing was found near it, search everywhere
+        if prior is not None and len(final_possible_coords) == 0 and len(distances) > 1:
+            logging.getLogger(__name__).info(f"No coordinates found near prior ({prior['x']}, {prior['y']}), searching without it")
+            final_possible_coords = self.__find_possible_coordinates_for_pairs(view_angles, distances, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles, None, view_table)
+
+        return final_possible_coords
+
+    def __find_possible_coordinates_for_pairs (self, view_angles, distances, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles, prior, view_table):
         possible_coords = []
         computed = []
         thread_params = []
 
         coord_sets = []
 
+        # workers only need the best view of each landmark, and only the fields used for positioning
+        if self.__use_multithreading:
+            compact_view_angles, compact_distances = self.get_compact_observations(view_angles, distances)
+
         # if we only have one coordinate, we can not compute that.
         if len(distances) > 1:
             # given each pair
@@ -738,15 +871,17 @@ class PositionEstimator:
 
                         if self.__use_multithreading:
                             thread_params.append((
-                                self,
+                                self.__worker_key,
                                 landmark_id,
                                 other_landmark_id,
-                                distances,
-                                view_angles,
+                                compact_distances,
+                                compact_view_angles,
                                 filter_out_of_bounds,
                                 allowed_variance,
                                 allowed_heading_variance,
-                                enforce_landmark_preferred_angles
+                                enforce_landmark_preferred_angles,
+                                prior,
+                                view_table
                             ))
                         else:
                             coord_sets.append(
@@ -758,22 +893,30 @@ class PositionEstimator:
                                     filter_out_of_bounds=filter_out_of_bounds,
                                     allowed_variance=allowed_variance,
                                     allowed_heading_variance=allowed_heading_variance,
-                                    enforce_landmark_preferred_angles=enforce_landmark_preferred_angles
+                                    enforce_landmark_preferred_angles=enforce_landmark_preferred_angles,
+                                    prior=prior,
+                                    view_table=view_table
                                 )
                             )
 
         # if multithreading, we need to wait for results to come in
         if self.__use_multithreading:
-            pool = PositionThreadManager.get_thread_pool()
+            if not self.__holds_pool:
+                PositionThreadManager.hold_estimator_pool(self.__worker_key)
+                self.__holds_pool = True
+            pool = PositionThreadManager.get_estimator_pool(self.__worker_key, PositionEstimator, self.__worker_config)
             async_results = pool.starmap_async(external_get_possible_coords_isolated, thread_params)
             logging.getLogger(__name__).debug("Waiting for threads to finish getting coords")
             
-            try:
-                for thread_result in async_results.get():
-                    coord_sets.append(thread_result)
-            except TimeoutError as te:
-                # is the thread pool corrupt in this case? Does it have a zombie
-                logging.getLogger(__name__).info("Timed out, some or all coord sets may not be included")
+            # length finding and filtering happen in the workers, so only the wait can be timed here
+            with self.__stage_timer.stage('workers'):
+                try:
+                    # each worker returns a flat (N,2) array
+                    for thread_result in async_results.get():
+                        coord_sets.append([(float(x), float(y)) for x, y in thread_result])
+                except TimeoutError as te:
+                    # is the thread pool corrupt in this case? Does it have a zombie
+                    logging.getLogger(__name__).info("Timed out, some or all coord sets may not be included")
 
 
         
@@ -783,6 +926,23 @@ class PositionEstimator:
 
         return final_possible_coords
     
+    # strips the view angles and distances down to what get_possible_coords_isolated needs,
+    # so the payload sent to each worker stays small
+    def get_compact_observations (self, view_angles, distances):
+        compact_view_angles = {}
+        for landmark_id in view_angles:
+            selected_angle = max(view_angles[landmark_id], key=lambda x:x['confidence'])
+            compact_view_angles[landmark_id] = [{k:selected_angle[k] for k in ['center_x', 'confidence', 'image_heading', 'height_deg', 'relative_deg'] if k in selected_angle}]
+
+        compact_distances = {}
+        for landmark_id in distances:
+            compact_distances[landmark_id] = {
+                'ground':distances[landmark_id]['ground'],
+                'islidar':distances[landmark_id]['islidar']
+            }
+
+        return compact_view_angles, compact_distances
+
     def calc_far_angle (self, far_side, base_side, top_side):
         part_1 = base_side ** 2 + top_side ** 2 - far_side ** 2
         part_2 = 2 * base_side * top_side
@@ -819,28 +979,11 @@ class PositionEstimator:
 
         return math.sqrt(((x2 - x1)**2) + ((y2 - y1) **2))
 
-    def __min_or_none (self, val1, val2):
-        if val1 is None and val2 is None:
-            return None
-        elif val1 is None:
-            return val2
-        elif val2 is None:
-            return val1
-        
-        return min(val1, val2)
-
-    def __max_or_none (self, val1, val2):
-        if val1 is None and val2 is None:
-            return None
-        elif val1 is None:
-            return val2
-        elif val2 is None:
-            return val1
-        
-        return max(val1, val2)
-
-def external_get_possible_coords_isolated (estimator_inst, landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles):
-    return estimator_inst.get_possible_coords_isolated (landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles)
+# runs inside a position pool worker, using the estimator that worker was initialized with
+def external_get_possible_coords_isolated (estimator_key, landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles, prior = None, view_table = None):
+    estimator_inst = PositionThreadManager.get_worker_estimator(estimator_key)
+    coords = estimator_inst.get_possible_coords_isolated (landmark_id, other_landmark_id, distances, view_angles, filter_out_of_bounds, allowed_variance, allowed_heading_variance, enforce_landmark_preferred_angles, prior, view_table)
+    return np.array(coords, dtype=float).reshape(-1, 2)
 
 if __name__ == "__main__":
     print("houdy")
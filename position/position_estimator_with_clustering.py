@@ -2,6 +2,7 @@ from position.position_estimator import PositionEstimator
 from position.confidence import Confidence
 from position.estimator_mode import EstimatorMode
 from field.field_map import FieldMap
+from timing.stage_timer import StageTimer
 import numpy as np
 from sklearn.cluster import KMeans
 import statistics
@@ -9,8 +10,8 @@ import logging
 import time
 
 class PositionEstimatorWithClustering (PositionEstimator):
-    def __init__(self, field_map : FieldMap, horizontal_fov, vertical_fov, view_width, view_height, base_front=90.0, use_multithreading = True, estimator_mode = EstimatorMode.VERY_PRECISE, max_lidar_drift_deg = 1.5, max_lidar_visual_variance_pct = 0.33, adjust_for_altitude = True):
-        PositionEstimator.__init__(self, field_map, horizontal_fov, vertical_fov, view_width, view_height, base_front, use_multithreading, estimator_mode, max_lidar_drift_deg, max_lidar_visual_variance_pct, adjust_for_altitude)
+    def __init__(self, field_map : FieldMap, horizontal_fov, vertical_fov, view_width, view_height, base_front=90.0, use_multithreading = True, estimator_mode = EstimatorMode.VERY_PRECISE, max_lidar_drift_deg = 1.5, max_lidar_visual_variance_pct = 0.33, adjust_for_altitude = True, stage_timer : StageTimer = None):
+        PositionEstimator.__init__(self, field_map, horizontal_fov, vertical_fov, view_width, view_height, base_front, use_multithreading, estimator_mode, max_lidar_drift_deg, max_lidar_visual_variance_pct, adjust_for_altitude, stage_timer)
         logging.getLogger(__name__).info("Position Clustering is enabled, for greater accuracy.")
         self.__default_heading_clusters = 2
         self.__heading_std_dev = 2
@@ -39,11 +40,14 @@ class PositionEstimatorWithClustering (PositionEstimator):
         
         return hits
 
-    def get_coords_and_heading (self, located_objects, view_altitude, lidar_map = None, enforce_landmark_preferred_angles = True):
-        angles = self.extract_object_view_angles(located_objects=located_objects)
+    def get_coords_and_heading (self, located_objects, view_altitude, lidar_map = None, enforce_landmark_preferred_angles = True, prior = None):
+        stage_timer = self.get_stage_timer()
+        with stage_timer.stage('view_angles'):
+            angles = self.extract_object_view_angles(located_objects=located_objects)
         #logging.getLogger(__name__).info(f"Estimated Angles: {angles}")
 
-        distances =self.extract_distances(view_angles=angles, view_altitude=view_altitude, lidar_map = lidar_map)
+        with stage_timer.stage('distances'):
+            distances =self.extract_distances(view_angles=angles, view_altitude=view_altitude, lidar_map = lidar_map)
         lidar_hits = self.count_lidar_hits(distances)
 
         #logging.getLogger(__name__).info(f"Estimated distances: {distances}")
@@ -54,12 +58,14 @@ class PositionEstimatorWithClustering (PositionEstimator):
         coords = []
         if len(located_objects) > 1:
             conf = Confidence.CONFIDENCE_LOW
-            coords = self.find_possible_coordinates(
-                view_angles=angles, 
-                distances=distances, 
-                allowed_variance=0.5, # we want to be able to adjust the estimated distances quite a bit. this isnt for accuracy
-                allowed_heading_variance = allowed_heading_variance,
-                enforce_landmark_preferred_angles=enforce_landmark_preferred_angles)
+            with stage_timer.stage('coordinates'):
+                coords = self.find_possible_coordinates(
+                    view_angles=angles, 
+                    distances=distances, 
+                    allowed_variance=0.5, # we want to be able to adjust the estimated distances quite a bit. this isnt for accuracy
+                    allowed_heading_variance = allowed_heading_variance,
+                    enforce_landmark_preferred_angles=enforce_landmark_preferred_angles,
+                    prior=prior)
             #logging.getLogger(__name__).info(f"All possible: {coords}")
 
         # if we got some back, get the heading and return the centroid
@@ -79,7 +85,8 @@ class PositionEstimatorWithClustering (PositionEstimator):
         # use clustering to remove outliers if enough samples
         if len(coords) > 2:
             #logging.getLogger(__name__).info("Removing outliers")
-            coords = self.__remove_coordinates_outliers(coords)
+            with stage_timer.stage('clustering'):
+                coords = self.__remove_coordinates_outliers(coords)
             #logging.getLogger(__name__).info(f"{len(coords)} Removed outliers")
 
         # calculate the mean of whatever is left
@@ -89,7 +96,8 @@ class PositionEstimatorWithClustering (PositionEstimator):
             y = [p[1] for p in coords]
             centroid_x, centroid_y = (sum(x) / len(coords), sum(y) / len(coords))
 
-            heading = self.get_heading(centroid_x, centroid_y, angles)
+            with stage_timer.stage('heading'):
+                heading = self.get_heading(centroid_x, centroid_y, angles)
 
         basis = {
             'angles':angles,
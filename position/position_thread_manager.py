@@ -9,21 +9,78 @@ import logging
 class PositionThreadManager:
     __thread_pool = None
 
+    # pools whose workers each hold their own estimator, keyed by estimator configuration
+    __estimator_pools = {}
+
+    # how many estimators are holding each estimator pool. a pool is freed when the last one releases it
+    __estimator_pool_holders = {}
+
+    # only set inside a worker process, by the pool initializer
+    __worker_estimators = {}
+
+    # the pool size of 3 seems to work best, based on unit tests, on the pi cm4 (4 cores).
+    # this makes sense, because we are currently limiting the number of landmarks taken into account
+    # to a max of 3, so 3 sets of calculations need to be done.
+    __pool_size = 3
+
     def get_thread_pool ():
-        # the pool size of 3 seems to work best, based on unit tests, on the pi cm4 (4 cores).
-        # this makes sense, because we are currently limiting the number of landmarks taken into account
-        # to a max of 3, so 3 sets of calculations need to be done.
-        pool_size = 3
         if PositionThreadManager.__thread_pool is None:
             atexit.register(PositionThreadManager.cleanup)
-            logging.getLogger(__name__).warning(f"Position thread pool initializing with {pool_size} workers. This should only happen once.")
-            PositionThreadManager.__thread_pool = ThreadPool(pool_size)
-        
+            logging.getLogger(__name__).warning(f"Position thread pool initializing with {PositionThreadManager.__pool_size} workers. This should only happen once.")
+            PositionThreadManager.__thread_pool = ThreadPool(PositionThreadManager.__pool_size)
+
         return PositionThreadManager.__thread_pool
-    
+
+    # returns a pool whose workers were given the estimator class and its config (including the field map) once, at startup.
+    # tasks sent to this pool only need to carry the observations
+    def get_estimator_pool (estimator_key, estimator_class, estimator_config):
+        if estimator_key not in PositionThreadManager.__estimator_pools:
+            if len(PositionThreadManager.__estimator_pools) == 0 and PositionThreadManager.__thread_pool is None:
+                atexit.register(PositionThreadManager.cleanup)
+            logging.getLogger(__name__).warning(f"Position estimator pool initializing with {PositionThreadManager.__pool_size} workers. This should only happen once per estimator.")
+            PositionThreadManager.__estimator_pools[estimator_key] = ThreadPool(
+                PositionThreadManager.__pool_size,
+                initializer=PositionThreadManager.initialize_worker,
+                initargs=(estimator_key, estimator_class, estimator_config))
+
+        return PositionThreadManager.__estimator_pools[estimator_key]
+
+    def hold_estimator_pool (estimator_key):
+        PositionThreadManager.__estimator_pool_holders[estimator_key] = PositionThreadManager.__estimator_pool_holders.get(estimator_key, 0) + 1
+
+    def release_estimator_pool (estimator_key):
+        holders = PositionThreadManager.__estimator_pool_holders.get(estimator_key, 0) - 1
+        if holders > 0:
+            PositionThreadManager.__estimator_pool_holders[estimator_key] = holders
+            return
+
+        PositionThreadManager.__estimator_pool_holders.pop(estimator_key, None)
+        if estimator_key in PositionThreadManager.__estimator_pools:
+            logging.getLogger(__name__).info("Releasing position estimator pool, no estimators are using it")
+            PositionThreadManager.__estimator_pools[estimator_key].close()
+            PositionThreadManager.__estimator_pools[estimator_key].terminate()
+            del PositionThreadManager.__estimator_pools[estimator_key]
+
+    def get_estimator_pool_count ():
+        return len(PositionThreadManager.__estimator_pools)
+
+    # runs once in each worker process
+    def initialize_worker (estimator_key, estimator_class, estimator_config):
+        PositionThreadManager.__worker_estimators[estimator_key] = estimator_class(**estimator_config)
+
+    def get_worker_estimator (estimator_key):
+        return PositionThreadManager.__worker_estimators[estimator_key]
+
     def cleanup ():
         if PositionThreadManager.__thread_pool is not None:
             logging.getLogger(__name__).warning("Cleaning up position thread pool")
             PositionThreadManager.__thread_pool.close()
             PositionThreadManager.__thread_pool.terminate()
-            PositionThreadManager.__thread_pool = None
\ No newline at end of file
+            PositionThreadManager.__thread_pool = None
+
+        for estimator_key in list(PositionThreadManager.__estimator_pools.keys()):
+            logging.getLogger(__name__).warning("Cleaning up position estimator pool")
+            PositionThreadManager.__estimator_pools[estimator_key].close()
+            PositionThreadManager.__estimator_pools[estimator_key].terminate()
+            del PositionThreadManager.__estimator_pools[estimator_key]
+        PositionThreadManager.__estimator_pool_holders = {}
@@ -0,0 +1,132 @@
+import unittest
+from position.position_estimator import PositionEstimator
+from position.candidate_scorer import CandidateScorer
+from visual.visual_degrees import VisualDegreesCalculator
+from field.field_map import FieldMap
+import numpy as np
+import logging
+
+class TestCandidateScorer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def get_alt_map (self):
+        return FieldMap( 
+            landmarks= {
+                "n_light": {
+                    "pattern":"3",
+                    "type":"light",
+                    "model":"lights",
+                    "x":26,
+                    "y":132,
+                    "height":43,
+                    "altitude":40,
+                    "confidence":0.25
+                },
+                "e_light": {
+                    "pattern":"2",
+                    "type":"light",
+                    "model":"lights",
+                    "x":136,
+                    "y":-28,
+                    "height":11,
+                    "altitude":29,
+                    "confidence":0.25
+                },
+                "nw_light": {
+                    "pattern":"4",
+                    "type":"light",
+                    "model":"lights",
+                    "x":-112,
+                    "y":130,
+                    "height":42,
+                    "altitude":21,
+                    "confidence":0.25
+                },                
+                "e_ball": {
+                    "pattern":"na",
+                    "type":"gazing_ball",
+                    "model":"basement",
+                    "x":72,
+                    "y":1,
+                    "height":10.5,
+                    "altitude":5.25,
+                    "confidence":0.6
+                },
+                "w_tree": {
+                    "pattern":"na",
+                    "type":"cat_tree",
+                    "model":"basement",
+                    "x":-93,
+                    "y":-52,
+                    "height":24.5,
+                    "altitude":12.25,
+                    "confidence":0.6
+                },   
+				"w_house": {
+				    "pattern":"na",
+				    "type":"house",
+				    "model":"basement",
+				    "x":-57,
+				    "y":1,
+				    "height":7.75,
+				    "altitude":3.875,
+                    "confidence":0.6
+				},                
+            },
+            shape="rectangle",
+            boundaries = {
+                "xmin":-50,
+                "ymin":-150,
+                "xmax":100,
+                "ymax":0
+            },
+            near_boundaries = {
+                "xmin":-100,
+                "ymin":-170,
+                "xmax":120,
+                "ymax":10
+            },
+            )
+
+    def get_located_objects (self):
+        return [
+            {'e_light': {'id': 'e_light', 'time': 1692628315.9, 'x1': 668.4199168682098, 'x2': 708.1502503156662, 'y1': 373.9696774482727, 'y2': 478.90106439590454, 'confidence': 0.4475695, 'camera_heading': 156.0}},
+            {'n_light': {'id': 'n_light', 'time': 1692628317.9, 'x1': 1484.8546743392944, 'x2': 1523.4735455513, 'y1': 137.253227353096, 'y2': 485.55761194229126, 'confidence': 0.35439932, 'camera_heading': 24.0}},
+            {'nw_light': {'id': 'nw_light', 'time': 1692628317.9, 'x1': 497.9999496936798, 'x2': 531.7095794677734, 'y1': 357.876118183136, 'y2': 615.5538032054901, 'confidence': 0.3126791, 'camera_heading': 24.0}}
+        ]
+
+    def test_matches_is_possible (self):
+        curr_map = self.get_alt_map()
+        estimator = PositionEstimator(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False)
+        scorer = CandidateScorer(curr_map, VisualDegreesCalculator(horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0), view_width=1640.0)
+        angles = estimator.extract_object_view_angles(located_objects=self.get_located_objects())
+
+        # random candidates, plus some that sit exactly on a landmark axis
+        candidates = np.vstack([
+            np.random.default_rng(1).uniform(-150, 150, (500, 2)),
+            [[26.0, -50.0], [-40.0, 132.0], [6.0, -50.0]]
+        ])
+
+        possible = scorer.get_possible_mask(candidates, view_angles=angles, allowed_variance=0.5, allowed_heading_variance=0.03)
+        for i, c in enumerate(candidates):
+            self.assertEqual(estimator.is_possible(c[0], c[1], view_angles=angles, allowed_variance=0.5, allowed_heading_variance=0.03), possible[i])
+        self.assertGreater(np.count_nonzero(possible), 0)
+
+        # a view table built once gives the same answer
+        view_table = scorer.build_view_table(angles)
+        self.assertTrue(np.array_equal(possible, scorer.get_possible_mask(candidates, allowed_variance=0.5, allowed_heading_variance=0.03, view_table=view_table)))
+
+    def test_headings_match (self):
+        curr_map = self.get_alt_map()
+        estimator = PositionEstimator(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False)
+        scorer = CandidateScorer(curr_map, VisualDegreesCalculator(horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0), view_width=1640.0)
+        angles = estimator.extract_object_view_angles(located_objects=self.get_located_objects())
+
+        candidates = np.random.default_rng(2).uniform(-150, 150, (200, 2))
+        headings = scorer.get_possible_headings(candidates, scorer.build_view_table(angles))
+        for i, c in enumerate(candidates):
+            expected = estimator.get_possible_headings(c[0], c[1], angles)
+            for j, h in enumerate(expected):
+                self.assertAlmostEqual(h, headings[i][j], places=6)
@@ -0,0 +1,127 @@
+import unittest
+from position.position_estimator_with_clustering import PositionEstimatorWithClustering
+from position.estimator_mode import EstimatorMode
+from position.candidate_scorer import CandidateScorer
+from visual.visual_degrees import VisualDegreesCalculator
+from field.field_map import FieldMap
+import numpy as np
+import logging
+
+class TestGridLocalizer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def get_alt_map (self):
+        return FieldMap( 
+            landmarks= {
+                "n_light": {
+                    "pattern":"3",
+                    "type":"light",
+                    "model":"lights",
+                    "x":26,
+                    "y":132,
+                    "height":43,
+                    "altitude":40,
+                    "confidence":0.25
+                },
+                "e_light": {
+                    "pattern":"2",
+                    "type":"light",
+                    "model":"lights",
+                    "x":136,
+                    "y":-28,
+                    "height":11,
+                    "altitude":29,
+                    "confidence":0.25
+                },
+                "nw_light": {
+                    "pattern":"4",
+                    "type":"light",
+                    "model":"lights",
+                    "x":-112,
+                    "y":130,
+                    "height":42,
+                    "altitude":21,
+                    "confidence":0.25
+                },                
+                "e_ball": {
+                    "pattern":"na",
+                    "type":"gazing_ball",
+                    "model":"basement",
+                    "x":72,
+                    "y":1,
+                    "height":10.5,
+                    "altitude":5.25,
+                    "confidence":0.6
+                },
+                "w_tree": {
+                    "pattern":"na",
+                    "type":"cat_tree",
+                    "model":"basement",
+                    "x":-93,
+                    "y":-52,
+                    "height":24.5,
+                    "altitude":12.25,
+                    "confidence":0.6
+                },   
+				"w_house": {
+				    "pattern":"na",
+				    "type":"house",
+				    "model":"basement",
+				    "x":-57,
+				    "y":1,
+				    "height":7.75,
+				    "altitude":3.875,
+                    "confidence":0.6
+				},                
+            },
+            shape="rectangle",
+            boundaries = {
+                "xmin":-50,
+                "ymin":-150,
+                "xmax":100,
+                "ymax":0
+            },
+            near_boundaries = {
+                "xmin":-100,
+                "ymin":-170,
+                "xmax":120,
+                "ymax":10
+            },
+            )
+
+    def get_located_objects (self):
+        return [
+            {'e_light': {'id': 'e_light', 'time': 1692628315.9, 'x1': 668.4199168682098, 'x2': 708.1502503156662, 'y1': 373.9696774482727, 'y2': 478.90106439590454, 'confidence': 0.4475695, 'camera_heading': 156.0}},
+            {'n_light': {'id': 'n_light', 'time': 1692628317.9, 'x1': 1484.8546743392944, 'x2': 1523.4735455513, 'y1': 137.253227353096, 'y2': 485.55761194229126, 'confidence': 0.35439932, 'camera_heading': 24.0}},
+            {'nw_light': {'id': 'nw_light', 'time': 1692628317.9, 'x1': 497.9999496936798, 'x2': 531.7095794677734, 'y1': 357.876118183136, 'y2': 615.5538032054901, 'confidence': 0.3126791, 'camera_heading': 24.0}}
+        ]
+
+    def test_coords_and_heading_grid (self):
+        curr_map = self.get_alt_map()
+        estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False, estimator_mode=EstimatorMode.GRID)
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading (located_objects = self.get_located_objects(),  view_altitude = 8.75)
+
+        # actual coordinates are 6, -50 with heading of around 30
+        self.assertGreaterEqual(x,0)
+        self.assertLessEqual(x,70)
+
+        self.assertGreaterEqual(y,-100)
+        self.assertLessEqual(y,0)
+
+        self.assertGreaterEqual(heading,6)
+        self.assertLessEqual(heading,40)
+
+        # the grid result should closely agree with the visible angles
+        scorer = CandidateScorer(curr_map, VisualDegreesCalculator(horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0), view_width=1640.0)
+        angle_variance, heading_spread = scorer.score_candidates(np.array([[x, y]]), view_angles=basis['angles'])
+        self.assertLessEqual(angle_variance[0], 0.05)
+        self.assertLessEqual(heading_spread[0], 0.025)
+
+    def test_not_enough_landmarks (self):
+        curr_map = self.get_alt_map()
+        estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False, estimator_mode=EstimatorMode.GRID)
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading (located_objects = self.get_located_objects()[0:1],  view_altitude = 8.75)
+        self.assertIsNone(x)
+        self.assertIsNone(y)
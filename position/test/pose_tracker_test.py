@@ -0,0 +1,111 @@
+import unittest
+from position.pose_tracker import PoseTracker
+from position.confidence import Confidence
+import logging
+import math
+
+class TestPoseTracker(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_not_tracking_until_fix (self):
+        tracker = PoseTracker()
+        self.assertFalse(tracker.is_initialized())
+        tracker.predict_forward(10.0)
+        self.assertEqual(tracker.get_pose(), (None, None, None))
+        self.assertFalse(tracker.is_confident(100.0, 100.0))
+
+    def test_predict_moves (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=0.0, confidence=Confidence.CONFIDENCE_HIGH, timestamp=1.0)
+
+        # face east, drive 10
+        tracker.predict_rotation(90.0)
+        tracker.predict_forward(10.0)
+        x, y, heading = tracker.get_pose()
+        self.assertAlmostEqual(x, 10.0, 3)
+        self.assertAlmostEqual(y, 0.0, 3)
+        self.assertAlmostEqual(heading, 90.0, 3)
+
+        # keep turning right past south, heading wraps to negative
+        tracker.predict_rotation(135.0)
+        self.assertAlmostEqual(tracker.get_pose()[2], -135.0, 3)
+
+    def test_uncertainty_grows_with_movement (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=0.0, confidence=Confidence.CONFIDENCE_HIGH, timestamp=1.0)
+        self.assertTrue(tracker.is_confident(max_position_uncertainty=6.0, max_heading_uncertainty=8.0))
+
+        start_pos = tracker.get_position_uncertainty()
+        start_heading = tracker.get_heading_uncertainty()
+        for i in range(5):
+            tracker.predict_forward(20.0)
+            tracker.predict_rotation(30.0)
+
+        self.assertGreater(tracker.get_position_uncertainty(), start_pos)
+        self.assertGreater(tracker.get_heading_uncertainty(), start_heading)
+        self.assertFalse(tracker.is_confident(max_position_uncertainty=6.0, max_heading_uncertainty=8.0))
+
+    def test_bearing_corrects_heading (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=0.0, confidence=Confidence.CONFIDENCE_HIGH, timestamp=1.0)
+
+        # odometry thinks we turned 40, but we actually turned 30
+        tracker.predict_rotation(40.0)
+        before = tracker.get_heading_uncertainty()
+
+        # landmark due north, seen 30 degrees to the left
+        tracker.correct_with_bearing(landmark_x=0.0, landmark_y=100.0, relative_bearing=-30.0)
+        self.assertLess(abs(tracker.get_pose()[2] - 30.0), 5.0)
+        self.assertLess(tracker.get_heading_uncertainty(), before)
+
+    def test_bearings_and_ranges_correct_position (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=0.0, confidence=Confidence.CONFIDENCE_HIGH, timestamp=1.0)
+
+        # commanded 50 forward, only made it 40
+        tracker.predict_forward(50.0)
+        actual_x, actual_y, actual_heading = 0.0, 40.0, 0.0
+
+        landmarks = [(-30.0, 100.0), (40.0, 90.0), (60.0, 20.0)]
+        for i in range(3):
+            for lx, ly in landmarks:
+                bearing = math.degrees(math.atan2(lx - actual_x, ly - actual_y)) - actual_heading
+                tracker.correct_with_bearing(landmark_x=lx, landmark_y=ly, relative_bearing=bearing)
+                tracker.correct_with_range(landmark_x=lx, landmark_y=ly, distance=math.dist((lx, ly), (actual_x, actual_y)), is_lidar=True)
+
+        x, y, heading = tracker.get_pose()
+        logging.getLogger(__name__).info(f"Corrected to ({x}, {y}) heading {heading} +/- {tracker.get_position_uncertainty()}")
+        self.assertLess(math.dist((x, y), (actual_x, actual_y)), 2.0)
+        self.assertLess(abs(heading - actual_heading), 2.0)
+
+    def test_fix_pulls_track (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=170.0, confidence=Confidence.CONFIDENCE_LOW, timestamp=1.0)
+
+        # a confident fix just across the 180 boundary should average the short way around
+        tracker.correct_with_fix(x=10.0, y=10.0, heading=-170.0, confidence=Confidence.CONFIDENCE_FACT, timestamp=2.0)
+        x, y, heading = tracker.get_pose()
+        self.assertGreater(x, 9.0)
+        self.assertGreater(y, 9.0)
+        self.assertGreater(abs(heading), 170.0)
+        self.assertEqual(tracker.get_confidence(), Confidence.CONFIDENCE_FACT)
+        self.assertEqual(tracker.get_last_update(), 2.0)
+
+        tracker.reset()
+        self.assertFalse(tracker.is_initialized())
+
+    def test_distant_fix_restarts_track (self):
+        tracker = PoseTracker()
+        tracker.correct_with_fix(x=0.0, y=0.0, heading=0.0, confidence=Confidence.CONFIDENCE_HIGH, timestamp=1.0)
+
+        # vehicle was pushed somewhere else entirely
+        tracker.correct_with_fix(x=80.0, y=-60.0, heading=90.0, confidence=Confidence.CONFIDENCE_MEDIUM, timestamp=2.0)
+        x, y, heading = tracker.get_pose()
+        self.assertAlmostEqual(x, 80.0, 3)
+        self.assertAlmostEqual(y, -60.0, 3)
+        self.assertAlmostEqual(heading, 90.0, 3)
+
+if __name__ == '__main__':
+    unittest.main()
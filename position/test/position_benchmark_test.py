@@ -0,0 +1,32 @@
+import unittest
+from position.position_benchmark import PositionBenchmark
+from position.estimator_mode import EstimatorMode
+import logging
+
+class TestPositionBenchmark(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_report (self):
+        benchmark = PositionBenchmark(
+            fixture_dir = 'position/test/resources/benchmark',
+            estimators = ['PositionEstimatorWithClustering'],
+            modes = [EstimatorMode.CLOSED_FORM, EstimatorMode.GRID],
+            multithreading = [False],
+            repetitions = 2)
+        self.assertGreater(len(benchmark.get_fixtures()), 0)
+
+        report = benchmark.run()
+        self.assertEqual(len(report['results']), 2)
+        for result in report['results']:
+            self.assertEqual(result['runs'], 2 * len(report['fixtures']))
+            self.assertEqual(result['failures'], 0)
+            self.assertGreater(result['fixes_per_sec'], 0)
+            self.assertLessEqual(result['latency']['p50'], result['latency']['p99'])
+            self.assertLess(result['position_error']['p50'], 36)
+            self.assertLess(result['heading_error']['p50'], 15)
+            self.assertIn('heading_n_lidar', result['fixtures'])
+
+if __name__ == '__main__':
+    unittest.main()
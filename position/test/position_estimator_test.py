@@ -421,6 +421,23 @@ class TestPositionEstimator(unittest.TestCase):
             self.assertGreater(p, 0)
         #logging.getLogger(__name__).info(f"Possible: {possible}")
 
+    def test_pair_missing_from_map (self):
+        curr_map = self.get_basic_map()
+        estimator = PositionEstimator(curr_map, horizontal_fov = 44.0, vertical_fov = 27.333, view_width=1280.0, view_height=720.0)
+
+        # 'w9' isn't on the map, so there is no geometry for the pair and it should be skipped
+        view_angles = {'n1':[{'confidence':0.4, 'relative_deg':{'w9':30.0}}]}
+        coords = estimator.get_possible_coords_isolated(
+            landmark_id='n1',
+            other_landmark_id='w9',
+            distances={},
+            view_angles=view_angles,
+            filter_out_of_bounds=True,
+            allowed_variance=0.3,
+            allowed_heading_variance=0.1)
+
+        self.assertEqual(coords, [])
+
     def test_not_enough_located_objects (self):
         curr_map = self.get_basic_map()
 
@@ -262,3 +262,79 @@ class TestPositionEstimatorWithClustering(unittest.TestCase):
         #x, y, heading, confidence = estimator.get_coords_and_heading (located_objects,  41.75, estimator_mode = EstimatorMode.VERY_PRECISE)
         #logging.getLogger(__name__).info(f"VERY PRECISE : ({x},{y} - Heading {heading})")
 
+    def test_coords_and_heading_closed_form (self):
+        curr_map = self.get_alt_map()
+
+        located_objects =  [
+            {
+                'e_light': {
+                    'id': 'e_light', 'time': 1692628315.9, 'x1': 668.4199168682098, 'x2': 708.1502503156662, 
+                    'y1': 373.9696774482727, 'y2': 478.90106439590454, 'confidence': 0.4475695, 'camera_heading': 156.0
+                }
+            }, {
+                'n_light': {
+                    'id': 'n_light', 'time': 1692628317.9, 'x1': 1484.8546743392944, 'x2': 1523.4735455513, 
+                    'y1': 137.253227353096, 'y2': 485.55761194229126, 'confidence': 0.35439932, 'camera_heading': 24.0
+                }
+            }, {
+                'nw_light': {
+                    'id': 'nw_light', 'time': 1692628317.9, 'x1': 497.9999496936798, 'x2': 531.7095794677734, 
+                    'y1': 357.876118183136, 'y2': 615.5538032054901, 'confidence': 0.3126791, 'camera_heading': 24.0
+                }
+            }]
+
+        estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False, estimator_mode=EstimatorMode.CLOSED_FORM)
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading (located_objects = located_objects,  view_altitude = 8.75)
+
+        # actual coordinates are 6, -50 with heading of around 30
+        self.assertGreaterEqual(x,0)
+        self.assertLessEqual(x,70)
+
+        self.assertGreaterEqual(y,-100)
+        self.assertLessEqual(y,-25)
+
+        self.assertGreaterEqual(heading,6)
+        self.assertLessEqual(heading,40)
+        self.assertEqual(Confidence.CONFIDENCE_MEDIUM, confidence)
+
+        logging.getLogger(__name__).info(f"CLOSED FORM : ({x},{y} - Heading {heading})")
+
+    def test_coords_and_heading_with_prior (self):
+        curr_map = self.get_alt_map()
+
+        located_objects =  [
+            {
+                'e_light': {
+                    'id': 'e_light', 'time': 1692628315.9, 'x1': 668.4199168682098, 'x2': 708.1502503156662, 
+                    'y1': 373.9696774482727, 'y2': 478.90106439590454, 'confidence': 0.4475695, 'camera_heading': 156.0
+                }
+            }, {
+                'n_light': {
+                    'id': 'n_light', 'time': 1692628317.9, 'x1': 1484.8546743392944, 'x2': 1523.4735455513, 
+                    'y1': 137.253227353096, 'y2': 485.55761194229126, 'confidence': 0.35439932, 'camera_heading': 24.0
+                }
+            }, {
+                'nw_light': {
+                    'id': 'nw_light', 'time': 1692628317.9, 'x1': 497.9999496936798, 'x2': 531.7095794677734, 
+                    'y1': 357.876118183136, 'y2': 615.5538032054901, 'confidence': 0.3126791, 'camera_heading': 24.0
+                }
+            }]
+
+        estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False, estimator_mode=EstimatorMode.FAST)
+
+        # a recent, nearby prior keeps the search close to it
+        prior = {'x':50.0, 'y':-38.0, 'heading':25.0, 'age':1.0}
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading (located_objects = located_objects,  view_altitude = 8.75, prior = prior)
+        self.assertLessEqual(estimator.get_distance(x, y, prior['x'], prior['y']), estimator.get_prior_radius(prior))
+        self.assertGreaterEqual(heading,6)
+        self.assertLessEqual(heading,40)
+
+        # a prior on the wrong side of the map falls back to searching everywhere
+        prior = {'x':-60.0, 'y':100.0, 'heading':0.0, 'age':1.0}
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading (located_objects = located_objects,  view_altitude = 8.75, prior = prior)
+        self.assertGreaterEqual(x,0)
+        self.assertLessEqual(x,70)
+        self.assertGreaterEqual(y,-100)
+        self.assertLessEqual(y,-25)
+
+        logging.getLogger(__name__).info(f"WITH PRIOR : ({x},{y} - Heading {heading})")
@@ -0,0 +1,135 @@
+import unittest
+from position.position_estimator_with_clustering import PositionEstimatorWithClustering
+from position.position_thread_manager import PositionThreadManager
+from position.estimator_mode import EstimatorMode
+from field.field_map import FieldMap
+import logging
+
+class TestPositionThreadManager(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def get_alt_map (self):
+        return FieldMap( 
+            landmarks= {
+                "n_light": {
+                    "pattern":"3",
+                    "type":"light",
+                    "model":"lights",
+                    "x":26,
+                    "y":132,
+                    "height":43,
+                    "altitude":40,
+                    "confidence":0.25
+                },
+                "e_light": {
+                    "pattern":"2",
+                    "type":"light",
+                    "model":"lights",
+                    "x":136,
+                    "y":-28,
+                    "height":11,
+                    "altitude":29,
+                    "confidence":0.25
+                },
+                "nw_light": {
+                    "pattern":"4",
+                    "type":"light",
+                    "model":"lights",
+                    "x":-112,
+                    "y":130,
+                    "height":42,
+                    "altitude":21,
+                    "confidence":0.25
+                },                
+                "e_ball": {
+                    "pattern":"na",
+                    "type":"gazing_ball",
+                    "model":"basement",
+                    "x":72,
+                    "y":1,
+                    "height":10.5,
+                    "altitude":5.25,
+                    "confidence":0.6
+                },
+                "w_tree": {
+                    "pattern":"na",
+                    "type":"cat_tree",
+                    "model":"basement",
+                    "x":-93,
+                    "y":-52,
+                    "height":24.5,
+                    "altitude":12.25,
+                    "confidence":0.6
+                },   
+				"w_house": {
+				    "pattern":"na",
+				    "type":"house",
+				    "model":"basement",
+				    "x":-57,
+				    "y":1,
+				    "height":7.75,
+				    "altitude":3.875,
+                    "confidence":0.6
+				},                
+            },
+            shape="rectangle",
+            boundaries = {
+                "xmin":-50,
+                "ymin":-150,
+                "xmax":100,
+                "ymax":0
+            },
+            near_boundaries = {
+                "xmin":-100,
+                "ymin":-170,
+                "xmax":120,
+                "ymax":10
+            },
+            )
+
+    def get_located_objects (self):
+        return [
+            {'e_light': {'id': 'e_light', 'time': 1692628315.9, 'x1': 668.4199168682098, 'x2': 708.1502503156662, 'y1': 373.9696774482727, 'y2': 478.90106439590454, 'confidence': 0.4475695, 'camera_heading': 156.0}},
+            {'n_light': {'id': 'n_light', 'time': 1692628317.9, 'x1': 1484.8546743392944, 'x2': 1523.4735455513, 'y1': 137.253227353096, 'y2': 485.55761194229126, 'confidence': 0.35439932, 'camera_heading': 24.0}},
+            {'nw_light': {'id': 'nw_light', 'time': 1692628317.9, 'x1': 497.9999496936798, 'x2': 531.7095794677734, 'y1': 357.876118183136, 'y2': 615.5538032054901, 'confidence': 0.3126791, 'camera_heading': 24.0}}
+        ]
+
+    def test_pool_matches_single_process (self):
+        curr_map = self.get_alt_map()
+        results = []
+        for use_multithreading in [False, True, True]:
+            estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=use_multithreading, estimator_mode=EstimatorMode.CLOSED_FORM)
+            results.append(estimator.get_coords_and_heading (located_objects = self.get_located_objects(),  view_altitude = 8.75)[0:3])
+
+        for x, y, heading in results[1:]:
+            self.assertAlmostEqual(results[0][0], x, places=6)
+            self.assertAlmostEqual(results[0][1], y, places=6)
+            self.assertAlmostEqual(results[0][2], heading, places=6)
+
+    def test_pool_shared_and_released (self):
+        # the same map loaded twice shares one pool, which goes away once both estimators are cleaned up
+        pools_before = PositionThreadManager.get_estimator_pool_count()
+        estimators = [PositionEstimatorWithClustering(self.get_alt_map(), horizontal_fov = 70.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=True, estimator_mode=EstimatorMode.CLOSED_FORM) for i in range(2)]
+        for estimator in estimators:
+            estimator.get_coords_and_heading (located_objects = self.get_located_objects(),  view_altitude = 8.75)
+        self.assertEqual(pools_before + 1, PositionThreadManager.get_estimator_pool_count())
+
+        estimators[0].cleanup()
+        self.assertEqual(pools_before + 1, PositionThreadManager.get_estimator_pool_count())
+        estimators[1].cleanup()
+        self.assertEqual(pools_before, PositionThreadManager.get_estimator_pool_count())
+
+    def test_compact_observations (self):
+        curr_map = self.get_alt_map()
+        estimator = PositionEstimatorWithClustering(curr_map, horizontal_fov = 71.0, vertical_fov = 49.4, view_width=1640.0, view_height=1232.0, use_multithreading=False)
+        angles = estimator.extract_object_view_angles(located_objects=self.get_located_objects())
+        distances = estimator.extract_distances(view_angles=angles, view_altitude=8.75)
+
+        compact_angles, compact_distances = estimator.get_compact_observations(angles, distances)
+        self.assertEqual(set(angles.keys()), set(compact_angles.keys()))
+        for landmark_id in compact_angles:
+            self.assertEqual(1, len(compact_angles[landmark_id]))
+            self.assertNotIn('width_pix', compact_angles[landmark_id][0])
+            self.assertEqual(distances[landmark_id]['ground'], compact_distances[landmark_id]['ground'])
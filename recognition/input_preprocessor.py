@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+import math
+
+# turns camera frames into model input, reusing the same buffers from one frame to the next.
+# buffers are kept per input shape / type, so models that take the same input share them.
+# grayscale frames (the picamera2 lores Y plane) are resized once, then copied into all three channels
+# of the model input in place. color frames are converted to gray first, since the models do better with gray.
+# anything returned points into a buffer that is overwritten by the next call with the same shape
+class InputPreprocessor:
+    def __init__(self):
+        self.__buffers = {}
+
+    # resizes every slice of every image to the model input.
+    # returns the slices stacked into a single uint8 batch, and for each slice,
+    # (image number, horizontal pixel offset, slice width, image height, image width)
+    def prepare (self, images, width, height):
+        slice_positions = []
+        for image_num, image in enumerate(images):
+            initial_h, initial_w = image.shape[:2]
+            slice_count = self.__get_slice_count(initial_w, initial_h)
+
+            # how many pixels to adjust bounding box by, given we may only be looking at a slice of the image
+            slice_width = initial_w / slice_count
+            for i in range(slice_count):
+                slice_positions.append((image_num, i * slice_width, slice_width, initial_h, initial_w))
+
+        batch = self.__get_buffer('batch', (len(slice_positions), height, width, 3), np.uint8)
+        resized = self.__get_buffer('resized', (height, width), np.uint8)
+
+        row = 0
+        for image in images:
+            for img_slice in self.__get_vertical_slices(image):
+                # picamera2 will have 2d image shape, cv2 will have 3d (channels)
+                if len(img_slice.shape) == 3:
+                    gray = self.__get_buffer('gray', img_slice.shape[:2], np.uint8)
+                    cv2.cvtColor(img_slice, cv2.COLOR_BGR2GRAY, dst=gray)
+                    img_slice = gray
+
+                cv2.resize(img_slice, (width, height), dst=resized)
+                cv2.cvtColor(resized, cv2.COLOR_GRAY2RGB, dst=batch[row])
+                row += 1
+
+        return batch, slice_positions
+
+    # scales a uint8 batch to the -1 to 1 range float models expect
+    def normalize (self, batch):
+        normalized = self.__get_buffer('normalized', batch.shape, np.float32)
+        np.subtract(batch, 127.5, out=normalized, dtype=np.float32)
+        np.divide(normalized, 127.5, out=normalized)
+        return normalized
+
+    # frames wider than they are tall are split into square-ish slices, so each slice fills the model input
+    def __get_slice_count (self, initial_w, initial_h):
+        return max(1, math.floor(initial_w / initial_h))
+
+    def __get_vertical_slices (self, image):
+        initial_h, initial_w = image.shape[:2]
+        slice_count = self.__get_slice_count(initial_w, initial_h)
+        if slice_count > 1:
+            return np.split(image, slice_count, axis=1)
+        return [image]
+
+    def __get_buffer (self, purpose, shape, dtype):
+        key = (purpose, tuple(shape), np.dtype(dtype).str)
+        if key not in self.__buffers:
+            self.__buffers[key] = np.empty(shape, dtype=dtype)
+        return self.__buffers[key]
@@ -0,0 +1,45 @@
+import unittest
+from recognition.input_preprocessor import InputPreprocessor
+import numpy as np
+import cv2
+import logging
+
+class TestInputPreprocessor(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_slices (self):
+        preprocessor = InputPreprocessor()
+        wide = np.random.randint(0, 255, (480, 1280), dtype=np.uint8)
+        color = np.random.randint(0, 255, (300, 300, 3), dtype=np.uint8)
+        batch, slice_positions = preprocessor.prepare([wide, color], 64, 64)
+
+        # the wide gray frame is split in two, the square color frame is not
+        self.assertEqual((3, 64, 64, 3), batch.shape)
+        self.assertEqual([(0, 0.0, 640.0, 480, 1280), (0, 640.0, 640.0, 480, 1280), (1, 0.0, 300.0, 300, 300)], slice_positions)
+
+        # same as converting each slice on its own
+        expected = cv2.resize(cv2.cvtColor(wide[:, 640:], cv2.COLOR_GRAY2RGB), (64, 64))
+        self.assertTrue(np.array_equal(expected, batch[1]))
+        expected = cv2.cvtColor(cv2.resize(cv2.cvtColor(color, cv2.COLOR_BGR2GRAY), (64, 64)), cv2.COLOR_GRAY2RGB)
+        self.assertTrue(np.array_equal(expected, batch[2]))
+
+        normalized = preprocessor.normalize(batch)
+        self.assertEqual(np.float32, normalized.dtype)
+        self.assertTrue(np.allclose((np.float32(batch) - 127.5) / 127.5, normalized))
+
+    def test_buffers_reused (self):
+        preprocessor = InputPreprocessor()
+        frame = np.random.randint(0, 255, (640, 640), dtype=np.uint8)
+        first, _ = preprocessor.prepare([frame, frame], 320, 320)
+        second, _ = preprocessor.prepare([frame, frame], 320, 320)
+        self.assertIs(first, second)
+        self.assertIs(preprocessor.normalize(first), preprocessor.normalize(second))
+
+        # a different model input gets its own buffer
+        other, _ = preprocessor.prepare([frame, frame], 300, 300)
+        self.assertIsNot(first, other)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -49,3 +49,23 @@ class TestTFLiteObjectLocator(unittest.TestCase):
         located_objects = locator.find_objects_on_camera(camera = self.__get_right_camera(), object_filter = None, min_confidence = 0.1)
         
         logging.getLogger(__name__).info(f"Right Cam Located {located_objects}")
+
+
+    def testBatchedMatchesUnbatched (self):
+        unbatched = TFLiteObjectLocator(model_configs = self.__get_model_configs(), keep_latest_image = True)
+        batched = TFLiteObjectLocator(model_configs = self.__get_model_configs(), keep_latest_image = True, batch_inference = True)
+
+        # a couple of frames, the way a smoothing cycle would hand them over
+        images = [self.__get_left_camera().capture_image(), self.__get_right_camera().capture_image()]
+        expected = [unbatched.find_objects_in_image(image = i, min_confidence = 0.1) for i in images]
+        located = batched.find_objects_in_images(images = images, min_confidence = 0.1)
+
+        self.assertEqual(len(expected), len(located))
+        for e, l in zip(expected, located):
+            self.assertEqual([o['object'] for o in e], [o['object'] for o in l])
+            for eo, lo in zip(e, l):
+                self.assertAlmostEqual(eo['x_center'], lo['x_center'], 1)
+                self.assertAlmostEqual(eo['confidence'], lo['confidence'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
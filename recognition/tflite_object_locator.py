@@ -7,15 +7,26 @@ except:
 import time
 import logging
 from recognition.object_locator import ObjectLocator
-import math
+from recognition.input_preprocessor import InputPreprocessor
+from camera.frame_ring_buffer import FrameRingBuffer
+from timing.stage_timer import StageTimer
 
 class TFLiteObjectLocator (ObjectLocator):
-    def __init__(self, model_configs = {}, keep_latest_image = True, preload_models = True):
+    # batch_inference runs all slices of all images through a model in one invoke, for models that allow it.
+    # debug_image_dir, if given, is where every prepared model input gets written
+    def __init__(self, model_configs = {}, keep_latest_image = True, preload_models = True, stage_timer : StageTimer = None, batch_inference = False, debug_image_dir = None):
         self.__models = {}
         self.__labels = {}
         self.__model_configs = model_configs
         self.__latest_image = None
         self.__keep_latest_image = keep_latest_image
+        self.__stage_timer = stage_timer if stage_timer is not None else StageTimer()
+        self.__batch_inference = batch_inference
+        self.__debug_image_dir = debug_image_dir
+        self.__batch_sizes = {} # current input batch size of each model, 1 if not listed
+        self.__unbatchable_models = set()
+        self.__input_signatures = {} # (height, width, floating) of each loaded model
+        self.__preprocessor = InputPreprocessor()
         
         if preload_models:
             for model_name in model_configs:
@@ -25,6 +36,24 @@ class TFLiteObjectLocator (ObjectLocator):
     def unload_models (self):
         self.__models = {}
         self.__labels = {}
+        self.__batch_sizes = {}
+        self.__input_signatures = {}
+
+    # makes sure every configured model is loaded and its tensors allocated
+    def load_models (self):
+        for model_name in self.__model_configs:
+            self.__load_model(model_name)
+
+    # interpreters can't be pickled, a copy sent to another process loads its own models
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_TFLiteObjectLocator__models"] = {}
+        state["_TFLiteObjectLocator__labels"] = {}
+        state["_TFLiteObjectLocator__latest_image"] = None
+        state["_TFLiteObjectLocator__batch_sizes"] = {}
+        state["_TFLiteObjectLocator__input_signatures"] = {}
+        state["_TFLiteObjectLocator__preprocessor"] = InputPreprocessor()
+        return state
 
     def __load_model (self, model_name):
         if model_name not in self.__labels:
@@ -34,13 +63,19 @@ class TFLiteObjectLocator (ObjectLocator):
                 interpreter = tflite.Interpreter(model_path=self.__model_configs[model_name]['ModelFile'], num_threads=4)
                 interpreter.allocate_tensors()
                 self.__models[model_name] = interpreter
+
+                # input size / type never change, only the batch size
+                input_details = interpreter.get_input_details()
+                self.__input_signatures[model_name] = (int(input_details[0]['shape'][1]), int(input_details[0]['shape'][2]), input_details[0]['dtype'] == np.float32)
                 #logging.getLogger(__name__).info(f"Model {model_name}: TFLite interpreter loaded.")
 
 
     def find_objects_on_camera(self, camera, object_filter = None, min_confidence = 0.4):
-        captured = camera.capture_image()
+        with self.__stage_timer.stage('capture'):
+            captured = camera.capture_image()
         if captured is not None:
-            preprocessed = camera.preprocess_image(captured)
+            with self.__stage_timer.stage('preprocess'):
+                preprocessed = camera.preprocess_image(captured)
             return self.find_objects_in_image(image = preprocessed, object_filter=object_filter, min_confidence=min_confidence)
         logging.getLogger(__name__).warning("Null image received from camera")
         return []
@@ -50,182 +85,152 @@ class TFLiteObjectLocator (ObjectLocator):
 
     def find_objects_in_image_file (self, image_file, object_filter = None, min_confidence = 0.4):
         #image = cv2.imread(image_file)
-        image = np.load(image_file)
+        with self.__stage_timer.stage('load_image'):
+            image = np.load(image_file)
         return self.find_objects_in_image(image = image, object_filter=object_filter, min_confidence=min_confidence)
 
+    # finds objects in a frame captured into a FrameRingBuffer, possibly by another process.
+    # the frame is read in place from shared memory
+    def find_objects_in_frame_slot (self, frame_slot, object_filter = None, min_confidence = 0.4):
+        with self.__stage_timer.stage('load_image'):
+            image = FrameRingBuffer.read(frame_slot)
+        return self.find_objects_in_image(image = image, object_filter=object_filter, min_confidence=min_confidence)
 
-    def __get_vertical_slices(self, image):
-        slices = []
-        initial_h = None
-        initial_w = None
-
-        if len(image.shape) == 3:
-            initial_h, initial_w, _ = image.shape
-        else:
-            initial_h, initial_w = image.shape
-
-        #logging.getLogger(__name__).info(f"Full Height: {initial_h}, Width: {initial_w}, Dimensions: {len(image.shape)}")
+    # same as find_objects_in_frame_slot, for several frames at once. returns a list of detected objects for each frame
+    def find_objects_in_frame_slots (self, frame_slots, object_filter = None, min_confidence = 0.4):
+        with self.__stage_timer.stage('load_image'):
+            images = [FrameRingBuffer.read(s) for s in frame_slots]
+        return self.find_objects_in_images(images = images, object_filter=object_filter, min_confidence=min_confidence)
 
-        v_slices = math.floor(initial_w / initial_h)
-        if v_slices > 1:
-            #logging.getLogger(__name__).info(f"Slicing image into {v_slices}")
-            slices = np.split(image, v_slices, axis=1)
-            for s in slices:
-                if len(s.shape) == 3:
-                    s_h, s_w, _ = s.shape
-                else:
-                    s_h, s_w = s.shape
-                #logging.getLogger(__name__).info(f"Slice Height: {s_h}, Width: {s_w}, Dimensions: {len(s.shape)}")
 
-        else:
-            slices.append(image)
-        return slices
+    def find_objects_in_image(self, image, object_filter = None, min_confidence = 0.4):
+        return self.find_objects_in_images(images = [image], object_filter=object_filter, min_confidence=min_confidence)[0]
 
+    # finds objects in several images (like the frames of a smoothing cycle) in one pass over the models.
+    # returns a list of detected objects for each image, in the same order
+    def find_objects_in_images(self, images, object_filter = None, min_confidence = 0.4):
+        if self.__keep_latest_image and len(images) > 0:
+            self.__latest_image = images[-1] # for retrieving later
 
-    def find_objects_in_image(self, image, object_filter = None, min_confidence = 0.4):
-        if self.__keep_latest_image:
-            self.__latest_image = image # for retrieving later
-
-        initial_h = None
-        initial_w = None
-        last_width = None
-        last_height = None
-        last_input_data = None
-        last_floating_model = None
-        detected_objects = []
+        # model input, keyed by input signature, so models that take the same input share it
+        prepared_inputs = {}
+        detected_objects = [[] for i in images]
         
         for m in self.__model_configs:
             #logging.getLogger(__name__).info(f"Checking model {m} for objects")
             self.__load_model(m)
             interpreter = self.__models[m]
-            input_details = interpreter.get_input_details()
-            output_details = interpreter.get_output_details()
-            height = input_details[0]['shape'][1]
-            width = input_details[0]['shape'][2]
-            floating_model = False
-            if input_details[0]['dtype'] == np.float32:
-                floating_model = True
-            
-            # don't reconvert the image if we dont need to
-            input_data = None
-            if height == last_height and width == last_width and last_input_data is not None and last_floating_model == floating_model:
-                input_data = last_input_data
-            else:
-                #logging.getLogger(__name__).info("Converting image, since this is first model pass")
-                last_width = width
-                last_height = height
-                last_floating_model = floating_model
-                prepared_slices = [] # image slices resized as necessary for model input
-
-                # picamera2 will have 2d image shape, cv2 will have 3d (channels)
-                picture = None
-                if len(image.shape) == 3: # cv2 camera
-                    # model does better with gray scale
-                    initial_h, initial_w = image.shape
-
-                    hires_slices = self.__get_vertical_slices(image=image)
-                    for i,img_slice in enumerate(hires_slices):
-                        picture = cv2.cvtColor(img_slice, cv2.COLOR_BGR2GRAY)
-                        picture = cv2.resize(picture, (width, height), cv2.INTER_CUBIC) # INTER_CUBIC, INTER_AREA, INTER_LINEAR, INTER_NEAREST
-                        picture = cv2.cvtColor(picture, cv2.COLOR_GRAY2RGB)
-                        cv2.imwrite(f'/tmp/tflite_locator_{i}.png', picture)
-                        prepared_slices.append(picture)
-                    
-                else:
-                    initial_h, initial_w = image.shape
-
-                    hires_slices = self.__get_vertical_slices(image=image)
-                    for i,img_slice in enumerate(hires_slices):
-                        rgb = cv2.cvtColor(img_slice, cv2.COLOR_GRAY2RGB)
-                        picture = cv2.resize(rgb, (width, height))
-                        cv2.imwrite(f'/tmp/tflite_locator_{i}.png', picture)
-                        prepared_slices.append(picture)
-
-                input_data = []
-                for input_slice in prepared_slices:
-                    expanded = np.expand_dims(input_slice, axis=0)
+            height, width, floating_model = self.__input_signatures[m]
+
+            # don't reconvert the images if we dont need to
+            if (height, width, floating_model) not in prepared_inputs:
+                with self.__stage_timer.stage('prepare_input'):
+                    #logging.getLogger(__name__).info("Converting image, since this is first model pass")
+                    if (height, width, False) not in prepared_inputs:
+                        # every slice of every image, one row each, and where each slice came from
+                        prepared_inputs[(height, width, False)] = self.__preprocessor.prepare(images, width, height)
+                        if self.__debug_image_dir is not None:
+                            for i, picture in enumerate(prepared_inputs[(height, width, False)][0]):
+                                cv2.imwrite(f'{self.__debug_image_dir}/tflite_locator_{i}.png', picture)
+
                     if floating_model:
-                        expanded = (np.float32(expanded) - 127.5) / 127.5
-
-                    input_data.append(expanded)
-
-
-                last_input_data = input_data
-
-            for i, img_part in enumerate(input_data):
-                # how many pixels to adjust bounding box by, given we may only be looking at a slice of the image
-                slice_width = initial_w / len(input_data)
-                horz_pixel_offset = i * slice_width
-
-                # invoke the detection model
-                interpreter.set_tensor(input_details[0]['index'], img_part)
-                interpreter.invoke()
-
-                # retrieve the detected bound boxes
-                detected_boxes = interpreter.get_tensor(output_details[0]['index'])
-                detected_classes = interpreter.get_tensor(output_details[1]['index'])
-                detected_scores = interpreter.get_tensor(output_details[2]['index'])
-                num_boxes = interpreter.get_tensor(output_details[3]['index'])
-
-                # fix for this new model
-                if True:
-                    #box_count = num_boxes[0]
-                    #c_temp = detected_boxes
-                    #detected_boxes = detected_scores
-                    #detected_scores = c_temp
-                    #detected_classes = num_boxes
-                    #num_boxes = box_count
-
-                    # order in the custom model:
-                    # 0 = scores, 1 = boxes, 2 = num objects detected?, 3 = classes
-                    
-                    detected_scores = interpreter.get_tensor(output_details[0]['index'])
-                    detected_boxes = interpreter.get_tensor(output_details[1]['index'])
-                    num_boxes = interpreter.get_tensor(output_details[2]['index'])
-                    detected_classes = interpreter.get_tensor(output_details[3]['index'])
-
-                    logging.getLogger(__name__).debug("Detected Boxes:")
-                    logging.getLogger(__name__).debug(f"{detected_boxes}")
-                    logging.getLogger(__name__).debug("num boxes:")
-                    logging.getLogger(__name__).debug(f"{num_boxes}")
-                    logging.getLogger(__name__).debug("detected classes:")
-                    logging.getLogger(__name__).debug(f"{detected_classes}")
-                    logging.getLogger(__name__).debug("detected scores:")
-                    logging.getLogger(__name__).debug(f"{detected_scores}")
-                # end fix
-
-
-                for i in range(int(num_boxes[0])):
-                    top, left, bottom, right = detected_boxes[0][i]
-                    classId = int(detected_classes[0][i])
-                    if object_filter is None or self.__labels[m][classId] in object_filter:
-                        score = detected_scores[0][i]
-                        if score > min_confidence:
-                            #logging.getLogger(__name__).info(f"{self.__labels[m][classId]} - Top: {top}, Left: {left}, Bottom: {bottom}, Right: {right}, Conf: {score}")
-                            
-                            xmin = horz_pixel_offset + (left * slice_width)
-                            ymin = top * initial_h
-                            xmax = horz_pixel_offset + (right * slice_width)
-                            ymax = bottom * initial_h
-                            box = [xmin, ymin, xmax, ymax]
-                            x_center = xmin + ((xmax-xmin)/2)
-                            y_center = ymin + ((ymax-ymin)/2)
-                            
-                            #if xmin >= 0 and ymin >= 0 and ymax <= last_height and xmax <= last_width:
-                                #rectangles.append(box)
-                                #logging.getLogger(__name__).info(f"Found {self.__labels[m][classId]} centered at ({x_center},{y_center}), confidence: {score}, [({xmin},{ymin}):({xmax},{ymax})]")
-                            detected_objects.append({
-                                'object':self.__labels[m][classId],
-                                'x_center':x_center,
-                                'y_center':y_center,
-                                'x_min':max(1,xmin),
-                                'x_max':min(initial_w, xmax),
-                                'y_min':max(1,ymin),
-                                'y_max':min(initial_h, ymax),
-                                'confidence':score
-                            })
-                            #else:
-                            #    logging.getLogger(__name__).warning("Out of bounds object on image, ignoring!")
+                        batch, slice_positions = prepared_inputs[(height, width, False)]
+                        prepared_inputs[(height, width, True)] = (self.__preprocessor.normalize(batch), slice_positions)
+
+            input_data, slice_positions = prepared_inputs[(height, width, floating_model)]
+
+            # invoke the detection model
+            with self.__stage_timer.stage('inference'):
+                detected_scores, detected_boxes, num_boxes, detected_classes = self.__invoke(m, interpreter, input_data)
+
+            logging.getLogger(__name__).debug("Detected Boxes:")
+            logging.getLogger(__name__).debug(f"{detected_boxes}")
+            logging.getLogger(__name__).debug("num boxes:")
+            logging.getLogger(__name__).debug(f"{num_boxes}")
+            logging.getLogger(__name__).debug("detected classes:")
+            logging.getLogger(__name__).debug(f"{detected_classes}")
+            logging.getLogger(__name__).debug("detected scores:")
+            logging.getLogger(__name__).debug(f"{detected_scores}")
+
+            with self.__stage_timer.stage('decode'):
+                self.__decode(m, detected_scores, detected_boxes, num_boxes, detected_classes, slice_positions, object_filter, min_confidence, detected_objects)
 
         return detected_objects
 
+    # runs the model over every row of the input. if batching, all rows go through in a single invoke
+    # when the model allows it, otherwise one invoke per row.
+    # returns scores, boxes, box counts and classes, with one row per input row
+    def __invoke (self, model_name, interpreter, input_data):
+        batch_size = len(input_data)
+        if self.__batch_inference and batch_size > 1 and model_name not in self.__unbatchable_models:
+            try:
+                self.__set_batch_size(model_name, interpreter, batch_size)
+                outputs = self.__invoke_once(interpreter, input_data)
+                if all(len(o) == batch_size for o in outputs):
+                    return outputs
+                logging.getLogger(__name__).info(f"Model {model_name} only detects on one image at a time, batching disabled for it")
+            except Exception as e:
+                logging.getLogger(__name__).info(f"Model {model_name} can't be batched, batching disabled for it: {e}")
+            self.__unbatchable_models.add(model_name)
+
+        self.__set_batch_size(model_name, interpreter, 1)
+        outputs = [self.__invoke_once(interpreter, input_data[i:i+1]) for i in range(batch_size)]
+        return [np.concatenate([o[t] for o in outputs]) for t in range(4)]
+
+    def __invoke_once (self, interpreter, input_data):
+        input_details = interpreter.get_input_details()
+        output_details = interpreter.get_output_details()
+        interpreter.set_tensor(input_details[0]['index'], input_data)
+        interpreter.invoke()
+
+        # order in the custom model:
+        # 0 = scores, 1 = boxes, 2 = num objects detected?, 3 = classes
+        return [interpreter.get_tensor(output_details[t]['index']) for t in range(4)]
+
+    def __set_batch_size (self, model_name, interpreter, batch_size):
+        if self.__batch_sizes.get(model_name, 1) != batch_size:
+            input_details = interpreter.get_input_details()
+            interpreter.resize_tensor_input(input_details[0]['index'], [batch_size] + [int(d) for d in input_details[0]['shape'][1:]])
+            interpreter.allocate_tensors()
+            self.__batch_sizes[model_name] = batch_size
+
+    # adds the boxes found in each row of model output to the detected objects of the image that row came from
+    def __decode (self, model_name, detected_scores, detected_boxes, num_boxes, detected_classes, slice_positions, object_filter, min_confidence, detected_objects):
+        labels = self.__labels[model_name]
+        filtered_classes = None
+        if object_filter is not None:
+            filtered_classes = [c for c in labels if labels[c] in object_filter]
+
+        for row, (image_num, horz_pixel_offset, slice_width, initial_h, initial_w) in enumerate(slice_positions):
+            row_boxes = int(num_boxes[row])
+            scores = detected_scores[row][:row_boxes]
+            class_ids = detected_classes[row][:row_boxes].astype(int)
+            keep = scores > min_confidence
+            if filtered_classes is not None:
+                keep &= np.isin(class_ids, filtered_classes)
+            if not np.any(keep):
+                continue
+
+            top, left, bottom, right = detected_boxes[row][:row_boxes][keep].T
+            xmin = horz_pixel_offset + (left * slice_width)
+            ymin = top * initial_h
+            xmax = horz_pixel_offset + (right * slice_width)
+            ymax = bottom * initial_h
+            x_center = xmin + ((xmax-xmin)/2)
+            y_center = ymin + ((ymax-ymin)/2)
+
+            for class_id, x_c, y_c, x_mn, x_mx, y_mn, y_mx, score in zip(
+                    class_ids[keep].tolist(), x_center, y_center,
+                    np.maximum(1, xmin), np.minimum(initial_w, xmax), np.maximum(1, ymin), np.minimum(initial_h, ymax),
+                    scores[keep]):
+                #logging.getLogger(__name__).info(f"Found {labels[class_id]} centered at ({x_c},{y_c}), confidence: {score}")
+                detected_objects[image_num].append({
+                    'object':labels[class_id],
+                    'x_center':x_c,
+                    'y_center':y_c,
+                    'x_min':x_mn,
+                    'x_max':x_mx,
+                    'y_min':y_mn,
+                    'y_max':y_mx,
+                    'confidence':score
+                })
@@ -0,0 +1,104 @@
+import time
+import logging
+
+# one timed stage, begins on enter and ends on exit
+class StageSpan:
+    def __init__(self, stage_timer, name):
+        self.__stage_timer = stage_timer
+        self.__name = name
+
+    def __enter__ (self):
+        self.__stage_timer.begin_stage(self.__name)
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.__stage_timer.end_stage()
+        return False
+
+# what a disabled timer hands back
+class NoOpSpan:
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        return False
+
+# Records how long each stage of a positioning cycle takes.
+# Stages can be nested, a stage started inside another is recorded as parent/child.
+# When disabled, stage() hands back a shared span that does nothing, so instrumented code costs almost nothing.
+class StageTimer:
+    # shared by every disabled timer
+    NO_OP_SPAN = NoOpSpan()
+
+    def __init__(self, enabled = False):
+        self.__enabled = enabled
+        self.__cycle_start = None
+        self.__stages = {}
+        self.__open_stages = []
+
+    def is_enabled (self):
+        return self.__enabled
+
+    def set_enabled (self, enabled):
+        self.__enabled = enabled
+
+    # clears everything recorded, the breakdown total is measured from here
+    def start_cycle (self):
+        if self.__enabled:
+            self.__cycle_start = time.perf_counter()
+            self.__stages = {}
+            self.__open_stages = []
+
+    # use as: with stage_timer.stage('inference'):
+    def stage (self, name):
+        if self.__enabled:
+            return StageSpan(self, name)
+        return StageTimer.NO_OP_SPAN
+
+    # adds time measured somewhere else (another process, for instance) to the current stage
+    def add (self, name, seconds):
+        if self.__enabled:
+            self.__record(self.__get_path(name), seconds)
+
+    def begin_stage (self, name):
+        path = self.__get_path(name)
+        self.__open_stages.append((path, time.perf_counter()))
+
+    def end_stage (self):
+        if len(self.__open_stages) > 0:
+            path, started = self.__open_stages.pop()
+            self.__record(path, time.perf_counter() - started)
+
+    def __get_path (self, name):
+        if len(self.__open_stages) > 0:
+            return f"{self.__open_stages[-1][0]}/{name}"
+        return name
+
+    def __record (self, path, seconds):
+        if path not in self.__stages:
+            self.__stages[path] = {'seconds':0.0, 'count':0}
+        self.__stages[path]['seconds'] += seconds
+        self.__stages[path]['count'] += 1
+
+    # per-stage seconds and number of times each stage ran, since the cycle started
+    def get_breakdown (self):
+        if not self.__enabled:
+            return None
+
+        breakdown = {
+            'total':round(time.perf_counter() - self.__cycle_start, 4) if self.__cycle_start is not None else None,
+            'stages':{}
+        }
+        for path in self.__stages:
+            breakdown['stages'][path] = {
+                'seconds':round(self.__stages[path]['seconds'], 4),
+                'count':self.__stages[path]['count']
+            }
+        return breakdown
+
+    def log_breakdown (self):
+        breakdown = self.get_breakdown()
+        if breakdown is not None:
+            logging.getLogger(__name__).info(f"Positioning cycle took {breakdown['total']} sec")
+            for path in breakdown['stages']:
+                logging.getLogger(__name__).info(f"{path:>40}: {breakdown['stages'][path]['seconds']} sec ({breakdown['stages'][path]['count']}x)")
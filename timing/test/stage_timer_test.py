@@ -0,0 +1,82 @@
+import unittest
+from timing.stage_timer import StageTimer
+from position.position_benchmark import PositionBenchmark
+from position.position_estimator_with_clustering import PositionEstimatorWithClustering
+from position.estimator_mode import EstimatorMode
+from field.field_map_persistence import FieldMapPersistence
+import logging
+import time
+
+class TestStageTimer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_disabled_records_nothing (self):
+        timer = StageTimer()
+        timer.start_cycle()
+        with timer.stage('inference'):
+            pass
+        timer.add('workers', 1.0)
+        self.assertIsNone(timer.get_breakdown())
+        self.assertIs(timer.stage('a'), timer.stage('b'))
+
+    def test_nested_stages (self):
+        timer = StageTimer(enabled = True)
+        timer.start_cycle()
+        for i in range(2):
+            with timer.stage('locate_landmarks'):
+                with timer.stage('inference'):
+                    time.sleep(0.01)
+                timer.add('extra', 0.5)
+
+        breakdown = timer.get_breakdown()
+        self.assertEqual(breakdown['stages']['locate_landmarks']['count'], 2)
+        self.assertEqual(breakdown['stages']['locate_landmarks/inference']['count'], 2)
+        self.assertGreaterEqual(breakdown['stages']['locate_landmarks/inference']['seconds'], 0.02)
+        self.assertGreaterEqual(breakdown['stages']['locate_landmarks']['seconds'], breakdown['stages']['locate_landmarks/inference']['seconds'])
+        self.assertEqual(breakdown['stages']['locate_landmarks/extra']['seconds'], 1.0)
+        self.assertGreaterEqual(breakdown['total'], 0.02)
+
+        # a new cycle starts clean
+        timer.start_cycle()
+        self.assertEqual(len(timer.get_breakdown()['stages']), 0)
+
+    def test_stage_ends_on_exception (self):
+        timer = StageTimer(enabled = True)
+        timer.start_cycle()
+        try:
+            with timer.stage('estimate'):
+                raise Exception("failed")
+        except Exception:
+            pass
+        with timer.stage('logging'):
+            pass
+        self.assertIn('estimate', timer.get_breakdown()['stages'])
+        self.assertIn('logging', timer.get_breakdown()['stages'])
+
+    def test_estimator_stages (self):
+        fixture = [f for f in PositionBenchmark().get_fixtures() if f['name'] == 'alt_map_three_lights'][0]
+        timer = StageTimer(enabled = True)
+        estimator = PositionEstimatorWithClustering(
+            FieldMapPersistence().load_map_from_dict(fixture['map']),
+            horizontal_fov = fixture['camera']['horizontal_fov'],
+            vertical_fov = fixture['camera']['vertical_fov'],
+            view_width = fixture['camera']['view_width'],
+            view_height = fixture['camera']['view_height'],
+            use_multithreading = False,
+            estimator_mode = EstimatorMode.CLOSED_FORM,
+            adjust_for_altitude = fixture['adjust_for_altitude'],
+            stage_timer = timer)
+
+        timer.start_cycle()
+        x, y, heading, confidence, basis = estimator.get_coords_and_heading(located_objects = fixture['located_objects'], view_altitude = fixture['view_altitude'])
+        self.assertIsNotNone(x)
+
+        stages = timer.get_breakdown()['stages']
+        logging.getLogger(__name__).info(f"Stages: {stages}")
+        for s in ['view_angles', 'distances', 'coordinates', 'coordinates/length_finding', 'coordinates/candidate_filtering', 'heading']:
+            self.assertIn(s, stages)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import numpy as np
+import logging
+
+# Finds possible triangle lengths, given a far angle and far side, without searching.
+# With the far side and far angle fixed, every valid triangle is described by its base angle,
+# so the whole family of (base, top) pairs is built in one pass (law of sines) and
+# ranked by how far each pair deviates from the estimates.
+# the less confidence in a given side, the more it can be adjusted
+class ClosedFormLengthFinder:
+    # seeds are accepted so this can be swapped in for the genetic finder. the whole family is always searched, so they aren't needed.
+    # min_separation_deg is how far apart the base angles of the solutions should be, so they aren't all neighboring samples
+    def __init__(self, far_angle, far_side, est_top, est_base, base_confidence = 0.8, top_confidence = 0.8, samples = 2000, seeds = None, min_separation_deg = 2.0):
+        self.__far_angle = far_angle
+        self.__far = far_side
+        self.__est_top = est_top
+        self.__est_base = est_base
+        self.__samples = samples
+        self.__min_separation = np.radians(min_separation_deg)
+
+        # if we have less confidence in one of the variables, we are allowed to adjust it more.
+        # a floor is kept so a full-confidence side does not divide the deviation by zero
+        self.__max_base_adjustment = max((1 - base_confidence) * 2, 0.01)
+        self.__max_top_adjustment = max((1 - top_confidence) * 2, 0.01)
+
+    # target_accuracy and allowed_time are accepted so this can be swapped in for the genetic finder.
+    # every solution generated here is an exact triangle, so neither limits the result
+    def find_lengths (self, max_num_solutions = 5, target_accuracy = 0.01, allowed_time = None):
+        if self.__far <= 0 or self.__far_angle <= 0 or self.__far_angle >= 180:
+            logging.getLogger(__name__).debug(f"No triangle possible for far angle {self.__far_angle}, far side {self.__far}")
+            return []
+
+        far_angle_rad = np.radians(self.__far_angle)
+        remaining_rad = np.pi - far_angle_rad
+
+        # the base angle can be anything between 0 and whatever is left after the far angle.
+        # the endpoints are degenerate triangles, so they are not included
+        base_angles = np.linspace(0, remaining_rad, self.__samples + 2)[1:-1]
+        top_angles = remaining_rad - base_angles
+
+        # law of sines, each side is opposite its angle
+        sides_ratio = self.__far / np.sin(far_angle_rad)
+        bases = sides_ratio * np.sin(base_angles)
+        tops = sides_ratio * np.sin(top_angles)
+
+        # deviation from the estimates, scaled by how much each side is allowed to be adjusted
+        base_dev = self.__get_deviation(bases, self.__est_base, self.__max_base_adjustment)
+        top_dev = self.__get_deviation(tops, self.__est_top, self.__max_top_adjustment)
+        cost = base_dev ** 2 + top_dev ** 2
+
+        # anything within the allowed adjustment is ranked ahead of everything else.
+        # each pick rules out the base angles too close to it, so the solutions are spread along the family.
+        # the spacing shrinks if the allowed range is too narrow to fit them all
+        out_of_range = (np.abs(base_dev) > 1) | (np.abs(top_dev) > 1)
+        separation = self.__min_separation
+        if not np.all(out_of_range):
+            in_range_angles = base_angles[~out_of_range]
+            separation = min(separation, (in_range_angles[-1] - in_range_angles[0]) / max(1, max_num_solutions))
+
+        order = np.lexsort((cost, out_of_range))
+        available = np.ones(len(order), dtype=bool)
+        ranked = []
+        while len(ranked) < max_num_solutions:
+            remaining = order[available[order]]
+            if len(remaining) == 0:
+                break
+            ranked.append(remaining[0])
+            available = available & (np.abs(base_angles - base_angles[remaining[0]]) >= separation)
+        ranked = np.array(ranked, dtype=int)
+
+        # report how close each is to the far angle, same as the other finders
+        selected_bases = bases[ranked]
+        selected_tops = tops[ranked]
+        cos_far = (selected_bases ** 2 + selected_tops ** 2 - self.__far ** 2) / (2 * selected_bases * selected_tops)
+        diffs = self.__far_angle - np.degrees(np.arccos(np.clip(cos_far, -1.0, 1.0)))
+
+        return [(float(b), float(t), float(d)) for b, t, d in zip(selected_bases, selected_tops, diffs)]
+
+    # how far each length is from its estimate, in units of the allowed adjustment.
+    # without an estimate (zero or less) any length is as good as another
+    def __get_deviation (self, lengths, estimate, max_adjustment):
+        if estimate is None or estimate <= 0:
+            return np.zeros(len(lengths))
+        return (lengths - estimate) / (estimate * max_adjustment)
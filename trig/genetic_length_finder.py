@@ -7,13 +7,16 @@ import time
 # Performs a step-by-step search to find possible triangle lengths, given a far angle and far side
 # the less confidence in a given side, the more it can be adjusted
 class BaseTopLengthFinder:
-    def __init__(self, far_angle, far_side, est_top, est_base, base_confidence = 0.8, top_confidence = 0.8):
+    def __init__(self, far_angle, far_side, est_top, est_base, base_confidence = 0.8, top_confidence = 0.8, seeds = None):
         self.__far_angle = far_angle
         self.__far = far_side
         self.__est_top = est_top
         self.__est_base = est_base
         self.__trig_calc = BasicTrigCalc()
 
+        # (base, top) pairs that are likely close to the answer, such as those implied by a previous position
+        self.__seeds = seeds
+
         # if we have less confidence in one of the variables, we are allowed to adjust it more
         self.__max_base_adjustment = ((1 - base_confidence) * 2)
         self.__max_top_adjustment = ((1 - top_confidence) * 2)
@@ -31,7 +34,9 @@ class BaseTopLengthFinder:
             est_top=self.__est_top, 
             max_base_adjustment=self.__max_base_adjustment, 
             max_top_adjustment=self.__max_top_adjustment, 
-            target_accuracy=target_accuracy)
+            target_accuracy=target_accuracy,
+            seeds=self.__seeds,
+            seed_copies=max_num_solutions)
         solutions = optimizer.select_side_lengths(max_solutions=max_num_solutions, allowed_time=allowed_time)
 
         # return the proposed solutions, along with how close they were able to get to the far angle
@@ -87,17 +92,37 @@ class LengthFitnessTester:
 
             # now given the all sides, see what it thinks the far angle is. However different that is becomes our difference
             # See how far off we are on the angle, and score it
-            score = 1.0 / abs(self.__far_angle - self.__trig_calc.calc_far_angle(self.__far_side, proposed_base, proposed_top))
+            angle_diff = abs(self.__far_angle - self.__trig_calc.calc_far_angle(self.__far_side, proposed_base, proposed_top))
+
+            # an exact fit is the best possible score, not an invalid triangle
+            score = 1.0 / angle_diff if angle_diff > 0 else float('inf')
             #logging.getLogger(__name__).info(f"Score: {score}")
         except:
             # this is not a valid triangle, return bad fitness score
             pass
         #logging.getLogger(__name__).info(f"Score: {score}")
         return score
+
+    # same scoring as get_fitness_level, for an (N, 2) array of base, top
+    def get_fitness_levels (self, genes):
+        bases = genes[:, 0]
+        tops = genes[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # both angles must be possible for the triangle to be valid
+            cos_base = (self.__far_side ** 2 + tops ** 2 - bases ** 2) / (2 * self.__far_side * tops)
+            cos_far = (tops ** 2 + bases ** 2 - self.__far_side ** 2) / (2 * tops * bases)
+            valid = (np.abs(cos_base) <= 1) & (np.abs(cos_far) <= 1)
+
+            angle_diff = np.abs(self.__far_angle - np.degrees(np.arccos(np.clip(cos_far, -1.0, 1.0))))
+            scores = np.where(angle_diff > 0, 1.0 / angle_diff, np.inf)
+
+        return np.where(valid, scores, 0.0)
     
 
+# The population is kept as a single (P, 2) array of base, top.
+# Chromosome objects are only created for the solutions that are returned
 class SideLengthOptimizer:
-    def __init__(self, far_angle, far_side, population_size, num_elites, generations, est_base, est_top, max_base_adjustment=0.5, max_top_adjustment=0.5, target_accuracy=None):
+    def __init__(self, far_angle, far_side, population_size, num_elites, generations, est_base, est_top, max_base_adjustment=0.5, max_top_adjustment=0.5, target_accuracy=None, seeds=None, seed_copies=4, seed_jitter=0.05):
         self.__far = far_side
         self.__far_angle = far_angle
         self.__tester = LengthFitnessTester(far_angle=self.__far_angle, far_side=self.__far)
@@ -111,8 +136,12 @@ class SideLengthOptimizer:
         self.__trig_calc = BasicTrigCalc()
         self.__target_accuracy = target_accuracy
 
-    def generate_random_chromosomes (self, num_chromosomes, add_starting_estimates = False):
-        gene_key = {
+        # seeds go into the starting population as-is, along with a few copies jittered by up to seed_jitter pct
+        self.__seeds = seeds if seeds is not None else []
+        self.__seed_copies = seed_copies
+        self.__seed_jitter = seed_jitter
+
+        self.__gene_key = {
             'base':0,
             'top':1,
             'far':2, # not adjustable
@@ -120,36 +149,87 @@ class SideLengthOptimizer:
         }
 
         # max range of base and top
-        gene_ranges = [
+        self.__gene_ranges = [
             [self.__est_base - (self.__est_base * self.__max_base_adjustment),self.__est_base + (self.__est_base * self.__max_base_adjustment)], # base range
             [self.__est_top - (self.__est_top * self.__max_top_adjustment),self.__est_top + (self.__est_top * self.__max_top_adjustment)], # top range
         ]
-        c = []
-
-        for i in range(num_chromosomes):
-            init_genes = []
-            for gr in gene_ranges:
-                init_genes.append(np.random.uniform(gr[0],gr[1]))
-            c.append(Chromosome(
-                gene_key=gene_key, 
-                gene_ranges=gene_ranges,
-                genes=np.array(init_genes + [self.__far, self.__far_angle]),
-                calc=self.__trig_calc))
-            
+
+        # make_fit tries 1, 1.01, 0.99, 1.02, 0.98 ... 1.49, 0.51 times the gene, in that order
+        step_size = 0.005
+        multipliers = [1.0]
+        for factor in range(2,100,2):
+            multipliers.append(1 + (step_size * factor))
+            multipliers.append(1 - (step_size * factor))
+        self.__fit_multipliers = np.array(multipliers)
+
+    # returns an (N, 2) array of base, top
+    def generate_random_genes (self, num_chromosomes, add_starting_estimates = False):
+        # seeded chromosomes take the place of random ones
+        seeded_genes = []
         if add_starting_estimates:
-            c.append(Chromosome(
-                gene_key=gene_key, 
-                gene_ranges=gene_ranges,
-                genes=np.array([self.__est_base, self.__est_top, self.__far, self.__far_angle]),
-                calc=self.__trig_calc))
-        
-        # randomly adjust the top or base so each one fits
-        for curr_c in c:
-            makefit_gene = np.random.randint(0,2)
-            curr_c.make_fit(makefit_gene)
+            for seed_base, seed_top in self.__seeds:
+                seeded_genes.append(self.__fit_seed(seed_base, seed_top))
+                for copy_count in range(self.__seed_copies):
+                    seeded_genes.append(self.__fit_seed(
+                        seed_base * (1 + np.random.uniform(-self.__seed_jitter, self.__seed_jitter)),
+                        seed_top))
+
+        num_random = max(num_chromosomes - len(seeded_genes), 0)
+        genes = np.column_stack([
+            np.random.uniform(self.__gene_ranges[0][0], self.__gene_ranges[0][1], num_random),
+            np.random.uniform(self.__gene_ranges[1][0], self.__gene_ranges[1][1], num_random)])
 
+        if add_starting_estimates:
+            genes = np.vstack([genes, [[self.__est_base, self.__est_top]]])
 
-        return c
+        if len(seeded_genes) > 0:
+            genes = np.vstack([genes, np.array(seeded_genes, dtype=float)])
+
+        # randomly adjust the top or base so each one fits
+        makefit_genes = np.random.randint(0, 2, len(genes))
+        self.make_fit(genes, makefit_genes == self.__gene_key['base'], self.__gene_key['base'])
+        self.make_fit(genes, makefit_genes == self.__gene_key['top'], self.__gene_key['top'])
+
+        return genes
+
+    # same as Chromosome.make_fit, for the selected rows of genes (in place).
+    # the gene is bumped up/down by the smallest step that keeps the other side computable.
+    # rows where no step works are left alone
+    def make_fit (self, genes, rows, adjust_gene):
+        if not np.any(rows):
+            return
+        trials = genes[rows, adjust_gene][:, np.newaxis] * self.__fit_multipliers[np.newaxis, :]
+
+        # the other side is found with asin(side * sin(far angle) / far side), which has to be in range
+        fits = np.abs(trials * np.sin(np.radians(self.__far_angle)) / self.__far) <= 1
+        has_fit = np.any(fits, axis=1)
+        first_fit = np.argmax(fits, axis=1)
+
+        adjusted = genes[rows, adjust_gene]
+        adjusted[has_fit] = trials[has_fit, first_fit[has_fit]]
+        genes[rows, adjust_gene] = adjusted
+
+    # keeps the seed's base, and swaps in whichever top completes the triangle and is closest to the seed's top.
+    # that way seeds start out as solutions instead of having to be evolved into one
+    def __fit_seed (self, seed_base, seed_top):
+        # law of cosines, solved for the top: top = base*cos(F) +/- sqrt(far^2 - (base*sin(F))^2)
+        far_angle_rad = np.radians(self.__far_angle)
+        discriminant = self.__far ** 2 - (seed_base * np.sin(far_angle_rad)) ** 2
+        if discriminant < 0:
+            return [seed_base, seed_top]
+
+        tops = [t for t in [seed_base * np.cos(far_angle_rad) + np.sqrt(discriminant), seed_base * np.cos(far_angle_rad) - np.sqrt(discriminant)] if t > 0]
+        if len(tops) == 0:
+            return [seed_base, seed_top]
+
+        return [seed_base, min(tops, key=lambda t:abs(t - seed_top))]
+
+    def __to_chromosomes (self, genes):
+        return [Chromosome(
+            gene_key=self.__gene_key,
+            gene_ranges=self.__gene_ranges,
+            genes=np.array([g[0], g[1], self.__far, self.__far_angle]),
+            calc=self.__trig_calc) for g in genes]
 
     def select_side_lengths (self, max_solutions = 1, allowed_time = None):
         start_time = time.time()
@@ -157,60 +237,44 @@ class SideLengthOptimizer:
         # use genetic algo to select best side lengths
 
         # initialize some chromosomes
-        pop = self.generate_random_chromosomes(self.__population_size, add_starting_estimates=True)
+        pop = self.generate_random_genes(self.__population_size, add_starting_estimates=True)
 
         reproducer = Reproducer()
 
-        best_chromosome = None
         best_fitness = 0
         generations_without_best = 0
 
         stagnation_threshold = 50
-        last_ranked_pop = []
+        last_ranked_pop = np.zeros((0, 2))
 
         # while stop condition not met
         for generation_count in range(self.__max_generations+1):
-            #print (f'generation: {generation_count}, pop size: {len(pop)}')
-            fitness_map = {}
-
             # test the fitness of each chromosome
-            for c in pop:
-                fitness_map[c.get_id()] = self.__tester.get_fitness_level(c)
+            fitness = self.__tester.get_fitness_levels(pop)
 
-            # rank each chromosome by fitness
-            ranked_chromosome_ids = [k for k, v in sorted(fitness_map.items(), key=lambda item: item[1], reverse=True)]
+            # rank each chromosome by fitness. stable, so ties keep their order like the sorted() this replaced
+            ranking = np.argsort(-1 * fitness, kind='stable')
+            ranked_pop = pop[ranking]
+            ranked_fitness = fitness[ranking]
 
-            # reorder the population by fitness map
             # if the desired number have achieved the target, stop searching
-            ranked_pop = []
-            target_count = 0
-            for c_id in ranked_chromosome_ids:
-                ranked_pop.append([p for p in pop if p.get_id() == c_id][0])
-                # 1/angle diff is the score, so 1/the score will give us the diff
-                if fitness_map[c_id] > 0 and 1/fitness_map[c_id] <= self.__target_accuracy * self.__far_angle:
-                    target_count += 1
+            # 1/angle diff is the score, so 1/the score will give us the diff
+            with np.errstate(divide='ignore'):
+                target_count = np.count_nonzero((ranked_fitness > 0) & (1 / ranked_fitness <= self.__target_accuracy * self.__far_angle))
             if target_count >= max_solutions:
                 #logging.getLogger(__name__).info(f"Stopping early, desired accuracy was {self.__target_accuracy}")
-                return ranked_pop[0:max_solutions]
+                return self.__to_chromosomes(ranked_pop[0:max_solutions])
 
             # if too much time has passed, return whatever we have
-            #logging.getLogger(__name__).info(f"elapsed: {time.time() - start_time} - allowed: {allowed_time}")
             if allowed_time is not None and (time.time() - start_time) > allowed_time:
-                if target_count >= max_solutions:
-                    #logging.getLogger(__name__).info(f"Stopping early, desired accuracy was {self.__target_accuracy}")
-                    return ranked_pop[0:max_solutions]
-                else:
-                    return ranked_pop[0:len(ranked_pop)]
-
-            
+                return self.__to_chromosomes(ranked_pop)
 
             last_ranked_pop = ranked_pop
 
             # compare the best chromosome with our best so far
-            best_fitness_this_generation = fitness_map[ranked_pop[0].get_id()]
+            best_fitness_this_generation = ranked_fitness[0]
             if best_fitness_this_generation > best_fitness:
                 best_fitness = best_fitness_this_generation
-                best_chromosome = ranked_pop[0]                
                 generations_without_best = 0
                 reproducer.reset_mutation_rate()
             else:
@@ -222,7 +286,7 @@ class SideLengthOptimizer:
                 else:
                     reproducer.reset_mutation_rate()
 
-            probabilities = np.linspace(.9,.05,len(ranked_chromosome_ids))
+            probabilities = np.linspace(.9,.05,len(ranked_pop))
 
             # scale the probabilities so they add up to one
             probabilities = probabilities / np.sum(probabilities)
@@ -230,57 +294,46 @@ class SideLengthOptimizer:
             # select the reproducers using a weighted choice, without replacement
             # the weights are basically ordered by the rank
             reproducers = np.random.choice(
-                len(ranked_chromosome_ids), 
+                len(ranked_pop), 
                 size=self.__population_size, 
                 p=probabilities, 
-                replace=len(ranked_chromosome_ids) < self.__population_size # dont' want to reproduce with self, unless no choice
+                replace=len(ranked_pop) < self.__population_size # dont' want to reproduce with self, unless no choice
             )
 
             # no more than 1/3 can reproduce
             if len(reproducers) > int(self.__population_size / 3):
                 reproducers = reproducers[0:int(self.__population_size / 3)]
 
-            new_pop = []
-            
             # keep elites (if we had some and if we're using elites)
-            for e_count in range(self.__num_elites):
-                if len(ranked_pop) > e_count:
-                    new_pop.append(ranked_pop[e_count])
-
-            # reproduce
-            for p in range(0, len(reproducers), 2):
-                # random number of offspring per couple, between 1 and 2 offspring
-                for offspring_count in range(0, np.random.randint(1,4)):
-                    if len(new_pop) < self.__population_size and len(reproducers) > p+1:
-                        new_pop.append(reproducer.get_offspring([ranked_pop[reproducers[p]], ranked_pop[reproducers[p+1]]]))
-
-            # remove clones
-            unique_pop = []
-            used_pairs = []
-            for p in new_pop:
-                s = p.get_summary()
-                if s not in used_pairs:
-                    unique_pop.append(p)
-                    used_pairs.append(s)
-            new_pop = unique_pop
+            elites = ranked_pop[0:self.__num_elites]
+
+            # each couple has between 1 and 3 offspring, until the population is full
+            num_couples = len(reproducers) // 2
+            offspring_counts = np.random.randint(1, 4, num_couples)
+            couples = np.repeat(np.arange(num_couples), offspring_counts)[0:max(self.__population_size - len(elites), 0)]
+            offspring = reproducer.get_offspring(
+                ranked_pop[reproducers[2 * couples]],
+                ranked_pop[reproducers[(2 * couples) + 1]],
+                self)
+
+            # remove clones, keeping the first of each
+            new_pop = np.vstack([elites, offspring])
+            _, first_index = np.unique(new_pop, axis=0, return_index=True)
+            new_pop = new_pop[np.sort(first_index)]
 
             # fill in the rest of the population with new random chromosomes
             if len(new_pop) < self.__population_size:
-                fresh_pop = self.generate_random_chromosomes(self.__population_size - len(new_pop))
-                new_pop = new_pop + fresh_pop
+                new_pop = np.vstack([new_pop, self.generate_random_genes(self.__population_size - len(new_pop))])
 
-
-
-            # throw out the old generation if we have enough. otherwise, append
-            #if len(new_pop) < int(.8*self.__population_size):
-            #    pop = pop + new_pop
-            #else:
             pop = new_pop
 
         if max_solutions <= len(last_ranked_pop):
-            return last_ranked_pop[0:max_solutions]
+            return self.__to_chromosomes(last_ranked_pop[0:max_solutions])
 
-        return last_ranked_pop[0:len(last_ranked_pop)]
+        return self.__to_chromosomes(last_ranked_pop)
+
+    def get_gene_ranges (self):
+        return self.__gene_ranges
 
 class Chromosome:
     def __init__(self, gene_key, gene_ranges, genes, calc):
@@ -421,26 +474,33 @@ class Reproducer:
         self.__max_gene_mutations = 2.0*self.__normal_max_gene_mutations
         #print ('increasing mutations')
 
-    def get_offspring(self, parents):
+    # one offspring per row of the given (N, 2) parent arrays
+    def get_offspring(self, first_parents, second_parents, optimizer : SideLengthOptimizer):
+        num_offspring = len(first_parents)
+
         # parents are shuffled so their order wont matter
-        p1_index = np.random.randint(0,2)
-        p1 = parents[p1_index]
-        p2 = parents[1 - p1_index]
-        
-        # select a random number 'r' between 1 and 3
-        gene_selector = np.random.randint(1, 2) # every nth gene
-        beginning_gene = np.random.randint(0, 2) # must be 0 or 1
-
-        # teh offspring gets every rth gene value from parent 1
-        offspring = p1.clone()
-        offspring.take_genes (np.arange(beginning_gene, offspring.get_editable_gene_count(), gene_selector), p2)
+        swapped = np.random.randint(0, 2, num_offspring) == 1
+        p1 = np.where(swapped[:, np.newaxis], second_parents, first_parents)
+        p2 = np.where(swapped[:, np.newaxis], first_parents, second_parents)
+
+        # the offspring starts as parent 1, and takes genes from parent 2 starting at either the base or the top.
+        # after each gene is taken, the other one is adjusted to make sure it still fits
+        offspring = np.copy(p1)
+        from_base = np.random.randint(0, 2, num_offspring) == 0
+        offspring[from_base, 0] = p2[from_base, 0]
+        optimizer.make_fit(offspring, from_base, 1)
+        offspring[:, 1] = p2[:, 1]
+        optimizer.make_fit(offspring, np.ones(num_offspring, dtype=bool), 0)
 
         # possibly introduce mutation
-        if np.random.randint(0, 101) < (self.__mutation_rate*100):
-            genes_to_flip = np.random.choice(
-                len(offspring.get_genes()), 
-                size=np.random.randint(1, self.__max_gene_mutations+1),
-                replace=False)
-            offspring.mutate_genes (genes_to_flip)
-
-        return offspring
\ No newline at end of file
+        mutated = np.random.randint(0, 101, num_offspring) < (self.__mutation_rate*100)
+        if np.any(mutated):
+            # pick which of the 4 genes flip, without replacement. only the base and top can actually change
+            num_flips = np.random.randint(1, self.__max_gene_mutations+1, num_offspring)
+            flip_order = np.argsort(np.argsort(np.random.rand(num_offspring, 4), axis=1), axis=1)
+            gene_ranges = optimizer.get_gene_ranges()
+            for g in [0, 1]:
+                flip = mutated & (flip_order[:, g] < num_flips)
+                offspring[flip, g] = np.random.uniform(gene_ranges[g][0], gene_ranges[g][1], np.count_nonzero(flip))
+
+        return offspring
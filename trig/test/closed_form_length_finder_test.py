@@ -0,0 +1,80 @@
+import unittest
+from trig.trig import BasicTrigCalc
+from trig.closed_form_length_finder import ClosedFormLengthFinder
+import logging
+import math
+
+class TestClosedFormLengthFinder(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+        return super().setUp()
+
+    def test_basic_find_solution (self):
+        # a known-good triangle
+        #    angle : side
+        # far   25.176 : 134
+        # base  90.033 : 315
+        # top   64.79  : 285
+
+        # loop through a range of estimates and see what it comes up with
+        for est_base,est_top in [(310,270),(315,285)]:
+            far_angle = 25.176
+            far_side = 134
+            target_accuracy = 0.001
+            finder = ClosedFormLengthFinder(
+                far_angle=far_angle,
+                far_side=far_side,
+                est_base=est_base,
+                est_top=est_top
+            )
+            solutions = finder.find_lengths(
+                max_num_solutions=3,
+                target_accuracy=target_accuracy)
+
+            self.assertEqual(3, len(solutions))
+
+            # make sure each solution works, and is near the estimates
+            calc = BasicTrigCalc()
+            for proposed_base, proposed_top, diff in solutions:
+                base_angle = calc.calc_base_angle(
+                    far_side=far_side, 
+                    base_side=proposed_base, 
+                    top_side=proposed_top
+                )
+
+                # get the far angle and make sure it has not deviated by more than the desired accuracy
+                proposed_far_angle = calc.calc_far_angle(far_side=far_side, base_side=proposed_base, top_side=proposed_top)
+                self.assertLessEqual(abs(proposed_far_angle - far_angle)/far_angle, target_accuracy)
+                self.assertLessEqual(abs(diff), target_accuracy)
+
+                self.assertLessEqual(abs(proposed_base - est_base), 10)
+                self.assertLessEqual(abs(proposed_top - est_top), 20)
+
+    def test_solutions_spread_out (self):
+        finder = ClosedFormLengthFinder(far_angle=25.176, far_side=134, est_base=310, est_top=270)
+        solutions = finder.find_lengths(max_num_solutions=5)
+        self.assertEqual(5, len(solutions))
+
+        # not just neighboring samples of the sweep
+        for i in range(len(solutions)):
+            for j in range(i + 1, len(solutions)):
+                self.assertGreater(abs(solutions[i][0] - solutions[j][0]) + abs(solutions[i][1] - solutions[j][1]), 1.0)
+
+    def test_missing_estimates (self):
+        # no estimate for a side, or full confidence in it, still gives exact triangles
+        for est_base, est_top, base_confidence in [(0, 270, 0.8), (310, 0, 0.8), (0, 0, 0.8), (315, 285, 1.0)]:
+            finder = ClosedFormLengthFinder(far_angle=25.176, far_side=134, est_base=est_base, est_top=est_top, base_confidence=base_confidence)
+            solutions = finder.find_lengths(max_num_solutions=3)
+            self.assertEqual(3, len(solutions))
+            for base, top, diff in solutions:
+                self.assertFalse(math.isnan(base) or math.isnan(top))
+                self.assertLessEqual(abs(diff), 0.001)
+
+    def test_impossible_triangle (self):
+        finder = ClosedFormLengthFinder(
+            far_angle=0,
+            far_side=134,
+            est_base=310,
+            est_top=270
+        )
+        self.assertEqual(0, len(finder.find_lengths(max_num_solutions=3)))
@@ -1,6 +1,7 @@
 import unittest
 from trig.trig import BasicTrigCalc
-from trig.genetic_length_finder import BaseTopLengthFinder
+from trig.genetic_length_finder import BaseTopLengthFinder, LengthFitnessTester, SideLengthOptimizer, Chromosome
+import numpy as np
 import logging
 
 class TestGeneticLengthFinder(unittest.TestCase):
@@ -50,3 +51,61 @@ class TestGeneticLengthFinder(unittest.TestCase):
 
 
 
+
+    def test_seeded_find_solution (self):
+        # same triangle, seeded with roughly the right sides, as if from a previous position
+        far_angle = 25.176
+        far_side = 134
+        target_accuracy = 0.001
+        finder = BaseTopLengthFinder(
+            far_angle=far_angle,
+            far_side=far_side,
+            est_base=290,
+            est_top=260,
+            seeds=[(312, 288)]
+        )
+        solutions = finder.find_lengths(
+            max_num_solutions=5,
+            target_accuracy=target_accuracy,
+            allowed_time=0.5)
+
+        self.assertEqual(5, len(solutions))
+
+        calc = BasicTrigCalc()
+        near_seed = 0
+        for proposed_base, proposed_top, diff in solutions:
+            proposed_far_angle = calc.calc_far_angle(far_side=far_side, base_side=proposed_base, top_side=proposed_top)
+            self.assertLessEqual(abs(proposed_far_angle - far_angle)/far_angle, target_accuracy)
+            if abs(proposed_base - 312) < 312 * 0.1:
+                near_seed += 1
+
+        # the best solutions come from the seed, the rest of the population can still wander
+        self.assertLess(abs(solutions[0][0] - 312), 312 * 0.1)
+        self.assertGreaterEqual(near_seed, 3)
+
+    def test_population_fitness_matches_single (self):
+        far_angle = 25.176
+        far_side = 134
+        tester = LengthFitnessTester(far_angle=far_angle, far_side=far_side)
+        calc = BasicTrigCalc()
+        gene_key = {'base':0, 'top':1, 'far':2, 'far_angle':3}
+
+        # includes impossible triangles, which both should score as 0
+        genes = np.column_stack([np.random.uniform(50, 400, 500), np.random.uniform(50, 400, 500)])
+        scores = tester.get_fitness_levels(genes)
+        for g, score in zip(genes, scores):
+            single = tester.get_fitness_level(Chromosome(gene_key=gene_key, gene_ranges=[], genes=np.array([g[0], g[1], far_side, far_angle]), calc=calc))
+            self.assertAlmostEqual(single, score, delta=abs(single) * 1e-6)
+
+    def test_make_fit (self):
+        far_angle = 40.0
+        far_side = 50.0
+        optimizer = SideLengthOptimizer(far_angle=far_angle, far_side=far_side, population_size=10, num_elites=2, generations=10, est_base=60, est_top=55)
+
+        # a side longer than far side / sin(far angle) can't be part of the triangle, it gets bumped down
+        genes = np.array([[60.0, 55.0], [90.0, 55.0], [60.0, 200.0]])
+        optimizer.make_fit(genes, np.array([True, True, False]), 0)
+        self.assertEqual(60.0, genes[0][0])
+        self.assertLessEqual(genes[1][0] * np.sin(np.radians(far_angle)), far_side)
+        self.assertAlmostEqual(90.0 * 0.86, genes[1][0], 6)
+        self.assertEqual(200.0, genes[2][1])